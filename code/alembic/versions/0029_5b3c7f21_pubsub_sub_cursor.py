@@ -0,0 +1,76 @@
+"""Add pubsub_sub_cursor and pubsub_sub_cursor_ack for subscriptions reading GD messages from topic logs
+
+Revision ID: 0029_5b3c7f21
+Revises: 0028_ae3419a9
+Create Date: 2024-10-18 12:00:00.000000
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '0029_5b3c7f21'
+down_revision = '0028_ae3419a9'
+
+# Alembic
+from alembic import op
+
+# SQLAlchemy
+import sqlalchemy as sa
+from sqlalchemy.schema import CreateSequence, DropSequence
+
+# Zato
+from zato.common.odb.model.base import _JSON
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+def _has_sequences():
+    return op.get_bind().dialect.supports_sequences
+
+# ################################################################################################################################
+
+def upgrade():
+
+    if _has_sequences():
+        op.execute(CreateSequence(sa.Sequence('pubsub_sub_cursor_seq')))
+        op.execute(CreateSequence(sa.Sequence('pubsub_sub_cursor_ack_seq')))
+
+    op.create_table(
+        'pubsub_sub_cursor',
+        sa.Column('id', sa.Integer(), sa.Sequence('pubsub_sub_cursor_seq'), primary_key=True),
+        sa.Column('position', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('last_updated', sa.Numeric(20, 7, asdecimal=False), nullable=True),
+        sa.Column('opaque1', _JSON(), nullable=True),
+        sa.Column('sub_key', sa.String(200), sa.ForeignKey('pubsub_sub.sub_key', ondelete='CASCADE'), nullable=False),
+        sa.Column('topic_id', sa.Integer(), sa.ForeignKey('pubsub_topic.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('cluster_id', sa.Integer(), sa.ForeignKey('cluster.id', ondelete='CASCADE'), nullable=False),
+    )
+
+    op.create_index('pubsb_sub_cur_subk_idx', 'pubsub_sub_cursor', ['sub_key'], unique=True)
+    op.create_index('pubsb_sub_cur_topic_idx', 'pubsub_sub_cursor', ['cluster_id', 'topic_id'], unique=False)
+
+    op.create_table(
+        'pubsub_sub_cursor_ack',
+        sa.Column('id', sa.Integer(), sa.Sequence('pubsub_sub_cursor_ack_seq'), primary_key=True),
+        sa.Column('msg_id', sa.Integer(), sa.ForeignKey('pubsub_message.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('sub_key', sa.String(200), sa.ForeignKey('pubsub_sub.sub_key', ondelete='CASCADE'), nullable=False),
+    )
+
+    op.create_index('pubsb_sub_cur_ack_idx', 'pubsub_sub_cursor_ack', ['sub_key', 'msg_id'], unique=True)
+
+# ################################################################################################################################
+
+def downgrade():
+
+    op.drop_index('pubsb_sub_cur_ack_idx', table_name='pubsub_sub_cursor_ack')
+    op.drop_table('pubsub_sub_cursor_ack')
+
+    op.drop_index('pubsb_sub_cur_topic_idx', table_name='pubsub_sub_cursor')
+    op.drop_index('pubsb_sub_cur_subk_idx', table_name='pubsub_sub_cursor')
+    op.drop_table('pubsub_sub_cursor')
+
+    if _has_sequences():
+        op.execute(DropSequence(sa.Sequence('pubsub_sub_cursor_ack_seq')))
+        op.execute(DropSequence(sa.Sequence('pubsub_sub_cursor_seq')))
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -706,11 +706,13 @@ class Create(ZatoCommand):
         session.add(sec_default_internal)
 
         impl_name1 = 'zato.server.service.internal.pubsub.pubapi.TopicService'
+        impl_bulk  = 'zato.server.service.internal.pubsub.pubapi.BulkTopicService'
         impl_name2 = 'zato.server.service.internal.pubsub.pubapi.SubscribeService'
         impl_name3 = 'zato.server.service.internal.pubsub.pubapi.MessageService'
         impl_demo  = 'zato.server.service.internal.helpers.JSONRawRequestLogger'
 
         service_topic = Service(None, 'zato.pubsub.pubapi.topic-service', True, impl_name1, True, cluster)
+        service_bulk  = Service(None, 'zato.pubsub.pubapi.bulk-topic-service', True, impl_bulk, True, cluster)
         service_sub   = Service(None, 'zato.pubsub.pubapi.subscribe-service', True, impl_name2, True, cluster)
         service_msg   = Service(None, 'zato.pubsub.pubapi.message-service', True, impl_name3, True, cluster)
         service_demo  = Service(None, 'pub.helpers.raw-request-logger', True, impl_demo, True, cluster)
@@ -724,6 +726,11 @@ class Create(ZatoCommand):
             None, '', None, DATA_FORMAT.JSON, security=None, service=service_topic, opaque=opaque,
             cluster=cluster)
 
+        chan_bulk = HTTPSOAP(None, 'zato.pubsub.topics', True, True, CONNECTION.CHANNEL,
+            URL_TYPE.PLAIN_HTTP, None, '/zato/pubsub/topics',
+            None, '', None, DATA_FORMAT.JSON, security=None, service=service_bulk,
+            cluster=cluster)
+
         chan_sub = HTTPSOAP(None, 'zato.pubsub.subscribe.topic.topic_name', True, True, CONNECTION.CHANNEL,
             URL_TYPE.PLAIN_HTTP, None, '/zato/pubsub/subscribe/topic/{topic_name}',
             None, '', None, DATA_FORMAT.JSON, security=None, service=service_sub, opaque=opaque,
@@ -864,10 +871,12 @@ class Create(ZatoCommand):
         session.add(sub_test)
 
         session.add(service_topic)
+        session.add(service_bulk)
         session.add(service_sub)
         session.add(service_msg)
 
         session.add(chan_topic)
+        session.add(chan_bulk)
         session.add(chan_sub)
         session.add(chan_msg)
 
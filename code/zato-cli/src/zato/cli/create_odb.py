@@ -20,7 +20,7 @@ from sqlalchemy.dialects.postgresql.base import PGTypeCompiler
 from zato.cli import common_odb_opts, is_arg_given, ZatoCommand
 from zato.common.odb.model import AlembicRevision, Base, ZatoInstallState
 
-LATEST_ALEMBIC_REVISION = '0028_ae3419a9'
+LATEST_ALEMBIC_REVISION = '0029_5b3c7f21'
 VERSION = 1
 
 # ################################################################################################################################
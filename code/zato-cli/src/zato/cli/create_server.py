@@ -65,6 +65,7 @@ debugger_host=0.0.0.0
 debugger_port=5678
 ipc_host=127.0.0.1
 ipc_port_start=17050
+ipc_use_unix_socket=True
 
 work_dir=../../work
 
@@ -169,6 +170,7 @@ return_json_schema_errors=False
 sftp_genkey_command=dropbearkey
 posix_ipc_skip_platform=darwin
 service_invoker_allow_internal="pub.zato.ping", "/zato/api/invoke/service_name"
+rate_limit_lease_ratio=0.05
 
 [events]
 fs_data_path = {{events_fs_data_path}}
@@ -263,6 +265,8 @@ log_if_wsx_deliv_server_not_found=False
 data_prefix_len=2048
 data_prefix_short_len=64
 sk_server_table_columns=6, 15, 8, 6, 17, 75
+non_gd_backlog_max_bytes=0
+non_gd_backlog_on_max_bytes=spill-gd
 
 [pubsub_meta_topic]
 enabled=True
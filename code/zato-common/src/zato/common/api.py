@@ -477,6 +477,11 @@ class CACHE:
     class DEFAULT:
         MAX_SIZE = 10000
         MAX_ITEM_SIZE = 10000 # In characters for string/unicode, bytes otherwise
+        SYNC_BATCH_WINDOW = 20 # In milliseconds
+        SYNC_BATCH_MAX_OPS = 500
+        SHMEM_STRIPES = 16
+        SHMEM_MAX_KEY_SIZE = 256 # In bytes
+        SHMEM_LOCK_TIMEOUT = 5 # In seconds
 
     class PERSISTENT_STORAGE:
         NO_PERSISTENT_STORAGE = NameId('No persistent storage', 'no-persistent-storage')
@@ -485,12 +490,20 @@ class CACHE:
         def __iter__(self):
             return iter((self.NO_PERSISTENT_STORAGE, self.SQL))
 
+    class BUILTIN_STORAGE:
+        WORKER = NameId('Worker process', 'worker')
+        SHARED_MEMORY = NameId('Shared memory', 'shared-memory')
+
+        def __iter__(self):
+            return iter((self.WORKER, self.SHARED_MEMORY))
+
     class SYNC_METHOD:
         NO_SYNC = NameId('No synchronization', 'no-sync')
         IN_BACKGROUND = NameId('In background', 'in-background')
+        BATCHED = NameId('In background, batched', 'batched')
 
         def __iter__(self):
-            return iter((self.NO_SYNC, self.IN_BACKGROUND))
+            return iter((self.NO_SYNC, self.IN_BACKGROUND, self.BATCHED))
 
 # ################################################################################################################################
 # ################################################################################################################################
@@ -888,6 +901,24 @@ class PUBSUB:
         ACCEPT = NameId('Accept', 'accept')
         DROP = NameId('Drop', 'drop')
 
+    # How GD messages are stored for subscribers - either each of them has its own queue with references to messages
+    # or all of them read messages straight from the topic, each keeping its own cursor. Subscriptions use the storage
+    # that their topic had when they were created.
+    class GD_STORAGE:
+        QUEUE = NameId('Subscriber queues', 'queue')
+        TOPIC_LOG = NameId('Topic log', 'topic-log')
+
+        def __iter__(self):
+            return iter((self.QUEUE, self.TOPIC_LOG))
+
+    # What to do with non-GD messages that would make the in-RAM backlog of a server exceed its maximum size
+    class ON_MAX_BACKLOG_BYTES:
+        SPILL_GD = NameId('Store as GD', 'spill-gd')
+        DROP_OLDEST = NameId('Drop oldest', 'drop-oldest')
+
+        def __iter__(self):
+            return iter((self.SPILL_GD, self.DROP_OLDEST))
+
     class DEFAULT:
         DATA_FORMAT = 'text'
         MIME_TYPE = 'application/json'
@@ -905,6 +936,9 @@ class PUBSUB:
         WAIT_TIME_SOCKET_ERROR = 10
         WAIT_TIME_NON_SOCKET_ERROR = 3
         ON_NO_SUBS_PUB = 'accept'
+        GD_STORAGE = 'queue'
+        NON_GD_BACKLOG_MAX_BYTES = 0 # No limit
+        ON_MAX_BACKLOG_BYTES = 'spill-gd'
         SK_OPAQUE = ('deliver_to_sk', 'reply_to_sk')
 
         Dashboard_Message_Body = 'This is a sample message'
@@ -1182,9 +1216,11 @@ class RATE_LIMIT:
     class TYPE:
         APPROXIMATE = NameId('Approximate', 'APPROXIMATE')
         EXACT       = NameId('Exact', 'EXACT')
+        CLUSTER     = NameId('Cluster-wide', 'CLUSTER')
+        CLUSTER_SLIDING = NameId('Cluster-wide, sliding window', 'CLUSTER_SLIDING')
 
         def __iter__(self):
-            return iter((self.APPROXIMATE, self.EXACT))
+            return iter((self.APPROXIMATE, self.EXACT, self.CLUSTER, self.CLUSTER_SLIDING))
 
     class OBJECT_TYPE:
         HTTP_SOAP = 'http_soap'
@@ -1271,6 +1307,12 @@ class IPC:
         Timeout = 90
         TCP_Port_Start = 17050
 
+        # Whether processes of the same server should invoke each other through Unix sockets rather than TCP
+        Use_Unix_Socket = True
+
+        # How many idle connections to a Unix socket to keep open for later use
+        Unix_Socket_Max_Idle = 10
+
     class Credentials:
         Username = 'zato.server.ipc'
         Password_Key = 'Zato_Server_IPC_Password'
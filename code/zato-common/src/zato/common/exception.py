@@ -66,6 +66,12 @@ class TimeoutException(ConnectionException):
 
 # ################################################################################################################################
 
+class CircuitOpenException(ConnectionException):
+    """ Raised when a call to an external system is not made because its circuit breaker is open.
+    """
+
+# ################################################################################################################################
+
 class StatusAwareException(ZatoException):
     """ Raised when the underlying error condition can be easily expressed
     as one of the HTTP status codes.
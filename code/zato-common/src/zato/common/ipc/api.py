@@ -8,19 +8,21 @@ Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
 
 # stdlib
 import logging
+import os
 
 # Zato
 from zato.common.api import IPC
 from zato.common.ipc.client import IPCClient
 from zato.common.ipc.server import IPCServer
-from zato.common.util.api import fs_safe_name, load_ipc_pid_port
+from zato.common.ipc.unix import UnixIPCClient, UnixIPCConnectError, UnixIPCServer
+from zato.common.util.api import fs_safe_name, get_ipc_pid_port_path, get_ipc_pid_socket_path, load_ipc_pid_port
 
 # ################################################################################################################################
 # ################################################################################################################################
 
 if 0:
     from zato.common.ipc.client import IPCResponse
-    from zato.common.typing_ import callable_
+    from zato.common.typing_ import any_, callable_, intnone
     from zato.server.base.parallel import ParallelServer
 
 # ################################################################################################################################
@@ -45,6 +47,27 @@ class IPCAPI:
         self.username = IPC.Credentials.Username
         self.password = ''
 
+        # Whether we invoke other processes through their Unix sockets, if they have any
+        self.use_unix_socket = IPC.Default.Use_Unix_Socket
+
+        # PID -> (socket file identity, client) - a client is replaced if its socket file changes
+        self._unix_clients = {} # type: dict[int, tuple[any_, UnixIPCClient]]
+
+        # PID -> (port file identity, port)
+        self._tcp_ports = {} # type: dict[int, tuple[any_, int]]
+
+# ################################################################################################################################
+
+    def _get_file_id(self, path:'str') -> 'any_':
+        """ Returns a value that changes each time a given file is re-created or modified, or None if it does not exist.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        else:
+            return (stat.st_ino, stat.st_mtime_ns)
+
 # ################################################################################################################################
 
     def set_password(self, password:'str') -> 'None':
@@ -79,6 +102,71 @@ class IPCAPI:
             server_type_suffix=server_type_suffix
         )
 
+# ################################################################################################################################
+
+    def start_unix_server(
+        self,
+        pid,           # type: int
+        *,
+        cluster_name,  # type: str
+        server_name,   # type: str
+        username='',   # type: str
+        password='',   # type: str
+        callback_func, # type: callable_
+    ) -> 'None':
+
+        path = get_ipc_pid_socket_path(cluster_name, server_name, pid)
+
+        server = UnixIPCServer(path, username or self.username, password or self.password, callback_func)
+        server.serve_forever()
+
+# ################################################################################################################################
+
+    def _get_unix_client(self, cluster_name:'str', server_name:'str', target_pid:'int') -> 'UnixIPCClient | None':
+
+        # The socket file tells us whether the target process listens on a Unix socket ..
+        path = get_ipc_pid_socket_path(cluster_name, server_name, target_pid)
+        file_id = self._get_file_id(path)
+
+        cached_file_id, client = self._unix_clients.get(target_pid) or (None, None)
+
+        # .. if it is the same file that we already have a client for, we can reuse it ..
+        if client and cached_file_id == file_id:
+            return client
+
+        # .. otherwise, the process is gone or it was replaced by a new one with the same PID ..
+        if client:
+            client.close()
+            _ = self._unix_clients.pop(target_pid, None)
+
+        if not file_id:
+            return None
+
+        # .. so we need a new client for it.
+        client = UnixIPCClient(path, self.username, self.password, IPC.Default.Unix_Socket_Max_Idle)
+        self._unix_clients[target_pid] = (file_id, client)
+
+        return client
+
+# ################################################################################################################################
+
+    def _get_tcp_port(self, cluster_name:'str', server_name:'str', target_pid:'int') -> 'int':
+
+        # Reuse the port that we already read unless the file with the port has changed since then ..
+        path = get_ipc_pid_port_path(cluster_name, server_name, target_pid)
+        file_id = self._get_file_id(path)
+
+        cached_file_id, port = self._tcp_ports.get(target_pid) or (None, None) # type: any_, intnone
+
+        if port and cached_file_id == file_id:
+            return port
+
+        # .. this will wait for the file if it does not exist yet ..
+        port = load_ipc_pid_port(cluster_name, server_name, target_pid)
+        self._tcp_ports[target_pid] = (self._get_file_id(path), port)
+
+        return port
+
 # ################################################################################################################################
 
     def invoke_by_pid(
@@ -94,11 +182,32 @@ class IPCAPI:
         """ Invokes a service in a specific process synchronously through IPC.
         """
 
+        # Prefer the Unix socket of the target process, if it has one ..
+        if self.use_unix_socket:
+            client = self._get_unix_client(cluster_name, server_name, target_pid)
+            if client:
+                logger.debug(f'Invoking {service} on {cluster_name}:{server_name}:{target_pid}-unix')
+                try:
+                    return client.invoke(
+                        service,
+                        request,
+                        cluster_name=cluster_name,
+                        server_name=server_name,
+                        server_pid=target_pid,
+                        timeout=timeout,
+                        source_server_name=self.parallel_server.name,
+                        source_server_pid=self.parallel_server.pid,
+                    )
+
+                # .. nothing was sent in this case so we can still try TCP below.
+                except UnixIPCConnectError as e:
+                    logger.info('Falling back to TCP for %s:%s:%s -> %s', cluster_name, server_name, target_pid, e)
+
         # This is constant
         ipc_host = '127.0.0.1'
 
         # Get the port that we can find the PID listening on
-        ipc_port = load_ipc_pid_port(cluster_name, server_name, target_pid)
+        ipc_port = self._get_tcp_port(cluster_name, server_name, target_pid)
 
         # Log what we are about to do
         log_msg = f'Invoking {service} on {cluster_name}:{server_name}:{target_pid}-tcp:{ipc_port}'
@@ -51,6 +51,23 @@ class IPCResponse:
 # ################################################################################################################################
 # ################################################################################################################################
 
+def build_ipc_response(response:'anydict', cluster_name:'str', server_name:'str', server_pid:'int') -> 'IPCResponse':
+    """ Turns a de-serialized response from an IPC server into an IPCResponse object.
+    """
+    ipc_response = IPCResponse()
+    ipc_response.data = response['response'] or None
+    ipc_response.meta = IPCResponseMeta()
+    ipc_response.meta.cid = response['cid']
+    ipc_response.meta.is_ok = response['status'] == Common_IPC.Status_OK
+    ipc_response.meta.cluster_name = cluster_name
+    ipc_response.meta.server_name = server_name
+    ipc_response.meta.server_pid = server_pid
+
+    return ipc_response
+
+# ################################################################################################################################
+# ################################################################################################################################
+
 class IPCClient:
 
     def __init__(
@@ -136,17 +153,8 @@ class IPCClient:
         # .. de-serialize the response ..
         response = loads(response.text)
 
-        ipc_response = IPCResponse()
-        ipc_response.data = response['response'] or None
-        ipc_response.meta = IPCResponseMeta()
-        ipc_response.meta.cid = response['cid']
-        ipc_response.meta.is_ok = response['status'] == Common_IPC.Status_OK
-        ipc_response.meta.cluster_name = cluster_name
-        ipc_response.meta.server_name = server_name
-        ipc_response.meta.server_pid = server_pid
-
         # .. and return its response.
-        return ipc_response
+        return build_ipc_response(response, cluster_name, server_name, server_pid)
 
 # ################################################################################################################################
 
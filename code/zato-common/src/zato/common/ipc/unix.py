@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2023, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+import os
+from hmac import compare_digest
+from json import dumps
+from logging import getLogger
+from struct import Struct
+from traceback import format_exc
+
+# Bunch
+from bunch import Bunch
+
+# gevent
+from gevent import socket
+from gevent.lock import RLock
+from gevent.server import StreamServer
+
+# Zato
+from zato.common.api import IPC as Common_IPC
+from zato.common.broker_message import SERVER_IPC
+from zato.common.ipc.client import build_ipc_response
+from zato.common.util.api import new_cid
+from zato.common.util.json_ import json_loads
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.ipc.client import IPCResponse
+    from zato.common.typing_ import any_, anydict, callable_
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+logger = getLogger(__name__)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+# Each frame is a JSON document preceded by its length as a four-byte, unsigned, big-endian integer
+_frame_header = Struct('>I')
+_frame_header_size = _frame_header.size
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class UnixIPCConnectError(Exception):
+    """ Raised when a Unix socket cannot be connected to, which means that nothing has been sent to the other side yet.
+    """
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+def _recv_exact(sock:'socket.socket', size:'int') -> 'bytes':
+
+    buffer = bytearray()
+
+    while len(buffer) < size:
+        data = sock.recv(size - len(buffer))
+        if not data:
+            raise EOFError('Connection closed by peer after {} of {} bytes'.format(len(buffer), size))
+        buffer.extend(data)
+
+    return bytes(buffer)
+
+# ################################################################################################################################
+
+def send_frame(sock:'socket.socket', data:'anydict') -> 'None':
+    payload = dumps(data).encode('utf8')
+    sock.sendall(_frame_header.pack(len(payload)) + payload)
+
+# ################################################################################################################################
+
+def recv_frame(sock:'socket.socket') -> 'any_':
+    size, = _frame_header.unpack(_recv_exact(sock, _frame_header_size))
+    return json_loads(_recv_exact(sock, size))
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class UnixIPCServer:
+    """ Listens for IPC requests from other processes of the same server on a Unix socket.
+    Each connection is persistent and can carry any number of requests, each in its own frame.
+    """
+    cid_prefix = 'zipc'
+
+    def __init__(self, path:'str', username:'str', password:'str', callback_func:'callable_') -> 'None':
+        self.path = path
+        self.username = username
+        self.password = password
+        self.callback_func = callback_func
+        self.impl = None # type: StreamServer | None
+
+# ################################################################################################################################
+
+    def _get_listener(self) -> 'socket.socket':
+
+        # A socket file may have been left over by a previous process with the same PID
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.path)
+        listener.listen(128)
+
+        # Only processes running under the same user can connect to us
+        os.chmod(self.path, 0o600)
+
+        return listener
+
+# ################################################################################################################################
+
+    def serve_forever(self) -> 'None':
+        logger.info('Starting IPC server (unix:%s)', self.path)
+        self.impl = StreamServer(self._get_listener(), self._on_connection)
+        self.impl.serve_forever()
+
+# ################################################################################################################################
+
+    def stop(self) -> 'None':
+        if self.impl:
+            self.impl.stop()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+# ################################################################################################################################
+
+    def _handle_request(self, request:'anydict') -> 'any_':
+
+        # First, check credentials ..
+        if not (compare_digest(request.get('username') or '', self.username) and \
+           compare_digest(request.get('password') or '', self.password)):
+            raise Exception('Invalid credentials')
+
+        # .. this is the only action supported ..
+        action = request.get('action')
+        if action != SERVER_IPC.INVOKE.value:
+            raise Exception('Unexpected action `{}`'.format(action))
+
+        # .. callback functions expect Bunch instances on input.
+        return self.callback_func(Bunch(request))
+
+# ################################################################################################################################
+
+    def _on_connection(self, sock:'socket.socket', _ignored_address:'any_') -> 'None':
+
+        try:
+            while True:
+
+                try:
+                    request = recv_frame(sock)
+                except EOFError:
+                    return
+
+                cid = '{}{}'.format(self.cid_prefix, new_cid())
+                response = {}
+
+                try:
+                    response = self._handle_request(request)
+                    status = Common_IPC.Status_OK
+                except Exception:
+                    logger.warning(format_exc())
+                    status = 'error'
+
+                send_frame(sock, {
+                    'cid': cid,
+                    'status': status,
+                    'response': response
+                })
+
+        except Exception:
+            logger.warning('IPC connection error (unix:%s) -> %s', self.path, format_exc())
+
+        finally:
+            sock.close()
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class UnixIPCClient:
+    """ Invokes an IPC server over its Unix socket, keeping connections open between invocations.
+    """
+    def __init__(self, path:'str', username:'str', password:'str', max_idle:'int'=10) -> 'None':
+        self.path = path
+        self.username = username
+        self.password = password
+        self.max_idle = max_idle
+        self._idle = [] # type: list[socket.socket]
+        self._lock = RLock()
+
+# ################################################################################################################################
+
+    def _acquire(self, timeout:'int') -> 'socket.socket':
+
+        with self._lock:
+            if self._idle:
+                sock = self._idle.pop()
+                sock.settimeout(timeout)
+                return sock
+
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            sock.connect(self.path)
+        except OSError as e:
+            raise UnixIPCConnectError('Could not connect to unix:{} -> {}'.format(self.path, e))
+        else:
+            return sock
+
+# ################################################################################################################################
+
+    def _release(self, sock:'socket.socket') -> 'None':
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(sock)
+                return
+        sock.close()
+
+# ################################################################################################################################
+
+    def close(self) -> 'None':
+        with self._lock:
+            for sock in self._idle:
+                sock.close()
+            self._idle[:] = []
+
+# ################################################################################################################################
+
+    def invoke(
+        self,
+        service,    # type: str
+        request,    # type: any_
+        *,
+        cluster_name, # type: str
+        server_name,  # type: str
+        server_pid,   # type: int
+        timeout=90,   # type: int
+        source_server_name, # type: str
+        source_server_pid,  # type: int
+    ) -> 'IPCResponse':
+
+        # Prepare the full request ..
+        dict_data = {
+            'username': self.username,
+            'password': self.password,
+            'source_server_name': source_server_name,
+            'source_server_pid':  source_server_pid,
+            'action':   SERVER_IPC.INVOKE.value,
+            'service':  service,
+            'data': request,
+        }
+
+        # .. get a connection to the server ..
+        sock = self._acquire(timeout)
+
+        # .. invoke it - the connection cannot be reused if anything goes wrong
+        # .. because we would not know where the next frame would start in that case ..
+        try:
+            send_frame(sock, dict_data)
+            response = recv_frame(sock)
+        except Exception:
+            sock.close()
+            raise
+        else:
+            self._release(sock)
+
+        # .. and return its response.
+        return build_ipc_response(response, cluster_name, server_name, server_pid)
+
+# ################################################################################################################################
+# ################################################################################################################################
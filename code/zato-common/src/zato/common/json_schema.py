@@ -11,8 +11,7 @@ import os
 from logging import getLogger
 
 # JSON Schema
-from jsonschema import validate as js_validate
-from jsonschema.exceptions import ValidationError as JSValidationError
+from jsonschema.exceptions import best_match
 from jsonschema.validators import validator_for
 
 # Zato
@@ -176,6 +175,8 @@ class ValidationConfig:
         self.object_name = None # type: str
         self.schema_path = None # type: str
         self.schema = None      # type: dict
+
+        # A validator instance, built for the schema once and then reused by each validation
         self.validator = None   # type: object
         self.needs_err_details = None # type: bool
 
@@ -237,15 +238,20 @@ class Validator:
         # Parse the contents as JSON
         schema = loads(schema)
 
-        # Assign the schema and validator for the schema for later use
+        # Find the validator class for the schema's draft and check the schema itself,
+        # which is done only once here rather than each time a request is validated ..
+        validator_class = validator_for(schema)
+        validator_class.check_schema(schema)
+
+        # .. assign the schema and validator for the schema for later use.
         self.config.schema = schema
-        self.config.validator = validator_for(schema)
+        self.config.validator = validator_class(schema)
 
         # Everything is set up = we are initialized
         self.is_initialized = True
 
-    def validate(self, cid, data, object_type=None, object_name=None, needs_err_details=False, _validate=js_validate):
-        # type: (str, object, str, str, Callable) -> Result
+    def validate(self, cid, data, object_type=None, object_name=None, needs_err_details=False, _best_match=best_match):
+        # type: (str, object, str, str, bool, Callable) -> Result
 
         # Result we will return
         result = Result()
@@ -255,15 +261,16 @@ class Validator:
         object_name = object_name or self.config.object_name
         needs_err_details = needs_err_details or self.config.needs_err_details
 
-        try:
-            js_validate(data, self.config.schema, self.config.validator)
-        except JSValidationError as e:
+        # This is the same error that jsonschema.validate would raise
+        error = _best_match(self.config.validator.iter_errors(data))
+
+        if error is not None:
 
             # These will be always used, no matter the object/channel type
             result.is_ok = False
             result.object_type = object_type
             result.needs_err_details = needs_err_details
-            result.error_msg = str(e)
+            result.error_msg = str(error)
 
             # This is applicable only to JSON-RPC
             if object_type == CHANNEL.JSON_RPC:
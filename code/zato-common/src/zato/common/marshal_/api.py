@@ -8,6 +8,7 @@ Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
 
 # stdlib
 from dataclasses import asdict, _FIELDS, make_dataclass, MISSING, _PARAMS # type: ignore
+from functools import partial
 from http.client import BAD_REQUEST
 from inspect import isclass
 from typing import Any
@@ -44,7 +45,7 @@ from zato.common.typing_ import cast_, date_, datetime_, datetimez, extract_from
 
 if 0:
     from dataclasses import Field
-    from zato.common.typing_ import any_, anydict, anylist, boolnone, dictnone, intnone, optional, tuplist
+    from zato.common.typing_ import any_, anydict, anylist, dictnone, intnone, tuplist
     from zato.server.base.parallel import ParallelServer
     from zato.server.service import Service
 
@@ -56,6 +57,12 @@ if 0:
 
 _None_Type = type(None)
 
+# Unmarshalling plans are stored in model classes under this attribute
+_model_plan_attr = '_zato_model_plan'
+
+# Indicates that there is no value for optional fields with a given type, in which case it is reported in runtime
+_empty_value_unknown = object()
+
 # ################################################################################################################################
 # ################################################################################################################################
 
@@ -251,80 +258,132 @@ class ElementIsNotAList(ElementMissing):
 # ################################################################################################################################
 # ################################################################################################################################
 
-class DictCtx:
-    def __init__(
-        self,
-        service:      'Service',
-        current_dict: 'anydict | Model',
-        DataClass:    'any_',
-        extra:        'dictnone',
-        list_idx:     'intnone',
-        parent:       'optional[FieldCtx]' = None
-        ) -> 'None':
-
-        # We get these on input ..
-        self.service      = service
-        self.current_dict = current_dict
-        self.extra        = extra
-        self.DataClass    = DataClass
-        self.list_idx     = list_idx
-        self.parent       = parent
+def _to_int(value:'any_') -> 'any_':
+    if not isinstance(value, int):
+        value = int(value)
+    return value
+
+def _to_date(value:'any_') -> 'any_':
+    if not isinstance(value, date_):
+        value = dt_parse(value).date() # type: ignore
+    return value
+
+def _to_datetime(value:'any_') -> 'any_':
+    if not isinstance(value, (date_, datetime_, datetimez)):
+        value = dt_parse(value) # type: ignore
+    return value
+
+def _to_datetimez(value:'any_') -> 'any_':
+    if not isinstance(value, (date_, datetime_, datetimez)):
+        value = dt_parse(value) # type: ignore
+        value = datetimez(
+            year=value.year,
+            month=value.month,
+            day=value.day,
+            hour=value.hour,
+            minute=value.minute,
+            second=value.second,
+            microsecond=value.microsecond,
+            tzinfo=value.tzinfo,
+            fold=value.fold,
+        )
+    return value
+
+def _to_isotimestamp(value:'any_') -> 'any_':
+    if isinstance(value, str):
+        value = dt_parse(value) # type: ignore
+        value = value.isoformat()
+    return value
+
+# Maps field types to functions that parse input values into these types
+_converters = {
+    int: _to_int,
+    date_: _to_date,
+    datetime_: _to_datetime,
+    datetimez: _to_datetimez,
+    isotimestamp: _to_isotimestamp,
+}
+
+# ################################################################################################################################
+
+def _get_empty_value(field_type:'any_') -> 'any_':
+    """ Returns a value for an optional field that was not given on input and that has no default value.
+    """
+    # This is the most reliable way
+    if 'typing.List' in str(field_type):
+        return []
+    elif field_type is Any:
+        return None
+    elif issubclass(field_type, str):
+        return ''
+    elif issubclass(field_type, int):
+        return 0
+    elif issubclass(field_type, list):
+        return []
+    elif issubclass(field_type, dict):
+        return {}
+    elif issubclass(field_type, float):
+        return 0.0
+    else:
+        return None
 
-        # .. while these we need to build ourselves in self.init.
-        self.has_init = None # type: boolnone
+# ################################################################################################################################
 
-        # These are the Field object that we expect this dict will contain,
-        # i.e. it will be possible to map ourselves to these Field objects.
-        self.fields = None # type: dictnone
+def _get_elem_path(parent:'any_', name:'str') -> 'str':
+    """ Returns a path to an element, e.g. /phone_list[0]/attr_list[1]/name, given the element's name and its parent,
+    which is a tuple of the parent's own parent, its name and its index in a list, if it is in one.
+    """
+    # This will always exist
+    elem_path = [name]
 
-        # This will be populated with parameters to the dataclass's __init__ method, assuming that the class has one.
-        self.init_attrs = {}
+    # Keep checking parent fields as long as they exist
+    while parent:
+        parent, parent_name, list_idx = parent
+        if list_idx is not None:
+            parent_name = '{}[{}]'.format(parent_name, list_idx)
+        elem_path.append(parent_name)
 
-        # This will be populated with parameters to be set via setattr, in case the class does not have __init__.
-        self.setattr_attrs = {}
+    # We need to reverse it now to present a top-down view
+    elem_path.reverse()
 
-        # We can check it once upfront and make it point to either init_attrs or setattr_attrs
-        self.attrs_container = cast_('dict', None) # type: dictnone
+    # Now, join it with a elem_path separator
+    return '/' + '/'.join(elem_path)
 
 # ################################################################################################################################
+# ################################################################################################################################
 
-    def init(self):
-
-        # Whether the dataclass defines the __init__method
-        dataclass_params = getattr(self.DataClass, _PARAMS, None)
-        self.has_init = dataclass_params.init if dataclass_params else False
-
-        self.attrs_container = self.init_attrs if self.has_init else self.setattr_attrs
-        self.fields = getattr(self.DataClass, _FIELDS) # type: dictnone
+class FieldPlan:
+    """ Everything about a single field of a model class that unmarshalling needs and that does not depend on input.
+    """
+    def __init__(self, field:'Field') -> 'None':
 
-# ################################################################################################################################
-# ################################################################################################################################
+        self.field = field
+        self.name  = field.name # type: str
 
-class FieldCtx:
-    def __init__(self, dict_ctx, field, parent):
-        # type: (DictCtx, Field, optional[FieldCtx]) -> None
+        # Assume we are required ..
+        self.is_required = True
 
-        # We get these on input ..
-        self.dict_ctx   = dict_ctx
-        self.field      = field
-        self.parent     = parent
-        self.name       = self.field.name # type: str
+        # This will be the same as field.type unless field.type is a union (e.g. optional[str]).
+        # In this case, self.field_type will be str whereas field.type will be the original type.
+        self.field_type = field.type
 
-        # This will be the same as self.field.type unless self.field.type is a union (e.g. optional[str]).
-        # In this case, self.field_type will be str whereas self.field.type will be the original type.
-        self.field_type = None # type: object
+        # .. unless it is a union with None = this field is really optional[type_]
+        if is_union(field.type):
+            _, self.field_type, union_with = extract_from_union(field.type)
+            self.is_required = not (union_with is _None_Type)
 
-        # .. by default, assume we have no type information (we do not know what model class it is)
-        self.model_class = None # type: object
+        # A function to parse input values with, if any is needed for our type
+        try:
+            self.converter = _converters.get(self.field_type)
+        except TypeError:
+            self.converter = None # The type is not hashable so there is surely no converter for it
 
-        # .. while these we need to build ourselves in self.init ..
-        self.value    = None # type: any_
-        self.is_class = None # type: boolnone
-        self.is_list  = None # type: boolnone
-        self.is_required = None # type: boolnone
+        self.is_class = isclass(field.type)
+        self.is_model = self.is_class and issubclass(field.type, Model)
+        self.is_list = is_list(field.type, self.is_class) # type: ignore
 
-        # This indicates if ourselves, we are a Model instance
-        self.is_model = None # type: boolnone
+        # By default, assume we have no type information (we do not know what model class it is)
+        self.model_class = None # type: any_
 
         # This indicates whether we are a list that contains a Model instance.
         # The value is based on whether self.model_class exists or not
@@ -332,81 +391,6 @@ class FieldCtx:
         # as the latter is possible in strlist definitions.
         self.contains_model = False
 
-        # We set this flag to True only if there is some extra data that we have
-        # and if we are a top-level element, as indicated by the lack of parent.
-        self.has_extra = self.dict_ctx.extra and (not self.dict_ctx.parent)
-
-# ################################################################################################################################
-
-    def init(self):
-
-        # Assume that we do not have any value
-        value = ZatoNotGiven
-
-        # If we have extra data, that will take priority over our regular dict, which is why we check it first here.
-        if self.has_extra:
-            if self.dict_ctx.extra:
-                value = self.dict_ctx.extra.get(self.name, ZatoNotGiven)
-
-        # If we do not have a value here, it means that we have no extra,
-        # or that it did not contain the expected value so we look it up in the current dictionary.
-        if value == ZatoNotGiven:
-            if isinstance(self.dict_ctx.current_dict, dict):
-                value = self.dict_ctx.current_dict.get(self.name, ZatoNotGiven)
-            elif isinstance(self.dict_ctx.current_dict, Model): # type: ignore
-                value = getattr(self.dict_ctx.current_dict, self.name, ZatoNotGiven)
-
-        # We do not handle SQLAlchemy Table objects
-        is_table = isinstance(value, Table)
-
-        # If this field has a value, we can try to parse it into a specific type ..
-        if (not is_table) and value and (value != ZatoNotGiven):
-
-            try:
-                # .. as an integer ..
-                if self.field_type is int:
-                    if not isinstance(value, int):
-                        value = int(value)
-
-                if self.field_type is date_:
-                    if not isinstance(value, date_):
-                        value = dt_parse(value).date() # type: ignore
-
-                # .. as a datetime object ..
-                elif self.field_type in (datetime_, datetimez):
-                    if not isinstance(value, (date_, datetime_, datetimez)):
-                        _is_datetimez = self.field_type is datetimez
-                        value = dt_parse(value) # type: ignore
-                        if _is_datetimez:
-                            value = datetimez(
-                                year=value.year,
-                                month=value.month,
-                                day=value.day,
-                                hour=value.hour,
-                                minute=value.minute,
-                                second=value.second,
-                                microsecond=value.microsecond,
-                                tzinfo=value.tzinfo,
-                                fold=value.fold,
-                            )
-
-                # .. as a datetime object formatted as string ..
-                elif self.field_type is isotimestamp:
-                    if isinstance(value, str):
-                        value = dt_parse(value) # type: ignore
-                        value = value.isoformat()
-
-            except Exception as e:
-                msg = f'Value `{repr(value)}` of field {self.name} could not be parsed -> {e} -> {self.dict_ctx.current_dict}'
-                raise Exception(msg)
-
-        # At this point, we know there will be something to assign although it still may be ZatoNotGiven.
-        self.value = value
-
-        self.is_class = isclass(self.field.type)
-        self.is_model = self.is_class and issubclass(self.field.type, Model)
-        self.is_list = is_list(self.field.type, self.is_class) # type: ignore
-
         #
         # This is a list and we need to check if its definition
         # contains information about the actual type of elements inside.
@@ -415,93 +399,109 @@ class FieldCtx:
         # Otherwise, we will just pass this list on as it is.
         #
         if self.is_list:
-            self.model_class = extract_model_class(self.field.type) # type: ignore
+            self.model_class = extract_model_class(field.type) # type: ignore
             self.contains_model = bool(self.model_class and hasattr(self.model_class, _FIELDS))
 
+        # Default values to use if there is no value on input
+        self.default = field.default
+        self.default_factory = field.default_factory if field.default_factory is not MISSING else None
+
+        # This is what optional fields without default values will get. Not every type can be checked with issubclass,
+        # in which case we do not have anything here and the error is reported in runtime, only if such a value is needed.
+        try:
+            self.empty_value = _get_empty_value(self.field_type)
+        except Exception:
+            self.empty_value = _empty_value_unknown
+
 # ################################################################################################################################
 
-    def get_name(self):
-        if self.dict_ctx.list_idx is not None:
-            return '{}[{}]'.format(self.name, self.dict_ctx.list_idx)
+    def get_empty_value(self) -> 'any_':
+
+        # Each field gets its own lists and dicts ..
+        if self.empty_value.__class__ is list:
+            return []
+
+        elif self.empty_value.__class__ is dict:
+            return {}
+
+        # .. this will raise an exception ..
+        elif self.empty_value is _empty_value_unknown:
+            return _get_empty_value(self.field_type)
+
+        # .. while all the other values can be shared.
         else:
-            return self.name
+            return self.empty_value
 
 # ################################################################################################################################
 # ################################################################################################################################
 
-class MarshalAPI:
+class ModelPlan:
+    """ Everything about a model class that unmarshalling needs and that does not depend on input. Each plan is built once
+    and it is stored in the class that it is for, which means that classes created during hot-deployment get new plans.
+    """
+    def __init__(self, DataClass:'any_') -> 'None':
 
-    def __init__(self):
-        self._field_cache = {}
+        # Whether the dataclass defines the __init__method
+        dataclass_params = getattr(DataClass, _PARAMS, None)
+        self.has_init = dataclass_params.init if dataclass_params else False
 
-# ################################################################################################################################
+        # These are the Field objects that we expect input dicts will contain, sorted by their names.
+        fields = getattr(DataClass, _FIELDS) # type: anydict
+        self.field_plans = [FieldPlan(field) for _ignored_name, field in sorted(fields.items())]
 
-    def get_validation_error(
-        self,
-        field_ctx,                 # type: FieldCtx
-        error_class=ElementMissing # type: any_
-    ) -> 'ModelValidationError':
+# ################################################################################################################################
 
-        # This will always exist
-        elem_path = [field_ctx.name]
+def get_model_plan(DataClass:'any_') -> 'ModelPlan':
+    """ Returns a plan for unmarshalling dicts into instances of the input class, building it first if it does not exist yet.
+    """
+    # We look up the class's own attributes rather than use getattr because subclasses need plans of their own
+    plan = DataClass.__dict__.get(_model_plan_attr)
 
-        # Keep checking parent fields as long as they exist
-        while field_ctx.parent:
-            elem_path.append(field_ctx.parent.get_name())
-            field_ctx = field_ctx.parent
+    if plan is None:
+        plan = ModelPlan(DataClass)
+        setattr(DataClass, _model_plan_attr, plan)
 
-        # We need to reverse it now to present a top-down view
-        elem_path = reversed(elem_path)
+    return plan
 
-        # Now, join it with a elem_path separator
-        elem_path = '/' + '/'.join(elem_path)
+# ################################################################################################################################
+# ################################################################################################################################
 
-        return error_class(elem_path)
+class MarshalAPI:
 
 # ################################################################################################################################
 
-    def _self_require_dict_or_model(self, field_ctx:'FieldCtx') -> 'None':
-        if not isinstance(field_ctx.value, (dict, BaseModel)):
-            raise self.get_validation_error(field_ctx)
+    def get_validation_error(
+        self,
+        parent,                    # type: any_
+        name,                      # type: str
+        error_class=ElementMissing # type: any_
+    ) -> 'ModelValidationError':
+        return error_class(_get_elem_path(parent, name))
 
 # ################################################################################################################################
 
-    def _visit_list(self, field_ctx:'FieldCtx') -> 'anylist':
+    def _visit_list(
+        self,
+        service: 'Service',
+        value:   'anylist',
+        field_plan: 'FieldPlan',
+        parent:  'any_',
+    ) -> 'anylist':
 
         # Local aliases
-        service     = field_ctx.dict_ctx.service
-        model_class = field_ctx.model_class
+        model_class = field_plan.model_class
+        name = field_plan.name
 
         # Respone to produce
         out = []
 
-        # Visit each element in the list ..
-        for idx, elem in enumerate(field_ctx.value):
-
-            if field_ctx.is_list:
-                field_ctx.dict_ctx.list_idx = idx
-
-            # .. convert it to a model instance ..
-            instance = self.from_dict(service, elem, model_class, list_idx=idx, parent=field_ctx)
-
-            # .. and append it for our caller ..
-            out.append(instance)
+        # Visit each element in the list, convert it to a model instance and append it for our caller ..
+        for idx, elem in enumerate(value):
+            out.append(self.from_dict(service, elem, model_class, list_idx=idx, parent=(parent, name, idx)))
 
         # .. finally, return the response.
         return out # type: ignore
 
-# ################################################################################################################################
-
-    def from_field_ctx(self, field_ctx:'FieldCtx') -> 'any_':
-        return self.from_dict(field_ctx.dict_ctx.service, field_ctx.value, field_ctx.field.type,
-            extra=None, list_idx=field_ctx.dict_ctx.list_idx, parent=field_ctx)
-
-# ################################################################################################################################
-
-    def _ensure_value_is_a_list(self, field_ctx:'FieldCtx', value:'any_') -> 'None':
-        if not isinstance(value, list):
-            raise self.get_validation_error(field_ctx, error_class=ElementIsNotAList)
-
 # ################################################################################################################################
 
     def from_dict(
@@ -511,69 +511,87 @@ class MarshalAPI:
         DataClass:    'any_',
         extra:        'dictnone' = None,
         list_idx:     'intnone'  = None,
-        parent:       'optional[FieldCtx]' = None
+        parent:       'any_'     = None
         ) -> 'any_':
+        """ Turns a dict into an instance of a model class. The parent, if given, is a tuple of the parent's own parent,
+        the name of the field that current_dict is the value of and the index of current_dict in a list, if it is in one.
+        """
+        plan = get_model_plan(DataClass)
 
-        dict_ctx = DictCtx(service, current_dict, DataClass, extra, list_idx, parent)
-        dict_ctx.init()
+        # This will be populated with parameters to the dataclass's __init__ method, assuming that the class has one,
+        # or with parameters to be set via setattr, in case the class does not have __init__.
+        attrs = {}
 
-        # All fields that we will visit
-        field_items = sorted(dict_ctx.fields.items()) # type: any_
+        # We can use extra data only if we are a top-level element, as indicated by the lack of parent.
+        if parent:
+            extra = None
 
-        for _ignored_name, _field in field_items:
+        # Find out how to extract values from our input
+        if isinstance(current_dict, dict):
+            get_value = current_dict.get
+        elif isinstance(current_dict, Model): # type: ignore
+            get_value = partial(getattr, current_dict)
+        else:
+            get_value = None
 
-            # Assume we are required ..
-            is_required = True
+        for field_plan in plan.field_plans:
 
-            # Use this by default ..
-            field_type = _field.type
+            name = field_plan.name
 
-            # .. unless it is a union with None = this field is really optional[type_]
-            if is_union(_field.type):
-                result = extract_from_union(_field.type)
-                _, field_type, union_with = result
+            # Assume that we do not have any value
+            value = ZatoNotGiven
 
-                # .. check if this was an optional field.
-                is_required = not (union_with is _None_Type)
+            # If we have extra data, that will take priority over our regular dict, which is why we check it first here.
+            if extra:
+                value = extra.get(name, ZatoNotGiven)
 
-            # Represents a current field in the model in the context of the input dict ..
-            field_ctx = FieldCtx(dict_ctx, _field, parent)
-            field_ctx.is_required = is_required
-            field_ctx.field_type = field_type
+            # If we do not have a value here, it means that we have no extra,
+            # or that it did not contain the expected value so we look it up in the current dictionary.
+            if value is ZatoNotGiven and get_value:
+                value = get_value(name, ZatoNotGiven)
 
-            # .. this call will populate the initial value of the field as well (field_ctx..
-            field_ctx.init()
+            # If this field has a value, we can try to parse it into a specific type,
+            # unless it is an SQLAlchemy Table object, which we do not handle.
+            if field_plan.converter and value and (value is not ZatoNotGiven) and (not isinstance(value, Table)):
+                try:
+                    value = field_plan.converter(value)
+                except Exception as e:
+                    msg = f'Value `{repr(value)}` of field {name} could not be parsed -> {e} -> {current_dict}'
+                    raise Exception(msg)
 
             # If this field points to a model ..
-            if field_ctx.is_model:
+            if field_plan.is_model:
 
                 # .. first, we need a dict as value as it is the only container that we can extract model fields from ..
-                self._self_require_dict_or_model(field_ctx)
+                if not isinstance(value, (dict, BaseModel)):
+                    raise self.get_validation_error(parent, name)
 
                 # .. if we are here, it means that we can check the dict and extract its fields,
                 # but note that we do not pass extra data on to nested models
                 # because we can only ever overwrite top-level elements with what extra contains.
-                field_ctx.value = self.from_field_ctx(field_ctx)
+                value = self.from_dict(service, value, field_plan.field.type, list_idx=list_idx,
+                    parent=(parent, name, list_idx))
 
             # .. if this field points to a list ..
-            elif field_ctx.is_list:
+            elif field_plan.is_list:
 
                 # If we have a model class the elements of the list are of,
                 # we need to visit each of them now.
-                if field_ctx.model_class:
+                if field_plan.model_class:
 
                     # Enter further only if we have any value at all to check ..
-                    if field_ctx.value and field_ctx.value != ZatoNotGiven: # type: ignore
+                    if value and value is not ZatoNotGiven:
 
                         # .. if the field is required, make sure that what we have on input really is a list object ..
-                        if field_ctx.is_required:
-                            self._ensure_value_is_a_list(field_ctx, field_ctx.value)
+                        if field_plan.is_required:
+                            if not isinstance(value, list):
+                                raise self.get_validation_error(parent, name, error_class=ElementIsNotAList)
 
                         # However, that model class may actually point to <type 'str'> types
                         # in case of fields like strlist, and we need to take that into account
                         # before entering the _visit_list method below.
-                        if field_ctx.is_model or field_ctx.contains_model:
-                            field_ctx.value = self._visit_list(field_ctx)
+                        if field_plan.is_model or field_plan.contains_model:
+                            value = self._visit_list(service, value, field_plan, parent)
 
                     # .. if we are here, it may be because the value is a dictlist instance
                     # .. for which there will be no underlying model and we can just assign it as is ..
@@ -590,71 +608,52 @@ class MarshalAPI:
                         #     my_list: anylistnone = list_field()
                         #     my_dict: anydictnone = dict_field()
                         #
-                        if field_ctx.name in current_dict:
+                        if name in current_dict:
 
                             # .. extract the value first ..
-                            value = current_dict[field_ctx.name]
+                            value = current_dict[name]
 
                             # .. if the field is required, make sure that what we have on input really is a list object ..
-                            if field_ctx.is_required:
-                                self._ensure_value_is_a_list(field_ctx, value)
-
-                            # .. assign the list now.
-                            field_ctx.value = value
+                            if field_plan.is_required:
+                                if not isinstance(value, list):
+                                    raise self.get_validation_error(parent, name, error_class=ElementIsNotAList)
 
-            # If we do not have a value yet, perhaps we will find a default one
-            if field_ctx.value == ZatoNotGiven:
+            # If we do not have a value yet, perhaps we will find a default one ..
+            if value is ZatoNotGiven:
 
-                default = field_ctx.field.default
-                default_factory = field_ctx.field.default_factory
+                if field_plan.default is not MISSING:
+                    value = field_plan.default
 
-                if default is not MISSING:
-                    field_ctx.value = default
+                elif field_plan.default_factory:
+                    value = field_plan.default_factory()
 
-                elif default_factory and default_factory is not MISSING:
-                    field_ctx.value = default_factory()
+                # .. if not, this is an error if the field is required ..
+                elif field_plan.is_required:
+                    raise self.get_validation_error(parent, name)
 
-            # Let's check if we found any value
-            if field_ctx.value != ZatoNotGiven:
-                value = field_ctx.value
-            else:
-                if field_ctx.is_required:
-                    raise self.get_validation_error(field_ctx)
+                # .. otherwise, it gets a value based on its type.
                 else:
-                    # This is the most reliable way
-                    if 'typing.List' in str(field_ctx.field_type):
-                        value = []
-                    elif field_ctx.field_type is Any:
-                        value = None
-                    elif issubclass(field_ctx.field_type, str):
-                        value = ''
-                    elif issubclass(field_ctx.field_type, int):
-                        value = 0
-                    elif issubclass(field_ctx.field_type, list):
-                        value = []
-                    elif issubclass(field_ctx.field_type, dict):
-                        value = {}
-                    elif issubclass(field_ctx.field_type, float):
-                        value = 0.0
-                    else:
-                        value = None
+                    value = field_plan.get_empty_value()
 
             # Assign the value now
-            dict_ctx.attrs_container[field_ctx.name] = value # type: ignore
+            attrs[name] = value
 
         # Create a new instance, potentially with attributes ..
-        instance = DataClass(**dict_ctx.init_attrs) # type: Model
+        if plan.has_init:
+            instance = DataClass(**attrs) # type: Model
 
-        # .. and add extra ones in case __init__ was not defined ..
-        for k, v in dict_ctx.setattr_attrs.items():
-            setattr(instance, k, v)
+        # .. or add them one by one in case __init__ was not defined ..
+        else:
+            instance = DataClass()
+            for k, v in attrs.items():
+                setattr(instance, k, v)
 
         # .. run the post-creation hook ..
         if instance.after_created:
 
             ctx = ModelCtx()
             ctx.service = service
-            ctx.data = dict_ctx.current_dict
+            ctx.data = current_dict
             ctx.DataClass = DataClass
 
             instance.after_created(ctx)
@@ -28,7 +28,8 @@ from zato.common.typing_ import cast_
 # ################################################################################################################################
 
 if 0:
-    from zato.common.typing_ import boolnone, floatnone, intnone, strnone
+    from zato.common.typing_ import anylistnone, boolnone, floatnone, intnone, strnone
+    anylistnone = anylistnone
     boolnone = boolnone
     floatnone = floatnone
     intnone = intnone
@@ -2600,6 +2601,54 @@ class PubSubEndpointEnqueuedMessage(Base):
 
 # ################################################################################################################################
 
+class PubSubSubCursor(Base):
+    """ A delivery cursor of a subscription which reads messages directly from its topic's log instead of its own queue.
+    All the messages up to and including the cursor's position have been acknowledged, and so have those
+    from PubSubSubCursorAck, which are the ones acknowledged out of order, above the current position.
+    """
+    __tablename__ = 'pubsub_sub_cursor'
+    __table_args__ = (
+        Index('pubsb_sub_cur_subk_idx', 'sub_key', unique=True),
+        Index('pubsb_sub_cur_topic_idx', 'cluster_id', 'topic_id', unique=False),
+    {})
+
+    id = cast_('int', Column(Integer, Sequence('pubsub_sub_cursor_seq'), primary_key=True))
+
+    # ID of the last message in the topic's log that was acknowledged along with all the messages before it
+    position = cast_('int', Column(BigInteger, nullable=False, server_default='0'))
+
+    last_updated = cast_('floatnone', Column(Numeric(20, 7, asdecimal=False), nullable=True))
+
+    # JSON data is here
+    opaque1 = cast_('strnone', Column(_JSON(), nullable=True))
+
+    sub_key = cast_('str', Column(String(200), ForeignKey('pubsub_sub.sub_key', ondelete='CASCADE'), nullable=False))
+
+    topic_id = cast_('int', Column(Integer, ForeignKey('pubsub_topic.id', ondelete='CASCADE'), nullable=False))
+    topic = relationship(PubSubTopic, backref=backref('pubsub_sub_cursors', order_by=id, cascade='all, delete, delete-orphan'))
+
+    cluster_id = cast_('int', Column(Integer, ForeignKey('cluster.id', ondelete='CASCADE'), nullable=False))
+    cluster = relationship(Cluster, backref=backref('pubsub_sub_cursors', order_by=id, cascade='all, delete, delete-orphan'))
+
+# ################################################################################################################################
+
+class PubSubSubCursorAck(Base):
+    """ A message above a cursor's position that its subscription acknowledged out of order.
+    """
+    __tablename__ = 'pubsub_sub_cursor_ack'
+    __table_args__ = (
+        Index('pubsb_sub_cur_ack_idx', 'sub_key', 'msg_id', unique=True),
+    {})
+
+    id = cast_('int', Column(Integer, Sequence('pubsub_sub_cursor_ack_seq'), primary_key=True))
+
+    # ID of the message in the topic's log, i.e. PubSubMessage.id
+    msg_id = cast_('int', Column(Integer, ForeignKey('pubsub_message.id', ondelete='CASCADE'), nullable=False))
+
+    sub_key = cast_('str', Column(String(200), ForeignKey('pubsub_sub.sub_key', ondelete='CASCADE'), nullable=False))
+
+# ################################################################################################################################
+
 class PubSubEndpointQueueInteraction(Base):
     """ A series of interactions with a message queue's endpoint.
     """
@@ -15,6 +15,7 @@ from sqlalchemy import and_, delete, func, or_, select
 
 # Zato
 from zato.common.odb.model import PubSubEndpoint, PubSubEndpointEnqueuedMessage, PubSubMessage, PubSubSubscription, PubSubTopic
+from zato.common.odb.query.pubsub.cursor import get_min_position_query
 
 # ################################################################################################################################
 # ################################################################################################################################
@@ -169,6 +170,16 @@ def get_topic_messages_without_subscribers(
     query = query.\
         filter(PubSubMessage.pub_time < max_pub_time_float)
 
+    # Messages in topic logs are never in any queue, which is why we can return only the ones that all the subscribers
+    # reading from such logs have already acknowledged, if there are any such subscribers at all.
+    min_position = get_min_position_query(topic_id)
+
+    query = query.\
+        filter(or_(
+            min_position.is_(None),
+            PubSubMessage.id <= min_position,
+        ))
+
     # .. obtain the result  ..
     result = query.all()
 
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# SQLAlchemy
+from sqlalchemy import and_, delete, exists, func, insert, literal, or_, select, update
+
+# Zato
+from zato.common.api import PUBSUB
+from zato.common.odb.model import PubSubMessage, PubSubSubCursor, PubSubSubCursorAck
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from sqlalchemy.orm.query import Query
+    from sqlalchemy.orm.session import Session as SASession
+    from zato.common.typing_ import any_, anylist, intlist, strlist, strset
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+#
+# Subscriptions to topics whose GD storage is a topic log do not have their own queues of messages.
+# Instead, each of them keeps a cursor pointing to the last message in the topic's table that it acknowledged,
+# with everything before it acknowledged too, along with rows of messages acknowledged out of order, above the cursor.
+#
+# This means that a GD message is stored only once, no matter how many subscribers there are, and that
+# the messages that a subscriber still needs to receive are the ones above its cursor that have not been acknowledged yet.
+#
+
+MsgTable = PubSubMessage.__table__
+CursorTable = PubSubSubCursor.__table__
+AckTable = PubSubSubCursorAck.__table__
+
+_float_str = PUBSUB.FLOAT_STRING_CONVERT
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class ModuleCtx:
+
+    # IDs of messages come from a sequence and publishers do not wait for each other, which means that a message
+    # may be committed, and become visible, after messages with higher IDs. This is why cursors never move past messages
+    # published less than this many seconds ago - by then, the transactions publishing messages with lower IDs
+    # have been committed. Until then, acknowledgements of such messages are kept in PubSubSubCursorAck.
+    Visibility_Horizon = 60
+
+    # How many messages above a cursor are read at a time when it is being moved forward
+    Advance_Page_Size = 500
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+def get_cursors(session:'SASession', sub_key_list:'strlist', for_update:'bool'=False) -> 'anylist':
+    """ Returns cursors of all the subscriptions from the input list that read messages from topic logs.
+    """
+    query = session.query(PubSubSubCursor).\
+        filter(PubSubSubCursor.sub_key.in_(sub_key_list))
+
+    if for_update:
+        query = query.with_for_update()
+
+    return query.all()
+
+# ################################################################################################################################
+
+def get_cursor(session:'SASession', sub_key:'str', for_update:'bool'=False) -> 'PubSubSubCursor | None':
+    """ Returns a cursor of a subscription or None if the subscription has its own queue.
+    """
+    result = get_cursors(session, [sub_key], for_update)
+    return result[0] if result else None
+
+# ################################################################################################################################
+
+def get_cursor_sub_keys(session:'SASession', topic_id:'int') -> 'strset':
+    """ Returns sub_keys of all the subscriptions to a topic that read messages from its log.
+    """
+    result = session.query(PubSubSubCursor.sub_key).\
+        filter(PubSubSubCursor.topic_id==topic_id).\
+        all()
+
+    return {elem.sub_key for elem in result}
+
+# ################################################################################################################################
+
+def get_cursor_sub_keys_by_topic_id_list(session:'SASession', topic_id_list:'intlist') -> 'strset':
+    """ Returns sub_keys of all the subscriptions to any of the input topics that read messages from their logs.
+    """
+    result = session.query(PubSubSubCursor.sub_key).\
+        filter(PubSubSubCursor.topic_id.in_(topic_id_list)).\
+        all()
+
+    return {elem.sub_key for elem in result}
+
+# ################################################################################################################################
+
+def get_min_position_query(topic_id:'int') -> 'any_':
+    """ Returns a scalar subquery with the lowest position of all the cursors of a topic, i.e. the highest ID of messages
+    that all of its topic-log subscribers have already acknowledged. It is NULL if there are no such subscribers.
+    """
+    return select([func.min(CursorTable.c.position)]).\
+        where(CursorTable.c.topic_id==topic_id).\
+        as_scalar()
+
+# ################################################################################################################################
+
+def add_cursor(
+    session,     # type: SASession
+    cluster_id,  # type: int
+    topic_id,    # type: int
+    sub_key,     # type: str
+    pub_time_max # type: float
+) -> 'PubSubSubCursor':
+    """ Adds a cursor for a new subscription. This is the topic-log counterpart of move_messages_to_sub_queue
+    and it must be called with the same lock held. All the unexpired messages that no subscriber has received yet
+    will be delivered to the new subscription, which is why its cursor is placed right before the first of them
+    and the ones above it that have been already received by others are marked as acknowledged.
+    """
+    # The last message published to the topic so far ..
+    last_id = session.query(func.max(PubSubMessage.id)).\
+        filter(PubSubMessage.topic_id==topic_id).\
+        scalar() or 0
+
+    # .. and the ones that no one has received yet.
+    first_orphan_id = session.query(func.min(PubSubMessage.id)).\
+        filter(PubSubMessage.topic_id==topic_id).\
+        filter(PubSubMessage.cluster_id==cluster_id).\
+        filter(~PubSubMessage.is_in_sub_queue).\
+        filter(PubSubMessage.expiration_time > _float_str.format(pub_time_max)).\
+        scalar()
+
+    if first_orphan_id:
+
+        position = first_orphan_id - 1
+
+        # Everything above the position that is not available to the subscription counts as already acknowledged ..
+        acked = select([literal(sub_key), MsgTable.c.id]).\
+            where(and_(
+                MsgTable.c.topic_id==topic_id,
+                MsgTable.c.id > position,
+                or_(
+                    MsgTable.c.is_in_sub_queue,
+                    MsgTable.c.expiration_time <= _float_str.format(pub_time_max),
+                )
+            ))
+
+        session.execute(insert(AckTable).from_select((AckTable.c.sub_key, AckTable.c.msg_id), acked))
+
+        # .. whereas the messages that are available will not be received by other subscribers anymore.
+        session.execute(
+            update(MsgTable).\
+            values({
+                'is_in_sub_queue': True,
+            }).\
+            where(and_(
+                MsgTable.c.topic_id==topic_id,
+                MsgTable.c.id >= first_orphan_id,
+                ~MsgTable.c.is_in_sub_queue
+            ))
+        )
+
+    else:
+        position = last_id
+
+    cursor = PubSubSubCursor()
+    cursor.position = position
+    cursor.last_updated = pub_time_max
+    cursor.sub_key = sub_key
+    cursor.topic_id = topic_id
+    cursor.cluster_id = cluster_id
+
+    session.add(cursor)
+
+    return cursor
+
+# ################################################################################################################################
+
+def _advance_cursor(session:'SASession', cursor:'PubSubSubCursor', now:'float') -> 'None':
+    """ Moves the cursor forward past all the messages that were acknowledged or that expired,
+    as long as they were published before the visibility horizon.
+    """
+    position = cursor.position
+    horizon = now - ModuleCtx.Visibility_Horizon
+    page_size = ModuleCtx.Advance_Page_Size
+
+    while True:
+
+        msg_list = session.query(
+            PubSubMessage.id,
+            PubSubMessage.pub_time,
+            PubSubMessage.expiration_time,
+            PubSubSubCursorAck.msg_id.label('acked_id'),
+            ).\
+            outerjoin(PubSubSubCursorAck, and_(
+                PubSubSubCursorAck.sub_key==cursor.sub_key,
+                PubSubSubCursorAck.msg_id==PubSubMessage.id,
+            )).\
+            filter(PubSubMessage.topic_id==cursor.topic_id).\
+            filter(PubSubMessage.id > position).\
+            order_by(PubSubMessage.id).\
+            limit(page_size).\
+            all()
+
+        for msg_id, pub_time, expiration_time, acked_id in msg_list:
+            if pub_time > horizon:
+                # Messages with lower IDs than this one may not have been committed yet
+                break
+            elif acked_id is not None:
+                pass
+            elif expiration_time is not None and expiration_time < now:
+                pass
+            else:
+                # This message is still waiting to be acknowledged so the cursor cannot go any further
+                break
+            position = msg_id
+        else:
+            # If we are here, we advanced past all the messages that we had, which means that there may be more ones
+            # to advance over, unless there were fewer of them than we asked for.
+            if len(msg_list) == page_size:
+                continue
+
+        break
+
+    # Acknowledgements below the position are implied by the position itself
+    if position != cursor.position:
+        session.execute(
+            delete(AckTable).\
+            where(and_(
+                AckTable.c.sub_key==cursor.sub_key,
+                AckTable.c.msg_id <= position,
+            ))
+        )
+
+    cursor.position = position
+    cursor.last_updated = now
+
+# ################################################################################################################################
+
+def acknowledge_by_cursor(
+    session,     # type: SASession
+    cluster_id,  # type: int
+    sub_key,     # type: str
+    msg_id_list, # type: strlist
+    now          # type: float
+) -> 'bool':
+    """ Acknowledges messages by their pub_msg_id values for a subscription that reads them from its topic's log.
+    Returns False if the subscription does not have a cursor, in which case its queue needs to be updated instead.
+    """
+    # We lock the row so as not to lose acknowledgements made concurrently ..
+    cursor = get_cursor(session, sub_key, True)
+
+    if not cursor:
+        return False
+
+    # .. store the messages being acknowledged, unless they already were ..
+    if msg_id_list:
+
+        acked = select([literal(sub_key), MsgTable.c.id]).\
+            where(and_(
+                MsgTable.c.topic_id==cursor.topic_id,
+                MsgTable.c.id > cursor.position,
+                MsgTable.c.pub_msg_id.in_(msg_id_list),
+                ~get_acked_query(sub_key, MsgTable.c.id),
+            ))
+
+        session.execute(insert(AckTable).from_select((AckTable.c.sub_key, AckTable.c.msg_id), acked))
+
+    # .. and move the cursor forward if we can.
+    _advance_cursor(session, cursor, now)
+
+    return True
+
+# ################################################################################################################################
+
+def get_acked_query(sub_key:'any_', msg_id:'any_') -> 'any_':
+    """ Returns an EXISTS clause that is true if a message was acknowledged out of order by a subscription. Both input
+    parameters may be either values or columns of outer queries, e.g. PubSubSubCursor.sub_key and PubSubMessage.id.
+    """
+    return exists().where(and_(
+        AckTable.c.sub_key==sub_key,
+        AckTable.c.msg_id==msg_id,
+    ))
+
+# ################################################################################################################################
+
+def get_cursor_msg_query(query:'Query', cursor:'PubSubSubCursor') -> 'Query':
+    """ Limits a query of topic messages to the ones that a cursor's subscription has not acknowledged yet.
+    """
+    query = query.\
+        filter(PubSubMessage.topic_id==cursor.topic_id).\
+        filter(PubSubMessage.id > cursor.position).\
+        filter(~get_acked_query(cursor.sub_key, PubSubMessage.id))
+
+    return query
+
+# ################################################################################################################################
+
+def get_queue_depth_by_cursor(session:'SASession', cursor:'PubSubSubCursor', now:'float') -> 'int':
+    """ Returns the number of unexpired messages that a subscription reading from a topic log has not acknowledged yet.
+    """
+    query = session.query(func.count(PubSubMessage.id)).\
+        filter(PubSubMessage.expiration_time>=now)
+
+    query = get_cursor_msg_query(query, cursor)
+
+    return query.scalar() or 0
+
+# ################################################################################################################################
+
+def get_queue_depth_by_cursor_topic_id_list(session:'SASession', cluster_id:'int', topic_id_list:'intlist', now:'float') -> 'anylist':
+    """ Returns (topic_id, depth) for each topic from the input list that has topic-log subscribers. The depth of a topic
+    is the sum of the depths of each of its subscribers, which is the same as if each of them had its own queue.
+    """
+    result = session.query(PubSubSubCursor.topic_id, func.count(PubSubMessage.id)).\
+        filter(PubSubSubCursor.topic_id.in_(topic_id_list)).\
+        filter(PubSubSubCursor.cluster_id==cluster_id).\
+        filter(PubSubMessage.topic_id==PubSubSubCursor.topic_id).\
+        filter(PubSubMessage.id > PubSubSubCursor.position).\
+        filter(PubSubMessage.expiration_time>=now).\
+        filter(~get_acked_query(PubSubSubCursor.sub_key, PubSubMessage.id)).\
+        group_by(PubSubSubCursor.topic_id).\
+        all()
+
+    return [tuple(elem) for elem in result]
+
+# ################################################################################################################################
+# ################################################################################################################################
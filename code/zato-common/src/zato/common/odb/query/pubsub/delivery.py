@@ -16,15 +16,16 @@ from sqlalchemy.exc import IntegrityError
 
 # Zato
 from zato.common.api import PUBSUB
-from zato.common.odb.model import PubSubEndpoint, PubSubMessage, PubSubEndpointEnqueuedMessage, PubSubSubscription, Server, \
-     WebSocketClient, WebSocketClientPubSubKeys
+from zato.common.odb.model import PubSubEndpoint, PubSubMessage, PubSubEndpointEnqueuedMessage, PubSubSubCursor, \
+     PubSubSubscription, Server, WebSocketClient, WebSocketClientPubSubKeys
+from zato.common.odb.query.pubsub.cursor import acknowledge_by_cursor, get_acked_query, get_cursor, get_cursors
 from zato.common.util.sql.retry import sql_op_with_deadlock_retry, sql_query_with_retry
 
 # ################################################################################################################################
 
 if 0:
     from sqlalchemy.orm.session import Session as SASession
-    from zato.common.typing_ import any_, anytuple, intnone, intset, listnone, strlist
+    from zato.common.typing_ import any_, anylist, anytuple, intnone, intset, listnone, strlist, strlistnone
 
 # ################################################################################################################################
 
@@ -64,6 +65,13 @@ sql_messages_columns = (
     PubSubEndpointEnqueuedMessage.sub_pattern_matched,
 )
 
+# Subscriptions reading messages from topic logs have no queue rows so IDs of topic messages are used instead
+sql_cursor_messages_columns = sql_messages_columns[:-3] + (
+    PubSubMessage.id.label('endp_msg_queue_id'),
+    PubSubSubCursor.sub_key,
+    PubSubSubscription.sub_pattern_matched,
+)
+
 sql_msg_id_columns = (
     PubSubMessage.pub_msg_id,
 )
@@ -100,6 +108,40 @@ def _get_base_sql_msg_query(
 
 # ################################################################################################################################
 
+def _get_cursor_sql_msg_query(
+    session, # type: SASession
+    columns, # type: anytuple
+    cursors, # type: anylist
+    pub_time_max, # type: float
+    cluster_id,   # type: int
+    include_unexpired_only # type: bool
+    ):
+    """ A counterpart of _get_base_sql_msg_query for subscriptions that read messages from topic logs.
+    """
+    query = session.query(*columns).\
+        filter(PubSubSubCursor.sub_key.in_([cursor.sub_key for cursor in cursors])).\
+        filter(PubSubSubscription.sub_key==PubSubSubCursor.sub_key).\
+        filter(PubSubMessage.topic_id==PubSubSubCursor.topic_id).\
+        filter(PubSubMessage.id > PubSubSubCursor.position).\
+        filter(~get_acked_query(PubSubSubCursor.sub_key, PubSubMessage.id))
+
+    if include_unexpired_only:
+        query = query.\
+            filter(PubSubMessage.expiration_time > _float_str.format(pub_time_max))
+
+    if cluster_id:
+        query = query.\
+            filter(PubSubMessage.cluster_id==cluster_id)
+
+    return query
+
+# ################################################################################################################################
+
+def _get_msg_sort_key(msg:'any_') -> 'anytuple':
+    return -msg.priority, msg.ext_pub_time or 0.0, msg.pub_time
+
+# ################################################################################################################################
+
 def _get_sql_msg_data_by_sub_key(
     session, # type: SASession
     cluster_id,   # type: int
@@ -109,7 +151,8 @@ def _get_sql_msg_data_by_sub_key(
     columns,      # type: anytuple
     include_unexpired_only, # type: bool
     ignore_list=None, # type: listnone
-    needs_result=True # type: bool
+    needs_result=True, # type: bool
+    cursor_sub_key_list=None # type: strlistnone
     ):
     """ Returns all SQL messages queued up for a given sub_key that are not being delivered
     or have not been delivered already.
@@ -117,27 +160,75 @@ def _get_sql_msg_data_by_sub_key(
     logger_pubsub.info('Getting GD messages for `%s` last_run:%r pub_time_max:%r needs_result:%d unexp:%d', sub_key_list, last_sql_run,
         pub_time_max, int(needs_result), int(include_unexpired_only))
 
-    query = _get_base_sql_msg_query(session, columns, sub_key_list, pub_time_max, cluster_id, include_unexpired_only)
+    # Subscriptions reading messages from topic logs have cursors, all the other ones have queues. If our caller knows
+    # which subscriptions may have cursors, only these are looked up, and if there are none, cursors are not looked up at all.
+    if cursor_sub_key_list is None:
+        cursor_sub_key_list = sub_key_list
+
+    cursors = get_cursors(session, cursor_sub_key_list) if cursor_sub_key_list else []
+    cursor_sub_keys = {cursor.sub_key for cursor in cursors}
+    queue_sub_keys = [sub_key for sub_key in sub_key_list if sub_key not in cursor_sub_keys]
+
+    query_list = []
+
+    if queue_sub_keys or not cursors:
+
+        query = _get_base_sql_msg_query(session, columns, queue_sub_keys, pub_time_max, cluster_id, include_unexpired_only)
+
+        # If there is the last SQL run time given, it means that we have to fetch all messages
+        # enqueued for that subscriber since that time ..
+        if last_sql_run:
+            query = query.\
+                filter(PubSubEndpointEnqueuedMessage.creation_time > _float_str.format(last_sql_run))
 
-    # If there is the last SQL run time given, it means that we have to fetch all messages
-    # enqueued for that subscriber since that time ..
-    if last_sql_run:
         query = query.\
-            filter(PubSubEndpointEnqueuedMessage.creation_time > _float_str.format(last_sql_run))
+            filter(PubSubEndpointEnqueuedMessage.creation_time <= _float_str.format(pub_time_max))
+
+        if ignore_list:
+            query = query.\
+                filter(PubSubEndpointEnqueuedMessage.id.notin_(ignore_list))
+
+        query_list.append(query)
 
-    query = query.\
-        filter(PubSubEndpointEnqueuedMessage.creation_time <= _float_str.format(pub_time_max))
+    if cursors:
+
+        cursor_columns = sql_cursor_messages_columns if columns is sql_messages_columns else columns
+        query = _get_cursor_sql_msg_query(session, cursor_columns, cursors, pub_time_max, cluster_id, include_unexpired_only)
+
+        # Topic messages become available to subscribers as soon as they are published
+        if last_sql_run:
+            query = query.\
+                filter(PubSubMessage.pub_time > _float_str.format(last_sql_run))
 
-    if ignore_list:
         query = query.\
-            filter(PubSubEndpointEnqueuedMessage.id.notin_(ignore_list))
+            filter(PubSubMessage.pub_time <= _float_str.format(pub_time_max))
+
+        if ignore_list:
+            query = query.\
+                filter(PubSubMessage.id.notin_(ignore_list))
 
-    query = query.\
-        order_by(PubSubMessage.priority.desc()).\
-        order_by(PubSubMessage.ext_pub_time).\
-        order_by(PubSubMessage.pub_time)
+        query_list.append(query)
+
+    # This is the most common case, either all the subscriptions have queues or all of them read from topic logs ..
+    if len(query_list) == 1:
+
+        query = query_list[0].\
+            order_by(PubSubMessage.priority.desc()).\
+            order_by(PubSubMessage.ext_pub_time).\
+            order_by(PubSubMessage.pub_time)
+
+        out = query.all() if needs_result else query
+
+    # .. otherwise, results from both kinds of subscriptions need to be combined.
+    elif needs_result:
+        out = []
+        for query in query_list:
+            out.extend(query.all())
+        out.sort(key=_get_msg_sort_key)
+
+    else:
+        out = query_list[0].union_all(*query_list[1:])
 
-    out = query.all() if needs_result else query
     return out
 
 # ################################################################################################################################
@@ -149,10 +240,11 @@ def get_sql_messages_by_sub_key(
     last_sql_run, # type: float
     pub_time_max, # type: float
     ignore_list,  # type: intset
-    include_unexpired_only=True # type: bool
+    include_unexpired_only=True, # type: bool
+    cursor_sub_key_list=None     # type: strlistnone
     ) -> 'any_':
     return _get_sql_msg_data_by_sub_key(session, cluster_id, sub_key_list, last_sql_run, pub_time_max,
-        sql_messages_columns, include_unexpired_only, ignore_list)
+        sql_messages_columns, include_unexpired_only, ignore_list, cursor_sub_key_list=cursor_sub_key_list)
 
 # ################################################################################################################################
 
@@ -162,11 +254,22 @@ def get_sql_messages_by_msg_id_list(
     sub_key,      # type: str
     pub_time_max, # type: float
     msg_id_list,  # type: strlist
-    include_unexpired_only=True # type: bool
+    include_unexpired_only=True, # type: bool
+    may_have_cursor=True         # type: bool
     ) -> 'any_':
-    query = _get_base_sql_msg_query(session, sql_messages_columns, [sub_key], pub_time_max, cluster_id, include_unexpired_only)
-    return query.\
-        filter(PubSubEndpointEnqueuedMessage.pub_msg_id.in_(msg_id_list))
+
+    # The subscription reads messages from its topic's log ..
+    if may_have_cursor and (cursor := get_cursor(session, sub_key)):
+        query = _get_cursor_sql_msg_query(
+            session, sql_cursor_messages_columns, [cursor], pub_time_max, cluster_id, include_unexpired_only)
+        return query.\
+            filter(PubSubMessage.pub_msg_id.in_(msg_id_list))
+
+    # .. or it has its own queue.
+    else:
+        query = _get_base_sql_msg_query(session, sql_messages_columns, [sub_key], pub_time_max, cluster_id, include_unexpired_only)
+        return query.\
+            filter(PubSubEndpointEnqueuedMessage.pub_msg_id.in_(msg_id_list))
 
 # ################################################################################################################################
 
@@ -177,10 +280,11 @@ def get_sql_msg_ids_by_sub_key(
     last_sql_run, # type: float
     pub_time_max, # type: float
     include_unexpired_only=True, # type: bool
-    needs_result=False           # type: bool
+    needs_result=False,          # type: bool
+    may_have_cursor=True         # type: bool
     ) -> 'any_':
     return _get_sql_msg_data_by_sub_key(session, cluster_id, [sub_key], last_sql_run, pub_time_max, sql_msg_id_columns,
-        include_unexpired_only, needs_result=needs_result)
+        include_unexpired_only, needs_result=needs_result, cursor_sub_key_list=None if may_have_cursor else [])
 
 # ################################################################################################################################
 
@@ -193,6 +297,10 @@ def _confirm_pubsub_msg_delivered_query(
     ) -> 'None':
     """ Returns all SQL messages queued up for a given sub_key.
     """
+    # Subscriptions reading messages from topic logs only need to move their cursors
+    if acknowledge_by_cursor(session, cluster_id, sub_key, delivered_pub_msg_id_list, now):
+        return
+
     session.execute(
         update(PubSubEndpointEnqueuedMessage).\
         values({
@@ -16,6 +16,7 @@ from sqlalchemy.exc import IntegrityError
 # Zato
 from zato.common.api import PUBSUB
 from zato.common.odb.model import PubSubEndpoint, PubSubEndpointEnqueuedMessage, PubSubEndpointTopic, PubSubMessage, PubSubTopic
+from zato.common.odb.query.pubsub.cursor import get_cursor_sub_keys, get_cursor_sub_keys_by_topic_id_list
 from zato.common.pubsub import ensure_subs_exist, msg_pub_ignore
 from zato.common.util.sql.retry import sql_op_with_deadlock_retry
 
@@ -24,7 +25,7 @@ from zato.common.util.sql.retry import sql_op_with_deadlock_retry
 
 if 0:
     from sqlalchemy.orm.session import Session as SASession
-    from zato.common.typing_ import any_, callable_, callnone, strdictlist
+    from zato.common.typing_ import any_, callable_, callnone, list_, strdictlist
     from zato.server.pubsub.model import sublist
 
 # ################################################################################################################################
@@ -49,11 +50,49 @@ EndpointTopicTable = PubSubEndpointTopic.__table__
 # ################################################################################################################################
 
 _float_str = PUBSUB.FLOAT_STRING_CONVERT
+_topic_log = PUBSUB.GD_STORAGE.TOPIC_LOG.id
 sub_only_keys = ('sub_pattern_matched', 'topic_name')
 
 # ################################################################################################################################
 # ################################################################################################################################
 
+def get_queue_messages(
+    cluster_id, # type: int
+    subscriptions_by_topic, # type: sublist
+    msg_list, # type: strdictlist
+    topic_id, # type: int
+    now,      # type: float
+) -> 'strdictlist':
+    """ Returns rows to insert into subscriber queues, one for each message and each subscriber.
+    """
+    # All the queue messages to be inserted.
+    queue_msgs = []
+
+    # Note that it is possible that there will be messages in msg_list
+    # for which no subscriber will be found in the outer loop.
+    # This is possible if one or more subscriptions were removed in between
+    # the time when the publication was triggered and when the SQL query actually runs.
+    # In such a case, such message(s) will not be delivered to a sub_key that no longer exists.
+
+    for sub in subscriptions_by_topic:
+        for msg in msg_list:
+
+            # Enqueues the message for each subscriber
+            queue_msgs.append({
+                'creation_time': _float_str.format(now),
+                'pub_msg_id': msg['pub_msg_id'],
+                'endpoint_id': sub.endpoint_id,
+                'topic_id': topic_id,
+                'sub_key': sub.sub_key,
+                'cluster_id': cluster_id,
+                'sub_pattern_matched': msg['sub_pattern_matched'][sub.sub_key],
+            })
+
+    return queue_msgs
+
+# ################################################################################################################################
+# ################################################################################################################################
+
 class PublishOpCtx:
 
     needs_topic_messages:'bool' = True
@@ -116,7 +155,8 @@ class PublishWithRetryManager:
         gd_msg_list,            # type: strdictlist
         subscriptions_by_topic, # type: sublist
 
-        should_collect_ctx # type: bool
+        should_collect_ctx, # type: bool
+        gd_storage          # type: str
 
     ) -> 'None':
 
@@ -137,6 +177,8 @@ class PublishWithRetryManager:
         self.should_collect_ctx = should_collect_ctx
         self.ctx_history = []
 
+        self.gd_storage = gd_storage
+
 # ################################################################################################################################
 
     def run(self):
@@ -149,6 +191,12 @@ class PublishWithRetryManager:
         # in case queue messages could not be inserted.
         subscriptions_by_topic = self.subscriptions_by_topic
 
+        # Subscriptions reading messages from the topic's log do not need any references to them in queues,
+        # which is why queue messages are inserted only for the ones that were created before the topic had such a log.
+        if self.gd_storage == _topic_log:
+            cursor_sub_keys = get_cursor_sub_keys(self.session, self.topic_id)
+            subscriptions_by_topic = [elem for elem in subscriptions_by_topic if elem.sub_key not in cursor_sub_keys]
+
         while publish_op_ctx.needs_queue_messages:
 
             # We have just entered a new iteration of this loop (possibly it is the first time)
@@ -402,27 +450,7 @@ class PublishWithRetryManager:
         """
 
         # All the queue messages to be inserted.
-        queue_msgs = []
-
-        # Note that it is possible that there will be messages in msg_list
-        # for which no subscriber will be found in the outer loop.
-        # This is possible if one or more subscriptions were removed in between
-        # the time when the publication was triggered and when the SQL query actually runs.
-        # In such a case, such message(s) will not be delivered to a sub_key that no longer exists.
-
-        for sub in subscriptions_by_topic:
-            for msg in msg_list:
-
-                # Enqueues the message for each subscriber
-                queue_msgs.append({
-                    'creation_time': _float_str.format(now),
-                    'pub_msg_id': msg['pub_msg_id'],
-                    'endpoint_id': sub.endpoint_id,
-                    'topic_id': topic_id,
-                    'sub_key': sub.sub_key,
-                    'cluster_id': cluster_id,
-                    'sub_pattern_matched': msg['sub_pattern_matched'][sub.sub_key],
-                })
+        queue_msgs = get_queue_messages(cluster_id, subscriptions_by_topic, msg_list, topic_id, now)
 
         # Move the message to endpoint queues
         return sql_op_with_deadlock_retry(cid, 'insert_queue_messages', self._insert_queue_messages, queue_msgs)
@@ -447,7 +475,8 @@ def sql_publish_with_retry(
     gd_msg_list,            # type: strdictlist
     subscriptions_by_topic, # type: sublist
 
-    should_collect_ctx # type: bool
+    should_collect_ctx, # type: bool
+    gd_storage=PUBSUB.DEFAULT.GD_STORAGE # type: str
 ) -> 'PublishWithRetryManager':
 
     """ Populates SQL structures with new messages for topics and their counterparts in subscriber queues.
@@ -471,7 +500,8 @@ def sql_publish_with_retry(
         gd_msg_list,
         subscriptions_by_topic,
 
-        should_collect_ctx
+        should_collect_ctx,
+        gd_storage
     )
 
     # .. publish the message(s) ..
@@ -482,3 +512,196 @@ def sql_publish_with_retry(
 
 # ################################################################################################################################
 # ################################################################################################################################
+
+class BulkPublishTopicCtx:
+    """ Messages to be published to a single topic as part of a bulk publication.
+    """
+    def __init__(
+        self,
+        topic_id,   # type: int
+        topic_name, # type: str
+        gd_msg_list,            # type: strdictlist
+        subscriptions_by_topic, # type: sublist
+        gd_storage=PUBSUB.DEFAULT.GD_STORAGE # type: str
+    ) -> 'None':
+
+        self.topic_id = topic_id
+        self.topic_name = topic_name
+        self.gd_msg_list = gd_msg_list
+        self.subscriptions_by_topic = subscriptions_by_topic
+        self.gd_storage = gd_storage
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class BulkPublishWithRetryManager(PublishWithRetryManager):
+    """ Publishes messages to many topics at once. Rows for all the topics are inserted with a single INSERT statement
+    and rows for all the subscriber queues with another one, all of it in the caller's transaction.
+    """
+    def __init__(
+        self,
+
+        now,         # type: float
+        cid,         # type: str
+        cluster_id,  # type: int
+        pub_counter, # type: int
+
+        session,          # type: SASession
+        new_session_func, # type: callable_
+
+        topic_ctx_list, # type: list_[BulkPublishTopicCtx]
+
+    ) -> 'None':
+
+        self.now = now
+        self.cid = cid
+        self.cluster_id = cluster_id
+        self.pub_counter = pub_counter
+
+        self.session = session
+        self.new_session_func = new_session_func
+
+        self.topic_ctx_list = topic_ctx_list
+
+# ################################################################################################################################
+
+    def _exclude_cursor_subscriptions(self) -> 'None':
+        """ Subscriptions reading messages from their topics' logs do not need any references to them in queues,
+        which is why all of them, for all the topics, are looked up with one query and ignored.
+        """
+        topic_id_list = [elem.topic_id for elem in self.topic_ctx_list if elem.gd_storage == _topic_log]
+
+        if topic_id_list:
+            cursor_sub_keys = get_cursor_sub_keys_by_topic_id_list(self.session, topic_id_list)
+            for topic_ctx in self.topic_ctx_list:
+                if topic_ctx.topic_id in topic_id_list:
+                    topic_ctx.subscriptions_by_topic = [
+                        elem for elem in topic_ctx.subscriptions_by_topic if elem.sub_key not in cursor_sub_keys]
+
+# ################################################################################################################################
+
+    def _ensure_subs_exist(self, counter_ctx_str:'str') -> 'None':
+        """ Filters out subscriptions that were deleted after the publication started, for all the topics at once.
+        """
+        all_subs = [] # type: sublist
+        all_msgs = [] # type: strdictlist
+
+        for topic_ctx in self.topic_ctx_list:
+            all_subs.extend(topic_ctx.subscriptions_by_topic)
+            all_msgs.extend(topic_ctx.gd_msg_list)
+
+        topic_names = ', '.join(sorted({elem.topic_name for elem in self.topic_ctx_list}))
+
+        with closing(self.new_session_func()) as new_session: # type: ignore
+            existing = ensure_subs_exist(new_session, topic_names, all_msgs, all_subs, '_sql_bulk_publish_with_retry',
+                counter_ctx_str)
+
+        existing_sub_keys = {elem.sub_key for elem in existing}
+
+        for topic_ctx in self.topic_ctx_list:
+            topic_ctx.subscriptions_by_topic = [
+                elem for elem in topic_ctx.subscriptions_by_topic if elem.sub_key in existing_sub_keys]
+
+# ################################################################################################################################
+
+    def run(self):
+
+        # This is reusable
+        publish_op_ctx = PublishOpCtx(self.pub_counter)
+
+        # All the messages to all the topics
+        msg_list = [] # type: strdictlist
+
+        for topic_ctx in self.topic_ctx_list:
+            msg_list.extend(topic_ctx.gd_msg_list)
+
+        # Nothing to do if there are no messages at all
+        if not msg_list:
+            logger_pubsub.info('No messages in bulk publication -> %s', self.cid)
+            return
+
+        self._exclude_cursor_subscriptions()
+
+        # Same as in the non-bulk publications, we temporarily remove the keys that topic messages do not use ..
+        sub_only = {}
+
+        for msg in msg_list: # type: dict
+            sub_attrs = sub_only.setdefault(msg['pub_msg_id'], {})
+            for name in sub_only_keys:
+                sub_attrs[name] = msg.pop(name, None)
+
+        # .. insert messages for all the topics at once ..
+        self.insert_topic_messages(self.cid, msg_list)
+
+        logger_pubsub.info('Topic messages inserted (bulk) -> %s -> %s -> %s',
+            self.cid, [elem.topic_name for elem in self.topic_ctx_list], msg_list)
+
+        # .. and bring back the keys that subscriber queues need.
+        for msg in msg_list: # type: dict
+            for name in sub_only_keys:
+                msg[name] = sub_only[msg['pub_msg_id']][name]
+
+        while publish_op_ctx.needs_queue_messages:
+
+            publish_op_ctx.queue_insert_attempt += 1
+            counter_ctx_str = publish_op_ctx.get_counter_ctx_str()
+
+            # Queue rows for all the topics and their subscribers ..
+            queue_msgs = [] # type: strdictlist
+
+            for topic_ctx in self.topic_ctx_list:
+                queue_msgs.extend(get_queue_messages(
+                    self.cluster_id, topic_ctx.subscriptions_by_topic, topic_ctx.gd_msg_list, topic_ctx.topic_id, self.now))
+
+            # .. which may be none at all, e.g. if none of the topics has any subscriptions ..
+            if not queue_msgs:
+                logger_pubsub.info('No subscribers in bulk publication -> %s -> %s', counter_ctx_str, self.cid)
+                publish_op_ctx.needs_queue_messages = False
+                break
+
+            # .. otherwise, insert all of them at once.
+            try:
+                _ = sql_op_with_deadlock_retry(self.cid, 'insert_queue_messages', self._insert_queue_messages, queue_msgs)
+
+            except IntegrityError as e:
+                err_msg = 'Caught IntegrityError (_sql_bulk_publish_with_retry) -> %s -> %s -> `%s`'
+                logger_zato.info(err_msg, counter_ctx_str, self.cid, e)
+                logger_pubsub.info(err_msg, counter_ctx_str, self.cid, e)
+
+                # Try again, this time only with subscriptions that still exist.
+                self._ensure_subs_exist(counter_ctx_str)
+
+            else:
+                logger_pubsub.info('Inserted queue messages (bulk) -> %s -> %s -> %d',
+                    counter_ctx_str, self.cid, len(queue_msgs))
+                publish_op_ctx.is_queue_insert_ok = True
+                publish_op_ctx.needs_queue_messages = False
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+def sql_bulk_publish_with_retry(
+
+    *,
+
+    now,         # type: float
+    cid,         # type: str
+    cluster_id,  # type: int
+    pub_counter, # type: int
+
+    session,          # type: SASession
+    new_session_func, # type: callable_
+
+    topic_ctx_list, # type: list_[BulkPublishTopicCtx]
+
+) -> 'BulkPublishWithRetryManager':
+    """ Same as sql_publish_with_retry but publishes messages to many topics at once, using one INSERT statement
+    for all the topic messages and one for all the queue messages. Committing the transaction is up to the caller.
+    """
+    manager = BulkPublishWithRetryManager(now, cid, cluster_id, pub_counter, session, new_session_func, topic_ctx_list)
+    manager.run()
+
+    return manager
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -6,13 +6,19 @@ Copyright (C) 2022, Zato Source s.r.o. https://zato.io
 Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
 """
 
+# Bunch
+from bunch import Bunch
+
 # SQLAlchemy
 from sqlalchemy import func, update
 
 # Zato
 from zato.common.api import PUBSUB
-from zato.common.odb.model import PubSubEndpointEnqueuedMessage, PubSubMessage, PubSubSubscription
+from zato.common.odb.model import PubSubEndpoint, PubSubEndpointEnqueuedMessage, PubSubMessage, PubSubSubscription, \
+     PubSubTopic
 from zato.common.odb.query import count, _pubsub_queue_message
+from zato.common.odb.query.pubsub.cursor import acknowledge_by_cursor, get_cursor, get_cursor_msg_query, \
+     get_queue_depth_by_cursor, get_queue_depth_by_cursor_topic_id_list
 from zato.common.util.time_ import utcnow_as_ms
 
 # ################################################################################################################################
@@ -20,6 +26,7 @@ from zato.common.util.time_ import utcnow_as_ms
 
 if 0:
     from sqlalchemy.orm.session import Session as SASession
+    from zato.common.odb.model import PubSubSubCursor
     from zato.common.typing_ import anylist, intlist, strlistempty
 
 # ################################################################################################################################
@@ -38,6 +45,63 @@ _waiting = PUBSUB.DELIVERY_STATUS.WAITING_FOR_CONFIRMATION
 # ################################################################################################################################
 # ################################################################################################################################
 
+def _get_cursor_messages(
+    session,     # type: SASession
+    cluster_id,  # type: int
+    cursor,      # type: PubSubSubCursor
+    batch_size,  # type: int
+    now          # type: float
+) -> 'anylist':
+    """ A counterpart of get_messages for subscriptions that read messages from topic logs. Messages returned
+    are acknowledged right away, which is the same as if they were waiting for a confirmation in a queue
+    because neither kind is returned again.
+    """
+    query = session.query(
+        PubSubMessage.pub_msg_id.label('msg_id'),
+        PubSubMessage.pub_correl_id.label('correl_id'),
+        PubSubMessage.in_reply_to,
+        PubSubMessage.data_prefix_short,
+        PubSubMessage.priority,
+        PubSubMessage.ext_pub_time,
+        PubSubMessage.size,
+        PubSubMessage.data_format,
+        PubSubMessage.mime_type,
+        PubSubMessage.data,
+        PubSubMessage.expiration,
+        PubSubMessage.expiration_time,
+        PubSubMessage.ext_client_id,
+        PubSubMessage.published_by_id,
+        PubSubMessage.pub_pattern_matched,
+        PubSubTopic.id.label('topic_id'),
+        PubSubTopic.name.label('topic_name'),
+        PubSubTopic.name.label('queue_name'), # Currently, queue name = name of its underlying topic
+        PubSubMessage.pub_time.label('recv_time'),
+        PubSubEndpoint.id.label('subscriber_id'),
+        PubSubSubscription.sub_key,
+        PubSubEndpoint.name.label('subscriber_name'),
+        PubSubSubscription.sub_pattern_matched,
+        ).\
+        filter(PubSubMessage.topic_id==PubSubTopic.id).\
+        filter(PubSubSubscription.sub_key==cursor.sub_key).\
+        filter(PubSubSubscription.endpoint_id==PubSubEndpoint.id).\
+        filter(PubSubMessage.cluster_id==cluster_id).\
+        filter(PubSubMessage.expiration_time>=now)
+
+    messages = get_cursor_msg_query(query, cursor).\
+        order_by(PubSubMessage.ext_pub_time.desc()).\
+        limit(batch_size).\
+        all()
+
+    # Each message is being delivered for the first time
+    messages = [dict(elem._asdict(), delivery_count=1) for elem in messages]
+
+    if messages:
+        _ = acknowledge_by_cursor(session, cluster_id, cursor.sub_key, [elem['msg_id'] for elem in messages], now)
+
+    return [Bunch(elem) for elem in messages]
+
+# ################################################################################################################################
+
 def get_messages(
     session,     # type: SASession
     cluster_id,  # type: int
@@ -47,6 +111,10 @@ def get_messages(
 ) -> 'anylist':
     """ Returns up to batch_size messages for input sub_key and mark them as being delivered.
     """
+    # The subscription reads messages from its topic's log and its cursor is locked until our caller commits
+    if cursor := get_cursor(session, sub_key, True):
+        return _get_cursor_messages(session, cluster_id, cursor, batch_size, now)
+
     # First, get all messages but note it is SELECT FOR UPDATE
     messages = _pubsub_queue_message(session, cluster_id).\
         filter(PubSubSubscription.sub_key==sub_key).\
@@ -85,6 +153,12 @@ def _set_delivery_status(
     now,         # type: float
     status       # type: int
 ) -> 'None':
+
+    # Subscriptions reading messages from topic logs do not keep a status of each message, it is enough
+    # to move their cursors past the messages, no matter if these were delivered or are not to be delivered at all.
+    if acknowledge_by_cursor(session, cluster_id, sub_key, msg_id_list, now):
+        return
+
     session.execute(
         update(PubSubEnqMsg).\
         values({
@@ -134,6 +208,9 @@ def get_queue_depth_by_sub_key(
 ) -> 'int':
     """ Returns queue depth for a given sub_key - does not include messages expired, in staging, or already delivered.
     """
+    if cursor := get_cursor(session, sub_key):
+        return get_queue_depth_by_cursor(session, cursor, now)
+
     current_q = session.query(PubSubEnqMsg.id).\
         filter(PubSubSubscription.sub_key==PubSubEnqMsg.sub_key).\
         filter(PubSubEnqMsg.is_in_staging != True).\
@@ -153,13 +230,23 @@ def get_queue_depth_by_topic_id_list(
 ) -> 'anylist':
     """ Returns queue depth for a given sub_key - does not include messages expired, in staging, or already delivered.
     """
-    return session.query(PubSubEnqMsg.topic_id, func.count(PubSubEnqMsg.topic_id)).\
+    now = utcnow_as_ms()
+
+    result = session.query(PubSubEnqMsg.topic_id, func.count(PubSubEnqMsg.topic_id)).\
         filter(PubSubEnqMsg.topic_id.in_(topic_id_list)).\
         filter(PubSubEnqMsg.cluster_id==cluster_id).\
         filter(PubSubEnqMsg.delivery_status==_initialized).\
         filter(PubSubEnqMsg.pub_msg_id==PubSubMessage.pub_msg_id).\
-        filter(PubSubMessage.expiration_time>=utcnow_as_ms()).\
+        filter(PubSubMessage.expiration_time>=now).\
         group_by(PubSubMessage.topic_id).\
         all()
 
+    # Add the depth of subscriptions reading messages from topic logs
+    depth_by_topic = dict(result)
+
+    for topic_id, depth in get_queue_depth_by_cursor_topic_id_list(session, cluster_id, topic_id_list, now):
+        depth_by_topic[topic_id] = depth_by_topic.get(topic_id, 0) + depth
+
+    return list(depth_by_topic.items())
+
 # ################################################################################################################################
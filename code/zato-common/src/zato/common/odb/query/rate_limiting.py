@@ -25,9 +25,16 @@ def current_state(session, cluster_id, object_type, object_id, period, network):
 
 # ################################################################################################################################
 
-def current_period_list(session, cluster_id):
-    """ Returns all periods stored in ODB, no matter their object type, ID or similar.
+def current_period_list(session, cluster_id, object_type=None, object_id=None):
+    """ Returns all periods stored in ODB, optionally only the ones of a given object.
     """
-    return session.query(RateLimitState.period)
+    query = session.query(RateLimitState.period)
+
+    if object_type:
+        query = query.\
+            filter(RateLimitState.object_type==object_type).\
+            filter(RateLimitState.object_id==object_id)
+
+    return query
 
 # ################################################################################################################################
@@ -20,8 +20,9 @@ from netaddr import IPNetwork
 from sqlalchemy import and_
 
 # Zato
+from zato.common.api import RATE_LIMIT
 from zato.common.rate_limiting.common import Const, DefinitionItem, ObjectInfo
-from zato.common.rate_limiting.limiter import Approximate, Exact, RateLimitStateDelete, RateLimitStateTable
+from zato.common.rate_limiting.limiter import Approximate, Exact, Leased, RateLimitStateDelete, RateLimitStateTable
 
 # ################################################################################################################################
 # ################################################################################################################################
@@ -43,6 +44,12 @@ logger = getLogger(__name__)
 # ################################################################################################################################
 # ################################################################################################################################
 
+_type_cluster = RATE_LIMIT.TYPE.CLUSTER.id
+_type_cluster_sliding = RATE_LIMIT.TYPE.CLUSTER_SLIDING.id
+
+# ################################################################################################################################
+# ################################################################################################################################
+
 class DefinitionParser:
     """ Parser for user-provided rate limiting definitions.
     """
@@ -139,7 +146,7 @@ class DefinitionParser:
 class RateLimiting:
     """ Main API for the management of rate limiting functionality.
     """
-    __slots__ = 'parser', 'config_store', 'lock', 'sql_session_func', 'global_lock_func', 'cluster_id'
+    __slots__ = 'parser', 'config_store', 'lock', 'sql_session_func', 'global_lock_func', 'cluster_id', 'lease_ratio'
 
     def __init__(self) -> 'None':
         self.parser = DefinitionParser() # type: DefinitionParser
@@ -148,6 +155,7 @@ class RateLimiting:
         self.global_lock_func = None     # type: LockManager
         self.sql_session_func = None     # type: callable_
         self.cluster_id = None           # type: int
+        self.lease_ratio = Const.lease_ratio
 
 # ################################################################################################################################
 
@@ -162,7 +170,13 @@ class RateLimiting:
 
 # ################################################################################################################################
 
-    def _create_config(self, object_dict:'strdict', definition:'str', is_exact:'bool') -> 'BaseLimiter':
+    def _create_config(
+        self,
+        object_dict, # type: strdict
+        definition,  # type: str
+        is_exact,    # type: bool
+        rate_limit_type='' # type: str
+    ) -> 'BaseLimiter':
 
         object_id = object_dict['id']
         object_type = object_dict['type_']
@@ -181,12 +195,20 @@ class RateLimiting:
         else:
             has_from_any = False
 
-        config = Exact(self.cluster_id, self.sql_session_func) if is_exact else Approximate(self.cluster_id) # type: BaseLimiter
+        if rate_limit_type in (_type_cluster, _type_cluster_sliding):
+            config = Leased(
+                self.cluster_id, self.sql_session_func, self.lease_ratio, rate_limit_type == _type_cluster_sliding
+            ) # type: BaseLimiter
+        elif is_exact:
+            config = Exact(self.cluster_id, self.sql_session_func)
+        else:
+            config = Approximate(self.cluster_id)
+
         config.is_active = object_dict['is_active']
         config.is_exact = is_exact
         config.api = self
         config.object_info = info
-        config.definition = parsed
+        config.set_definition(parsed)
         config.parent_type = object_dict['parent_type']
         config.parent_name = object_dict['parent_name']
 
@@ -204,8 +226,8 @@ class RateLimiting:
 
 # ################################################################################################################################
 
-    def create(self, object_dict:'strdict', definition:'str', is_exact:'bool') -> 'None':
-        config = self._create_config(object_dict, definition, is_exact)
+    def create(self, object_dict:'strdict', definition:'str', is_exact:'bool', rate_limit_type:'str'='') -> 'None':
+        config = self._create_config(object_dict, definition, is_exact, rate_limit_type)
         self.config_store[config.get_config_key()] = config
 
 # ################################################################################################################################
@@ -247,7 +269,7 @@ class RateLimiting:
         limiter = self.config_store[config_key] # type: BaseLimiter
         del self.config_store[config_key]
 
-        if limiter.is_exact:
+        if limiter.has_odb_state:
             self._delete_from_odb(object_type, limiter.object_info.id)
 
         if remove_parent:
@@ -280,7 +302,15 @@ class RateLimiting:
 
 # ################################################################################################################################
 
-    def edit(self, object_type:'str', old_object_name:'str', object_dict:'strdict', definition:'str', is_exact:'bool') -> 'None':
+    def edit(
+        self,
+        object_type,     # type: str
+        old_object_name, # type: str
+        object_dict,     # type: strdict
+        definition,      # type: str
+        is_exact,        # type: bool
+        rate_limit_type='' # type: str
+    ) -> 'None':
         """ Changes, in place, an existing configuration entry to input data.
         """
 
@@ -298,7 +328,7 @@ class RateLimiting:
                     old_config.object_info.type_, object_type, old_object_name, object_dict))
 
             # Now, create a new config object ..
-            new_config = self._create_config(object_dict, definition, is_exact)
+            new_config = self._create_config(object_dict, definition, is_exact, rate_limit_type)
 
             # .. in case it was a rename ..
             if old_config.object_info.name != new_config.object_info.name:
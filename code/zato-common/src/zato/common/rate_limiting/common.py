@@ -32,6 +32,12 @@ class Const:
     from_any = '*'
     rate_any = '*'
 
+    # What part of a rate each worker process leases at a time in cluster-wide limiters
+    lease_ratio = 0.05
+
+    # How many client addresses each limiter keeps the results of network look-ups for
+    ip_address_cache_size = 10_000
+
     class Unit:
         minute = 'm'
         hour   = 'h'
@@ -9,18 +9,23 @@ Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
 # stdlib
 from contextlib import closing
 from copy import deepcopy
-from datetime import datetime
+from datetime import datetime, timedelta
+from logging import getLogger
+from traceback import format_exc
 
 # gevent
+from gevent import spawn
 from gevent.lock import RLock
 
-# netaddr
-from netaddr import IPAddress
+# SQLAlchemy
+from sqlalchemy import and_
+from sqlalchemy.exc import IntegrityError
 
 # Zato
 from zato.common.odb.model import RateLimitState
 from zato.common.odb.query.rate_limiting import current_period_list, current_state as current_state_query
 from zato.common.rate_limiting.common import Const, AddressNotAllowed, RateLimitReached
+from zato.common.util.network import LRUCache, NetworkMatcher
 
 # ################################################################################################################################
 # ################################################################################################################################
@@ -28,7 +33,7 @@ from zato.common.rate_limiting.common import Const, AddressNotAllowed, RateLimit
 if 0:
     from zato.common.rate_limiting import Approximate as RateLimiterApproximate, RateLimiting
     from zato.common.rate_limiting.common import DefinitionItem, ObjectInfo
-    from zato.common.typing_ import any_, callable_, commondict, strcalldict, strdict, strlist
+    from zato.common.typing_ import any_, callable_, commondict, dict_, list_, strcalldict, strdict, strlist
 
     # For pyflakes
     DefinitionItem = DefinitionItem
@@ -39,6 +44,11 @@ if 0:
 # ################################################################################################################################
 # ################################################################################################################################
 
+logger = getLogger(__name__)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
 RateLimitStateTable  = RateLimitState.__table__
 RateLimitStateDelete = RateLimitStateTable.delete
 
@@ -52,7 +62,7 @@ class BaseLimiter:
     __slots__ = 'current_idx', 'lock', 'api', 'object_info', 'definition', 'has_from_any', 'from_any_rate', 'from_any_unit', \
         'is_limit_reached', 'ip_address_cache', 'current_period_func', 'by_period', 'parent_type', 'parent_name', \
         'is_exact', 'from_any_object_id', 'from_any_object_type', 'from_any_object_name', 'cluster_id', 'is_active', \
-        'invocation_no'
+        'invocation_no', 'network_matcher'
 
     api:'RateLimiting'
     object_info:'ObjectInfo'
@@ -65,13 +75,17 @@ class BaseLimiter:
     is_exact:'bool'
     invocation_no:'int'
 
-    ip_address_cache:'strdict'
+    ip_address_cache:'LRUCache'
+    network_matcher:'NetworkMatcher'
     by_period:'strdict'
 
     from_any_object_id:'int'
     from_any_object_type:'str'
     from_any_object_name:'str'
 
+    # Whether the limiter keeps its state in ODB, which needs to be deleted along with the limiter
+    has_odb_state:'bool' = False
+
     initial_state:'commondict' = {
         'requests': 0,
         'last_cid': None,
@@ -85,7 +99,8 @@ class BaseLimiter:
         self.is_active = False
         self.current_idx = 0
         self.lock = RLock()
-        self.ip_address_cache = {}
+        self.ip_address_cache = LRUCache(Const.ip_address_cache_size)
+        self.network_matcher = NetworkMatcher()
         self.by_period = {}
         self.is_exact = False
         self.invocation_no = 0
@@ -109,10 +124,6 @@ class BaseLimiter:
         """
         with self.lock:
 
-            # First, periodically clear out the IP cache to limit its size to 1,000 items
-            if len(self.ip_address_cache) >= 1000:
-                self.ip_address_cache.clear()
-
             now = datetime.utcnow()
             current_minute = self._get_current_minute(now)
             current_hour = self._get_current_hour(now)
@@ -158,23 +169,38 @@ class BaseLimiter:
 
 # ################################################################################################################################
 
-    def _get_rate_config_by_from(self, orig_from, _from_any=Const.from_any) -> 'DefinitionItem':
-        # type: (str, str) -> DefinitionItem
+    def set_definition(self, definition:'list_[DefinitionItem]') -> 'None':
+        """ Sets definition lines and compiles them into a matcher of networks.
+        """
+        self.definition = definition
+        self.network_matcher = NetworkMatcher()
+        self.ip_address_cache.clear()
 
-        from_ = self.ip_address_cache.setdefault(orig_from, IPAddress(orig_from)) # type: IPAddress
-        found = None
+        for line in definition:
+            if line.from_ == Const.from_any:
+                self.network_matcher.add_any(line)
+            else:
+                self.network_matcher.add(line.from_, line)
 
-        for line in self.definition: # type: DefinitionItem
+# ################################################################################################################################
 
-            # A catch-all * pattern
-            if line.from_ == _from_any:
-                found = line
-                break
+    def _get_rate_config_by_from(self, orig_from, _missing=object()) -> 'DefinitionItem':
+        # type: (str, object) -> DefinitionItem
 
-            # A network match
-            elif from_ in line.from_:
-                found = line
-                break
+        found = self.ip_address_cache.get(orig_from, _missing)
+
+        # We have not seen this address recently ..
+        if found is _missing:
+
+            # .. so we need to look it up, keeping in mind that the first matching line from configuration wins,
+            # no matter if there are other, more specific, matching lines after it ..
+            try:
+                found = self.network_matcher.get_first(orig_from)
+            except ValueError:
+                found = None # This is not a valid IP address
+
+            # .. and either way, cache the result.
+            self.ip_address_cache.set(orig_from, found)
 
         # We did not match any line from configuration
         if not found:
@@ -323,6 +349,8 @@ class Approximate(BaseLimiter):
 
 class Exact(BaseLimiter):
 
+    has_odb_state = True
+
     def __init__(self, cluster_id:'int', sql_session_func:'callable_') -> 'None':
         super(Exact, self).__init__(cluster_id)
         self.sql_session_func = sql_session_func
@@ -390,16 +418,313 @@ class Exact(BaseLimiter):
 
     def _get_current_periods(self) -> 'strlist':
         with closing(self.sql_session_func()) as session:
-            return [elem[0] for elem in current_period_list(session, self.cluster_id).all()]
+            query = current_period_list(session, self.cluster_id, self.object_info.type_, self.object_info.id)
+            return [elem[0] for elem in query.all()]
 
 # ################################################################################################################################
 
     def _delete_periods(self, to_delete) -> 'None':
+        # Only our own periods can be deleted because other limiters may still need theirs,
+        # e.g. sliding windows need the previous period too.
         with closing(self.sql_session_func()) as session:
-            session.execute(RateLimitStateDelete().where(
-                RateLimitStateTable.c.period.in_(to_delete)
-            ))
+            session.execute(RateLimitStateDelete().where(and_(
+                RateLimitStateTable.c.object_type==self.object_info.type_,
+                RateLimitStateTable.c.object_id==self.object_info.id,
+                RateLimitStateTable.c.period.in_(to_delete),
+            )))
+            session.commit()
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class Lease:
+    """ Tokens that a cluster-wide limiter was granted for a given period and network.
+    """
+    __slots__ = 'period', 'tokens', 'is_refilling', 'next_refill', 'requests', 'last_cid', 'last_request_time_utc', \
+        'last_from', 'last_network'
+
+    def __init__(self, period:'str') -> 'None':
+        self.period = period
+        self.tokens = 0
+        self.is_refilling = False
+        self.next_refill = None # type: datetime | None
+        self.requests = 0
+        self.last_cid = None
+        self.last_request_time_utc = None
+        self.last_from = None
+        self.last_network = None
+
+    def to_dict(self) -> 'strdict':
+        return {
+            'requests': self.requests,
+            'last_cid': self.last_cid,
+            'last_request_time_utc': self.last_request_time_utc,
+            'last_from': self.last_from,
+            'last_network': self.last_network,
+        }
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class Leased(Exact):
+    """ A cluster-wide rate limiter. The number of requests made in each period is kept in ODB, shared by all servers,
+    but each worker process leases tokens from it in chunks and consumes them locally, which means that a request
+    needs no SQL queries unless its worker ran out of tokens. The next chunk is leased in background
+    when half of the current one is used up.
+
+    Tokens are never leased above the limit so it is never exceeded, but the ones leased and not used
+    by the end of a period are lost, i.e. up to (lease_ratio * rate) requests per worker process may be rejected
+    even though the limit has not been reached yet. The lower the lease_ratio, the more accurate the limiter is
+    and the more often it needs to query ODB.
+
+    With is_sliding set, the limit applies to a window of the unit's length ending at the time of a request
+    rather than to calendar periods. This is approximated by adding to the current period's requests
+    a part of the previous period's ones, proportional to how much of the window is still in that period.
+    """
+    unit_seconds:'commondict' = {
+        Const.Unit.day: 86400,
+        Const.Unit.hour: 3600,
+        Const.Unit.minute: 60,
+    }
+
+    def __init__(
+        self,
+        cluster_id,       # type: int
+        sql_session_func, # type: callable_
+        lease_ratio=Const.lease_ratio, # type: float
+        is_sliding=False, # type: bool
+        spawn_func=spawn  # type: callable_
+    ) -> 'None':
+        super(Leased, self).__init__(cluster_id, sql_session_func)
+        self.lease_ratio = lease_ratio
+        self.is_sliding = is_sliding
+        self.spawn_func = spawn_func
+
+        # Network -> Its current lease
+        self.leases = {} # type: dict_[str, Lease]
+
+# ################################################################################################################################
+
+    def get_lease_size(self, rate:'int') -> 'int':
+        return max(1, int(rate * self.lease_ratio))
+
+# ################################################################################################################################
+
+    def _get_period_start(self, now:'datetime', unit:'str') -> 'datetime':
+
+        if unit == Const.Unit.minute:
+            return now.replace(second=0, microsecond=0)
+
+        elif unit == Const.Unit.hour:
+            return now.replace(minute=0, second=0, microsecond=0)
+
+        else:
+            return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+# ################################################################################################################################
+
+    def _get_previous_period(self, now:'datetime', unit:'str') -> 'str':
+        previous = self._get_period_start(now, unit) - timedelta(seconds=1)
+        return self.current_period_func[unit](previous)
+
+# ################################################################################################################################
+
+    def _get_previous_weight(self, now:'datetime', unit:'str') -> 'float':
+        """ Returns what part of a sliding window ending now is still in the previous period.
+        """
+        elapsed = (now - self._get_period_start(now, unit)).total_seconds()
+        return max(0.0, 1.0 - elapsed / self.unit_seconds[unit])
+
+# ################################################################################################################################
+
+    def _fetch_state(self, session:'any_', period:'str', network:'str', for_update:'bool'=False) -> 'RateLimitState':
+
+        query = current_state_query(session, self.cluster_id, self.object_info.type_, self.object_info.id, period, network)
+
+        if for_update:
+            query = query.with_for_update()
+
+        return query.first()
+
+# ################################################################################################################################
+
+    def _lease(self, cid:'str', orig_from:'str', network:'str', rate:'int', unit:'str', now:'datetime', period:'str') -> 'int':
+        """ Leases up to a chunk of tokens for the period from ODB and returns how many were granted, possibly zero.
+        """
+        with closing(self.sql_session_func()) as session:
+
+            # Lock the period's row so that no other worker process leases tokens at the same time ..
+            item = self._fetch_state(session, period, network, True)
+
+            # .. it may not exist yet, in which case we create it, unless another process did it in the meantime ..
+            if not item:
+                item = RateLimitState()
+                item.cluster_id = self.cluster_id
+                item.object_type = self.object_info.type_
+                item.object_id = self.object_info.id
+                item.requests = 0
+                item.period = period
+                item.last_cid = cid
+                item.last_from = orig_from
+                item.last_network = network
+                item.last_request_time_utc = now
+
+                try:
+                    session.add(item)
+                    session.flush()
+                except IntegrityError:
+                    session.rollback()
+                    item = self._fetch_state(session, period, network, True)
+
+            # .. find out how many requests we still have ..
+            available = rate - item.requests
+
+            # .. in a sliding window, previous period's requests count too ..
+            if self.is_sliding:
+                previous = self._fetch_state(session, self._get_previous_period(now, unit), network)
+                if previous:
+                    available -= int(previous.requests * self._get_previous_weight(now, unit) + 0.5)
+
+            # .. now, we know how many tokens can be leased ..
+            granted = max(0, min(self.get_lease_size(rate), available))
+
+            # .. which is what we store for other processes to know about it.
+            item.requests += granted
+            item.last_cid = cid
+            item.last_from = orig_from
+            item.last_request_time_utc = now
+
             session.commit()
 
+            return granted
+
+# ################################################################################################################################
+
+    def _add_tokens(self, lease:'Lease', granted:'int', unit:'str', now:'datetime') -> 'None':
+        """ Adds newly leased tokens to a lease. Must be called with self.lock held.
+        """
+        lease.tokens += granted
+
+        # No tokens left in the whole cluster so there is no point in asking for them with each request.
+        # In a sliding window, previous period's requests stop counting as time goes by so we can ask again in a moment,
+        # whereas in a fixed one, we need to wait for the next period, which means a new lease.
+        if not granted:
+            if self.is_sliding:
+                lease.next_refill = now + timedelta(seconds=self.unit_seconds[unit] * self.lease_ratio)
+            else:
+                lease.next_refill = datetime.max
+
+# ################################################################################################################################
+
+    def _refill_in_background(
+        self,
+        lease,     # type: Lease
+        cid,       # type: str
+        orig_from, # type: str
+        network,   # type: str
+        rate,      # type: int
+        unit,      # type: str
+        now        # type: datetime
+    ) -> 'None':
+        """ Leases more tokens without self.lock held so that requests can still use the remaining ones in the meantime.
+        """
+        try:
+            granted = self._lease(cid, orig_from, network, rate, unit, now, lease.period)
+            with self.lock:
+                self._add_tokens(lease, granted, unit, now)
+        except Exception:
+            logger.warning('Could not lease rate limiting tokens for `%s`, e:`%s`', self.get_config_key(), format_exc())
+        finally:
+            lease.is_refilling = False
+
+# ################################################################################################################################
+
+    def _check_limit(self, cid, orig_from, network_found, rate, unit, def_object_id, def_object_name, def_object_type,
+        _rate_any=Const.rate_any, _utcnow=datetime.utcnow) -> 'None':
+        # type: (str, str, str, int, str, str, object, str, str)
+
+        # Increase invocation counter
+        self.invocation_no += 1
+
+        # Local aliases
+        now = _utcnow()
+        network = str(network_found)
+
+        # Get current period, e.g. current day, hour or minute, and a lease for it
+        current_period = self.current_period_func[unit](now)
+        lease = self.leases.get(network)
+
+        if (not lease) or lease.period != current_period:
+            lease = self.leases[network] = Lease(current_period)
+
+        # Unless we are allowed to have any rate ..
+        if rate != _rate_any:
+
+            # .. we may need to lease more tokens right now, unless we know that there are none left ..
+            if not lease.tokens:
+                if (not lease.next_refill) or now >= lease.next_refill:
+                    lease.next_refill = None
+                    granted = self._lease(cid, orig_from, network, rate, unit, now, current_period)
+                    self._add_tokens(lease, granted, unit, now)
+
+            # .. if there are still none, it means that the limit has been reached ..
+            if not lease.tokens:
+                self._raise_rate_limit_exceeded(rate, unit, orig_from, network_found, lease.to_dict(), cid,
+                    def_object_id, def_object_name, def_object_type)
+
+            # .. otherwise, we can use one of the tokens ..
+            lease.tokens -= 1
+
+            # .. and lease the next chunk in background if the current one is running out.
+            if lease.tokens <= self.get_lease_size(rate) // 2 and not (lease.is_refilling or lease.next_refill):
+                lease.is_refilling = True
+                _ = self.spawn_func(self._refill_in_background, lease, cid, orig_from, network, rate, unit, now)
+
+        # Update current metadata state
+        lease.requests += 1
+        lease.last_cid = cid
+        lease.last_request_time_utc = now.isoformat()
+        lease.last_from = orig_from
+        lease.last_network = network
+
+        # Above, we checked our own rate limit but it is still possible that we have a parent
+        # that also wants to check it.
+        if self.has_parent:
+            self.api.check_limit(cid, self.parent_type, self.parent_name, orig_from)
+
+        # Clean up old entries periodically
+        if self.invocation_no % 1000 == 0:
+            self.cleanup()
+
+# ################################################################################################################################
+
+    def cleanup(self) -> 'None':
+        """ Cleans up leases and time periods that are no longer needed. In a sliding window,
+        the previous period is still needed.
+        """
+        with self.lock:
+
+            now = datetime.utcnow()
+            to_keep = set()
+
+            for unit, current_period_func in self.current_period_func.items():
+                to_keep.add(current_period_func(now))
+                to_keep.add(self._get_previous_period(now, unit))
+
+            for network, lease in list(self.leases.items()):
+                if lease.period not in to_keep:
+                    del self.leases[network]
+
+            to_delete = set(self._get_current_periods()) - to_keep
+
+            if to_delete:
+                self._delete_periods(to_delete)
+
+# ################################################################################################################################
+
+    def rewrite_rate_data(self, old_config) -> 'None':
+        """ There is no local rate data to rewrite because all of it is kept in ODB.
+        """
+
 # ################################################################################################################################
 # ################################################################################################################################
@@ -182,6 +182,10 @@ wait_until_port_taken = wait_until_port_taken
 
 class ModuleCtx:
     PID_To_Port_Pattern = 'zato-ipc-port-{cluster_name}-{server_name}-{pid}.txt'
+    PID_To_Socket_Pattern = 'zato-ipc-{cluster_name}-{server_name}-{pid}.sock'
+
+    # Paths to Unix sockets cannot be longer than that
+    Max_Socket_Path_Len = 100
 
 # ################################################################################################################################
 
@@ -2113,6 +2117,31 @@ def get_ipc_pid_port_path(cluster_name:'str', server_name:'str', pid:'int') -> '
 
 # ################################################################################################################################
 
+def get_ipc_pid_socket_path(cluster_name:'str', server_name:'str', pid:'int') -> 'str':
+
+    # This is the file name of the socket ..
+    file_name = ModuleCtx.PID_To_Socket_Pattern.format(
+        cluster_name=cluster_name,
+        server_name=server_name,
+        pid=pid,
+    )
+
+    # .. make sure the name is safe to use in the file-system ..
+    file_name = fs_safe_name(file_name)
+
+    # .. obtain a full path to a temporary directory ..
+    full_path = get_new_tmp_full_path(file_name)
+
+    # .. long cluster or server names would not fit in a socket's path so we use a hash of them in that case ..
+    if len(full_path) > ModuleCtx.Max_Socket_Path_Len:
+        names_hash = sha256('{}-{}'.format(cluster_name, server_name).encode('utf8')).hexdigest()[:16]
+        full_path = get_new_tmp_full_path(f'zato-ipc-{names_hash}-{pid}.sock')
+
+    # .. and return the result to our caller.
+    return full_path
+
+# ################################################################################################################################
+
 def save_ipc_pid_port(cluster_name:'str', server_name:'str', pid:'int', port:'int') -> 'None':
 
     # Make sure we store a string ..
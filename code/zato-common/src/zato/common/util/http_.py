@@ -9,15 +9,16 @@ Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
 # stdlib
 import copy
 from cgi import FieldStorage
-from collections.abc import Mapping
-from io import BytesIO
+from collections.abc import Iterator, Mapping
+from io import BytesIO, IOBase
 from urllib.parse import parse_qsl, quote, urlencode
+from zlib import compressobj, MAX_WBITS
 
 # ################################################################################################################################
 # ################################################################################################################################
 
 if 0:
-    from zato.common.typing_ import any_, stranydict
+    from zato.common.typing_ import any_, intnone, iterator_, stranydict
 
 # ################################################################################################################################
 # ################################################################################################################################
@@ -70,6 +71,105 @@ def get_form_data(wsgi_environ:'stranydict', as_dict:'bool'=True) -> 'stranydict
     # Return the dict now
     return out
 
+# ################################################################################################################################
+
+class RequestStream:
+    """ Reads the body of an HTTP request in chunks, as it is consumed, instead of loading all of it into memory at once.
+    """
+    def __init__(self, wsgi_input:'any_', buffer_size:'int', content_length:'intnone'=None) -> 'None':
+        self.wsgi_input = wsgi_input
+        self.buffer_size = buffer_size
+
+        # If we know how much is to be read, we never try to read past it
+        self.remaining = content_length
+
+    def read(self, size:'int'=-1) -> 'bytes':
+
+        if self.remaining is not None:
+            if size < 0 or size > self.remaining:
+                size = self.remaining
+            if size == 0:
+                return b''
+
+        data = self.wsgi_input.read(size) if size >= 0 else self.wsgi_input.read()
+
+        if self.remaining is not None:
+            self.remaining -= len(data)
+
+        return data
+
+    def __iter__(self) -> 'iterator_[bytes]':
+        while True:
+            data = self.read(self.buffer_size)
+            if not data:
+                break
+            yield data
+
+# ################################################################################################################################
+
+def is_stream_payload(value:'any_') -> 'bool':
+    """ Returns True if value is a response payload that should be streamed, i.e. a generator,
+    another kind of an iterator, or a file-like object.
+    """
+    return isinstance(value, (Iterator, IOBase))
+
+# ################################################################################################################################
+
+def iter_stream_payload(payload:'any_', buffer_size:'int') -> 'iterator_[bytes]':
+    """ Turns a streamed payload into chunks of bytes. File-like objects are read buffer_size bytes at a time
+    whereas chunks produced by iterators are joined until there are at least buffer_size bytes of them.
+    """
+    try:
+
+        # We have a file-like object ..
+        if isinstance(payload, IOBase):
+            while True:
+                data = payload.read(buffer_size)
+                if not data:
+                    break
+                yield data.encode('utf8') if isinstance(data, str) else data
+
+        # .. or an iterator, e.g. a generator.
+        else:
+            buffer = []
+            buffer_len = 0
+
+            for data in payload:
+
+                if isinstance(data, str):
+                    data = data.encode('utf8')
+
+                buffer.append(data)
+                buffer_len += len(data)
+
+                if buffer_len >= buffer_size:
+                    yield b''.join(buffer)
+                    buffer[:] = []
+                    buffer_len = 0
+
+            if buffer:
+                yield b''.join(buffer)
+
+    finally:
+        close = getattr(payload, 'close', None)
+        if close:
+            close()
+
+# ################################################################################################################################
+
+def iter_gzip(chunks:'iterator_[bytes]') -> 'iterator_[bytes]':
+    """ Compresses chunks of bytes, returning them as a gzip stream.
+    """
+    # Adding 16 to wbits means the output will have gzip headers and a trailer
+    compressor = compressobj(wbits=16 + MAX_WBITS)
+
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+
+    yield compressor.flush()
+
 # type: ignore
 
 # ################################################################################################################################
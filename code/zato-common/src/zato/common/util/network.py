@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+from collections import OrderedDict
+from ipaddress import ip_address, ip_network, IPv4Address, IPv6Address
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import any_, anydict, anylist, generator_, tuple_
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+_max_bits = {
+    4: 32,
+    6: 128,
+}
+
+_address_types = (IPv4Address, IPv6Address)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class NetworkMatcher:
+    """ Matches IP addresses against IPv4 and IPv6 networks. Networks are grouped by their prefix length and each group
+    is a dict keyed by network addresses, which means that a look-up needs at most one dict access for each distinct
+    prefix length rather than one comparison for each network.
+
+    Each network is added with a value and an index, which is the order in which it was added. A look-up can return
+    the value of the longest matching prefix or, to keep the semantics of a list searched from its beginning,
+    the value of the matching network that was added first.
+    """
+    def __init__(self) -> 'None':
+
+        # IP version -> Prefix length -> Network address, shifted right by host bits -> (idx, value)
+        self._by_version = {4: {}, 6: {}} # type: anydict
+
+        # IP version -> Prefix lengths in use, longest first
+        self._prefix_lens = {4: [], 6: []} # type: anydict
+
+        # How many networks were added
+        self._len = 0
+
+# ################################################################################################################################
+
+    def __len__(self) -> 'int':
+        return self._len
+
+# ################################################################################################################################
+
+    def _add(self, network:'any_', value:'any_', idx:'int') -> 'None':
+
+        network = ip_network(str(network), strict=False)
+        version = network.version
+        prefix_len = network.prefixlen
+
+        by_prefix_len = self._by_version[version]
+        networks = by_prefix_len.setdefault(prefix_len, {})
+
+        # If the same network is added more than once, only the first one can ever be matched
+        key = int(network.network_address) >> (_max_bits[version] - prefix_len)
+        if key not in networks:
+            networks[key] = (idx, value)
+
+        self._prefix_lens[version] = sorted(by_prefix_len, reverse=True)
+
+# ################################################################################################################################
+
+    def add(self, network:'any_', value:'any_'=True) -> 'None':
+        """ Adds a network, which can be a string or any object whose string representation is a network in the CIDR notation.
+        """
+        self._add(network, value, self._len)
+        self._len += 1
+
+# ################################################################################################################################
+
+    def add_any(self, value:'any_'=True) -> 'None':
+        """ Adds a network matching all the IPv4 and IPv6 addresses.
+        """
+        self._add('0.0.0.0/0', value, self._len)
+        self._add('::/0', value, self._len)
+        self._len += 1
+
+# ################################################################################################################################
+
+    def _iter_matches(self, address:'any_') -> 'generator_[tuple_[int, any_], None, None]':
+        """ Yields (idx, value) for each network that the address belongs to, longest prefixes first.
+        Raises ValueError if the address is not a valid IP address.
+        """
+        if not isinstance(address, _address_types):
+            address = ip_address(str(address))
+
+        version = address.version
+        max_bits = _max_bits[version]
+        by_prefix_len = self._by_version[version]
+        address = int(address)
+
+        for prefix_len in self._prefix_lens[version]:
+            found = by_prefix_len[prefix_len].get(address >> (max_bits - prefix_len))
+            if found:
+                yield found
+
+# ################################################################################################################################
+
+    def get_longest(self, address:'any_', default:'any_'=None) -> 'any_':
+        """ Returns the value of the longest network prefix that the address matches.
+        """
+        for _, value in self._iter_matches(address):
+            return value
+        return default
+
+# ################################################################################################################################
+
+    def get_first(self, address:'any_', default:'any_'=None) -> 'any_':
+        """ Returns the value of the network that the address matches and that was added before all other matching ones.
+        """
+        matches = list(self._iter_matches(address)) # type: anylist
+        if matches:
+            return min(matches, key=_get_idx)[1]
+        else:
+            return default
+
+# ################################################################################################################################
+
+    def __contains__(self, address:'any_') -> 'bool':
+        for _ in self._iter_matches(address):
+            return True
+        return False
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+def _get_idx(item:'tuple_[int, any_]') -> 'int':
+    return item[0]
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class LRUCache:
+    """ A cache that keeps up to max_size most recently used items, e.g. results of IP address look-ups,
+    which would otherwise grow with each new client address.
+    """
+    def __init__(self, max_size:'int') -> 'None':
+        self.max_size = max_size
+        self._data = OrderedDict() # type: OrderedDict
+
+    def __len__(self) -> 'int':
+        return len(self._data)
+
+    def __contains__(self, key:'any_') -> 'bool':
+        return key in self._data
+
+    def get(self, key:'any_', default:'any_'=None) -> 'any_':
+        try:
+            value = self._data[key]
+        except KeyError:
+            return default
+        else:
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key:'any_', value:'any_') -> 'None':
+        self._data[key] = value
+        self._data.move_to_end(key)
+
+        if len(self._data) > self.max_size:
+            _ = self._data.popitem(last=False)
+
+    def clear(self) -> 'None':
+        self._data.clear()
+
+# ################################################################################################################################
+# ################################################################################################################################
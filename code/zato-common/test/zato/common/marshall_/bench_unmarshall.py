@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+
+Micro-benchmarks of unmarshalling dicts into models. This is not a test module, run it directly:
+
+    $ python bench_unmarshall.py
+"""
+
+# stdlib
+from time import perf_counter
+
+# Zato
+from zato.common.marshal_.api import MarshalAPI
+from zato.common.test.marshall_ import CreateAttrListRequest, CreateUserRequest, Role
+from zato.common.typing_ import cast_
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import any_
+    from zato.server.service import Service
+    Service = Service
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+# How many operations to time in each run
+ops_per_run = 20_000
+
+# How many elements there are in each list of models
+list_sizes = [10, 100, 1000]
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+flat_data = {
+    'type': 'my.type',
+    'name': 'my.name',
+}
+
+nested_data = {
+    'request_id': '123',
+    'user': {
+        'user_name': 'my.user',
+        'address': {
+            'locality': 'my.locality',
+            'post_code': '12345',
+        }
+    },
+    'role_list': [
+        {'type': 'type.1', 'name': 'name.1'},
+        {'type': 'type.2', 'name': 'name.2'},
+    ]
+}
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+def _report(name:'str', ops:'int', elapsed:'float') -> 'None':
+    print('{:<24} ops/s:{:>12,.0f}  us/op:{:>10.3f}'.format(name, ops / elapsed, elapsed / ops * 1_000_000))
+
+# ################################################################################################################################
+
+def bench(name:'str', data:'any_', DataClass:'any_', ops:'int'=ops_per_run) -> 'None':
+
+    api = MarshalAPI()
+    service = cast_('Service', None)
+
+    start = perf_counter()
+    for _ in range(ops):
+        _ = api.from_dict(service, data, DataClass)
+    _report(name, ops, perf_counter() - start)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+
+    bench('flat', flat_data, Role)
+    bench('nested', nested_data, CreateUserRequest)
+
+    for list_size in list_sizes:
+        list_data = {'attr_list': [{'type': 'type.{}'.format(idx), 'name': 'name.{}'.format(idx)} for idx in range(list_size)]}
+        bench('list of {}'.format(list_size), list_data, CreateAttrListRequest, ops_per_run // list_size)
+
+# ################################################################################################################################
+# ################################################################################################################################
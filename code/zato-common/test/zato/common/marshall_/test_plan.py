@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+from unittest import main, TestCase
+
+# Zato
+from zato.common.ext.dataclasses import dataclass
+from zato.common.marshal_.api import ElementIsNotAList, ElementMissing, get_model_plan, MarshalAPI, Model
+from zato.common.test.marshall_ import Address, CreatePhoneListRequest, User
+from zato.common.typing_ import cast_, list_, optional
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import any_
+    from zato.server.service import Service
+    Service = Service
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class ModelPlanTestCase(TestCase):
+
+    def test_plan_is_built_once(self) -> 'None':
+
+        api = MarshalAPI()
+        service = cast_('Service', None)
+
+        data = {'user_name': 'abc', 'address': {'locality': 'def'}}
+        _ = api.from_dict(service, data, User)
+
+        # Each class has its own plan, including the nested ones, and it is reused each time
+        user_plan = get_model_plan(User)
+        address_plan = get_model_plan(Address)
+
+        _ = api.from_dict(service, data, User)
+
+        self.assertIs(get_model_plan(User), user_plan)
+        self.assertIs(get_model_plan(Address), address_plan)
+
+        # Fields are sorted by name
+        self.assertListEqual([field_plan.name for field_plan in user_plan.field_plans], ['address', 'user_name'])
+        self.assertListEqual([field_plan.name for field_plan in address_plan.field_plans],
+            ['characteristics', 'details', 'locality', 'post_code'])
+
+        # The plan records what each field is
+        address, user_name = user_plan.field_plans
+        self.assertTrue(address.is_model)
+        self.assertTrue(address.is_required)
+        self.assertFalse(user_name.is_model)
+
+        characteristics, details, _, post_code = address_plan.field_plans
+        self.assertFalse(post_code.is_required)
+        self.assertEqual(post_code.get_empty_value(), '')
+
+        # Lists and dicts are never shared
+        self.assertEqual(characteristics.get_empty_value(), [])
+        self.assertIsNot(characteristics.get_empty_value(), characteristics.get_empty_value())
+        self.assertIsNot(details.get_empty_value(), details.get_empty_value())
+
+# ################################################################################################################################
+
+    def test_new_class_new_plan(self) -> 'None':
+
+        def get_class() -> 'any_':
+
+            @dataclass(init=False)
+            class MyModel(Model):
+                name: str
+                value: optional[int]
+
+            return MyModel
+
+        # This is what happens when a module with models is hot-deployed, i.e. the model classes are created anew
+        class1 = get_class()
+        class2 = get_class()
+
+        self.assertIsNot(get_model_plan(class1), get_model_plan(class2))
+
+        # Subclasses get plans of their own too
+        @dataclass(init=False)
+        class MySubclass(class1):
+            sub_name: str
+
+        sub_plan = get_model_plan(MySubclass)
+
+        self.assertIsNot(sub_plan, get_model_plan(class1))
+        self.assertListEqual([field_plan.name for field_plan in sub_plan.field_plans], ['name', 'sub_name', 'value'])
+
+        instance = MarshalAPI().unmarshall({'name': 'abc', 'value': '123', 'sub_name': 'def'}, MySubclass)
+
+        self.assertEqual(instance.name, 'abc')
+        self.assertEqual(instance.value, 123)
+        self.assertEqual(instance.sub_name, 'def')
+
+# ################################################################################################################################
+
+    def test_elem_path_after_list(self) -> 'None':
+
+        @dataclass(init=False)
+        class MyRequest(Model):
+            phone_list: list_[CreatePhoneListRequest]
+            user: User
+
+        data = {
+            'phone_list': [{}, {}, {}],
+            'user': {'user_name': 'abc'},
+        }
+
+        with self.assertRaises(ElementMissing) as ctx:
+            _ = MarshalAPI().unmarshall(data, MyRequest)
+
+        # Indexes of preceding lists are not included in paths to other elements
+        self.assertEqual(ctx.exception.reason, 'Element missing: /user/address')
+
+# ################################################################################################################################
+
+    def test_required_list(self) -> 'None':
+
+        @dataclass(init=False)
+        class MyRequest(Model):
+            phone_list: list_[CreatePhoneListRequest]
+            name_list: list_[str]
+            any_list: list
+
+        api = MarshalAPI()
+
+        # Required lists of a given type cannot be empty values of other types ..
+        for value in None, '', {}:
+            for name in 'phone_list', 'name_list':
+
+                data = {'phone_list': [], 'name_list': [], 'any_list': []}
+                data[name] = value
+
+                with self.assertRaises(ElementIsNotAList) as ctx:
+                    _ = api.unmarshall(data, MyRequest)
+
+                self.assertEqual(ctx.exception.reason, 'Element is not a list: /{}'.format(name))
+
+        # .. whereas lists of an unknown type are assigned as they are.
+        instance = api.unmarshall({'phone_list': [], 'name_list': ['abc'], 'any_list': 'def'}, MyRequest)
+
+        self.assertListEqual(instance.phone_list, [])
+        self.assertListEqual(instance.name_list, ['abc'])
+        self.assertEqual(instance.any_list, 'def')
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    _ = main()
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+from unittest import main, TestCase
+
+# Bunch
+from bunch import Bunch
+
+# SQLAlchemy
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+# Zato
+from zato.common.api import PUBSUB
+from zato.common.odb.model import Base, Cluster, PubSubEndpoint, PubSubEndpointEnqueuedMessage, PubSubMessage, \
+     PubSubSubscription, PubSubTopic
+from zato.common.odb.query.pubsub.cursor import add_cursor
+from zato.common.odb.query.pubsub.publish import BulkPublishTopicCtx, sql_bulk_publish_with_retry
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import anylist, dictlist, strlist
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+now = 1_000_000.0
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class SQLBulkPublishTestCase(TestCase):
+
+    def setUp(self) -> 'None':
+
+        self.engine = create_engine('sqlite://')
+        Base.metadata.create_all(self.engine)
+
+        self.session = sessionmaker(bind=self.engine)()
+
+        self.cluster = Cluster()
+        self.cluster.name = 'test.cluster'
+        self.cluster.odb_type = 'sqlite'
+        self.cluster.lb_host = 'localhost'
+        self.cluster.lb_port = 11223
+        self.cluster.lb_agent_port = 20151
+
+        self.endpoint = PubSubEndpoint()
+        self.endpoint.name = 'test.endpoint'
+        self.endpoint.endpoint_type = 'rest'
+        self.endpoint.role = 'pub-sub'
+        self.endpoint.cluster = self.cluster
+
+        self.session.add_all([self.cluster, self.endpoint])
+        self.session.flush()
+
+        self.msg_idx = 0
+
+        # All the INSERT statements executed during a test
+        self.inserts = [] # type: strlist
+
+        @event.listens_for(self.engine, 'before_cursor_execute')
+        def _on_execute(conn, cursor, statement, *args, **kwargs):
+            if statement.startswith('INSERT'):
+                self.inserts.append(statement.split('(')[0].strip())
+
+# ################################################################################################################################
+
+    def tearDown(self) -> 'None':
+        self.session.close()
+
+# ################################################################################################################################
+
+    def add_topic(self, name:'str') -> 'PubSubTopic':
+
+        topic = PubSubTopic()
+        topic.name = name
+        topic.is_active = True
+        topic.has_gd = True
+        topic.is_api_sub_allowed = True
+        topic.cluster = self.cluster
+
+        self.session.add(topic)
+        self.session.flush()
+
+        return topic
+
+# ################################################################################################################################
+
+    def subscribe(self, topic:'PubSubTopic', sub_key:'str') -> 'Bunch':
+
+        sub = PubSubSubscription()
+        sub.creation_time = now
+        sub.sub_key = sub_key
+        sub.sub_pattern_matched = 'sub=/*'
+        sub.has_gd = True
+        sub.wrap_one_msg_in_list = True
+        sub.delivery_err_should_block = True
+        sub.topic = topic
+        sub.endpoint = self.endpoint
+        sub.cluster = self.cluster
+
+        self.session.add(sub)
+        self.session.flush()
+
+        return Bunch(sub_key=sub_key, endpoint_id=self.endpoint.id, sub_pattern_matched=sub.sub_pattern_matched)
+
+# ################################################################################################################################
+
+    def get_gd_msg_list(self, topic:'PubSubTopic', subs:'anylist', count:'int') -> 'dictlist':
+
+        out = [] # type: dictlist
+
+        for _ in range(count):
+
+            self.msg_idx += 1
+            data = 'data{}'.format(self.msg_idx)
+
+            out.append({
+                'pub_msg_id': 'zpsm{}'.format(self.msg_idx),
+                'pub_pattern_matched': 'pub=/*',
+                'pub_time': PUBSUB.FLOAT_STRING_CONVERT.format(now),
+                'expiration': 3600,
+                'expiration_time': now + 3600,
+                'data': data,
+                'data_prefix': data,
+                'data_prefix_short': data,
+                'size': len(data),
+                'has_gd': True,
+                'is_in_sub_queue': bool(subs),
+                'published_by_id': self.endpoint.id,
+                'topic_id': topic.id,
+                'topic_name': topic.name,
+                'cluster_id': self.cluster.id,
+                'delivery_count': 0,
+                'delivery_status': PUBSUB.DELIVERY_STATUS.INITIALIZED,
+                'deliver_to_sk': [],
+                'reply_to_sk': [],
+                'sub_pattern_matched': {sub.sub_key: sub.sub_pattern_matched for sub in subs},
+            })
+
+        return out
+
+# ################################################################################################################################
+
+    def publish(self, topic_ctx_list:'anylist') -> 'None':
+
+        _ = sql_bulk_publish_with_retry(
+            now = now,
+            cid = 'test.cid',
+            cluster_id = self.cluster.id,
+            pub_counter = 1,
+            session = self.session,
+            new_session_func = None, # type: ignore
+            topic_ctx_list = topic_ctx_list,
+        )
+
+        self.session.commit()
+
+# ################################################################################################################################
+
+    def get_queue(self) -> 'strlist':
+
+        result = self.session.query(PubSubEndpointEnqueuedMessage.sub_key, PubSubEndpointEnqueuedMessage.pub_msg_id).\
+            order_by(PubSubEndpointEnqueuedMessage.sub_key, PubSubEndpointEnqueuedMessage.pub_msg_id).\
+            all()
+
+        return ['{}:{}'.format(sub_key, pub_msg_id) for sub_key, pub_msg_id in result]
+
+# ################################################################################################################################
+
+    def test_publish_many_topics(self) -> 'None':
+
+        topic1 = self.add_topic('/test/1')
+        topic2 = self.add_topic('/test/2')
+        topic3 = self.add_topic('/test/3')
+
+        subs1 = [self.subscribe(topic1, 'sk1'), self.subscribe(topic1, 'sk2')]
+        subs2 = [self.subscribe(topic2, 'sk3')]
+
+        self.inserts[:] = []
+
+        self.publish([
+            BulkPublishTopicCtx(topic1.id, topic1.name, self.get_gd_msg_list(topic1, subs1, 2), subs1),
+            BulkPublishTopicCtx(topic2.id, topic2.name, self.get_gd_msg_list(topic2, subs2, 1), subs2),
+            BulkPublishTopicCtx(topic3.id, topic3.name, self.get_gd_msg_list(topic3, [], 1), []),
+        ])
+
+        # All the topic messages were inserted with one statement and all the queue messages with another one ..
+        self.assertListEqual(self.inserts, ['INSERT INTO pubsub_message', 'INSERT INTO pubsub_endp_msg_queue'])
+
+        # .. each topic received its own messages ..
+        result = self.session.query(PubSubMessage.topic_id, PubSubMessage.pub_msg_id).order_by(PubSubMessage.id).all()
+        self.assertListEqual([tuple(elem) for elem in result], [
+            (topic1.id, 'zpsm1'),
+            (topic1.id, 'zpsm2'),
+            (topic2.id, 'zpsm3'),
+            (topic3.id, 'zpsm4'),
+        ])
+
+        # .. and each subscriber received messages only from the topic it is subscribed to.
+        self.assertListEqual(self.get_queue(), ['sk1:zpsm1', 'sk1:zpsm2', 'sk2:zpsm1', 'sk2:zpsm2', 'sk3:zpsm3'])
+
+# ################################################################################################################################
+
+    def test_publish_topic_log(self) -> 'None':
+
+        topic1 = self.add_topic('/test/1')
+        topic2 = self.add_topic('/test/2')
+
+        subs1 = [self.subscribe(topic1, 'sk1')]
+        subs2 = [self.subscribe(topic2, 'sk2')]
+
+        # The subscription to the second topic reads messages from the topic's log ..
+        _ = add_cursor(self.session, self.cluster.id, topic2.id, 'sk2', now)
+        self.session.flush()
+
+        self.publish([
+            BulkPublishTopicCtx(topic1.id, topic1.name, self.get_gd_msg_list(topic1, subs1, 1), subs1),
+            BulkPublishTopicCtx(topic2.id, topic2.name, self.get_gd_msg_list(topic2, subs2, 1), subs2,
+                PUBSUB.GD_STORAGE.TOPIC_LOG.id),
+        ])
+
+        # .. which is why it has no queue messages.
+        self.assertEqual(self.session.query(PubSubMessage).count(), 2)
+        self.assertListEqual(self.get_queue(), ['sk1:zpsm1'])
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    _ = main()
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+from unittest import main, TestCase
+
+# SQLAlchemy
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Zato
+from zato.common.odb.model import Base, Cluster, PubSubEndpoint, PubSubMessage, PubSubSubCursorAck, PubSubSubscription, \
+     PubSubTopic
+from zato.common.odb.query.cleanup import get_topic_messages_without_subscribers
+from zato.common.odb.query.pubsub.cursor import add_cursor, get_cursor, ModuleCtx
+from zato.common.odb.query.pubsub.delivery import get_sql_messages_by_sub_key
+from zato.common.odb.query.pubsub.queue import acknowledge_delivery, get_messages, get_queue_depth_by_sub_key, \
+     get_queue_depth_by_topic_id_list
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import intlist, strlist, strlistnone
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+now = 1_000_000.0
+expiration_time = now + 3600
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class SubCursorTestCase(TestCase):
+
+    def setUp(self) -> 'None':
+
+        engine = create_engine('sqlite://')
+        Base.metadata.create_all(engine)
+
+        self.session = sessionmaker(bind=engine)()
+
+        self.cluster = Cluster()
+        self.cluster.name = 'test.cluster'
+        self.cluster.odb_type = 'sqlite'
+        self.cluster.lb_host = 'localhost'
+        self.cluster.lb_port = 11223
+        self.cluster.lb_agent_port = 20151
+
+        self.endpoint = PubSubEndpoint()
+        self.endpoint.name = 'test.endpoint'
+        self.endpoint.endpoint_type = 'rest'
+        self.endpoint.role = 'pub-sub'
+        self.endpoint.cluster = self.cluster
+
+        self.topic = PubSubTopic()
+        self.topic.name = '/test'
+        self.topic.is_active = True
+        self.topic.has_gd = True
+        self.topic.is_api_sub_allowed = True
+        self.topic.cluster = self.cluster
+
+        self.session.add_all([self.cluster, self.endpoint, self.topic])
+        self.session.flush()
+
+        self.msg_idx = 0
+
+# ################################################################################################################################
+
+    def tearDown(self) -> 'None':
+        self.session.close()
+
+# ################################################################################################################################
+
+    def subscribe(self, sub_key:'str') -> 'None':
+
+        sub = PubSubSubscription()
+        sub.creation_time = now
+        sub.sub_key = sub_key
+        sub.sub_pattern_matched = 'sub=/*'
+        sub.has_gd = True
+        sub.wrap_one_msg_in_list = True
+        sub.delivery_err_should_block = True
+        sub.topic = self.topic
+        sub.endpoint = self.endpoint
+        sub.cluster = self.cluster
+
+        self.session.add(sub)
+        self.session.flush()
+
+        _ = add_cursor(self.session, self.cluster.id, self.topic.id, sub_key, now)
+        self.session.flush()
+
+# ################################################################################################################################
+
+    def publish(
+        self,
+        count:'int',
+        is_in_sub_queue:'bool'=True,
+        expiration_time:'float'=expiration_time,
+        pub_time:'float'=now - ModuleCtx.Visibility_Horizon - 100,
+    ) -> 'strlist':
+
+        out = []
+
+        for _ in range(count):
+
+            self.msg_idx += 1
+
+            msg = PubSubMessage()
+            msg.pub_msg_id = 'zpsm{}'.format(self.msg_idx)
+            msg.pub_pattern_matched = 'pub=/*'
+            msg.pub_time = pub_time + self.msg_idx
+            msg.expiration_time = expiration_time
+            msg.data = msg.data_prefix = msg.data_prefix_short = 'data{}'.format(self.msg_idx)
+            msg.size = 5
+            msg.is_in_sub_queue = is_in_sub_queue
+            msg.published_by_id = self.endpoint.id
+            msg.topic_id = self.topic.id
+            msg.cluster_id = self.cluster.id
+
+            self.session.add(msg)
+            out.append(msg.pub_msg_id)
+
+        self.session.flush()
+
+        return out
+
+# ################################################################################################################################
+
+    def get_messages(self, sub_key_list:'strlist', cursor_sub_key_list:'strlistnone'=None) -> 'strlist':
+        result = get_sql_messages_by_sub_key(self.session, self.cluster.id, sub_key_list, 0.0, now, set(),
+            cursor_sub_key_list=cursor_sub_key_list)
+        return ['{}:{}'.format(elem.sub_key, elem.pub_msg_id) for elem in result]
+
+# ################################################################################################################################
+
+    def get_acked(self, sub_key:'str') -> 'intlist':
+        result = self.session.query(PubSubSubCursorAck.msg_id).\
+            filter(PubSubSubCursorAck.sub_key==sub_key).\
+            order_by(PubSubSubCursorAck.msg_id).\
+            all()
+        return [elem.msg_id for elem in result]
+
+# ################################################################################################################################
+
+    def test_messages_by_cursor(self) -> 'None':
+
+        self.subscribe('sk1')
+        self.subscribe('sk2')
+
+        msg_id_list = self.publish(3)
+
+        # Each message is stored once but each subscriber receives it ..
+        self.assertEqual(self.session.query(PubSubMessage).count(), 3)
+        self.assertListEqual(sorted(self.get_messages(['sk1', 'sk2'])), [
+            'sk1:zpsm1', 'sk1:zpsm2', 'sk1:zpsm3',
+            'sk2:zpsm1', 'sk2:zpsm2', 'sk2:zpsm3',
+        ])
+
+        # .. until it acknowledges it.
+        acknowledge_delivery(self.session, self.cluster.id, 'sk1', msg_id_list[1:], now)
+
+        self.assertListEqual(self.get_messages(['sk1']), ['sk1:zpsm1'])
+        self.assertEqual(get_queue_depth_by_sub_key(self.session, self.cluster.id, 'sk1', now), 1)
+        self.assertEqual(get_queue_depth_by_sub_key(self.session, self.cluster.id, 'sk2', now), 3)
+
+# ################################################################################################################################
+
+    def test_cursor_position(self) -> 'None':
+
+        self.subscribe('sk1')
+        msg_id_list = self.publish(4)
+
+        # Acknowledgements out of order do not move the cursor ..
+        acknowledge_delivery(self.session, self.cluster.id, 'sk1', msg_id_list[1:3], now)
+
+        cursor = get_cursor(self.session, 'sk1')
+        self.assertEqual(cursor.position, 0)
+        self.assertListEqual(self.get_acked('sk1'), [2, 3])
+
+        # .. until the message before them is acknowledged.
+        acknowledge_delivery(self.session, self.cluster.id, 'sk1', msg_id_list[:1], now)
+
+        cursor = get_cursor(self.session, 'sk1')
+        self.assertEqual(cursor.position, 3)
+        self.assertListEqual(self.get_acked('sk1'), [])
+
+# ################################################################################################################################
+
+    def test_cursor_visibility_horizon(self) -> 'None':
+
+        self.subscribe('sk1')
+
+        msg_id_list = self.publish(1)
+        msg_id_list += self.publish(2, pub_time=now - ModuleCtx.Visibility_Horizon + 10)
+
+        # The second message has not been committed yet so it is not visible ..
+        msg = self.session.query(PubSubMessage).filter(PubSubMessage.pub_msg_id=='zpsm2').one()
+        msg.id = 1000
+        self.session.flush()
+
+        # .. but the third one is and it is acknowledged along with the first one ..
+        acknowledge_delivery(self.session, self.cluster.id, 'sk1', [msg_id_list[0], msg_id_list[2]], now)
+
+        # .. yet the cursor does not move past it because it is too recent ..
+        cursor = get_cursor(self.session, 'sk1')
+        self.assertEqual(cursor.position, 1)
+        self.assertListEqual(self.get_acked('sk1'), [3])
+
+        # .. which is why the second message is still delivered once it is committed ..
+        msg.id = 2
+        self.session.flush()
+
+        self.assertListEqual(self.get_messages(['sk1']), ['sk1:zpsm2'])
+
+        # .. and, once the messages are old enough, the cursor moves past all of them.
+        acknowledge_delivery(self.session, self.cluster.id, 'sk1', msg_id_list[1:2], now + ModuleCtx.Visibility_Horizon)
+
+        cursor = get_cursor(self.session, 'sk1')
+        self.assertEqual(cursor.position, 3)
+        self.assertListEqual(self.get_acked('sk1'), [])
+
+# ################################################################################################################################
+
+    def test_cursor_advances_in_pages(self) -> 'None':
+
+        self.subscribe('sk1')
+        self.subscribe('sk2')
+
+        msg_id_list = self.publish(25)
+
+        # Acknowledging the same messages again changes nothing
+        acknowledge_delivery(self.session, self.cluster.id, 'sk1', msg_id_list[1:], now)
+        acknowledge_delivery(self.session, self.cluster.id, 'sk1', msg_id_list[1:], now)
+
+        self.assertListEqual(self.get_acked('sk1'), list(range(2, 26)))
+        self.assertListEqual(self.get_messages(['sk1', 'sk2'], ['sk1', 'sk2'])[:2], ['sk1:zpsm1', 'sk2:zpsm1'])
+
+        # The cursor moves past many more messages than can be read at a time
+        page_size = ModuleCtx.Advance_Page_Size
+        ModuleCtx.Advance_Page_Size = 4
+
+        try:
+            acknowledge_delivery(self.session, self.cluster.id, 'sk1', msg_id_list[:1], now)
+        finally:
+            ModuleCtx.Advance_Page_Size = page_size
+
+        cursor = get_cursor(self.session, 'sk1')
+        self.assertEqual(cursor.position, 25)
+        self.assertListEqual(self.get_acked('sk1'), [])
+        self.assertListEqual(self.get_messages(['sk1']), [])
+
+# ################################################################################################################################
+
+    def test_queue_depth_by_topic_id_list(self) -> 'None':
+
+        self.subscribe('sk1')
+        self.subscribe('sk2')
+
+        # The depth is computed as of the current time rather than our test one
+        msg_id_list = self.publish(3, expiration_time=9_999_999_999.0)
+
+        acknowledge_delivery(self.session, self.cluster.id, 'sk1', msg_id_list[1:], now)
+
+        # The depth of a topic is the sum of what each of its subscribers still has to receive
+        self.assertListEqual(get_queue_depth_by_topic_id_list(self.session, self.cluster.id, [self.topic.id]),
+            [(self.topic.id, 4)])
+
+# ################################################################################################################################
+
+    def test_cursor_sub_key_list(self) -> 'None':
+
+        self.subscribe('sk1')
+        _ = self.publish(1)
+
+        # Cursors are looked up only for the subscriptions that our caller says may have them
+        self.assertListEqual(self.get_messages(['sk1'], ['sk1']), ['sk1:zpsm1'])
+        self.assertListEqual(self.get_messages(['sk1'], []), [])
+
+# ################################################################################################################################
+
+    def test_cursor_skips_expired(self) -> 'None':
+
+        self.subscribe('sk1')
+
+        msg_id_list = self.publish(1)
+        _ = self.publish(1, expiration_time=now - 1)
+        msg_id_list += self.publish(2)
+
+        acknowledge_delivery(self.session, self.cluster.id, 'sk1', msg_id_list[:2], now)
+
+        # The expired message does not need to be acknowledged
+        cursor = get_cursor(self.session, 'sk1')
+        self.assertEqual(cursor.position, 3)
+        self.assertListEqual(self.get_messages(['sk1']), ['sk1:zpsm4'])
+
+# ################################################################################################################################
+
+    def test_new_subscriber_receives_messages_without_subscribers(self) -> 'None':
+
+        _ = self.publish(1)
+        _ = self.publish(2, is_in_sub_queue=False)
+
+        self.subscribe('sk1')
+
+        self.assertListEqual(self.get_messages(['sk1']), ['sk1:zpsm2', 'sk1:zpsm3'])
+        self.assertEqual(self.session.query(PubSubMessage).filter(~PubSubMessage.is_in_sub_queue).count(), 0)
+
+# ################################################################################################################################
+
+    def test_get_messages(self) -> 'None':
+
+        self.subscribe('sk1')
+        _ = self.publish(3)
+
+        messages = get_messages(self.session, self.cluster.id, 'sk1', 2, now)
+        self.assertEqual(len(messages), 2)
+
+        # Messages pulled are not returned again
+        messages = get_messages(self.session, self.cluster.id, 'sk1', 2, now)
+        self.assertEqual(len(messages), 1)
+
+        messages = get_messages(self.session, self.cluster.id, 'sk1', 2, now)
+        self.assertEqual(len(messages), 0)
+
+# ################################################################################################################################
+
+    def test_cleanup(self) -> 'None':
+
+        self.subscribe('sk1')
+        self.subscribe('sk2')
+
+        msg_id_list = self.publish(3)
+
+        acknowledge_delivery(self.session, self.cluster.id, 'sk1', msg_id_list, now)
+        acknowledge_delivery(self.session, self.cluster.id, 'sk2', msg_id_list[:1], now)
+
+        # Only messages that all the subscribers acknowledged can be deleted
+        result = get_topic_messages_without_subscribers('test', self.session, self.topic.id, self.topic.name, None, now + 1)
+        self.assertListEqual([elem.pub_msg_id for elem in result], ['zpsm1'])
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    _ = main()
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2023, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+import os
+from unittest import main, TestCase
+from uuid import uuid4
+
+# gevent
+from gevent import joinall, sleep, spawn
+
+# Zato
+from zato.common.ipc.unix import UnixIPCClient, UnixIPCConnectError, UnixIPCServer
+from zato.common.util.api import get_new_tmp_full_path
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from bunch import Bunch
+    from zato.common.typing_ import any_
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class UnixIPCTestCase(TestCase):
+
+    def setUp(self) -> 'None':
+
+        self.path = get_new_tmp_full_path(prefix='test-ipc', suffix='sock')
+        self.username = 'test.username'
+        self.password = uuid4().hex
+
+        self.server = UnixIPCServer(self.path, self.username, self.password, self._callback)
+        _ = spawn(self.server.serve_forever)
+
+        # Wait until the socket file exists
+        while not os.path.exists(self.path):
+            sleep(0.01)
+
+    def tearDown(self) -> 'None':
+        self.server.stop()
+
+# ################################################################################################################################
+
+    def _callback(self, msg:'Bunch') -> 'str':
+        if msg.service == 'test.sleep':
+            sleep(msg.data)
+        return '{}.{}'.format(msg.service, msg.data)
+
+# ################################################################################################################################
+
+    def _invoke(self, client:'UnixIPCClient', service:'str', data:'int') -> 'any_':
+        return client.invoke(
+            service,
+            data,
+            cluster_name='test.cluster',
+            server_name='test.server',
+            server_pid=123,
+            timeout=1,
+            source_server_name='test.server',
+            source_server_pid=456,
+        )
+
+# ################################################################################################################################
+
+    def test_invoke(self) -> 'None':
+
+        client = UnixIPCClient(self.path, self.username, self.password)
+
+        response1 = self._invoke(client, 'test.service', 1)
+        response2 = self._invoke(client, 'test.service', 2)
+
+        self.assertTrue(response1.meta.is_ok)
+        self.assertEqual(response1.data, 'test.service.1')
+        self.assertEqual(response1.meta.server_pid, 123)
+        self.assertEqual(response2.data, 'test.service.2')
+
+        # The same connection was used by both invocations
+        self.assertEqual(len(client._idle), 1)
+
+        client.close()
+
+# ################################################################################################################################
+
+    def test_invoke_concurrent(self) -> 'None':
+
+        client = UnixIPCClient(self.path, self.username, self.password)
+
+        greenlets = [spawn(self._invoke, client, 'test.sleep', 0.1) for _ in range(5)]
+        _ = joinall(greenlets, raise_error=True)
+
+        for greenlet in greenlets:
+            self.assertEqual(greenlet.value.data, 'test.sleep.0.1')
+
+        self.assertEqual(len(client._idle), 5)
+
+        client.close()
+
+# ################################################################################################################################
+
+    def test_invalid_credentials(self) -> 'None':
+
+        client = UnixIPCClient(self.path, self.username, 'invalid')
+
+        response = self._invoke(client, 'test.service', 1)
+
+        self.assertFalse(response.meta.is_ok)
+        self.assertIsNone(response.data)
+
+# ################################################################################################################################
+
+    def test_connect_error(self) -> 'None':
+
+        client = UnixIPCClient(self.path + '.missing', self.username, self.password)
+        self.assertRaises(UnixIPCConnectError, self._invoke, client, 'test.service', 1)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    _ = main()
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+import os
+from tempfile import TemporaryDirectory
+from unittest import main, TestCase
+
+# JSON Schema
+from jsonschema import validate as js_validate
+from jsonschema.exceptions import SchemaError, ValidationError as JSValidationError
+
+# Zato
+from zato.common.api import CHANNEL
+from zato.common.json_internal import dumps
+from zato.common.json_schema import ValidationConfig, Validator
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import anydict
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+schema = {
+    '$schema': 'http://json-schema.org/draft-07/schema#',
+    'type': 'object',
+    'properties': {
+        'customer_id': {'type': 'integer'},
+        'name': {'type': 'string', 'maxLength': 5},
+    },
+    'required': ['customer_id'],
+}
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class JSONSchemaValidatorTestCase(TestCase):
+
+    def setUp(self) -> 'None':
+        self.temp_dir = TemporaryDirectory()
+
+    def tearDown(self) -> 'None':
+        self.temp_dir.cleanup()
+
+# ################################################################################################################################
+
+    def get_validator(self, schema:'anydict') -> 'Validator':
+
+        schema_path = os.path.join(self.temp_dir.name, 'schema.json')
+
+        with open(schema_path, 'w') as f:
+            _ = f.write(dumps(schema))
+
+        config = ValidationConfig()
+        config.is_enabled = True
+        config.object_type = CHANNEL.SERVICE
+        config.object_name = 'my.service'
+        config.schema_path = schema_path
+        config.needs_err_details = False
+
+        validator = Validator()
+        validator.config = config
+        validator.init()
+
+        return validator
+
+# ################################################################################################################################
+
+    def test_validate(self) -> 'None':
+
+        validator = self.get_validator(schema)
+        self.assertTrue(validator.is_initialized)
+
+        # The validator is built once, when the schema is loaded, and it is reused each time
+        config_validator = validator.config.validator
+
+        result = validator.validate('abc', {'customer_id': 123, 'name': 'abc'})
+        self.assertTrue(result)
+        self.assertIs(validator.config.validator, config_validator)
+
+        for data in {'name': 'abc'}, {'customer_id': 'abc'}, {'customer_id': 123, 'name': 'abcdef'}, None:
+
+            result = validator.validate('abc', data)
+            self.assertFalse(result)
+            self.assertEqual(result.object_type, CHANNEL.SERVICE)
+
+            # Errors are the same as what jsonschema itself reports
+            with self.assertRaises(JSValidationError) as ctx:
+                js_validate(data, schema)
+
+            self.assertEqual(result.error_msg, str(ctx.exception))
+
+# ################################################################################################################################
+
+    def test_invalid_schema(self) -> 'None':
+
+        # Schemas are checked when they are loaded rather than when requests are validated
+        with self.assertRaises(SchemaError):
+            _ = self.get_validator({'type': 'no-such-type'})
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    _ = main()
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+from datetime import datetime
+from unittest import main, TestCase
+
+# SQLAlchemy
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Zato
+from zato.common.api import RATE_LIMIT
+from zato.common.odb.model import Base, Cluster, RateLimitState
+from zato.common.rate_limiting import RateLimiting
+from zato.common.rate_limiting.common import RateLimitReached
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.rate_limiting.limiter import Leased
+    from zato.common.typing_ import any_
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+object_type = RATE_LIMIT.OBJECT_TYPE.SERVICE
+object_name = 'my.service'
+object_id = 'service.1'
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class LeasedRateLimitingTestCase(TestCase):
+
+    def setUp(self) -> 'None':
+
+        self.engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+        Base.metadata.create_all(self.engine)
+
+        self.session_func = sessionmaker(bind=self.engine)
+
+        session = self.session_func()
+
+        cluster = Cluster()
+        cluster.name = 'test.cluster'
+        cluster.odb_type = 'sqlite'
+        cluster.lb_host = 'localhost'
+        cluster.lb_port = 11223
+        cluster.lb_agent_port = 20151
+
+        session.add(cluster)
+        session.commit()
+
+        self.cluster_id = cluster.id
+        session.close()
+
+        # How many UPDATE statements were executed, i.e. how many times tokens were leased
+        self.len_updates = 0
+
+        @event.listens_for(self.engine, 'before_cursor_execute')
+        def _on_execute(conn, cursor, statement, *args, **kwargs):
+            if statement.startswith('UPDATE'):
+                self.len_updates += 1
+
+# ################################################################################################################################
+
+    def get_limiter(self, rate_limit_type:'str', definition:'str'='* = 100/m', lease_ratio:'float'=0.1) -> 'Leased':
+        """ Returns a limiter the way a single worker process would have it.
+        """
+        api = RateLimiting()
+        api.cluster_id = self.cluster_id
+        api.sql_session_func = self.session_func
+        api.lease_ratio = lease_ratio
+
+        api.create({
+            'id': object_id,
+            'type_': object_type,
+            'name': object_name,
+            'is_active': True,
+            'parent_type': None,
+            'parent_name': None,
+        }, definition, False, rate_limit_type)
+
+        limiter = api.get_config(object_type, object_name) # type: any_
+
+        # Leases are refilled in the same greenlet to make the tests deterministic
+        limiter.spawn_func = lambda func, *args: func(*args)
+
+        return limiter
+
+# ################################################################################################################################
+
+    def check_limit(self, limiter:'Leased', now:'datetime', rate:'int'=100) -> 'bool':
+        try:
+            limiter._check_limit('test.cid', '127.0.0.1', '*', rate, 'm', None, None, None, _utcnow=lambda: now)
+        except RateLimitReached:
+            return False
+        else:
+            return True
+
+# ################################################################################################################################
+
+    def test_limit_is_cluster_wide(self) -> 'None':
+
+        now = datetime(2024, 1, 1, 12, 0, 10)
+
+        # Two worker processes share the same limit ..
+        limiter1 = self.get_limiter(RATE_LIMIT.TYPE.CLUSTER.id)
+        limiter2 = self.get_limiter(RATE_LIMIT.TYPE.CLUSTER.id)
+
+        allowed = 0
+        for _ in range(100):
+            for limiter in (limiter1, limiter2):
+                allowed += self.check_limit(limiter, now)
+
+        # .. which means that together they allowed as many requests as the limit is ..
+        self.assertEqual(allowed, 100)
+
+        # .. but they leased tokens in chunks rather than for each request ..
+        self.assertEqual(self.len_updates, 10)
+
+        # .. and once the limit has been reached, they do not ask for more tokens in the same period ..
+        self.assertFalse(self.check_limit(limiter1, now))
+        self.assertEqual(self.len_updates, 10)
+
+        # .. which they do in the next one.
+        self.assertTrue(self.check_limit(limiter1, datetime(2024, 1, 1, 12, 1, 0)))
+
+# ################################################################################################################################
+
+    def test_sliding_window(self) -> 'None':
+
+        limiter = self.get_limiter(RATE_LIMIT.TYPE.CLUSTER_SLIDING.id)
+
+        # The limit is reached right at the end of a period ..
+        now = datetime(2024, 1, 1, 12, 0, 59)
+        allowed = sum(self.check_limit(limiter, now) for _ in range(200))
+        self.assertEqual(allowed, 100)
+
+        # .. so at the beginning of the next one, the previous period's requests still count, unlike with fixed periods ..
+        now = datetime(2024, 1, 1, 12, 1, 0)
+        self.assertFalse(self.check_limit(limiter, now))
+
+        # .. and once half of the window is in the new period, half of the requests are allowed again.
+        now = datetime(2024, 1, 1, 12, 1, 30)
+        allowed = sum(self.check_limit(limiter, now) for _ in range(200))
+        self.assertEqual(allowed, 50)
+
+# ################################################################################################################################
+
+    def test_cleanup(self) -> 'None':
+
+        limiter = self.get_limiter(RATE_LIMIT.TYPE.CLUSTER.id)
+
+        _ = self.check_limit(limiter, datetime(2020, 1, 1, 12, 0, 0))
+        _ = self.check_limit(limiter, datetime.utcnow())
+
+        limiter.cleanup()
+
+        # Only the current period is left
+        session = self.session_func()
+        periods = [elem.period for elem in session.query(RateLimitState.period).all()]
+        session.close()
+
+        self.assertEqual(len(periods), 1)
+        self.assertEqual(periods[0], limiter._get_current_minute(datetime.utcnow()))
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    _ = main()
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+
+Micro-benchmarks of network matching used by rate limiting. This is not a test module, run it directly:
+
+    $ python bench_network.py
+"""
+
+# stdlib
+from random import randrange, seed
+from time import perf_counter
+
+# netaddr
+from netaddr import IPAddress, IPNetwork
+
+# Zato
+from zato.common.util.network import NetworkMatcher
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+# How many networks to match against in each run
+network_counts = [10, 1_000, 10_000]
+
+# How many look-ups to time in each run
+ops_per_run = 20_000
+
+# Networks of these prefix lengths are generated
+prefix_lens = [16, 20, 24, 28, 32]
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+def _new_networks(network_count:'int') -> 'list':
+    out = []
+    for idx in range(network_count):
+        address = '10.{}.{}.{}'.format(randrange(256), randrange(256), randrange(256))
+        out.append(IPNetwork('{}/{}'.format(address, prefix_lens[idx % len(prefix_lens)])))
+    return out
+
+# ################################################################################################################################
+
+def _new_addresses() -> 'list':
+    return ['10.{}.{}.{}'.format(randrange(256), randrange(256), randrange(256)) for _ in range(ops_per_run)]
+
+# ################################################################################################################################
+
+def _report(name:'str', network_count:'int', elapsed:'float') -> 'None':
+    print('{:<24} networks:{:>7}  ops/s:{:>12,.0f}  us/op:{:>10.3f}'.format(
+        name, network_count, ops_per_run / elapsed, elapsed / ops_per_run * 1_000_000))
+
+# ################################################################################################################################
+
+def bench_linear(network_count:'int') -> 'None':
+    """ This is how definitions were matched before - each network is checked in turn until one matches.
+    """
+    networks = _new_networks(network_count)
+    addresses = _new_addresses()
+
+    start = perf_counter()
+    for address in addresses:
+        address = IPAddress(address)
+        for network in networks:
+            if address in network:
+                break
+    _report('linear (netaddr)', network_count, perf_counter() - start)
+
+# ################################################################################################################################
+
+def bench_matcher(network_count:'int') -> 'None':
+
+    matcher = NetworkMatcher()
+    for network in _new_networks(network_count):
+        matcher.add(network)
+
+    addresses = _new_addresses()
+
+    start = perf_counter()
+    for address in addresses:
+        _ = matcher.get_first(address)
+    _report('NetworkMatcher.get_first', network_count, perf_counter() - start)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+
+    seed(0)
+
+    for network_count in network_counts:
+        bench_linear(network_count)
+        bench_matcher(network_count)
+        print()
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2023, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+from gzip import decompress
+from io import BytesIO
+from unittest import main, TestCase
+
+# Zato
+from zato.common.util.http_ import is_stream_payload, iter_gzip, iter_stream_payload, RequestStream
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import any_
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class _Input(BytesIO):
+    """ Keeps track of the size of each read.
+    """
+    def __init__(self, *args:'any_', **kwargs:'any_') -> 'None':
+        super().__init__(*args, **kwargs)
+        self.read_sizes = []
+
+    def read(self, size:'any_'=-1) -> 'bytes':
+        self.read_sizes.append(size)
+        return super().read(size)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class HTTPStreamTestCase(TestCase):
+
+    def test_request_stream(self) -> 'None':
+
+        wsgi_input = _Input(b'a' * 25 + b'trailing data')
+        stream = RequestStream(wsgi_input, 10, 25)
+
+        chunks = list(stream)
+
+        # The body is read in chunks of up to the buffer size and nothing past the content length is read
+        self.assertListEqual(chunks, [b'a' * 10, b'a' * 10, b'a' * 5])
+        self.assertListEqual(wsgi_input.read_sizes, [10, 10, 5])
+
+# ################################################################################################################################
+
+    def test_request_stream_no_content_length(self) -> 'None':
+
+        stream = RequestStream(_Input(b'abc' * 5), 4)
+
+        self.assertEqual(stream.read(2), b'ab')
+        self.assertEqual(stream.read(), b'c' + b'abc' * 4)
+        self.assertEqual(stream.read(), b'')
+
+# ################################################################################################################################
+
+    def test_is_stream_payload(self) -> 'None':
+
+        def gen() -> 'any_':
+            yield b''
+
+        self.assertTrue(is_stream_payload(gen()))
+        self.assertTrue(is_stream_payload(iter([b''])))
+        self.assertTrue(is_stream_payload(BytesIO()))
+
+        self.assertFalse(is_stream_payload(b''))
+        self.assertFalse(is_stream_payload(''))
+        self.assertFalse(is_stream_payload({}))
+        self.assertFalse(is_stream_payload([]))
+        self.assertFalse(is_stream_payload(None))
+
+# ################################################################################################################################
+
+    def test_iter_stream_payload_file(self) -> 'None':
+
+        payload = BytesIO(b'a' * 25)
+        chunks = list(iter_stream_payload(payload, 10))
+
+        self.assertListEqual(chunks, [b'a' * 10, b'a' * 10, b'a' * 5])
+        self.assertTrue(payload.closed)
+
+# ################################################################################################################################
+
+    def test_iter_stream_payload_generator(self) -> 'None':
+
+        def gen() -> 'any_':
+            for idx in range(10):
+                yield 'abc' if idx % 2 else b'abc'
+
+        chunks = list(iter_stream_payload(gen(), 8))
+
+        # Small chunks are joined until there is at least a buffer's worth of them
+        self.assertListEqual(chunks, [b'abcabcabc', b'abcabcabc', b'abcabcabc', b'abc'])
+
+# ################################################################################################################################
+
+    def test_iter_gzip(self) -> 'None':
+
+        data = [b'abc' * 1000, b'def' * 1000, b'']
+        compressed = b''.join(iter_gzip(iter(data)))
+
+        self.assertEqual(decompress(compressed), b''.join(data))
+        self.assertLess(len(compressed), 100)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    _ = main()
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+from ipaddress import ip_address
+from unittest import main, TestCase
+
+# Zato
+from zato.common.util.network import LRUCache, NetworkMatcher
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class NetworkMatcherTestCase(TestCase):
+
+    def get_matcher(self) -> 'NetworkMatcher':
+
+        matcher = NetworkMatcher()
+        matcher.add('10.0.0.0/8', 'a')
+        matcher.add('10.1.0.0/16', 'b')
+        matcher.add('10.1.2.3', 'c')
+        matcher.add('2001:db8::/32', 'd')
+        matcher.add('192.168.1.77/24', 'e') # Host bits are ignored
+
+        return matcher
+
+# ################################################################################################################################
+
+    def test_get_longest(self) -> 'None':
+
+        matcher = self.get_matcher()
+
+        self.assertEqual(matcher.get_longest('10.2.3.4'), 'a')
+        self.assertEqual(matcher.get_longest('10.1.3.4'), 'b')
+        self.assertEqual(matcher.get_longest('10.1.2.3'), 'c')
+        self.assertEqual(matcher.get_longest('2001:db8::1'), 'd')
+        self.assertEqual(matcher.get_longest(ip_address('192.168.1.1')), 'e')
+
+        self.assertIsNone(matcher.get_longest('11.0.0.1'))
+        self.assertIsNone(matcher.get_longest('2001:db9::1'))
+
+# ################################################################################################################################
+
+    def test_get_first(self) -> 'None':
+
+        matcher = self.get_matcher()
+
+        # The first network added wins, even if a later one is more specific
+        self.assertEqual(matcher.get_first('10.1.2.3'), 'a')
+        self.assertEqual(matcher.get_first('11.0.0.1', 'default'), 'default')
+
+        matcher = NetworkMatcher()
+        matcher.add('10.1.2.3', 'a')
+        matcher.add_any('b')
+        matcher.add('10.0.0.0/8', 'c')
+
+        self.assertEqual(matcher.get_first('10.1.2.3'), 'a')
+        self.assertEqual(matcher.get_first('10.1.2.4'), 'b')
+        self.assertEqual(matcher.get_first('::1'), 'b')
+
+# ################################################################################################################################
+
+    def test_contains(self) -> 'None':
+
+        matcher = self.get_matcher()
+
+        self.assertIn('10.1.2.3', matcher)
+        self.assertIn(ip_address('2001:db8::1'), matcher)
+        self.assertNotIn('127.0.0.1', matcher)
+
+        self.assertEqual(len(matcher), 5)
+        self.assertNotIn('127.0.0.1', NetworkMatcher())
+
+        with self.assertRaises(ValueError):
+            _ = 'abc' in matcher
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class LRUCacheTestCase(TestCase):
+
+    def test_lru(self) -> 'None':
+
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+
+        # Using a key makes it the most recently used one ..
+        self.assertEqual(cache.get('a'), 1)
+
+        # .. which is why the other one is evicted when a new key is added.
+        cache.set('c', 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertIn('a', cache)
+        self.assertIn('c', cache)
+        self.assertIsNone(cache.get('b'))
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    _ = main()
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -9,10 +9,12 @@ Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
 # stdlib
 import inspect
 from base64 import b64decode
+from bisect import bisect_left, insort
 from datetime import datetime
 from decimal import Decimal
 from email.utils import formatdate as stdlib_format_date
 from hashlib import sha256
+from heapq import heapify, heappop, heappush
 from json import dumps as json_dumps, JSONEncoder
 from logging import getLogger
 from sys import getsizeof
@@ -23,11 +25,9 @@ from arrow import Arrow
 
 # Cython
 from cpython.dict cimport PyDict_Contains, PyDict_DelItem, PyDict_GetItem, PyDict_Items, PyDict_Keys, PyDict_SetItem, \
-    PyDict_Values
+    PyDict_Size, PyDict_Values
 from cpython.int cimport PyInt_AS_LONG,  PyInt_FromLong, PyInt_GetMax
-from cpython.list cimport PyList_GET_SIZE, PyList_Insert, PyList_SetSlice
 from cpython.object cimport Py_EQ, PyObject, PyObject_RichCompareBool
-from cpython.sequence cimport PySequence_ITEM
 from libc.stdint cimport uint64_t
 #from posix.time cimport timeval, timezone, gettimeofday
 
@@ -61,6 +61,12 @@ class CACHE:
     DEFAULT_SIZE = _COMMON_CACHE.DEFAULT.MAX_SIZE
     MAX_ITEM_SIZE = _COMMON_CACHE.DEFAULT.MAX_ITEM_SIZE
 
+# How many keys a sublist of _SortedKeys holds after a split
+cdef Py_ssize_t _sorted_keys_load = 512
+
+# Length of substrings that _NgramIndex indexes keys by, shorter ones cannot be looked up in the index
+cdef Py_ssize_t _ngram_size = 3
+
 # ################################################################################################################################
 
 class KeyExpiredError(KeyError):
@@ -108,9 +114,16 @@ cdef class Entry:
         # How many times was this key returned
         public uint64_t hits
 
-        # This entry's position in index
+        # This entry's position in index - only computed if details are requested
         public long position
 
+        # Neighbours in the cache's recency list, from the most to the least recently used one
+        Entry _prev
+        Entry _next
+
+        # The deadline under which this entry is currently found in the cache's expiry heap, 0.0 if it is not in the heap
+        double _scheduled_at
+
         # Hashed in SHA256
         public str hash
 
@@ -196,9 +209,172 @@ cdef class Entry:
 
 # ################################################################################################################################
 
+cdef class _SortedKeys:
+    """ String keys kept sorted in a list of sorted sublists, each of up to twice _sorted_keys_load elements,
+    so that keys starting with a given prefix can be found with a binary search and adding or removing a key
+    does not need to move more than a sublist's worth of elements.
+    """
+    cdef:
+        list _lists # Sorted sublists, each of them holding keys that are not smaller than those from the previous one
+        list _maxes # The biggest key of each sublist
+
+    def __cinit__(self):
+        self._lists = []
+        self._maxes = []
+
+    cdef void add(self, object key):
+        cdef list sublist
+        cdef Py_ssize_t pos
+
+        if not self._maxes:
+            self._lists.append([key])
+            self._maxes.append(key)
+            return
+
+        pos = bisect_left(self._maxes, key)
+
+        # The key is bigger than any other so it goes to the end of the last sublist ..
+        if pos == len(self._maxes):
+            pos -= 1
+            sublist = self._lists[pos]
+            sublist.append(key)
+            self._maxes[pos] = key
+
+        # .. otherwise, it belongs somewhere in the middle of the sublist found.
+        else:
+            sublist = self._lists[pos]
+            insort(sublist, key)
+
+        # Split sublists that have grown too big
+        if len(sublist) > _sorted_keys_load * 2:
+            self._lists.insert(pos + 1, sublist[_sorted_keys_load:])
+            del sublist[_sorted_keys_load:]
+            self._maxes.insert(pos, sublist[-1])
+
+    cdef void discard(self, object key):
+        cdef list sublist
+        cdef Py_ssize_t pos
+        cdef Py_ssize_t idx
+
+        pos = bisect_left(self._maxes, key)
+        if pos == len(self._maxes):
+            return
+
+        sublist = self._lists[pos]
+        idx = bisect_left(sublist, key)
+
+        if idx < len(sublist) and sublist[idx] == key:
+            del sublist[idx]
+
+            if sublist:
+                self._maxes[pos] = sublist[-1]
+            else:
+                del self._lists[pos]
+                del self._maxes[pos]
+
+    cdef list find_prefix(self, object prefix, int limit):
+        """ Returns keys starting with prefix, up to limit keys if limit is given.
+        """
+        cdef list out = []
+        cdef list sublist
+        cdef Py_ssize_t pos
+        cdef Py_ssize_t idx
+        cdef Py_ssize_t len_lists = len(self._lists)
+        cdef object key
+
+        pos = bisect_left(self._maxes, prefix)
+
+        while pos < len_lists:
+            sublist = self._lists[pos]
+            idx = bisect_left(sublist, prefix)
+
+            for key in sublist[idx:] if idx else sublist:
+                if not key.startswith(prefix):
+                    return out
+                out.append(key)
+                if len(out) == limit:
+                    return out
+
+            pos += 1
+
+        return out
+
+# ################################################################################################################################
+
+cdef class _NgramIndex:
+    """ Maps each n-gram of string keys to all the keys containing it so that keys containing a given string
+    can be looked up by intersecting sets of keys containing each of the string's n-grams.
+    """
+    cdef:
+        dict _keys_by_gram
+
+    def __cinit__(self):
+        self._keys_by_gram = {}
+
+    cdef set _get_grams(self, object value):
+        cdef Py_ssize_t idx
+        return {value[idx:idx+_ngram_size] for idx in range(len(value) - _ngram_size + 1)}
+
+    cdef void add(self, object key):
+        cdef set keys
+
+        for gram in self._get_grams(key):
+            keys = self._keys_by_gram.get(gram)
+            if keys is None:
+                self._keys_by_gram[gram] = {key}
+            else:
+                keys.add(key)
+
+    cdef void discard(self, object key):
+        cdef set keys
+
+        for gram in self._get_grams(key):
+            keys = self._keys_by_gram.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_gram[gram]
+
+    cdef set get_candidates(self, object value):
+        """ Returns keys that contain all the n-grams of value - these are the only keys that may contain the value itself
+        but each of them still needs to be checked. Value must be at least _ngram_size long.
+        """
+        cdef list found = []
+        cdef set keys
+        cdef set out
+
+        for gram in self._get_grams(value):
+            keys = self._keys_by_gram.get(gram)
+            if not keys:
+                return set()
+            found.append(keys)
+
+        found.sort(key=len)
+        out = set(found[0])
+
+        for keys in found[1:]:
+            out &= keys
+            if not out:
+                break
+
+        return out
+
+# ################################################################################################################################
+
 cdef class Cache:
     """ An LRU cache that optionally rejects entries bigger than N bytes. Entries can have a TTL assigned - periodic processes
-    will clean up entries older than allowed.
+    will clean up entries older than allowed. Recency is kept in a doubly linked list over Entry objects, which means that
+    get/set/delete operations do not depend on the number of keys in the cache. Positions of keys require walking that list
+    so they are computed only if details are requested, and statistics of hits per position only if track_positions is True.
+
+    Entries with a TTL are additionally kept in a min-heap ordered by their expiration time so that periodic cleanup
+    only needs to look at keys that are actually due to expire. Heap items are invalidated lazily - if an entry's expiration
+    is extended, the existing item is kept and the entry is rescheduled only when that item reaches the top of the heap.
+
+    String keys can be optionally indexed so that methods looking up keys by their prefixes, suffixes or substrings
+    do not need to check each key in the cache - prefixes and suffixes are looked up in sorted lists of keys and reversed keys
+    whereas substrings of at least three characters in an index of keys by their n-grams. If an index is used,
+    the limit given to such methods is the maximum number of keys matched rather than the number of keys checked.
     """
     cdef:
         public long max_size
@@ -206,34 +382,60 @@ cdef class Cache:
         public bint has_max_item_size
         public bint extend_expiry_on_get
         public bint extend_expiry_on_set
+        public bint track_positions
         public dict _data
-        public list _index
+        Entry _head # Most recently used entry
+        Entry _tail # Least recently used entry
         public uint64_t misses
         public uint64_t hits
         public uint64_t set_ops
         public uint64_t get_ops
         public dict hits_per_position # How many times a given position in cache was used
         public list _expired_on_op    # Keys that were found to have expired during a .get or .set operation
+        public list _expiry_heap      # (expires_at, seq, key) items ordered by expires_at
+        public uint64_t _expiry_seq   # Tie-breaker for heap items with the same expires_at
+        public uint64_t sweeps              # How many times delete_expired ran
+        public uint64_t expired_total       # How many keys were deleted by delete_expired in total
+        public long last_sweep_expired      # How many keys were deleted by the most recent delete_expired call
+        public double last_sweep_duration   # How long in seconds it took the most recent delete_expired call to run
         public object _lock
         public object default_get # A singleton indicating that no default value was given for self.get
         public dict _regex_cache
+        _SortedKeys _prefix_index   # All string keys, sorted, if prefixes are indexed
+        _SortedKeys _suffix_index   # All string keys, reversed and sorted, if suffixes are indexed
+        _NgramIndex _contains_index # String keys by their n-grams if substrings are indexed
+        bint _has_key_index         # Whether there is any index at all
 
     def __cinit__(self):
         self._data = {}
-        self._index = []
+        self._head = None
+        self._tail = None
         self.hits_per_position = {}
         self._expired_on_op = []
+        self._expiry_heap = []
+        self._expiry_seq = 0
+        self.sweeps = 0
+        self.expired_total = 0
+        self.last_sweep_expired = 0
+        self.last_sweep_duration = 0.0
         self.hits = 0
         self.misses = 0
         self.set_ops = 0
         self.get_ops = 0
         self._regex_cache = {}
+        self._prefix_index = None
+        self._suffix_index = None
+        self._contains_index = None
+        self._has_key_index = False
 
-    def __init__(self, max_size=None, max_item_size=None, extend_expiry_on_get=True, extend_expiry_on_set=True, lock=None):
+    def __init__(self, max_size=None, max_item_size=None, extend_expiry_on_get=True, extend_expiry_on_set=True, lock=None,
+        track_positions=False, index_prefix=False, index_suffix=False, index_contains=False):
         self._lock = lock or RLock()
         self.default_get = object()
+        self.track_positions = track_positions
         with self._lock:
             self._update_config(max_size, max_item_size, extend_expiry_on_get, extend_expiry_on_set)
+            self.set_key_indexes(index_prefix, index_suffix, index_contains)
 
     def _update_config(self, max_size, max_item_size, extend_expiry_on_get, extend_expiry_on_set):
         self.max_size = max_size or CACHE.DEFAULT_SIZE
@@ -241,11 +443,46 @@ cdef class Cache:
         self.has_max_item_size = self.max_item_size > 0
         self.extend_expiry_on_get = extend_expiry_on_get
         self.extend_expiry_on_set = extend_expiry_on_set
-        self.hits_per_position.update(dict((key, 0) for key in xrange(self.max_size)))
+        if self.track_positions:
+            self.hits_per_position.update(dict((key, 0) for key in xrange(self.max_size)))
+        else:
+            self.hits_per_position.clear()
 
     def update_config(self, config):
         with self._lock:
+            self.track_positions = config.get('track_positions', False)
             self._update_config(config.max_size, config.max_item_size, config.extend_expiry_on_get, config.extend_expiry_on_set)
+            self.set_key_indexes(config.get('index_prefix', False), config.get('index_suffix', False),
+                config.get('index_contains', False))
+
+    cpdef set_key_indexes(self, bint prefix, bint suffix, bint contains):
+        """ Enables or disables indexes of string keys, building the enabled ones out of keys that are already in the cache.
+        """
+        cdef object key
+
+        with self._lock:
+            if prefix != (self._prefix_index is not None):
+                self._prefix_index = _SortedKeys() if prefix else None
+                if prefix:
+                    for key in self._data:
+                        if isinstance(key, str_types):
+                            self._prefix_index.add(key)
+
+            if suffix != (self._suffix_index is not None):
+                self._suffix_index = _SortedKeys() if suffix else None
+                if suffix:
+                    for key in self._data:
+                        if isinstance(key, str_types):
+                            self._suffix_index.add(key[::-1])
+
+            if contains != (self._contains_index is not None):
+                self._contains_index = _NgramIndex() if contains else None
+                if contains:
+                    for key in self._data:
+                        if isinstance(key, str_types):
+                            self._contains_index.add(key)
+
+            self._has_key_index = prefix or suffix or contains
 
 # ################################################################################################################################
 
@@ -274,7 +511,7 @@ cdef class Cache:
 
     def __len__(self):
         with self._lock:
-            return PyList_GET_SIZE(self._index)
+            return PyDict_Size(self._data)
 
 # ################################################################################################################################
 
@@ -291,8 +528,18 @@ cdef class Cache:
 # ################################################################################################################################
 
     cpdef list keys_by_position(self):
+        """ Returns all keys, from the most to the least recently used one. Note that this walks the whole recency list.
+        """
+        cdef list out = []
+        cdef Entry entry
+
         with self._lock:
-            return list(self._index)
+            entry = self._head
+            while entry is not None:
+                out.append(entry.key)
+                entry = entry._next
+
+        return out
 
 # ################################################################################################################################
 
@@ -322,10 +569,11 @@ cdef class Cache:
 
     def get_slice(self, start, stop, step):
         with self._lock:
-            for key in self._index[start:stop:step]:
-                entry = self._data[key]
+            keys = self.keys_by_position()
+            for position in range(len(keys))[start:stop:step]:
+                entry = self._data[keys[position]]
                 as_dict = entry.to_dict()
-                as_dict['position'] = self._get_index(key)
+                as_dict['position'] = position
                 yield as_dict
 
 # ################################################################################################################################
@@ -333,12 +581,36 @@ cdef class Cache:
     cpdef list clear(self):
         """ Clears the cache - removes all entries and associated metadata.
         """
+        cdef Entry entry
+        cdef Entry next_entry
+
         # The attributes cleared below must be kept in sync with the ones from __cinit__.
         with self._lock:
+
+            # Break the links between entries so that they can be released without waiting for the cyclic garbage collector
+            entry = self._head
+            while entry is not None:
+                next_entry = entry._next
+                entry._prev = None
+                entry._next = None
+                entry = next_entry
+
+            self._head = None
+            self._tail = None
             self._data.clear()
-            self._index[:] = []
+
+            if self._has_key_index:
+                self._prefix_index = _SortedKeys() if self._prefix_index is not None else None
+                self._suffix_index = _SortedKeys() if self._suffix_index is not None else None
+                self._contains_index = _NgramIndex() if self._contains_index is not None else None
             self.hits_per_position.clear()
             self._expired_on_op[:] = []
+            self._expiry_heap[:] = []
+            self._expiry_seq = 0
+            self.sweeps = 0
+            self.expired_total = 0
+            self.last_sweep_expired = 0
+            self.last_sweep_duration = 0.0
             self.hits = 0
             self.misses = 0
             self.set_ops = 0
@@ -354,10 +626,13 @@ cdef class Cache:
             return
         else:
             # We run under self.lock so at this point we know that the key was valid
-            # and _remove_from_index_by_idx is safe to call.
+            # and the entry is safe to unlink.
             out = entry.value
             del self._data[key]
-            self._remove_from_index_by_idx(self._get_index(key))
+            self._unlink(entry)
+
+            if self._has_key_index:
+                self._unindex_key(key)
 
             return out
 
@@ -369,6 +644,180 @@ cdef class Cache:
 
     __del__ = delete
 
+# ################################################################################################################################
+
+    cdef void _index_key(self, object key):
+        if not isinstance(key, str_types):
+            return
+
+        if self._prefix_index is not None:
+            self._prefix_index.add(key)
+
+        if self._suffix_index is not None:
+            self._suffix_index.add(key[::-1])
+
+        if self._contains_index is not None:
+            self._contains_index.add(key)
+
+# ################################################################################################################################
+
+    cdef void _unindex_key(self, object key):
+        if not isinstance(key, str_types):
+            return
+
+        if self._prefix_index is not None:
+            self._prefix_index.discard(key)
+
+        if self._suffix_index is not None:
+            self._suffix_index.discard(key[::-1])
+
+        if self._contains_index is not None:
+            self._contains_index.discard(key)
+
+# ################################################################################################################################
+
+    cdef list _limit_keys(self, object keys, int limit):
+        cdef list out = list(keys)
+        return out[:limit] if limit > 0 else out
+
+# ################################################################################################################################
+
+    cdef list _keys_by_prefix(self, object data, int limit):
+        """ Returns string keys starting with data. Must be called with self._lock held, as all the other _keys_* methods.
+        """
+        cdef list out = []
+
+        if self._prefix_index is not None:
+            return self._prefix_index.find_prefix(data, limit)
+
+        for idx, key in enumerate(self._data, 1):
+            if isinstance(key, str_types) and key.startswith(data):
+                out.append(key)
+            if idx == limit:
+                break
+
+        return out
+
+# ################################################################################################################################
+
+    cdef list _keys_by_suffix(self, object data, int limit):
+        cdef list out = []
+
+        if self._suffix_index is not None:
+            return [key[::-1] for key in self._suffix_index.find_prefix(data[::-1], limit)]
+
+        for idx, key in enumerate(self._data, 1):
+            if isinstance(key, str_types) and key.endswith(data):
+                out.append(key)
+            if idx == limit:
+                break
+
+        return out
+
+# ################################################################################################################################
+
+    cdef list _keys_by_regex(self, object data, int limit):
+        cdef list out = []
+        cdef object regex = self._regex_cache.setdefault(data, re_compile(data))
+
+        for idx, key in enumerate(self._data, 1):
+            if isinstance(key, str_types) and regex.match(key):
+                out.append(key)
+            if idx == limit:
+                break
+
+        return out
+
+# ################################################################################################################################
+
+    cdef list _keys_contains(self, object data, int limit):
+        cdef list out = []
+
+        if self._contains_index is not None and len(data) >= _ngram_size:
+            return self._limit_keys([key for key in self._contains_index.get_candidates(data) if data in key], limit)
+
+        for idx, key in enumerate(self._data, 1):
+            if isinstance(key, str_types) and data in key:
+                out.append(key)
+            if idx == limit:
+                break
+
+        return out
+
+# ################################################################################################################################
+
+    cdef list _keys_not_contains(self, object data, int limit):
+        cdef list out = []
+
+        for idx, key in enumerate(self._data, 1):
+            if isinstance(key, str_types) and data not in key:
+                out.append(key)
+            if idx == limit:
+                break
+
+        return out
+
+# ################################################################################################################################
+
+    cdef list _keys_contains_all(self, object data, int limit):
+        cdef list out = []
+        cdef set candidates = None
+        cdef bint use_key
+
+        # Any element long enough to be looked up in the index narrows down the keys that can contain all of them
+        if self._contains_index is not None:
+            for elem in data:
+                if len(elem) >= _ngram_size:
+                    if candidates is None:
+                        candidates = self._contains_index.get_candidates(elem)
+                    else:
+                        candidates &= self._contains_index.get_candidates(elem)
+
+            if candidates is not None:
+                return self._limit_keys([key for key in candidates if all(elem in key for elem in data)], limit)
+
+        for idx, key in enumerate(self._data, 1):
+            if isinstance(key, str_types):
+                use_key = True
+                for elem in data:
+                    if elem not in key:
+                        use_key = False
+                        break
+                if use_key:
+                    out.append(key)
+            if idx == limit:
+                break
+
+        return out
+
+# ################################################################################################################################
+
+    cdef list _keys_contains_any(self, object data, int limit):
+        cdef list out = []
+        cdef set candidates
+        cdef bint use_key
+
+        # The index can be used only if each of the elements can be looked up in it
+        if self._contains_index is not None and all(len(elem) >= _ngram_size for elem in data):
+            candidates = set()
+            for elem in data:
+                candidates |= self._contains_index.get_candidates(elem)
+            return self._limit_keys([key for key in candidates if any(elem in key for elem in data)], limit)
+
+        for idx, key in enumerate(self._data, 1):
+            if isinstance(key, str_types):
+                use_key = False
+                for elem in data:
+                    if elem in key:
+                        use_key = True
+                        break
+                if use_key:
+                    out.append(key)
+            if idx == limit:
+                break
+
+        return out
+
 # ################################################################################################################################
 
     cpdef dict delete_by_prefix(self, object data, bint return_found, int limit):
@@ -378,24 +827,12 @@ cdef class Cache:
         """
         cdef object key
         cdef dict out = {}
-        cdef object value = None
-        cdef list to_delete = []
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-                if not isinstance(key, str_types):
-                    continue
-                if key.startswith(data):
-                    if return_found:
-                        out[key] = <Entry>self._data[key].value
-                    to_delete.append(key)
-                if idx == limit:
-                    break
-
-        # We could not do in the loop above because that would have changed self._data
-        # and result in 'RuntimeError: dictionary changed size during iteration'.
-        for key in to_delete:
-            self._delete(key)
+            for key in self._keys_by_prefix(data, limit):
+                if return_found:
+                    out[key] = (<Entry>self._data[key]).value
+                self._delete(key)
 
         return out
 
@@ -408,24 +845,12 @@ cdef class Cache:
         """
         cdef object key
         cdef dict out = {}
-        cdef object value = None
-        cdef list to_delete = []
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-                if not isinstance(key, str_types):
-                    continue
-                if key.endswith(data):
-                    if return_found:
-                        out[key] = <Entry>self._data[key].value
-                    to_delete.append(key)
-                if idx == limit:
-                    break
-
-        # We could not do in the loop above because that would have changed self._data
-        # and result in 'RuntimeError: dictionary changed size during iteration'.
-        for key in to_delete:
-            self._delete(key)
+            for key in self._keys_by_suffix(data, limit):
+                if return_found:
+                    out[key] = (<Entry>self._data[key]).value
+                self._delete(key)
 
         return out
 
@@ -436,27 +861,14 @@ cdef class Cache:
         that matched the input criteria along with their previous values.
         Similarly to other self.get/set/expire/delete methods, it's a separate one to reduce code branching/CPU mispredictions.
         """
-        cdef object regex = self._regex_cache.setdefault(data, re_compile(data))
         cdef object key
         cdef dict out = {}
-        cdef object value = None
-        cdef list to_delete = []
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-                if not isinstance(key, str_types):
-                    continue
-                if regex.match(key):
-                    if return_found:
-                        out[key] = <Entry>self._data[key].value
-                    to_delete.append(key)
-                if idx == limit:
-                    break
-
-        # We could not do in the loop above because that would have changed self._data
-        # and result in 'RuntimeError: dictionary changed size during iteration'.
-        for key in to_delete:
-            self._delete(key)
+            for key in self._keys_by_regex(data, limit):
+                if return_found:
+                    out[key] = (<Entry>self._data[key]).value
+                self._delete(key)
 
         return out
 
@@ -469,24 +881,12 @@ cdef class Cache:
         """
         cdef object key
         cdef dict out = {}
-        cdef object value = None
-        cdef list to_delete = []
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-                if not isinstance(key, str_types):
-                    continue
-                if data in key:
-                    if return_found:
-                        out[key] = <Entry>self._data[key].value
-                    to_delete.append(key)
-                if idx == limit:
-                    break
-
-        # We could not do in the loop above because that would have changed self._data
-        # and result in 'RuntimeError: dictionary changed size during iteration'.
-        for key in to_delete:
-            self._delete(key)
+            for key in self._keys_contains(data, limit):
+                if return_found:
+                    out[key] = (<Entry>self._data[key]).value
+                self._delete(key)
 
         return out
 
@@ -499,24 +899,12 @@ cdef class Cache:
         """
         cdef object key
         cdef dict out = {}
-        cdef object value = None
-        cdef list to_delete = []
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-                if not isinstance(key, str_types):
-                    continue
-                if data not in key:
-                    if return_found:
-                        out[key] = <Entry>self._data[key].value
-                    to_delete.append(key)
-                if idx == limit:
-                    break
-
-        # We could not do in the loop above because that would have changed self._data
-        # and result in 'RuntimeError: dictionary changed size during iteration'.
-        for key in to_delete:
-            self._delete(key)
+            for key in self._keys_not_contains(data, limit):
+                if return_found:
+                    out[key] = (<Entry>self._data[key]).value
+                self._delete(key)
 
         return out
 
@@ -529,33 +917,12 @@ cdef class Cache:
         """
         cdef object key
         cdef dict out = {}
-        cdef object value = None
-        cdef list to_delete = []
-        cdef bint add_key
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-                if not isinstance(key, str_types):
-                    continue
-
-                use_key = True
-                for elem in data:
-                    if elem not in key:
-                        use_key = False
-                        break
-
-                if use_key:
-                    if return_found:
-                        out[key] = <Entry>self._data[key].value
-                    to_delete.append(key)
-
-                if idx == limit:
-                    break
-
-        # We could not do in the loop above because that would have changed self._data
-        # and result in 'RuntimeError: dictionary changed size during iteration'.
-        for key in to_delete:
-            self._delete(key)
+            for key in self._keys_contains_all(data, limit):
+                if return_found:
+                    out[key] = (<Entry>self._data[key]).value
+                self._delete(key)
 
         return out
 
@@ -569,50 +936,32 @@ cdef class Cache:
         """
         cdef object key
         cdef dict out = {}
-        cdef object value = None
-        cdef list to_delete = []
-        cdef bint use_key
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-                if not isinstance(key, str_types):
-                    continue
-
-                use_key = False
-                for elem in data:
-                    if elem in key:
-                        use_key = True
-                        break
-
-                if use_key:
-                    if return_found:
-                        out[key] = <Entry>self._data[key].value
-                    to_delete.append(key)
-
-                if idx == limit:
-                    break
-
-        # We could not do in the loop above because that would have changed self._data
-        # and result in 'RuntimeError: dictionary changed size during iteration'.
-        for key in to_delete:
-            self._delete(key)
+            for key in self._keys_contains_any(data, limit):
+                if return_found:
+                    out[key] = (<Entry>self._data[key]).value
+                self._delete(key)
 
         return out
 
 # ################################################################################################################################
 
     cdef inline long _get_index(self, object key):
-        """ C-only version of self.get_position that will always return a long - must be called only
-        if key is known to be in self._index or self._data and only with self._lock held.
+        """ C-only version of self.index that will always return a long - must be called only
+        if key is known to be in self._data and only with self._lock held. Walks the recency list
+        from its head so it is meant for statistics and details rather than for regular operations.
         """
-        cdef Py_ssize_t index_idx = 0
-        cdef Py_ssize_t cache_size = PyList_GET_SIZE(self._index)
-        cdef bint index_key_eq
+        cdef long index_idx = 0
+        cdef Entry entry = self._head
 
-        while index_idx < cache_size:
-            if PyObject_RichCompareBool(PySequence_ITEM(self._index, index_idx), <object>key, Py_EQ):
+        while entry is not None:
+            if PyObject_RichCompareBool(entry.key, <object>key, Py_EQ):
                 return index_idx
             index_idx += 1
+            entry = entry._next
+
+        return -1
 
 # ################################################################################################################################
 
@@ -625,14 +974,78 @@ cdef class Cache:
 
 # ################################################################################################################################
 
-    cdef inline object _remove_from_index_by_idx(self, long idx):
-        """ Remove object from from index by its position - this is what listremove in Objects/listobject.c does
-        and we use the same technique because there is no public PyList_Remove function. Returns the removed key.
+    cdef inline void _link_head(self, Entry entry):
+        """ Adds an entry at the head of the recency list. Must be called with self._lock held.
         """
-        cdef object index_key = PySequence_ITEM(self._index, idx)
-        PyList_SetSlice(self._index, idx, idx+1, <object>NULL)
+        entry._prev = None
+        entry._next = self._head
+
+        if self._head is None:
+            self._tail = entry
+        else:
+            self._head._prev = entry
+
+        self._head = entry
+
+# ################################################################################################################################
+
+    cdef inline void _unlink(self, Entry entry):
+        """ Removes an entry from the recency list, wherever it currently is. Must be called with self._lock held.
+        """
+        if entry._prev is None:
+            self._head = entry._next
+        else:
+            entry._prev._next = entry._next
+
+        if entry._next is None:
+            self._tail = entry._prev
+        else:
+            entry._next._prev = entry._prev
+
+        entry._prev = None
+        entry._next = None
+
+# ################################################################################################################################
+
+    cdef inline void _move_to_head(self, Entry entry):
+        """ Marks an entry as the most recently used one. Must be called with self._lock held.
+        """
+        if entry is not self._head:
+            self._unlink(entry)
+            self._link_head(entry)
+
+# ################################################################################################################################
+
+    cdef inline _schedule_expiry(self, Entry entry):
+        """ Adds an entry to the expiry heap unless it is already there under a deadline that is not later than its current one.
+        Entries whose expiration was extended or reset keep their old heap items, these are sorted out in delete_expired.
+        Must be called with self._lock held.
+        """
+        if entry.expires_at:
+            if (not entry._scheduled_at) or entry.expires_at < entry._scheduled_at:
+                self._expiry_seq += 1
+                entry._scheduled_at = entry.expires_at
+                heappush(self._expiry_heap, (entry.expires_at, self._expiry_seq, entry.key))
+
+# ################################################################################################################################
+
+    cdef _rebuild_expiry_heap(self):
+        """ Rebuilds the expiry heap from scratch, dropping all the items that no longer point to current entries.
+        Must be called with self._lock held.
+        """
+        cdef list heap = []
+        cdef Entry entry
+
+        for entry in PyDict_Values(self._data):
+            if entry.expires_at:
+                self._expiry_seq += 1
+                entry._scheduled_at = entry.expires_at
+                heap.append((entry.expires_at, self._expiry_seq, entry.key))
+            else:
+                entry._scheduled_at = 0.0
 
-        return index_key
+        heapify(heap)
+        self._expiry_heap = heap
 
 # ################################################################################################################################
 
@@ -653,10 +1066,7 @@ cdef class Cache:
         cdef Entry entry
         cdef double _now
         cdef double _orig_now = 0.0
-        cdef Py_ssize_t cache_size = PyList_GET_SIZE(self._index)
-        cdef Py_ssize_t index_idx
-        cdef bint old_key_eq
-        cdef long hits_per_position
+        cdef Entry lru_entry
         cdef long len_value
 
         # If multiple processes synchronize contents of their caches, the one that originally added the keys
@@ -716,8 +1126,13 @@ cdef class Cache:
         else:
 
             # Make sure there is room for the new key
-            if cache_size == self.max_size:
-                PyDict_DelItem(self._data, self._index.pop())
+            if PyDict_Size(self._data) >= self.max_size:
+                lru_entry = self._tail
+                PyDict_DelItem(self._data, lru_entry.key)
+                self._unlink(lru_entry)
+
+                if self._has_key_index:
+                    self._unindex_key(lru_entry.key)
 
             # Actually insert entry
             entry = Entry()
@@ -733,7 +1148,13 @@ cdef class Cache:
             entry.set_metadata()
 
             PyDict_SetItem(self._data, key, entry)
-            PyList_Insert(self._index, 0, key)
+            self._link_head(entry)
+
+            if self._has_key_index:
+                self._index_key(key)
+
+        # Make sure the entry will be found by delete_expired if it needs to
+        self._schedule_expiry(entry)
 
         # If any output dict for metadata was passed in by reference, set its requires items.
         if meta_ref is not None:
@@ -758,33 +1179,28 @@ cdef class Cache:
         """
         cdef dict out = {}
         cdef Entry entry
-        cdef bint _needs_any_found_report = True if meta_ref else False
+        cdef list keys
         cdef double _now = orig_now if orig_now else self._get_timestamp()
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-                if not isinstance(key, str_types):
-                    continue
-                if key.startswith(data):
-
-                    # Set it before the update which would overwrite it, this is why we can return
-                    # value alone, without any metadata.
-                    if return_found:
-                        entry = <Entry>self._data[key]
-                        out[key] = entry if details else entry.value
+            keys = self._keys_by_prefix(data, limit)
 
-                    self._set(key, value, expiry, False, None, _now)
+            for key in keys:
 
-                    # Indicate to our caller that there was at least one matching key
-                    if _needs_any_found_report:
-                        meta_ref['_any_found'] = True
-                        _needs_any_found_report = False
+                # Set it before the update which would overwrite it, this is why we can return
+                # value alone, without any metadata.
+                if return_found:
+                    entry = <Entry>self._data[key]
+                    out[key] = entry if details else entry.value
 
-                # Our caller knows how many keys to look up at most
-                if idx == limit:
-                    break
+                self._set(key, value, expiry, False, None, _now)
 
         if meta_ref:
+
+            # Indicate to our caller that there was at least one matching key
+            if keys:
+                meta_ref['_any_found'] = True
+
             meta_ref['_now'] = _now
 
         return out
@@ -799,35 +1215,28 @@ cdef class Cache:
         """
         cdef dict out = {}
         cdef Entry entry
-        cdef bint _needs_any_found_report = True if meta_ref else False
+        cdef list keys
         cdef double _now = orig_now if orig_now else self._get_timestamp()
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
+            keys = self._keys_by_suffix(data, limit)
 
-                if not isinstance(key, str_types):
-                    continue
+            for key in keys:
 
-                if key.endswith(data):
+                # Set it before the update which would overwrite it, this is why we can return
+                # value alone, without any metadata.
+                if return_found:
+                    entry = <Entry>self._data[key]
+                    out[key] = entry if details else entry.value
 
-                    # Set it before the update which would overwrite it, this is why we can return
-                    # value alone, without any metadata.
-                    if return_found:
-                        entry = <Entry>self._data[key]
-                        out[key] = entry if details else entry.value
+                self._set(key, value, expiry, False, None, _now)
 
-                    self._set(key, value, expiry, False, None, _now)
-
-                    # Indicate to our caller that there was at least one matching key
-                    if _needs_any_found_report:
-                        meta_ref['_any_found'] = True
-                        _needs_any_found_report = False
+        if meta_ref:
 
-                # Our caller knows how many keys to look up at most
-                if idx == limit:
-                    break
+            # Indicate to our caller that there was at least one matching key
+            if keys:
+                meta_ref['_any_found'] = True
 
-        if meta_ref:
             meta_ref['_now'] = _now
 
         return out
@@ -842,36 +1251,28 @@ cdef class Cache:
         """
         cdef dict out = {}
         cdef Entry entry
-        cdef object regex = self._regex_cache.setdefault(data, re_compile(data))
-        cdef bint _needs_any_found_report = True if meta_ref else False
+        cdef list keys
         cdef double _now = orig_now if orig_now else self._get_timestamp()
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-
-                if not isinstance(key, str_types):
-                    continue
+            keys = self._keys_by_regex(data, limit)
 
-                if regex.match(key):
+            for key in keys:
 
-                    # Set it before the update which would overwrite it, this is why we can return
-                    # value alone, without any metadata.
-                    if return_found:
-                        entry = <Entry>self._data[key]
-                        out[key] = entry if details else entry.value
+                # Set it before the update which would overwrite it, this is why we can return
+                # value alone, without any metadata.
+                if return_found:
+                    entry = <Entry>self._data[key]
+                    out[key] = entry if details else entry.value
 
-                    self._set(key, value, expiry, False, None, _now)
+                self._set(key, value, expiry, False, None, _now)
 
-                    # Indicate to our caller that there was at least one matching key
-                    if _needs_any_found_report:
-                        meta_ref['_any_found'] = True
-                        _needs_any_found_report = False
+        if meta_ref:
 
-                # Our caller knows how many keys to look up at most
-                if idx == limit:
-                    break
+            # Indicate to our caller that there was at least one matching key
+            if keys:
+                meta_ref['_any_found'] = True
 
-        if meta_ref:
             meta_ref['_now'] = _now
 
         return out
@@ -886,36 +1287,28 @@ cdef class Cache:
         """
         cdef dict out = {}
         cdef Entry entry
-        cdef bint _needs_any_found_report = True if meta_ref else False
+        cdef list keys
         cdef double _now = orig_now if orig_now else self._get_timestamp()
 
         with self._lock:
+            keys = self._keys_contains(data, limit)
 
-            for idx, key in enumerate(self._data.iterkeys(), 1):
+            for key in keys:
 
-                if not isinstance(key, str_types):
-                    continue
-
-                if data in key:
-
-                    # Set it before the update which would overwrite it, this is why we can return
-                    # value alone, without any metadata.
-                    if return_found:
-                        entry = <Entry>self._data[key]
-                        out[key] = entry if details else entry.value
+                # Set it before the update which would overwrite it, this is why we can return
+                # value alone, without any metadata.
+                if return_found:
+                    entry = <Entry>self._data[key]
+                    out[key] = entry if details else entry.value
 
-                    self._set(key, value, expiry, False, None, _now)
+                self._set(key, value, expiry, False, None, _now)
 
-                    # Indicate to our caller that there was at least one matching key
-                    if _needs_any_found_report:
-                        meta_ref['_any_found'] = True
-                        _needs_any_found_report = False
+        if meta_ref:
 
-                # Our caller knows how many keys to look up at most
-                if idx == limit:
-                    break
+            # Indicate to our caller that there was at least one matching key
+            if keys:
+                meta_ref['_any_found'] = True
 
-        if meta_ref:
             meta_ref['_now'] = _now
 
         return out
@@ -930,33 +1323,29 @@ cdef class Cache:
         """
         cdef dict out = {}
         cdef Entry entry
-        cdef bint _needs_any_found_report = True if meta_ref else False
+        cdef list keys
         cdef double _now = orig_now if orig_now else self._get_timestamp()
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
+            keys = self._keys_not_contains(data, limit)
 
-                if not isinstance(key, str_types):
-                    continue
+            for key in keys:
 
-                if data not in key:
+                # Set it before the update which would overwrite it, this is why we can return
+                # value alone, without any metadata.
+                if return_found:
+                    entry = <Entry>self._data[key]
+                    out[key] = entry if details else entry.value
 
-                    # Set it before the update which would overwrite it, this is why we can return
-                    # value alone, without any metadata.
-                    if return_found:
-                        entry = <Entry>self._data[key]
-                        out[key] = entry if details else entry.value
+                self._set(key, value, expiry, False, None, _now)
 
-                    self._set(key, value, expiry, False, None, _now)
+        if meta_ref:
 
-                    # Indicate to our caller that there was at least one matching key
-                    if _needs_any_found_report:
-                        meta_ref['_any_found'] = True
-                        _needs_any_found_report = False
+            # Indicate to our caller that there was at least one matching key
+            if keys:
+                meta_ref['_any_found'] = True
 
-                # Our caller knows how many keys to look up at most
-                if idx == limit:
-                    break
+            meta_ref['_now'] = _now
 
         return out
 
@@ -970,42 +1359,28 @@ cdef class Cache:
         """
         cdef dict out = {}
         cdef Entry entry
-        cdef bint use_key
-        cdef bint _needs_any_found_report = True if meta_ref else False
+        cdef list keys
         cdef double _now = orig_now if orig_now else self._get_timestamp()
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
+            keys = self._keys_contains_all(data, limit)
 
-                if not isinstance(key, str_types):
-                    continue
+            for key in keys:
 
-                use_key = True
-                for elem in data:
-                    if elem not in key:
-                        use_key = False
-                        break
+                # Set it before the update which would overwrite it, this is why we can return
+                # value alone, without any metadata.
+                if return_found:
+                    entry = <Entry>self._data[key]
+                    out[key] = entry if details else entry.value
 
-                if use_key:
+                self._set(key, value, expiry, False, None, _now)
 
-                    # Set it before the update which would overwrite it, this is why we can return
-                    # value alone, without any metadata.
-                    if return_found:
-                        entry = <Entry>self._data[key]
-                        out[key] = entry if details else entry.value
-
-                    self._set(key, value, expiry, False, None, _now)
-
-                    # Indicate to our caller that there was at least one matching key
-                    if _needs_any_found_report:
-                        meta_ref['_any_found'] = True
-                        _needs_any_found_report = False
+        if meta_ref:
 
-                # Our caller knows how many keys to look up at most
-                if idx == limit:
-                    break
+            # Indicate to our caller that there was at least one matching key
+            if keys:
+                meta_ref['_any_found'] = True
 
-        if meta_ref:
             meta_ref['_now'] = _now
 
         return out
@@ -1020,42 +1395,28 @@ cdef class Cache:
         """
         cdef dict out = {}
         cdef Entry entry
-        cdef bint use_key
-        cdef bint _needs_any_found_report = True if meta_ref else False
+        cdef list keys
         cdef double _now = orig_now if orig_now else self._get_timestamp()
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
+            keys = self._keys_contains_any(data, limit)
 
-                if not isinstance(key, str_types):
-                    continue
+            for key in keys:
 
-                use_key = False
-                for elem in data:
-                    if elem in key:
-                        use_key = True
-                        break
-
-                if use_key:
+                # Set it before the update which would overwrite it, this is why we can return
+                # value alone, without any metadata.
+                if return_found:
+                    entry = <Entry>self._data[key]
+                    out[key] = entry if details else entry.value
 
-                    # Set it before the update which would overwrite it, this is why we can return
-                    # value alone, without any metadata.
-                    if return_found:
-                        entry = <Entry>self._data[key]
-                        out[key] = entry if details else entry.value
+                self._set(key, value, expiry, False, None, _now)
 
-                    self._set(key, value, expiry, False, None, _now)
-
-                    # Indicate to our caller that there was at least one matching key
-                    if _needs_any_found_report:
-                        meta_ref['_any_found'] = True
-                        _needs_any_found_report = False
+        if meta_ref:
 
-                # Our caller knows how many keys to look up at most
-                if idx == limit:
-                    break
+            # Indicate to our caller that there was at least one matching key
+            if keys:
+                meta_ref['_any_found'] = True
 
-        if meta_ref:
             meta_ref['_now'] = _now
 
         return out
@@ -1068,9 +1429,8 @@ cdef class Cache:
         """
         cdef object _item
         cdef Entry entry
-        cdef Py_ssize_t index_idx
-        cdef Py_ssize_t cache_size
-        cdef object index_key
+        cdef long index_idx = -1
+        cdef long hits_per_position
         cdef double _now = self._get_timestamp()
 
         try:
@@ -1098,20 +1458,22 @@ cdef class Cache:
             # Update total hits counter
             self.hits += 1
 
-            # Current position of that key in index
-            index_idx = self._get_index(key)
+            # Positions are optional because obtaining them requires walking the recency list
+            if self.track_positions or details:
+
+                # Current position of that key in index
+                index_idx = self._get_index(key)
 
-            # We have the key's position so we can now update per-position counter
-            # to be able to offer statistics on how often a key is found at a given position.
-            hits_per_position = PyInt_AS_LONG(<object>PyDict_GetItem(self.hits_per_position, index_idx))
-            hits_per_position += 1
-            PyDict_SetItem(self.hits_per_position, index_idx, PyInt_FromLong(hits_per_position))
+            if self.track_positions:
 
-            # Remove key from index
-            index_key = self._remove_from_index_by_idx(index_idx)
+                # We have the key's position so we can now update per-position counter
+                # to be able to offer statistics on how often a key is found at a given position.
+                hits_per_position = PyInt_AS_LONG(<object>PyDict_GetItem(self.hits_per_position, index_idx))
+                hits_per_position += 1
+                PyDict_SetItem(self.hits_per_position, index_idx, PyInt_FromLong(hits_per_position))
 
-            # Now insert the key back at the head position.
-            PyList_Insert(self._index, 0, index_key)
+            # Now move the key to the head position.
+            self._move_to_head(entry)
 
             # Update last/prev access information + hits
             entry.prev_read = entry.last_read
@@ -1150,13 +1512,8 @@ cdef class Cache:
         cdef dict out = {}
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-                if not isinstance(key, str_types):
-                    continue
-                if key.startswith(data):
-                    out[key] = self._get(key, self.default_get, details)
-                if idx == limit:
-                    break
+            for key in self._keys_by_prefix(data, limit):
+                out[key] = self._get(key, self.default_get, details)
 
         return out
 
@@ -1170,13 +1527,8 @@ cdef class Cache:
         cdef dict out = {}
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-                if not isinstance(key, str_types):
-                    continue
-                if key.endswith(data):
-                    out[key] = self._get(key, self.default_get, details)
-                if idx == limit:
-                    break
+            for key in self._keys_by_suffix(data, limit):
+                out[key] = self._get(key, self.default_get, details)
 
         return out
 
@@ -1188,20 +1540,13 @@ cdef class Cache:
         it's a separate one to reduce code branching/CPU mispredictions.
         """
         cdef dict out = {}
-        cdef object regex = self._regex_cache.setdefault(data, re_compile(data))
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-                if not isinstance(key, str_types):
-                    continue
-                if regex.match(key):
-                    out[key] = self._get(key, self.default_get, details)
-                if idx == limit:
-                    break
+            for key in self._keys_by_regex(data, limit):
+                out[key] = self._get(key, self.default_get, details)
 
         return out
 
-
 # ################################################################################################################################
 
     cpdef object get_contains(self, object data, bint details, int limit):
@@ -1212,13 +1557,8 @@ cdef class Cache:
         cdef dict out = {}
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-                if not isinstance(key, str_types):
-                    continue
-                if data in key:
-                    out[key] = self._get(key, self.default_get, details)
-                if idx == limit:
-                    break
+            for key in self._keys_contains(data, limit):
+                out[key] = self._get(key, self.default_get, details)
 
         return out
 
@@ -1232,13 +1572,8 @@ cdef class Cache:
         cdef dict out = {}
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-                if not isinstance(key, str_types):
-                    continue
-                if data not in key:
-                    out[key] = self._get(key, self.default_get, details)
-                if idx == limit:
-                    break
+            for key in self._keys_not_contains(data, limit):
+                out[key] = self._get(key, self.default_get, details)
 
         return out
 
@@ -1250,25 +1585,10 @@ cdef class Cache:
         it's a separate one to reduce code branching/CPU mispredictions.
         """
         cdef dict out = {}
-        cdef bint use_key
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-
-                if not isinstance(key, str_types):
-                    continue
-
-                use_key = True
-                for elem in data:
-                    if elem not in key:
-                        use_key = False
-                        break
-
-                if use_key:
-                    out[key] = self._get(key, self.default_get, details)
-
-                if idx == limit:
-                    break
+            for key in self._keys_contains_all(data, limit):
+                out[key] = self._get(key, self.default_get, details)
 
         return out
 
@@ -1280,25 +1600,10 @@ cdef class Cache:
         it's a separate one to reduce code branching/CPU mispredictions.
         """
         cdef dict out = {}
-        cdef bint use_key
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-
-                if not isinstance(key, str_types):
-                    continue
-
-                use_key = False
-                for elem in data:
-                    if elem in key:
-                        use_key = True
-                        break
-
-                if use_key:
-                    out[key] = self._get(key, self.default_get, details)
-
-                if idx == limit:
-                    break
+            for key in self._keys_contains_any(data, limit):
+                out[key] = self._get(key, self.default_get, details)
 
         return out
 
@@ -1325,160 +1630,106 @@ cdef class Cache:
 
 # ################################################################################################################################
 
-    cdef bint expire_by_prefix(self, object data, double expiry, int limit):
+    cpdef bint expire_by_prefix(self, object data, double expiry, int limit=0):
         """ Sets expiration for all keys matching a given prefix. Non-string-like keys are ignored.
         Similarly to other self.get/set/expire/delete methods, it's a separate one to reduce code branching/CPU mispredictions.
         """
         cdef bint found_any = False
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-                if not isinstance(key, str_types):
-                    continue
-                if key.startswith(data):
-                    self._expire(key, expiry, None)
-                    found_any = True
-                if idx == limit:
-                    break
+            for key in self._keys_by_prefix(data, limit):
+                self._expire(key, expiry, None)
+                found_any = True
 
         return found_any
 
 # ################################################################################################################################
 
-    cdef bint expire_by_suffix(self, object data, double expiry, int limit):
+    cpdef bint expire_by_suffix(self, object data, double expiry, int limit=0):
         """ Sets expiration for all keys matching a given suffix. Non-string-like keys are ignored.
         Similarly to other self.get/set/expire/delete methods, it's a separate one to reduce code branching/CPU mispredictions.
         """
         cdef bint found_any = False
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-                if not isinstance(key, str_types):
-                    continue
-                if key.endswith(data):
-                    self._expire(key, expiry, None)
-                    found_any = True
-                if idx == limit:
-                    break
+            for key in self._keys_by_suffix(data, limit):
+                self._expire(key, expiry, None)
+                found_any = True
 
         return found_any
 
 # ################################################################################################################################
 
-    cdef bint expire_by_regex(self, object data, double expiry, int limit):
+    cpdef bint expire_by_regex(self, object data, double expiry, int limit=0):
         """ Sets expiration for all keys matching a given regex pattern. Non-string-like keys are ignored.
         Similarly to other self.get/set/expire/delete methods, it's a separate one to reduce code branching/CPU mispredictions.
         """
         cdef bint found_any = False
-        cdef object regex = self._regex_cache.setdefault(data, re_compile(data))
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-                if not isinstance(key, str_types):
-                    continue
-                if regex.match(key):
-                    self._expire(key, expiry, None)
-                    found_any = True
-                if idx == limit:
-                    break
+            for key in self._keys_by_regex(data, limit):
+                self._expire(key, expiry, None)
+                found_any = True
 
         return found_any
 
 # ################################################################################################################################
 
-    cdef bint expire_contains(self, object data, double expiry, int limit):
+    cpdef bint expire_contains(self, object data, double expiry, int limit=0):
         """ Sets expiration for all keys containing a given pattern. Non-string-like keys are ignored.
         Similarly to other self.get/set/expire/delete methods, it's a separate one to reduce code branching/CPU mispredictions.
         """
         cdef bint found_any = False
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-                if not isinstance(key, str_types):
-                    continue
-                if data in key:
-                    self._expire(key, expiry, None)
-                    found_any = True
-                if idx == limit:
-                    break
+            for key in self._keys_contains(data, limit):
+                self._expire(key, expiry, None)
+                found_any = True
 
         return found_any
 
 # ################################################################################################################################
 
-    cdef bint expire_not_contains(self, object data, double expiry, int limit):
+    cpdef bint expire_not_contains(self, object data, double expiry, int limit=0):
         """ Sets expiration for all keys containing a given pattern. Non-string-like keys are ignored.
         Similarly to other self.get/set/expire/delete methods, it's a separate one to reduce code branching/CPU mispredictions.
         """
         cdef bint found_any = False
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-                if not isinstance(key, str_types):
-                    continue
-                if data not in key:
-                    self._expire(key, expiry, None)
-                    found_any = True
-                if idx == limit:
-                    break
+            for key in self._keys_not_contains(data, limit):
+                self._expire(key, expiry, None)
+                found_any = True
 
         return found_any
 
 # ################################################################################################################################
 
-    cdef bint expire_contains_all(self, object data, double expiry, int limit):
+    cpdef bint expire_contains_all(self, object data, double expiry, int limit=0):
         """ Sets expiration for keys containing all of input elements. Non-string-like keys are ignored.
         Similarly to other self.get/set/expire/delete methods, it's a separate one to reduce code branching/CPU mispredictions.
         """
         cdef bint found_any = False
-        cdef bint use_key
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-                if not isinstance(key, str_types):
-                    continue
-
-                use_key = True
-                for elem in data:
-                    if elem not in key:
-                        use_key = False
-                        break
-
-                if use_key:
-                    self._expire(key, expiry, None)
-                    found_any = True
-
-                if idx == limit:
-                    break
+            for key in self._keys_contains_all(data, limit):
+                self._expire(key, expiry, None)
+                found_any = True
 
         return found_any
 
 # ################################################################################################################################
 
-    cdef bint expire_contains_any(self, object data, double expiry, int limit):
+    cpdef bint expire_contains_any(self, object data, double expiry, int limit=0):
         """ Sets expiration for keys containing at least one of input elements. Non-string-like keys are ignored.
         Similarly to other self.get/set/expire/delete methods, it's a separate one to reduce code branching/CPU mispredictions.
         """
         cdef bint found_any = False
-        cdef bint use_key
 
         with self._lock:
-            for idx, key in enumerate(self._data.iterkeys(), 1):
-                if not isinstance(key, str_types):
-                    continue
-
-                use_key = False
-                for elem in data:
-                    if elem in key:
-                        use_key = True
-                        break
-
-                if use_key:
-                    self._expire(key, expiry, None)
-                    found_any = True
-
-                if idx == limit:
-                    break
+            for key in self._keys_contains_any(data, limit):
+                self._expire(key, expiry, None)
+                found_any = True
 
         return found_any
 
@@ -1507,33 +1758,85 @@ cdef class Cache:
                 if expires_at > entry.expires_at:
                     entry.expiry = expiry
                     entry.expires_at = expires_at
+                    self._schedule_expiry(entry)
 
 # ################################################################################################################################
 
     cpdef list delete_expired(self):
         """ Deletes all entries expired as of now. Also, deletes all entries possibly found to have expired by .get or .set calls.
+        Only heap items whose deadline has passed are looked at, which means that the cost of this method depends
+        on the number of keys that are due to expire rather than on the size of the cache.
         """
         cdef list deleted
+        cdef list heap
         cdef double _now = self._get_timestamp()
-        cdef double expires_at
-
-        # Collects all keys to be deleted and in another pass, delete them all.
-        # It's performed it two steps so as to be able to hold self._lock only once.
+        cdef double scheduled_at
+        cdef object key
+        cdef Entry entry
 
         with self._lock:
 
             deleted = self._expired_on_op[:]
+            heap = self._expiry_heap
 
-            # Collect keys still in cache
-            for key, value in PyDict_Items(self._data):
-                expires_at = value.expires_at
-                if expires_at and _now > expires_at:
+            while heap and (<tuple>heap[0])[0] < _now:
+                scheduled_at, _, key = heappop(heap)
+                entry = self._data.get(key)
+
+                # The key has been already deleted or the entry has been rescheduled under an earlier deadline,
+                # in either case this heap item is stale.
+                if entry is None or entry._scheduled_at != scheduled_at:
+                    continue
+
+                entry._scheduled_at = 0.0
+
+                # The entry no longer expires at all ..
+                if not entry.expires_at:
+                    continue
+
+                # .. it really has expired ..
+                if _now > entry.expires_at:
                     self._delete(key)
                     deleted.append(key)
 
+                # .. or its expiration has been extended in the meantime.
+                else:
+                    self._schedule_expiry(entry)
+
+            # Stale items of deleted or no longer expiring entries may accumulate if they have deadlines far in the future,
+            # in which case we get rid of them here.
+            if len(heap) > 2 * PyDict_Size(self._data) + 1024:
+                self._rebuild_expiry_heap()
+
             # Collect keys deleted by .get operations
             self._expired_on_op[:] = []
 
+            # Update statistics
+            self.sweeps += 1
+            self.last_sweep_expired = len(deleted)
+            self.expired_total += self.last_sweep_expired
+            self.last_sweep_duration = self._get_timestamp() - _now
+
         return deleted
 
+# ################################################################################################################################
+
+    cpdef dict get_stats(self):
+        """ Returns statistics about the usage of this cache.
+        """
+        with self._lock:
+            return {
+                'size': PyDict_Size(self._data),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'get_ops': self.get_ops,
+                'set_ops': self.set_ops,
+                'expiry_heap_size': len(self._expiry_heap),
+                'sweeps': self.sweeps,
+                'expired_total': self.expired_total,
+                'last_sweep_expired': self.last_sweep_expired,
+                'last_sweep_duration': self.last_sweep_duration,
+            }
+
 # ################################################################################################################################
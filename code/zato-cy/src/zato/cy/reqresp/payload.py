@@ -33,6 +33,9 @@ logger = getLogger('zato')
 # ################################################################################################################################
 
 DATA_FORMAT_DICT:str = DATA_FORMAT.DICT
+
+# Responses in these data formats can be produced in chunks, from iterators
+_stream_data_formats:tuple = (DATA_FORMAT.JSON, DATA_FORMAT.CSV)
 _not_given:object = object()
 
 # ################################################################################################################################
@@ -196,6 +199,34 @@ class SimpleIOPayload:
             else:
                 self.user_attrs_dict.update(self._extract_payload_attrs(value))
 
+# ################################################################################################################################
+
+    def _iter_payload_attrs(self, value:object):
+        """ Extracts response attributes from each element of an iterator, one element at a time.
+        """
+        for item in value:
+            if isinstance(item, dict):
+                yield self._extract_payload_attrs_dict(item)
+            else:
+                if hasattr(item, 'to_zato'):
+                    item = item.to_zato()
+                yield self._extract_payload_attrs(item)
+
+# ################################################################################################################################
+
+    @cy.ccall
+    def set_payload_iter(self, value:object):
+        """ Returns what a response should be if an iterator, e.g. a generator or an SQL cursor, is assigned to the payload.
+        For data formats that can be streamed, this is an iterator of serialised chunks, each produced when the next
+        element of the input is. Otherwise, all the elements are appended to this object, which is returned.
+        """
+        if self.data_format in _stream_data_formats:
+            return self.sio.iter_output(self._iter_payload_attrs(value), self.data_format)
+        else:
+            for item in self._iter_payload_attrs(value):
+                self.append(item)
+            return self
+
 # ################################################################################################################################
 
     @cy.ccall
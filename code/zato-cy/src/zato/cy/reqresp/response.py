@@ -11,6 +11,7 @@ Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 # stdlib
+from collections.abc import Iterator
 from http.client import OK
 from logging import getLogger
 
@@ -27,6 +28,7 @@ from sqlalchemy.util import KeyedTuple
 # Zato
 from zato.common.api import DATA_FORMAT, simple_types, ZATO_OK
 from zato.common.marshal_.api import Model
+from zato.common.util.http_ import is_stream_payload
 from zato.cy.reqresp.payload import SimpleIOPayload
 
 # Python 2/3 compatibility
@@ -63,6 +65,7 @@ class Response:
     cid              = cy.declare(cy.object, visibility='public')  # type: past_unicode
     data_format      = cy.declare(cy.object, visibility='public')  # type: past_unicode
     headers          = cy.declare(cy.dict, visibility='public')     # type: dict
+    meta             = cy.declare(cy.dict, visibility='public')     # type: dict
     status_code      = cy.declare(cy.int, visibility='public')      # type: int
     status_message   = cy.declare(cy.object, visibility='public')  # type: past_unicode
     sio              = cy.declare(object, visibility='public')      # type: CySimpleIO
@@ -80,6 +83,7 @@ class Response:
         self.cid = None
         self.data_format = None
         self.headers = {}
+        self.meta = {}
         self.status_code = OK
         self.status_message = 'OK'
         self.sio = None
@@ -122,7 +126,9 @@ class Response:
 
     def _set_payload(self, value, _json=DATA_FORMAT.JSON):
         """ Strings, lists and tuples are assigned as-is. Dicts as well if SIO is not used. However, if SIO is used
-        the dicts are matched and transformed according to the SIO definition.
+        the dicts are matched and transformed according to the SIO definition. Generators and file-like objects
+        are assigned as-is too because they are streamed rather than serialised, unless SIO is used with an iterator,
+        in which case its elements are transformed one by one as they are streamed.
         """
         # 1)
         # This covers dict and subclasses, e.g. Bunch
@@ -147,15 +153,27 @@ class Response:
                 self._payload = value
 
             # 2b)
+            # .. or a generator or file-like object that will be streamed to our caller ..
+            elif is_stream_payload(value):
+
+                # .. if using SimpleIO, elements of iterators are serialised one by one, as they are streamed ..
+                if self._has_sio_output and isinstance(value, Iterator):
+                    self._payload = self._payload.set_payload_iter(value)
+
+                # .. otherwise, they are streamed as they are.
+                else:
+                    self._payload = value
+
+            # 2c)
             # .. otherwise, we will try to serialise it ..
             else:
 
-                # 2b1)
+                # 2c1)
                 # .. if using SimpleIO ..
                 if self._has_sio_output:
                     self._payload.set_payload_attrs(value)
 
-                # 2b2)
+                # 2c2)
                 else:
                     if value:
                         if isinstance(value, Model):
@@ -16,6 +16,7 @@ from copy import deepcopy
 from csv import DictWriter, reader as csv_reader
 from datetime import date as stdlib_date, datetime as stdlib_datetime
 from decimal import Decimal as decimal_Decimal
+from collections.abc import Iterator
 from io import StringIO
 from json import JSONEncoder
 from itertools import chain
@@ -1291,6 +1292,16 @@ class SIODefinition:
 # ################################################################################################################################
 # ################################################################################################################################
 
+def _compile_function(func_name:object, lines:list, namespace:dict) -> object:
+    """ Turns lines of source code generated for a SimpleIO definition into a function.
+    """
+    source = '\n'.join(lines)
+    exec(compile(source, '<sio-{}>'.format(func_name), 'exec'), namespace)
+    return namespace[func_name]
+
+# ################################################################################################################################
+# ################################################################################################################################
+
 @cy.cclass
 class CySimpleIO:
     """ If a service uses SimpleIO then, during deployment, its class will receive an attribute called _sio
@@ -1318,6 +1329,12 @@ class CySimpleIO:
     # A service class this SimpleIO object is attached to
     service_class = cy.declare(object, visibility='public') # type: object
 
+    # Data format -> A function parsing input dicts, generated for this particular definition
+    input_parsers = cy.declare(dict, visibility='public') # type: dict
+
+    # Data format -> A function serialising a single output dict, generated for this particular definition
+    output_serialisers = cy.declare(dict, visibility='public') # type: dict
+
 # ################################################################################################################################
 
     def __cinit__(self, server:object, server_config:SIOServerConfig, user_declaration:object):
@@ -1403,6 +1420,9 @@ class CySimpleIO:
         self.server_config = server_config
         self.user_declaration = user_declaration
 
+        self.input_parsers = {}
+        self.output_serialisers = {}
+
 # ################################################################################################################################
 
     @cy.cfunc
@@ -1567,6 +1587,186 @@ class CySimpleIO:
         # Set up XML configuration
         self._set_up_xml_config()
 
+        # Now that the definition is complete, generate parsers and serialisers specific to it
+        self._compile_parsers()
+
+# ################################################################################################################################
+
+    @cy.cfunc
+    def _compile_parsers(self):
+        """ Generates, for each data format, a function that parses input dicts and one that serialises output dicts.
+        The functions check and convert each element in turn without having to look up its configuration in each request.
+        A new CySimpleIO object is attached to each class deployed, which means that hot-deployment replaces them too.
+        """
+        for data_format in (DATA_FORMAT_JSON, DATA_FORMAT_DICT, DATA_FORMAT_FORM):
+            self.input_parsers[data_format] = self._compile_input_parser(data_format)
+
+        for data_format in (DATA_FORMAT_DICT, DATA_FORMAT_CSV):
+            self.output_serialisers[data_format] = self._compile_output_serialiser(data_format)
+
+# ################################################################################################################################
+
+    @cy.cfunc
+    @cy.returns(object)
+    def _compile_input_parser(self, data_format:object) -> object:
+
+        skip_empty:SIOSkipEmpty = self.definition.skip_empty
+        sio_item:Elem
+        idx:cy.int = -1
+
+        namespace:dict = {
+            '_missing': InternalNotGiven,
+            '_on_missing': self._on_input_elem_missing,
+            '_data_format': data_format,
+            '_encrypt_func': self.server.encrypt if self.server else None,
+        }
+
+        lines:list = [
+            'def parse(elem):',
+            '    out = {}',
+            '    get = elem.get',
+        ]
+
+        for sio_item in self.definition.all_input_elems:
+
+            idx += 1
+            name = repr(sio_item.name)
+
+            # This reflects what self._should_skip_on_input does in runtime
+            is_forced:cy.bint = sio_item.name in skip_empty.force_empty_input_set
+            skip_always:cy.bint = (not is_forced) and skip_empty.has_skip_input_set and sio_item.name in skip_empty.skip_input_set
+            skip_if_empty:cy.bint = (not is_forced) and skip_empty.skip_all_empty_input
+
+            # What to do if the element is not on input ..
+            on_missing:list = []
+
+            if sio_item.is_required:
+                on_missing.append('_on_missing(elem, {})'.format(name))
+
+            elif not (skip_always or skip_if_empty):
+                if sio_item.get_default_value:
+                    namespace['default_{}'.format(idx)] = sio_item.get_default_value
+                    on_missing.append('out[{}] = default_{}()'.format(name, idx))
+                else:
+                    namespace['default_{}'.format(idx)] = sio_item.default_value
+                    on_missing.append('out[{}] = default_{}'.format(name, idx))
+
+            # .. and what to do if it is.
+            on_value:list = []
+
+            if not skip_always:
+
+                namespace['parse_{}'.format(idx)] = sio_item.parse_from[data_format]
+
+                on_value.append('try:')
+
+                if getattr(sio_item, 'is_secret', False):
+                    namespace['eval_{}'.format(idx)] = self.eval_
+                    on_value.append('    parse_{}(value)'.format(idx))
+                    on_value.append('    out[{}] = eval_{}({}, value, _encrypt_func)'.format(name, idx, name))
+                else:
+                    on_value.append('    out[{}] = parse_{}(value)'.format(name, idx))
+
+                on_value.append('except NotImplementedError:')
+                on_value.append("    raise NotImplementedError('No parser for input `{}` ({})'.format(value, _data_format))")
+
+                if skip_if_empty:
+                    on_value = ['if value:'] + ['    ' + line for line in on_value]
+
+            # Nothing is ever produced for this element
+            if not (on_missing or on_value):
+                continue
+
+            lines.append('    value = get({}, _missing)'.format(name))
+            lines.append('    if value is _missing:')
+            lines.extend('        ' + line for line in (on_missing or ['pass']))
+
+            if on_value:
+                lines.append('    else:')
+                lines.extend('        ' + line for line in on_value)
+
+        lines.append('    return out')
+
+        return _compile_function('parse', lines, namespace)
+
+# ################################################################################################################################
+
+    @cy.cfunc
+    @cy.returns(object)
+    def _compile_output_serialiser(self, data_format:object) -> object:
+
+        sio_item:Elem
+        idx:cy.int = -1
+        is_required:cy.bint
+
+        namespace:dict = {
+            '_missing': InternalNotGiven,
+            '_on_missing': self._on_output_elem_missing,
+            '_on_error': self._on_serialisation_error,
+        }
+
+        lines:list = [
+            'def serialise(data):',
+            '    out = {}',
+            '    get = data.get',
+        ]
+
+        for is_required, sio_list in ((True, self.definition._output_required), (False, self.definition._output_optional)):
+            for sio_item in sio_list:
+
+                idx += 1
+                name = repr(sio_item.name)
+
+                namespace['parse_{}'.format(idx)] = sio_item.parse_to[data_format]
+
+                lines.append('    value = get({}, _missing)'.format(name))
+
+                if is_required:
+                    lines.append('    if value is _missing:')
+                    lines.append('        _on_missing(data, {})'.format(name))
+                    lines.append('    else:')
+                else:
+                    lines.append('    if value is not _missing:')
+
+                lines.append('        try:')
+                lines.append('            value = parse_{}(value)'.format(idx))
+                lines.append('        except Exception as e:')
+                lines.append('            _on_error(e, value, data, parse_{})'.format(idx))
+
+                if cy.cast(cy.int, sio_item._type) == cy.cast(cy.int, sio_text_type):
+                    namespace['encoding_{}'.format(idx)] = sio_item.encoding
+                    lines.append('        if isinstance(value, bytes):')
+                    lines.append('            value = value.decode(encoding_{})'.format(idx))
+
+                lines.append('        out[{}] = value'.format(name))
+
+        lines.append('    return out')
+
+        return _compile_function('serialise', lines, namespace)
+
+# ################################################################################################################################
+
+    def _on_input_elem_missing(self, elem:object, sio_item_name:object):
+
+        # This goes to logs ..
+        logger.warning('%s; No such input elem `%s` among `%s` in `%s`' % (
+            self.service_class, sio_item_name, cy.cast(dict, elem).keys(), elem))
+
+        # .. while this is potentially returned to users.
+        raise ElementMissing(sio_item_name)
+
+# ################################################################################################################################
+
+    def _on_output_elem_missing(self, data:object, sio_item_name:object):
+        raise SerialisationError('Required element `{}` missing in `{}` ({})'.format(
+            sio_item_name, data, self.service_class))
+
+# ################################################################################################################################
+
+    def _on_serialisation_error(self, e:object, value:object, data:object, parse_func:object):
+        raise SerialisationError('Exception `{!r}` while serialising `{}` ({}) ({}) (func:{})'.format(
+            e, value, self.service_class, data, parse_func))
+
 # ################################################################################################################################
 
     @cy.returns(Elem)
@@ -1838,6 +2038,15 @@ class CySimpleIO:
                 elem, type(elem).__name__, self.service_class)
             return
 
+        # Dicts are parsed by functions generated for the definition, unless there is none for this data format
+        if is_dict:
+            compiled_parser = self.input_parsers.get(data_format)
+            if compiled_parser:
+                if extra:
+                    elem = dict(elem)
+                    elem.update(extra)
+                return compiled_parser(elem)
+
         # This dictionary holds keys that were common to both 'elem' and 'extra'. If extra exists,
         # and some of the extra keys already exist in elem, this dictionary is populated with such
         # keys/value extracted from elem. Before we return, they are re-added. This is needed,
@@ -2001,7 +2210,8 @@ class CySimpleIO:
         yield list(required_elems.keys())
         yield list(optional_elems.keys())
 
-        input_data:list = data if isinstance(data, (list, tuple)) else [data]
+        # Iterators, e.g. generators or SQL cursors, are consumed one element at a time
+        input_data:object = data if isinstance(data, (list, tuple, Iterator)) else [data]
 
         # 1st item = is_required
         # 2nd item = elems dict
@@ -2016,6 +2226,9 @@ class CySimpleIO:
         current_elem:Elem = None
         input_data_dict = None
 
+        # A function generated for the definition, if there is one for this data format
+        compiled_serialiser:object = self.output_serialisers.get(data_format)
+
         for _input_data_dict in input_data:
 
             # This is the dictionary that we return.
@@ -2035,6 +2248,10 @@ class CySimpleIO:
             elif isinstance(_input_data_dict, SQLRow):
                 input_data_dict = _input_data_dict.get_value()
 
+            if compiled_serialiser:
+                yield compiled_serialiser(input_data_dict)
+                continue
+
             for is_required, current_elems in all_elems: # type: bool, dict
                 for current_elem_name, current_elem in current_elems.items():
                     value = input_data_dict.get(current_elem_name, InternalNotGiven)
@@ -2108,7 +2325,7 @@ class CySimpleIO:
         # Local variables
         out_elems:list = []
 
-        if isinstance(data, (list, tuple)):
+        if isinstance(data, (list, tuple, Iterator)):
             is_list = True
         else:
             is_list = False
@@ -2172,6 +2389,83 @@ class CySimpleIO:
         else:
             raise ValueError('Unrecognised output data format `{}`'.format(data_format))
 
+# ################################################################################################################################
+
+    def iter_output(self, data:object, data_format:object):
+        """ Like get_output but for an iterator, e.g. a generator or an SQL cursor, whose elements are converted and serialised
+        one by one. The response is returned in chunks of strings, which means that it is never kept in memory as a whole.
+        """
+        if data_format == DATA_FORMAT_JSON:
+            return self._iter_output_json(data)
+
+        elif data_format == DATA_FORMAT_CSV:
+            return self._iter_output_csv(data)
+
+        else:
+            raise ValueError('Output data format `{}` cannot be streamed'.format(data_format))
+
+# ################################################################################################################################
+
+    def _iter_output_json(self, data:object):
+
+        encode = self.server_config.json_encoder.encode
+
+        gen = self._yield_data_dicts(data, DATA_FORMAT_DICT)
+
+        # Ignore field names, not needed in JSON
+        next(gen)
+        next(gen)
+
+        # Wrap the response in a top-level element if needed ..
+        if self.definition._has_response_elem:
+            yield '{' + encode(self.definition._response_elem) + ': ['
+        else:
+            yield '['
+
+        # .. produce each element, separated by commas ..
+        is_first:cy.bint = True
+
+        for data_dict in gen:
+            if is_first:
+                is_first = False
+                yield encode(data_dict)
+            else:
+                yield ', ' + encode(data_dict)
+
+        # .. and close the list, possibly along with the top-level element.
+        yield ']}' if self.definition._has_response_elem else ']'
+
+# ################################################################################################################################
+
+    def _iter_output_csv(self, data:object):
+
+        gen = self._yield_data_dicts(data, DATA_FORMAT_CSV)
+
+        # First, get the field names
+        required_field_names:list = next(gen)
+        optional_field_names:list = next(gen)
+
+        # Each row is written to the same buffer, which is emptied after each one
+        buff:StringIO = StringIO()
+        writer:DictWriter = DictWriter(
+            buff, required_field_names + optional_field_names, **self.definition._csv_config.writer_config)
+
+        if self.definition._csv_config.should_write_header:
+            writer.writeheader()
+
+        for data_dict in gen:
+            writer.writerow(data_dict)
+            yield buff.getvalue()
+            buff.seek(0)
+            buff.truncate()
+
+        # This will be non-empty only if there were no rows at all but there was a header
+        out = buff.getvalue()
+        buff.close()
+
+        if out:
+            yield out
+
 # ################################################################################################################################
 
     @cy.returns(object)
@@ -52,7 +52,7 @@ cdef class Matcher:
         public unicode pattern
         public object matcher
         object match_func
-        public bint is_static, is_internal
+        public bint is_static, is_internal, match_slash
         object _brace_pattern
         object _elem_re_template
         set ignore_http_methods
@@ -62,6 +62,7 @@ cdef class Matcher:
         # If True, we will include slashes in pattern matching,
         # otherwise they will not be taken into account.
         slash_pattern = '\/' if match_slash else ''
+        self.match_slash = bool(match_slash)
 
         # HTTP methods to ignore in case one is set for a particular HTTP channel
         self.ignore_http_methods = set(['CONNECT', 'DELETE', 'GET', 'HEAD', 'OPTIONS', 'PATCH', 'POST', 'PUT', 'TRACE'])
@@ -132,18 +133,355 @@ cdef class Matcher:
 # ################################################################################################################################
 # ################################################################################################################################
 
+# Used to find path parameters in URL path patterns
+_brace_pattern = re_compile('\{[\w \$.\-:|=~^\/]+\}', stdlib_re.UNICODE)
+
+# Characters that have a special meaning in URL path patterns, other than in path parameters
+_pattern_special_chars = frozenset('.^$*+?{}[]|()\\')
+
+# Path segments of a URL path pattern are of one of these types ..
+cdef int _segment_literal = 1 # .. a constant string that must match a segment exactly ..
+cdef int _segment_param   = 2 # .. a path parameter that matches any one segment ..
+cdef int _segment_tail    = 3 # .. a pattern that may match any number of segments, e.g. a parameter that can contain slashes.
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+cdef class _Route:
+    """ A channel along with its position among other channels - channels that are earlier in the order are matched first.
+    """
+    cdef:
+        public tuple key
+        public dict item
+        public Matcher matcher
+        object _item_bunch
+
+    def __init__(self, tuple key, dict item):
+        self.key = key
+        self.item = item
+        self.matcher = item['match_target_compiled']
+        self._item_bunch = None
+
+    cdef object get_item_bunch(self):
+
+        # Channel items are bunchified only once, the first time they are matched
+        if self._item_bunch is None:
+            self._item_bunch = bunchify(self.item)
+
+        return self._item_bunch
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+cdef class _RouteNode:
+    cdef:
+        dict children
+        _RouteNode param
+        list terminal
+        list tail
+
+    def __init__(self):
+        self.children = {}
+        self.param = None
+        self.terminal = []
+        self.tail = []
+
+    cdef bint is_empty(self):
+        return not (self.children or self.param or self.terminal or self.tail)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+cdef class URLRouter:
+    """ A trie of channels keyed by HTTP methods and URL path segments. Given a URL path, it returns the channels
+    that may possibly match it, in the order in which they should be tried. This is always a superset of the channels
+    that will actually match, each of which still needs to be confirmed by its own Matcher.
+    """
+    cdef:
+        dict roots
+        list fallback
+        dict routes
+        unicode sep
+
+    def __init__(self, unicode sep=target_separator):
+
+        # HTTP method -> root node, with an empty string for channels that accept any method
+        self.roots = {}
+
+        # Channels whose patterns cannot be represented in the trie, always returned as candidates
+        self.fallback = []
+
+        # id(item) -> (route, path to its node or None if it is in the fallback list)
+        self.routes = {}
+
+        self.sep = sep
+
+# ################################################################################################################################
+
+    cdef tuple _parse_target(self, unicode match_target, bint match_slash):
+        """ Returns an HTTP method and a list of typed URL path segments out of a match target,
+        or None if the target's pattern is not one that the trie can represent.
+        """
+        cdef list segments = []
+        cdef unicode segment, literal
+
+        parts = match_target.split(self.sep, 3)
+        if len(parts) != 4:
+            return None
+
+        soap_action, http_method, _, url_path = parts
+
+        # These are never used by REST channels
+        if soap_action:
+            return None
+
+        # A specific method or one out of many if the channel does not have one
+        if not http_method.isalpha():
+            http_method = ''
+
+        for segment in url_path.split('/'):
+
+            # Path parameters ..
+            if '{' in segment:
+
+                # .. which may contain slashes, or anything else in this segment may need to match across slashes ..
+                literal = _brace_pattern.sub('', segment).replace('\\(', '').replace('\\)', '')
+                if match_slash or _pattern_special_chars.intersection(literal):
+                    segments.append((_segment_tail, None))
+                    break
+                else:
+                    segments.append((_segment_param, None))
+
+            # A constant segment, possibly with escaped parentheses ..
+            else:
+                literal = segment.replace('\\(', '(').replace('\\)', ')')
+                if _pattern_special_chars.intersection(segment.replace('\\(', '').replace('\\)', '')):
+                    segments.append((_segment_tail, None))
+                    break
+                else:
+                    segments.append((_segment_literal, literal))
+
+        return http_method, segments
+
+# ################################################################################################################################
+
+    cpdef add(self, tuple key, dict item):
+        """ Adds a new channel to the trie.
+        """
+        cdef _Route route = _Route(key, item)
+        cdef _RouteNode node
+        cdef list path = []
+        cdef bint is_tail = False
+        cdef int segment_type
+
+        parsed = self._parse_target(item['match_target'], route.matcher.match_slash)
+
+        # This channel will be always tried ..
+        if parsed is None:
+            self.fallback.append(route)
+            self.routes[id(item)] = (route, None)
+            return
+
+        # .. whereas this one will be tried only if the URL path matches its location in the trie.
+        http_method, segments = parsed
+
+        node = self.roots.get(http_method)
+        if node is None:
+            node = self.roots[http_method] = _RouteNode()
+
+        path.append(node)
+
+        for segment_type, literal in segments:
+
+            if segment_type == _segment_tail:
+                is_tail = True
+                break
+
+            elif segment_type == _segment_param:
+                if node.param is None:
+                    node.param = _RouteNode()
+                node = node.param
+
+            else:
+                child = node.children.get(literal)
+                if child is None:
+                    child = node.children[literal] = _RouteNode()
+                node = child
+
+            path.append(node)
+
+        if is_tail:
+            node.tail.append(route)
+        else:
+            node.terminal.append(route)
+
+        self.routes[id(item)] = (route, (http_method, segments, path, is_tail))
+
+# ################################################################################################################################
+
+    cpdef remove(self, dict item):
+        """ Removes a channel from the trie, along with any nodes that become empty as a result.
+        """
+        cdef _RouteNode node, parent
+        cdef int idx, segment_type
+
+        entry = self.routes.pop(id(item), None)
+        if entry is None:
+            return
+
+        route, location = entry
+
+        if location is None:
+            self.fallback.remove(route)
+            return
+
+        http_method, segments, path, is_tail = location
+
+        node = path[-1]
+        if is_tail:
+            node.tail.remove(route)
+        else:
+            node.terminal.remove(route)
+
+        # Go up the path, removing nodes that no longer lead to any channel
+        for idx in range(len(path) - 1, 0, -1):
+            node = path[idx]
+            if not node.is_empty():
+                break
+
+            parent = path[idx - 1]
+            segment_type, literal = segments[idx - 1]
+
+            if segment_type == _segment_param:
+                parent.param = None
+            else:
+                del parent.children[literal]
+
+        if (<_RouteNode>path[0]).is_empty():
+            del self.roots[http_method]
+
+# ################################################################################################################################
+
+    cpdef clear(self):
+        self.roots.clear()
+        self.fallback[:] = []
+        self.routes.clear()
+
+# ################################################################################################################################
+
+    cdef _collect(self, _RouteNode node, list segments, int idx, list out):
+
+        # Channels whose patterns can match anything from this segment onwards
+        if node.tail:
+            out.extend(node.tail)
+
+        if idx == len(segments):
+            if node.terminal:
+                out.extend(node.terminal)
+            return
+
+        child = node.children.get(segments[idx])
+        if child is not None:
+            self._collect(child, segments, idx + 1, out)
+
+        if node.param is not None:
+            self._collect(node.param, segments, idx + 1, out)
+
+# ################################################################################################################################
+
+    cpdef list get_candidates(self, unicode http_method, unicode url_path):
+        """ Returns all the channels that may match a given URL path and HTTP method, in the order to try them in.
+        """
+        cdef list out = list(self.fallback)
+        cdef list segments
+        cdef _RouteNode node
+
+        # With a separator in the URL path, a pattern may match a part of the path other than where
+        # it would normally start from so we cannot use the trie in such a case.
+        if self.sep in url_path:
+            return self.get_all()
+
+        segments = url_path.split('/')
+
+        node = self.roots.get(http_method)
+        if node is not None:
+            self._collect(node, segments, 0, out)
+
+        node = self.roots.get('')
+        if node is not None:
+            self._collect(node, segments, 0, out)
+
+        if len(out) > 1:
+            out.sort(key=_get_route_key)
+
+        return out
+
+# ################################################################################################################################
+
+    cpdef list get_all(self):
+        cdef list out = [entry[0] for entry in self.routes.values()]
+        out.sort(key=_get_route_key)
+        return out
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+def _get_route_key(_Route route):
+    return route.key
+
+# ################################################################################################################################
+# ################################################################################################################################
+
 cdef class CyURLData:
 
     cdef:
         public list channel_data
         public dict url_path_cache
+        public URLRouter router
+        dict url_target_cache
         bint has_trace1
+        long route_seq
 
     def __init__(self, channel_data=None):
         self.channel_data = channel_data
         self.url_path_cache = {}
         self.url_target_cache = {}
         self.has_trace1 = logger.isEnabledFor(TRACE1)
+        self.router = URLRouter()
+        self.route_seq = 0
+        self.rebuild_router()
+
+# ################################################################################################################################
+
+    cpdef tuple _get_route_key(self, dict item):
+
+        # The same order as in URLData.sort_channel_data, with ties resolved in favour of channels added earlier
+        self.route_seq += 1
+        return (bool(item.get('is_internal')), item.get('name') or '', self.route_seq)
+
+# ################################################################################################################################
+
+    cpdef add_channel(self, dict item):
+        """ Makes a channel, already in self.channel_data, available for URL matching.
+        """
+        self.router.add(self._get_route_key(item), item)
+
+# ################################################################################################################################
+
+    cpdef remove_channel(self, dict item):
+        """ Makes a channel, already removed from self.channel_data, no longer available for URL matching.
+        """
+        self.router.remove(item)
+
+# ################################################################################################################################
+
+    cpdef rebuild_router(self):
+        """ Populates the router from scratch, using all the channels currently in self.channel_data.
+        """
+        self.router.clear()
+        self.route_seq = 0
+        for item in self.channel_data or []:
+            self.add_channel(item)
 
 # ################################################################################################################################
 
@@ -165,14 +503,13 @@ cdef class CyURLData:
 # ################################################################################################################################
 
     cpdef tuple match(self, unicode url_path, unicode http_method, unicode http_accept,
-        unicode sep=target_separator, _bunchify=bunchify, _log_trace1=logger.log,
-        _trace1=TRACE1):
+        unicode sep=target_separator, _log_trace1=logger.log, _trace1=TRACE1):
         """ Attemps to match the combination of SOAPt Action and URL path against
         the list of HTTP channel targets.
         """
         cdef bint needs_user, has_target_in_cache=True
         cdef Matcher matcher
-        cdef dict item
+        cdef _Route route
         cdef object item_bunch
 
         cdef unicode target = ''
@@ -196,9 +533,10 @@ cdef class CyURLData:
         except KeyError:
             needs_user = not url_path.startswith('/zato')
 
-            for item in self.channel_data:
+            # Only the channels whose patterns may possibly match this path need to be checked
+            for route in self.router.get_candidates(http_method, url_path):
 
-                matcher = item['match_target_compiled']
+                matcher = route.matcher
                 if needs_user and matcher.is_internal:
                     continue
 
@@ -206,9 +544,9 @@ cdef class CyURLData:
 
                 if match is not None:
                     if self.has_trace1:
-                        _log_trace1(_trace1, 'Matched target:`%s` with:`%r`', target, item)
+                        _log_trace1(_trace1, 'Matched target:`%s` with:`%r`', target, route.item)
 
-                    item_bunch = _bunchify(item)
+                    item_bunch = route.get_item_bunch()
 
                     # Cache that target but only if it's a static URL without dynamic variables
                     if (not has_target_in_cache) and matcher.is_static:
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2023, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+
+Micro-benchmarks of the built-in cache. This is not a test module, run it directly:
+
+    $ python bench_cache.py
+"""
+
+# stdlib
+from random import randrange
+from time import perf_counter
+
+# Zato
+from zato.cache import Cache
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+# How many keys to store in a cache for each run
+key_counts = [1_000, 100_000, 1_000_000]
+
+# How many operations to time in each run
+ops_per_run = 200_000
+
+# How many prefix/suffix/contains lookups to time in each run - without indexes, each of them checks every key
+pattern_ops_per_run = 100
+
+# Each customer has this many keys in the cache
+keys_per_customer = 10
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+def _new_cache(key_count:'int', **kwargs) -> 'Cache':
+    cache = Cache(key_count, **kwargs)
+    for idx in range(key_count):
+        cache.set('key.{}'.format(idx), idx, 0.0, False)
+    return cache
+
+# ################################################################################################################################
+
+def _report(name:'str', key_count:'int', elapsed:'float') -> 'None':
+    print('{:<24} keys:{:>9}  ops/s:{:>12,.0f}  us/op:{:>8.3f}'.format(
+        name, key_count, ops_per_run / elapsed, elapsed / ops_per_run * 1_000_000))
+
+# ################################################################################################################################
+
+def bench_get(key_count:'int') -> 'None':
+
+    cache = _new_cache(key_count)
+    keys = ['key.{}'.format(randrange(key_count)) for _ in range(ops_per_run)]
+
+    start = perf_counter()
+    for key in keys:
+        cache.get(key, None, False)
+    _report('get', key_count, perf_counter() - start)
+
+# ################################################################################################################################
+
+def bench_set_existing(key_count:'int') -> 'None':
+
+    cache = _new_cache(key_count)
+    keys = ['key.{}'.format(randrange(key_count)) for _ in range(ops_per_run)]
+
+    start = perf_counter()
+    for key in keys:
+        cache.set(key, key, 0.0, False)
+    _report('set (existing keys)', key_count, perf_counter() - start)
+
+# ################################################################################################################################
+
+def bench_set_evicting(key_count:'int') -> 'None':
+
+    # The cache is full so each of these new keys requires an eviction of the least recently used one
+    cache = _new_cache(key_count)
+    keys = ['new.{}'.format(idx) for idx in range(ops_per_run)]
+
+    start = perf_counter()
+    for key in keys:
+        cache.set(key, key, 0.0, False)
+    _report('set (evicting)', key_count, perf_counter() - start)
+
+# ################################################################################################################################
+
+def bench_delete_expired(key_count:'int', expiring_count:'int'=100) -> 'None':
+
+    # Most of the keys do not expire at all and only a small number of them is due to expire in each sweep
+    cache = _new_cache(key_count)
+    sweeps = 100
+    total = 0.0
+
+    for sweep in range(sweeps):
+        for idx in range(expiring_count):
+            cache.set('expiring.{}.{}'.format(sweep, idx), idx, 0.000001, False)
+        start = perf_counter()
+        cache.delete_expired()
+        total += perf_counter() - start
+
+    print('{:<24} keys:{:>9}  expiring/sweep:{:>6}  us/sweep:{:>10.1f}'.format(
+        'delete_expired', key_count, expiring_count, total / sweeps * 1_000_000))
+
+# ################################################################################################################################
+
+def bench_pattern_ops(key_count:'int', is_indexed:'bool') -> 'None':
+
+    label = 'indexed' if is_indexed else 'no index'
+    cache = Cache(key_count, index_prefix=is_indexed, index_suffix=is_indexed, index_contains=is_indexed)
+    customer_count = key_count // keys_per_customer
+
+    # Adding keys includes the cost of maintaining indexes
+    start = perf_counter()
+    for idx in range(key_count):
+        cache.set('customer:{}:order:{}'.format(idx % customer_count, idx), idx, 0.0, False)
+    elapsed = perf_counter() - start
+
+    print('{:<24} keys:{:>9}  us/op:{:>12.3f}'.format('set new key ({})'.format(label), key_count,
+        elapsed / key_count * 1_000_000))
+
+    customers = [randrange(customer_count) for _ in range(pattern_ops_per_run)]
+
+    for name, func, get_pattern in (
+        ('get_by_prefix', cache.get_by_prefix, 'customer:{}:'.format),
+        ('get_by_suffix', cache.get_by_suffix, ':order:{}'.format),
+        ('get_contains', cache.get_contains, ':{}:order'.format),
+        ):
+
+        patterns = [get_pattern(customer) for customer in customers]
+
+        start = perf_counter()
+        for pattern in patterns:
+            func(pattern, False, 0)
+        elapsed = perf_counter() - start
+
+        print('{:<24} keys:{:>9}  us/op:{:>12.3f}'.format('{} ({})'.format(name, label), key_count,
+            elapsed / pattern_ops_per_run * 1_000_000))
+
+# ################################################################################################################################
+
+def main() -> 'None':
+    for key_count in key_counts:
+        bench_get(key_count)
+        bench_set_existing(key_count)
+        bench_set_evicting(key_count)
+        bench_delete_expired(key_count)
+        bench_pattern_ops(key_count, False)
+        bench_pattern_ops(key_count, True)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    main()
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+
+Micro-benchmarks of SimpleIO parsing and serialisation, comparing functions generated for each definition
+with the generic parsers. This is not a test module, run it directly:
+
+    $ python bench_simpleio.py
+"""
+
+# stdlib
+from time import perf_counter
+from uuid import uuid4
+
+# Zato
+from zato.common.api import DATA_FORMAT
+from zato.common.test import BaseSIOTestCase
+from zato.server.service import Service
+
+# Zato - Cython
+from zato.simpleio import AsIs, Bool, CSV, CySimpleIO, Date, DateTime, Decimal, Dict, DictList, Float, Int, List, Opaque, \
+     Text, UUID
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+# How many operations to time in each run
+ops_per_run = 50_000
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+# The same definitions as in the simpleio_ tests
+class SmallService(Service):
+    class SimpleIO:
+        input = 'aaa', Int('bbb'), Opaque('ccc'), '-ddd', '-eee'
+        output = 'aaa', Int('bbb'), Opaque('ccc'), '-ddd', '-eee'
+
+class AllTypesService(Service):
+    class SimpleIO:
+        input = 'aaa', AsIs('bbb'), Bool('ccc'), CSV('ddd'), Date('eee'), DateTime('fff'), Decimal('ggg'), \
+            Dict('hhh', 'a', 'b', 'c'), DictList('iii', 'd', 'e', 'f'), Float('jjj'), Int('mmm'), List('nnn'), \
+            Opaque('ooo'), Text('ppp'), UUID('qqq')
+        output = 'aaa', AsIs('bbb'), Bool('ccc'), Float('jjj'), Int('mmm'), List('nnn'), Opaque('ooo'), Text('ppp'), \
+            UUID('qqq'), '-rrr', '-sss'
+
+small_request = {
+    'aaa': 'aaa-111',
+    'bbb': '222',
+    'ccc': 'ccc-333',
+    'eee': 'eee-444',
+}
+
+all_types_request = {
+    'aaa': 'aaa-111',
+    'bbb': 'bbb-222',
+    'ccc': 'true',
+    'ddd': '1,2,3',
+    'eee': '1999-12-31',
+    'fff': '1988-01-29T11:22:33.0000Z',
+    'ggg': '123.456',
+    'hhh': {'a': 1, 'b': 2, 'c': 3},
+    'iii': [{'d': 1, 'e': 2, 'f': 3}],
+    'jjj': '5.55',
+    'mmm': '666',
+    'nnn': [1, 2, 3],
+    'ooo': 'ooo-777',
+    'ppp': 'ppp-888',
+    'qqq': uuid4().hex,
+}
+
+all_types_response = {
+    'aaa': 'aaa-111',
+    'bbb': 'bbb-222',
+    'ccc': True,
+    'jjj': 5.55,
+    'mmm': 666,
+    'nnn': [1, 2, 3],
+    'ooo': 'ooo-777',
+    'ppp': b'ppp-888',
+    'qqq': uuid4(),
+    'rrr': 'rrr-999',
+}
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+def _report(name:'str', elapsed:'float') -> 'None':
+    print('{:<40} ops/s:{:>12,.0f}  us/op:{:>8.3f}'.format(name, ops_per_run / elapsed, elapsed / ops_per_run * 1_000_000))
+
+# ################################################################################################################################
+
+def _get_sio(class_:'type', is_compiled:'bool') -> 'CySimpleIO':
+
+    CySimpleIO.attach_sio(None, BaseSIOTestCase().get_server_config(), class_)
+    sio = class_._sio # type: ignore
+
+    if not is_compiled:
+        sio.input_parsers.clear()
+        sio.output_serialisers.clear()
+
+    return sio
+
+# ################################################################################################################################
+
+def bench_parse_input(name:'str', class_:'type', request:'dict', is_compiled:'bool') -> 'None':
+
+    sio = _get_sio(class_, is_compiled)
+
+    start = perf_counter()
+    for _ in range(ops_per_run):
+        _ = sio.parse_input(request, DATA_FORMAT.JSON)
+    _report('parse_input {} ({})'.format(name, 'compiled' if is_compiled else 'generic'), perf_counter() - start)
+
+# ################################################################################################################################
+
+def bench_get_output(name:'str', class_:'type', response:'dict', is_compiled:'bool') -> 'None':
+
+    sio = _get_sio(class_, is_compiled)
+
+    start = perf_counter()
+    for _ in range(ops_per_run):
+        _ = sio.get_output(response, DATA_FORMAT.DICT)
+    _report('get_output {} ({})'.format(name, 'compiled' if is_compiled else 'generic'), perf_counter() - start)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+
+    for is_compiled in (False, True):
+        bench_parse_input('small', SmallService, small_request, is_compiled)
+        bench_parse_input('all-types', AllTypesService, all_types_request, is_compiled)
+        bench_get_output('small', SmallService, small_request, is_compiled)
+        bench_get_output('all-types', AllTypesService, all_types_response, is_compiled)
+        print()
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2023, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+
+Micro-benchmarks of URL path matching. This is not a test module, run it directly:
+
+    $ python bench_url_dispatcher.py
+"""
+
+# stdlib
+from random import randrange
+from time import perf_counter
+
+# Zato
+from zato.common.api import MISC
+from zato.common.util.url_dispatcher import get_match_target
+from zato.url_dispatcher import CyURLData, Matcher
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+# How many channels to create for each run
+channel_counts = [100, 2_000, 10_000]
+
+# How many requests to match in each run
+ops_per_run = 20_000
+
+http_methods_allowed_re = '(GET|POST|PUT|DELETE|PATCH)'
+accept_any = 'haanyHTTP_SEPhaany'
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+def _get_channel_data(channel_count:'int') -> 'list':
+
+    out = []
+
+    for idx in range(channel_count):
+
+        # Most channels have path parameters
+        url_path = '/api/v1/object{}/{{id}}'.format(idx) if idx % 4 else '/api/v1/static{}'.format(idx)
+
+        item = {
+            'name': 'channel.{}'.format(idx),
+            'url_path': url_path,
+            'method': 'GET',
+            'soap_action': '',
+            'http_accept': None,
+            'is_internal': False,
+        }
+
+        item['match_target'] = get_match_target(item, http_methods_allowed_re=http_methods_allowed_re)
+        item['match_target_compiled'] = Matcher(item['match_target'], False)
+
+        out.append(item)
+
+    return out
+
+# ################################################################################################################################
+
+def _match_linear(channel_data:'list', url_path:'str', http_method:'str') -> 'object':
+    target = '{}{}{}{}{}{}'.format(MISC.SEPARATOR, http_method, MISC.SEPARATOR, accept_any, MISC.SEPARATOR, url_path)
+    for item in channel_data:
+        match = item['match_target_compiled'].match(target)
+        if match is not None:
+            return match
+
+# ################################################################################################################################
+
+def _report(name:'str', channel_count:'int', elapsed:'float') -> 'None':
+    print('{:<24} channels:{:>7}  ops/s:{:>12,.0f}  us/op:{:>10.3f}'.format(
+        name, channel_count, ops_per_run / elapsed, elapsed / ops_per_run * 1_000_000))
+
+# ################################################################################################################################
+
+def bench_match(channel_count:'int') -> 'None':
+
+    channel_data = _get_channel_data(channel_count)
+    url_data = CyURLData(channel_data)
+
+    url_paths = []
+    for _ in range(ops_per_run):
+        idx = randrange(channel_count)
+        url_paths.append('/api/v1/object{}/{}'.format(idx, idx) if idx % 4 else '/api/v1/static{}'.format(idx))
+
+    start = perf_counter()
+    for url_path in url_paths:
+        _match_linear(channel_data, url_path, 'GET')
+    _report('linear', channel_count, perf_counter() - start)
+
+    start = perf_counter()
+    for url_path in url_paths:
+        url_data.match(url_path, 'GET', accept_any)
+    _report('router', channel_count, perf_counter() - start)
+
+# ################################################################################################################################
+
+def main() -> 'None':
+    for channel_count in channel_counts:
+        bench_match(channel_count)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    main()
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+from collections.abc import Iterator
+
+# Bunch
+from bunch import Bunch
+
+# Zato
+from zato.common.api import DATA_FORMAT
+from zato.common.json_internal import loads as json_loads
+from zato.common.test import BaseSIOTestCase
+from zato.server.service import Service
+
+# Zato - Cython
+from zato.cy.reqresp.payload import SimpleIOPayload
+from zato.cy.reqresp.response import Response
+from zato.simpleio import CySimpleIO, Int, SerialisationError
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import any_, anylist
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class ResponseStreamTestCase(BaseSIOTestCase):
+
+    def setUp(self) -> 'None':
+        super().setUp()
+
+        # How many rows have been produced so far
+        self.rows_produced = 0
+
+# ################################################################################################################################
+
+    def get_response(self, data_format:'str', response_elem:'any_'=None) -> 'Response':
+
+        class MyService(Service):
+            class SimpleIO:
+                output = 'aaa', Int('bbb'), '-ccc'
+
+        if response_elem:
+            MyService.SimpleIO.response_elem = response_elem
+
+        CySimpleIO.attach_sio(None, self.get_server_config(), MyService)
+
+        response = Response()
+        response.init('abc', MyService._sio, data_format)
+
+        return response
+
+# ################################################################################################################################
+
+    def get_rows(self, row_list:'anylist') -> 'any_':
+        for row in row_list:
+            self.rows_produced += 1
+            yield row
+
+# ################################################################################################################################
+
+    def test_json(self) -> 'None':
+
+        response = self.get_response(DATA_FORMAT.JSON)
+        response.payload = self.get_rows([{'aaa': 'aaa-1', 'bbb': '1'}, Bunch(aaa='aaa-2', bbb=2, ccc='ccc-2')])
+
+        self.assertIsInstance(response.payload, Iterator)
+
+        # Nothing is produced until the response is consumed ..
+        self.assertEqual(self.rows_produced, 0)
+
+        # .. and then each row becomes a separate chunk.
+        chunks = list(response.payload)
+
+        self.assertEqual(len(chunks), 4)
+        self.assertListEqual(json_loads(''.join(chunks)), [
+            {'aaa': 'aaa-1', 'bbb': 1},
+            {'aaa': 'aaa-2', 'bbb': 2, 'ccc': 'ccc-2'},
+        ])
+
+# ################################################################################################################################
+
+    def test_json_response_elem(self) -> 'None':
+
+        response = self.get_response(DATA_FORMAT.JSON, 'my_response')
+
+        # Objects other than dicts have their attributes extracted, just like when they are assigned in a list
+        response.payload = self.get_rows([Bunch(aaa='aaa-1', bbb=1), type('MyRow', (), {'aaa': 'aaa-2', 'bbb': 2})()])
+
+        self.assertDictEqual(json_loads(''.join(response.payload)), {
+            'my_response': [
+                {'aaa': 'aaa-1', 'bbb': 1},
+                {'aaa': 'aaa-2', 'bbb': 2},
+            ]
+        })
+
+        # An empty iterator is an empty list
+        response = self.get_response(DATA_FORMAT.JSON, 'my_response')
+        response.payload = self.get_rows([])
+
+        self.assertDictEqual(json_loads(''.join(response.payload)), {'my_response': []})
+
+# ################################################################################################################################
+
+    def test_csv(self) -> 'None':
+
+        response = self.get_response(DATA_FORMAT.CSV)
+        response.payload = self.get_rows([{'aaa': 'aaa-1', 'bbb': '1'}, {'aaa': 'aaa-2', 'bbb': 2, 'ccc': 'ccc-2'}])
+
+        chunks = list(response.payload)
+
+        # The header is sent along with the first row
+        self.assertListEqual([chunk.splitlines() for chunk in chunks], [
+            ['aaa,bbb,ccc', 'aaa-1,1,'],
+            ['aaa-2,2,ccc-2'],
+        ])
+
+# ################################################################################################################################
+
+    def test_dict_is_not_streamed(self) -> 'None':
+
+        response = self.get_response(DATA_FORMAT.DICT)
+        response.payload = self.get_rows([{'aaa': 'aaa-1', 'bbb': '1'}, {'aaa': 'aaa-2', 'bbb': 2}])
+
+        # Responses to services invoked internally are produced in one piece, as previously
+        self.assertIsInstance(response.payload, SimpleIOPayload)
+        self.assertListEqual(response.payload.getvalue(), [
+            {'aaa': 'aaa-1', 'bbb': 1},
+            {'aaa': 'aaa-2', 'bbb': 2},
+        ])
+
+# ################################################################################################################################
+
+    def test_get_output(self) -> 'None':
+
+        response = self.get_response(DATA_FORMAT.JSON)
+        sio = response.sio # type: any_
+
+        # Iterators given directly on input are lists too, no matter the data format
+        for data_format in DATA_FORMAT.JSON, DATA_FORMAT.DICT:
+            out = sio.get_output(self.get_rows([{'aaa': 'aaa-1', 'bbb': '1'}, {'aaa': 'aaa-2', 'bbb': 2}]), data_format, False)
+            self.assertListEqual(out, [
+                {'aaa': 'aaa-1', 'bbb': 1},
+                {'aaa': 'aaa-2', 'bbb': 2},
+            ])
+
+# ################################################################################################################################
+
+    def test_required_elem_missing(self) -> 'None':
+
+        response = self.get_response(DATA_FORMAT.JSON)
+        response.payload = self.get_rows([{'aaa': 'aaa-1', 'bbb': '1'}, {'aaa': 'aaa-2'}])
+
+        with self.assertRaises(SerialisationError) as ctx:
+            _ = list(response.payload)
+
+        self.assertIn('Required element `bbb` missing', ctx.exception.args[0])
+
+# ################################################################################################################################
+# ################################################################################################################################
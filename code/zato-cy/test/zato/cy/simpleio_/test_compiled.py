@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+from uuid import uuid4
+
+# Zato
+from zato.common.api import DATA_FORMAT
+from zato.common.marshal_.api import ElementMissing
+from zato.common.test import BaseSIOTestCase
+from zato.server.service import Service
+
+# Zato - Cython
+from zato.simpleio import backward_compat_default_value, Bool, CySimpleIO, Date, Dict, Int, List, SerialisationError, Text, \
+     UUID
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class CompiledParsersTestCase(BaseSIOTestCase):
+
+    def get_service_class(self) -> 'type':
+
+        class MyService(Service):
+            class SimpleIO:
+                input = 'aaa', Int('bbb'), '-ccc', Bool('-ddd'), List('-eee'), Dict('-fff', 'a', '-b'), UUID('-ggg'), \
+                    Date('-hhh'), '-iii'
+                output = 'aaa', Int('bbb'), '-ccc', Text('-ddd'), UUID('-eee')
+                skip_empty_keys = 'iii'
+
+        CySimpleIO.attach_sio(None, self.get_server_config(), MyService)
+
+        return MyService
+
+# ################################################################################################################################
+
+    def test_parsers_are_compiled(self) -> 'None':
+
+        sio = self.get_service_class()._sio
+
+        self.assertListEqual(sorted(sio.input_parsers), sorted([DATA_FORMAT.JSON, DATA_FORMAT.DICT, DATA_FORMAT.FORM_DATA]))
+        self.assertListEqual(sorted(sio.output_serialisers), sorted([DATA_FORMAT.CSV, DATA_FORMAT.DICT]))
+
+        # Each new definition has its own functions, e.g. each time a service is hot-deployed
+        self.assertIsNot(self.get_service_class()._sio.input_parsers[DATA_FORMAT.JSON], sio.input_parsers[DATA_FORMAT.JSON])
+
+# ################################################################################################################################
+
+    def test_same_result_as_generic(self) -> 'None':
+
+        compiled_sio = self.get_service_class()._sio
+
+        generic_sio = self.get_service_class()._sio
+        generic_sio.input_parsers.clear()
+        generic_sio.output_serialisers.clear()
+
+        request_list = [
+            {'aaa': 'aaa-1', 'bbb': '123'},
+            {'aaa': 'aaa-2', 'bbb': 456, 'ccc': 'ccc-2', 'ddd': 'true', 'eee': [1, 2], 'fff': {'a': 1}, 'ggg': uuid4().hex,
+             'hhh': '2024-01-02', 'iii': 'iii-2'},
+            {'aaa': '', 'bbb': '0', 'ddd': '', 'iii': ''},
+        ]
+
+        for request in request_list:
+            for data_format in (DATA_FORMAT.JSON, DATA_FORMAT.DICT):
+                expected = generic_sio.parse_input(request, data_format)
+                self.assertDictEqual(compiled_sio.parse_input(request, data_format), expected)
+
+        # Optional elements get default values but they are not skipped if configured only for output
+        self.assertEqual(compiled_sio.parse_input(request_list[0], DATA_FORMAT.JSON).ccc, backward_compat_default_value)
+        self.assertIn('iii', compiled_sio.parse_input(request_list[0], DATA_FORMAT.JSON))
+
+        # Extra keys are used but the input is not modified
+        request = dict(request_list[0])
+        extra = {'bbb': '789', 'zzz': 'zzz-1'}
+
+        result = compiled_sio.parse_input(request, DATA_FORMAT.JSON, extra=extra)
+        self.assertEqual(result.bbb, 789)
+        self.assertDictEqual(request, request_list[0])
+
+        response = [
+            {'aaa': 'aaa-1', 'bbb': '123'},
+            {'aaa': 'aaa-2', 'bbb': 456, 'ccc': 'ccc-2', 'ddd': b'ddd-2', 'eee': uuid4()},
+        ]
+
+        for data_format in (DATA_FORMAT.JSON, DATA_FORMAT.DICT, DATA_FORMAT.CSV):
+            self.assertEqual(compiled_sio.get_output(response, data_format), generic_sio.get_output(response, data_format))
+
+# ################################################################################################################################
+
+    def test_skip_empty_input(self) -> 'None':
+
+        class MyService(Service):
+            class SimpleIO:
+                input = 'aaa', '-bbb', '-ccc', '-ddd'
+
+                class SkipEmpty:
+                    input = True
+                    force_empty_input = 'ccc'
+
+        CySimpleIO.attach_sio(None, self.get_server_config(), MyService)
+
+        result = MyService._sio.parse_input({'aaa': '', 'bbb': ''}, DATA_FORMAT.JSON)
+        self.assertDictEqual(result, {'ccc': backward_compat_default_value})
+
+# ################################################################################################################################
+
+    def test_errors(self) -> 'None':
+
+        sio = self.get_service_class()._sio
+
+        with self.assertRaises(ElementMissing) as ctx:
+            sio.parse_input({'aaa': 'aaa-1'}, DATA_FORMAT.JSON)
+        self.assertEqual(ctx.exception.args[0], 'bbb')
+
+        with self.assertRaises(SerialisationError) as ctx:
+            sio.get_output({'aaa': 'aaa-1'}, DATA_FORMAT.JSON)
+        self.assertIn('Required element `bbb` missing', ctx.exception.args[0])
+
+        with self.assertRaises(SerialisationError) as ctx:
+            sio.get_output({'aaa': 'aaa-1', 'bbb': 'abc'}, DATA_FORMAT.JSON)
+        self.assertIn('while serialising `abc`', ctx.exception.args[0])
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -12,6 +12,9 @@ from time import sleep
 from unittest import main as unittest_main, TestCase
 from uuid import uuid4
 
+# Bunch
+from bunch import Bunch
+
 # Zato
 from zato.cache import Cache, KeyExpiredError
 from zato.common.py23_ import maxint
@@ -274,7 +277,7 @@ class CacheTestCace(TestCase):
         key2, expected2 = 'key2', 'value2'
         key3, expected3 = 'key3', 'value3'
 
-        c = Cache(max_size)
+        c = Cache(max_size, track_positions=True)
         c.set(key1, expected1, 5.0, None)
         c.set(key2, expected2, 5.0, None)
         c.set(key3, expected3, 5.0, None)
@@ -315,6 +318,71 @@ class CacheTestCace(TestCase):
         self.assertEqual(c.hits_per_position[0], 6)
         self.assertEqual(c.hits_per_position[1], 1)
 
+# ################################################################################################################################
+
+    def test_track_positions_config(self):
+
+        config = Bunch(max_size=2, max_item_size=0, extend_expiry_on_get=True, extend_expiry_on_set=True)
+
+        c = Cache()
+        c.set('key1', 'value1', 0.0, None)
+
+        # Positions of hits are tracked only if the cache definition says so ..
+        config.track_positions = True
+        c.update_config(config)
+
+        c.get('key1', None, False)
+        self.assertDictEqual(c.hits_per_position, {0:1, 1:0})
+
+        # .. and they are not anymore once it no longer does.
+        config.track_positions = False
+        c.update_config(config)
+
+        c.get('key1', None, False)
+        self.assertDictEqual(c.hits_per_position, {})
+
+# ################################################################################################################################
+
+    def test_keys_by_position(self):
+
+        c = Cache()
+        c.set('key1', 'value1', 0.0, None)
+        c.set('key2', 'value2', 0.0, None)
+        c.set('key3', 'value3', 0.0, None)
+
+        self.assertListEqual(c.keys_by_position(), ['key3', 'key2', 'key1'])
+
+        # Reading a key makes it the most recently used one
+        c.get('key1', None, False)
+        self.assertListEqual(c.keys_by_position(), ['key1', 'key3', 'key2'])
+
+        # Positions are not tracked by default but they are still computed if details are requested
+        returned = c.get('key2', None, True)
+        self.assertEqual(returned.position, 2)
+        self.assertDictEqual(c.hits_per_position, {})
+        self.assertListEqual(c.keys_by_position(), ['key2', 'key1', 'key3'])
+
+        c.delete('key1')
+        self.assertListEqual(c.keys_by_position(), ['key2', 'key3'])
+
+# ################################################################################################################################
+
+    def test_set_eviction_after_get(self):
+
+        c = Cache(2)
+        c.set('key1', 'value1', 0.0, None)
+        c.set('key2', 'value2', 0.0, None)
+
+        # key1 is now the most recently used one so it is key2 that will be evicted
+        c.get('key1', None, False)
+        c.set('key3', 'value3', 0.0, None)
+
+        self.assertEqual(len(c), 2)
+        self.assertIn('key1', c)
+        self.assertNotIn('key2', c)
+        self.assertIn('key3', c)
+        self.assertListEqual(c.keys_by_position(), ['key3', 'key1'])
+
 # ################################################################################################################################
 
     def test_del(self):
@@ -358,6 +426,68 @@ class CacheTestCace(TestCase):
         self.assertIn(key2, c)
         self.assertNotIn(key3, c)
 
+# ################################################################################################################################
+
+    def test_delete_expired_extended_expiry(self):
+
+        c = Cache(extend_expiry_on_get=True)
+        c.set('key1', 'value1', 0.1, None)
+        c.set('key2', 'value2', 0.1, None)
+
+        sleep(0.06)
+
+        # Reading key1 extends its expiration so only key2 will be deleted below
+        c.get('key1', None, False)
+
+        sleep(0.06)
+
+        deleted = c.delete_expired()
+        self.assertListEqual(deleted, ['key2'])
+        self.assertIn('key1', c)
+
+        # key1 is still in the expiry heap, under its new deadline
+        self.assertEqual(len(c._expiry_heap), 1)
+
+        sleep(0.1)
+
+        deleted = c.delete_expired()
+        self.assertListEqual(deleted, ['key1'])
+        self.assertEqual(len(c), 0)
+        self.assertEqual(len(c._expiry_heap), 0)
+
+# ################################################################################################################################
+
+    def test_delete_expired_stats(self):
+
+        c = Cache()
+        c.set('key1', 'value1', 0.01, None)
+        c.set('key2', 'value2', 0.01, None)
+        c.set('key3', 'value3', 0.0, None)
+
+        # Deleting a key or resetting its expiration leaves a stale heap item that must be ignored
+        c.delete('key1')
+        c.set('key2', 'value2', 0.0, None)
+
+        sleep(0.02)
+
+        deleted = c.delete_expired()
+        self.assertListEqual(deleted, [])
+        self.assertEqual(len(c), 2)
+
+        c.set('key4', 'value4', 0.01, None)
+        sleep(0.02)
+
+        deleted = c.delete_expired()
+        self.assertListEqual(deleted, ['key4'])
+
+        stats = c.get_stats()
+        self.assertEqual(stats['size'], 2)
+        self.assertEqual(stats['sweeps'], 2)
+        self.assertEqual(stats['expired_total'], 1)
+        self.assertEqual(stats['last_sweep_expired'], 1)
+        self.assertEqual(stats['expiry_heap_size'], 0)
+        self.assertGreaterEqual(stats['last_sweep_duration'], 0.0)
+
 # ################################################################################################################################
 
     def test_get_deletes_expired_key(self):
@@ -474,6 +604,78 @@ class CacheTestCace(TestCase):
         returned1 = c.get(key1, None, False)
         self.assertIs(returned1, expected1)
 
+# ################################################################################################################################
+
+    def _check_pattern_ops(self, c):
+
+        for idx in range(60):
+            c.set('customer:{}:order:{}'.format(idx % 3, idx), idx, 0.0, None)
+        c.set(123, 123, 0.0, None)
+
+        self.assertListEqual(sorted(c.get_by_prefix('customer:1:', False, 0).values()), list(range(1, 60, 3)))
+        self.assertListEqual(sorted(c.get_by_suffix(':order:7', False, 0).values()), [7])
+        self.assertListEqual(sorted(c.get_contains('order:5', False, 0).values()), [5, 50, 51, 52, 53, 54, 55, 56, 57, 58, 59])
+        self.assertListEqual(sorted(c.get_contains('r:5', False, 0).values()), [5, 50, 51, 52, 53, 54, 55, 56, 57, 58, 59])
+        self.assertListEqual(sorted(c.get_contains_all(['r:2:', 'der:2'], False, 0).values()), [2, 20, 23, 26, 29])
+        self.assertListEqual(sorted(c.get_contains_any(['er:33', 'er:44'], False, 0).values()), [33, 44])
+
+        self.assertTrue(c.expire_by_suffix(':order:8', 10.0, 0))
+        self.assertEqual(c.get('customer:2:order:8', None, True).expiry, 10.0)
+
+        deleted = c.delete_by_prefix('customer:0:', True, 0)
+        self.assertListEqual(sorted(deleted.values()), list(range(0, 60, 3)))
+        self.assertDictEqual(c.get_by_prefix('customer:0:', False, 0), {})
+        self.assertDictEqual(c.get_contains('customer:0:', False, 0), {})
+        self.assertEqual(len(c), 41)
+
+        c.set_by_prefix('customer:1:', 'new', 0.0, False, None, False, 0)
+        self.assertListEqual(list(set(c.get_by_prefix('customer:1:', False, 0).values())), ['new'])
+
+        c.clear()
+        self.assertDictEqual(c.get_by_prefix('customer:', False, 0), {})
+
+# ################################################################################################################################
+
+    def test_pattern_ops_no_index(self):
+        self._check_pattern_ops(Cache())
+
+# ################################################################################################################################
+
+    def test_pattern_ops_indexed(self):
+        self._check_pattern_ops(Cache(index_prefix=True, index_suffix=True, index_contains=True))
+
+# ################################################################################################################################
+
+    def test_pattern_ops_indexed_eviction(self):
+
+        c = Cache(max_size=10, index_prefix=True, index_suffix=True, index_contains=True)
+
+        for idx in range(20):
+            c.set('key.{:02}'.format(idx), idx, 0.0, None)
+
+        # Evicted keys are no longer found in indexes
+        self.assertListEqual(sorted(c.get_by_prefix('key.', False, 0).values()), list(range(10, 20)))
+        self.assertListEqual(sorted(c.get_by_suffix('1', False, 0).values()), [11])
+        self.assertListEqual(sorted(c.get_contains('ey.0', False, 0).values()), [])
+
+# ################################################################################################################################
+
+    def test_set_key_indexes(self):
+
+        c = Cache()
+        c.set('abc.1', 1, 0.0, None)
+        c.set('xyz.2', 2, 0.0, None)
+
+        # Indexes are built out of keys already in the cache
+        c.set_key_indexes(True, True, True)
+        self.assertDictEqual(c.get_by_prefix('abc', False, 0), {'abc.1': 1})
+        self.assertDictEqual(c.get_by_suffix('.2', False, 0), {'xyz.2': 2})
+        self.assertDictEqual(c.get_contains('yz.', False, 0), {'xyz.2': 2})
+        self.assertEqual(len(c.get_by_prefix('', False, 1)), 1)
+
+        c.set_key_indexes(False, False, False)
+        self.assertDictEqual(c.get_by_prefix('abc', False, 0), {'abc.1': 1})
+
 # ################################################################################################################################
 
 if __name__ == '__main__':
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2023, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+from unittest import main, TestCase
+
+# Zato
+from zato.common.api import MISC
+from zato.common.util.url_dispatcher import get_match_target
+from zato.url_dispatcher import CyURLData, Matcher
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import any_, anydict, anylist
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+http_methods_allowed_re = '(GET|POST|PUT|DELETE|PATCH)'
+accept_any = 'haanyHTTP_SEPhaany'
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+def get_channel(name:'str', url_path:'str', method:'str'='', match_slash:'bool'=True, is_internal:'bool'=False) -> 'anydict':
+
+    item = {
+        'name': name,
+        'url_path': url_path,
+        'method': method,
+        'soap_action': '',
+        'http_accept': None,
+        'is_internal': is_internal,
+        'match_slash': match_slash,
+    }
+
+    item['match_target'] = get_match_target(item, http_methods_allowed_re=http_methods_allowed_re)
+    item['match_target_compiled'] = Matcher(item['match_target'], match_slash)
+
+    return item
+
+# ################################################################################################################################
+
+def match_linear(channel_data:'anylist', url_path:'str', http_method:'str') -> 'any_':
+    """ Matches URL paths the way it was done before the router existed, by trying each channel in turn.
+    """
+    sep = MISC.SEPARATOR
+    target = '{}{}{}{}{}{}'.format(sep, http_method, sep, accept_any, sep, url_path)
+    needs_user = not url_path.startswith('/zato')
+
+    channel_data = sorted(channel_data, key=lambda item: (item['is_internal'], item['name']))
+
+    for item in channel_data:
+        matcher = item['match_target_compiled']
+        if needs_user and matcher.is_internal:
+            continue
+        match = matcher.match(target)
+        if match is not None:
+            return match, item['name']
+
+    return None, None
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class URLDispatcherTestCase(TestCase):
+
+    def get_channel_data(self) -> 'anylist':
+        return [
+            get_channel('customer.get', '/api/customer/{id}', 'GET', match_slash=False),
+            get_channel('customer.update', '/api/customer/{id}', 'PUT', match_slash=False),
+            get_channel('customer.order', '/api/customer/{id}/order/{order_id}', match_slash=False),
+            get_channel('customer.list', '/api/customer'),
+            get_channel('customer.z.any', '/api/customer/{path}'),
+            get_channel('file.get', '/api/file/{name}.json', match_slash=False),
+            get_channel('dotted', '/api/v1.0/ping'),
+            get_channel('parens', '/api/(legacy)/ping'),
+            get_channel('zato.ping', '/zato/ping', is_internal=True),
+            get_channel('zato.api.invoke', '/zato/api/invoke/{service_name}', 'POST', is_internal=True),
+        ]
+
+# ################################################################################################################################
+
+    def test_same_as_linear_matching(self) -> 'None':
+
+        channel_data = self.get_channel_data()
+        url_data = CyURLData(channel_data)
+
+        url_paths = [
+            '/api/customer', '/api/customer/', '/api/customer/123', '/api/customer/123/order/456',
+            '/api/customer/123/order', '/api/customer/a/b/c', '/api/file/abc.json', '/api/file/abc.xml',
+            '/api/v1.0/ping', '/api/v1x0/ping', '/api/(legacy)/ping', '/api/legacy/ping', '/zato/ping',
+            '/zato/api/invoke/zato.ping', '/zato/api/invoke/zato/ping', '/nothing', '/', '',
+        ]
+
+        for url_path in url_paths:
+            for http_method in ['GET', 'POST', 'PUT', 'DELETE']:
+
+                expected_match, expected_name = match_linear(channel_data, url_path, http_method)
+
+                url_data.url_path_cache.clear()
+                match, item = url_data.match(url_path, http_method, accept_any)
+
+                self.assertEqual(match, expected_match, (url_path, http_method))
+                self.assertEqual(item['name'] if item else None, expected_name, (url_path, http_method))
+
+# ################################################################################################################################
+
+    def test_match_params(self) -> 'None':
+
+        url_data = CyURLData(self.get_channel_data())
+
+        match, item = url_data.match('/api/customer/123/order/456', 'GET', accept_any)
+        self.assertDictEqual(match, {'id': '123', 'order_id': '456'})
+        self.assertEqual(item.name, 'customer.order')
+
+        # The channel with a specific method is tried first because of its name ..
+        match, item = url_data.match('/api/customer/123', 'GET', accept_any)
+        self.assertEqual(item.name, 'customer.get')
+
+        # .. but it does not match other methods.
+        match, item = url_data.match('/api/customer/123', 'DELETE', accept_any)
+        self.assertEqual(item.name, 'customer.z.any')
+        self.assertDictEqual(match, {'path': '123'})
+
+        # Items are bunchified only once
+        _, item1 = url_data.match('/api/customer/1/order/2', 'GET', accept_any)
+        _, item2 = url_data.match('/api/customer/3/order/4', 'GET', accept_any)
+        self.assertIs(item1, item2)
+
+# ################################################################################################################################
+
+    def test_add_remove_channel(self) -> 'None':
+
+        channel_data = self.get_channel_data()
+        url_data = CyURLData(channel_data)
+
+        _, item = url_data.match('/api/customer/123/order/456', 'GET', accept_any)
+        self.assertEqual(item.name, 'customer.order')
+
+        # Remove a channel ..
+        for channel_item in channel_data:
+            if channel_item['name'] == 'customer.order':
+                channel_data.remove(channel_item)
+                url_data.remove_channel(channel_item)
+                break
+
+        # .. the next one in the order matches now ..
+        _, item = url_data.match('/api/customer/123/order/456', 'GET', accept_any)
+        self.assertEqual(item.name, 'customer.z.any')
+
+        # .. add a channel that is first in the order ..
+        channel_item = get_channel('customer.a.order', '/api/customer/{id}/order/{order_id}', 'GET', match_slash=False)
+        channel_data.append(channel_item)
+        url_data.add_channel(channel_item)
+
+        _, item = url_data.match('/api/customer/123/order/456', 'GET', accept_any)
+        self.assertEqual(item.name, 'customer.a.order')
+
+        # .. and remove all of them.
+        for channel_item in channel_data:
+            url_data.remove_channel(channel_item)
+
+        self.assertEqual(url_data.router.get_all(), [])
+        self.assertEqual(url_data.match('/api/customer', 'GET', accept_any), (None, None))
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    _ = main()
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -33,6 +33,7 @@ from zato.common.marshal_.api import Model
 from zato.common.odb.query.cleanup import delete_queue_messages, delete_topic_messages, \
     get_topic_messages_already_expired, get_topic_messages_with_max_retention_reached, \
     get_topic_messages_without_subscribers, get_subscriptions
+from zato.common.odb.query.pubsub.cursor import get_cursor
 from zato.common.odb.query.pubsub.delivery import get_sql_msg_ids_by_sub_key
 from zato.common.odb.query.pubsub.topic import get_topics_basic_data
 from zato.common.typing_ import cast_, list_
@@ -365,8 +366,17 @@ class CleanupManager:
 
         # Always create a new session so as not to block the database
         with closing(self.config.odb.session()) as session: # type: ignore
-            sk_queue_msg_list = get_sql_msg_ids_by_sub_key(
-                session, cluster_id, sub_key, last_sql_run, pub_time_max, include_unexpired_only=False, needs_result=True)
+
+            # Subscriptions reading messages from topic logs have no queue messages to delete. Their cursors are deleted
+            # along with them and the messages stay in their topics until they are cleaned up as topic messages.
+            if get_cursor(session, sub_key):
+                self.logger.info('%s: Subscription `%s` reads messages from its topic log', task_id, sub_key)
+                sk_queue_msg_list = []
+
+            else:
+                sk_queue_msg_list = get_sql_msg_ids_by_sub_key(
+                    session, cluster_id, sub_key, last_sql_run, pub_time_max, include_unexpired_only=False, needs_result=True,
+                    may_have_cursor=False)
 
         # Convert SQL results to a dict that we can easily work with
         sk_queue_msg_list = [elem._asdict() for elem in sk_queue_msg_list]
@@ -20,7 +20,7 @@ from traceback import format_exc
 from uuid import uuid4
 
 # gevent
-from gevent import sleep
+from gevent import joinall, sleep, spawn
 from gevent.lock import RLock
 
 # Needed for Cassandra
@@ -54,6 +54,7 @@ from zato.common.odb.api import PoolStore
 from zato.common.odb.post_process import ODBPostProcess
 from zato.common.pubsub import SkipDelivery
 from zato.common.rate_limiting import RateLimiting
+from zato.common.rate_limiting.common import Const as RateLimitingConst
 from zato.common.typing_ import cast_, intnone, optional
 from zato.common.util.api import absolutize, get_config_from_file, get_kvdb_config_for_log, get_user_config_name, \
     fs_safe_name, hot_deploy, invoke_startup_services as _invoke_startup_services, make_list_from_string_list, new_cid, \
@@ -1109,6 +1110,8 @@ class ParallelServer(BrokerMessageReceiver, ConfigLoader, HTTPHandler):
         self.rate_limiting.cluster_id = cast_('int', self.cluster_id)
         self.rate_limiting.global_lock_func = self.zato_lock_manager
         self.rate_limiting.sql_session_func = self.odb.session
+        self.rate_limiting.lease_ratio = float(
+            self.fs_server_config.misc.get('rate_limit_lease_ratio') or RateLimitingConst.lease_ratio)
 
         # Set up rate limiting for ConfigDict-based objects, which includes everything except for:
         # * services  - configured in ServiceStore
@@ -1303,9 +1306,23 @@ class ParallelServer(BrokerMessageReceiver, ConfigLoader, HTTPHandler):
             callback_func=self.on_ipc_invoke_callback,
         )
 
-        # .. we can now store the information about what IPC port to use with this PID.
+        # .. we can now store the information about what IPC port to use with this PID ..
         save_ipc_pid_port(self.cluster_name, self.name, self.pid, bind_port)
 
+        # .. other processes of this server can also invoke us through a Unix socket, if it is available.
+        use_unix_socket = self.fs_server_config.main.get('ipc_use_unix_socket', IPC.Default.Use_Unix_Socket)
+        self.ipc_api.use_unix_socket = asbool(use_unix_socket) and is_posix
+
+        if self.ipc_api.use_unix_socket:
+            _:'any_' = spawn_greenlet(self.ipc_api.start_unix_server,
+                self.pid,
+                cluster_name=self.cluster_name,
+                server_name=self.name,
+                username=IPC.Credentials.Username,
+                password=ipc_password,
+                callback_func=self.on_ipc_invoke_callback,
+            )
+
 # ################################################################################################################################
 
     def _stop_after_timeout(self):
@@ -1578,11 +1595,11 @@ class ParallelServer(BrokerMessageReceiver, ConfigLoader, HTTPHandler):
 
 # ################################################################################################################################
 
-    def set_in_cache(self, cache_type:'str', cache_name:'str', key:'str', value:'any_') -> 'any_':
-        """ Sets a value in cache for input parameters.
+    def set_in_cache(self, cache_type:'str', cache_name:'str', key:'str', value:'any_', expiry:'float'=0.0) -> 'any_':
+        """ Sets a value in cache for input parameters, optionally with an expiry time in seconds.
         """
         cache = self.worker_store.cache_api.get_cache(cache_type, cache_name)
-        return cache.set(key, value) # type: ignore
+        return cache.set(key, value, expiry=expiry) # type: ignore
 
 # ################################################################################################################################
 
@@ -1625,9 +1642,18 @@ class ParallelServer(BrokerMessageReceiver, ConfigLoader, HTTPHandler):
             # Use current PID if none were received (this is required on Mac)
             pids = pids or [self.pid]
 
-            # Invoke each of them
-            for pid in pids:
-                pid_response = self.invoke_by_pid(service, request, pid, timeout=timeout, *args, **kwargs)
+            # Invoke all of them concurrently ..
+            greenlets = [spawn(self.invoke_by_pid, service, request, pid, timeout=timeout, *args, **kwargs) for pid in pids]
+            _ = joinall(greenlets)
+
+            # .. and collect their responses in the same order that the PIDs were in.
+            for pid, greenlet in zip(pids, greenlets):
+
+                if not greenlet.successful():
+                    logger.warning('PID invocation error `%s` (%s) `%s`', service, pid, greenlet.exception)
+                    continue
+
+                pid_response = greenlet.value
                 if pid_response.data is not None:
 
                     # If this is an internal service, we want to remove its root-level response element.
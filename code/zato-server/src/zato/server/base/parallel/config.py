@@ -498,11 +498,12 @@ class ConfigLoader:
                 rate_limit_config['parent_type'] = existing_config.parent_type
                 rate_limit_config['parent_name'] = existing_config.parent_name
 
-                self.rate_limiting.edit(object_type, object_name, rate_limit_config, rate_limit_def, is_exact)
+                self.rate_limiting.edit(object_type, object_name, rate_limit_config, rate_limit_def, is_exact,
+                    config['rate_limit_type'])
 
             # .. otherwise, we will be creating a new one
             else:
-                self.rate_limiting.create(rate_limit_config, rate_limit_def, is_exact)
+                self.rate_limiting.create(rate_limit_config, rate_limit_def, is_exact, config['rate_limit_type'])
 
         # We are not to have any rate limits, but it is possible that previously we were required to,
         # in which case this needs to be cleaned up.
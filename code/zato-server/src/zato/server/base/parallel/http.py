@@ -7,6 +7,7 @@ Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
 """
 
 # stdlib
+from collections.abc import Iterator
 from datetime import datetime
 from logging import getLogger, INFO
 from traceback import format_exc
@@ -26,7 +27,7 @@ from zato.common.util.api import new_cid
 
 if 0:
     from pytz.tzinfo import BaseTzInfo
-    from zato.common.typing_ import any_, callable_, list_, stranydict
+    from zato.common.typing_ import any_, callable_, iterator_, list_, stranydict
     from zato.server.base.parallel import ParallelServer
 
 # ################################################################################################################################
@@ -58,7 +59,7 @@ class HTTPHandler:
         _Access_Log_Date_Time_Format=Access_Log_Date_Time_Format, # type: str
         _no_remote_address=NO_REMOTE_ADDRESS, # type: str
         **kwargs:'any_'
-    ) -> 'list_[bytes]':
+    ) -> 'list_[bytes] | iterator_[bytes]':
         """ Handles incoming HTTP requests.
         """
 
@@ -126,12 +127,15 @@ class HTTPHandler:
 
         start_response(wsgi_environ['zato.http.response.status'], wsgi_environ['zato.http.response.headers'].items())
 
+        # .. streamed responses are sent in chunks, as they are produced, so we do not know their size upfront ..
+        is_stream = isinstance(payload, Iterator)
+
         if isinstance(payload, str):
             payload = payload.encode('utf-8')
 
         # .. this is reusable ..
         status_code = wsgi_environ['zato.http.response.status'].split()[0]
-        response_size = len(payload)
+        response_size = '-' if is_stream else len(payload)
 
         # .. this goes to the access log ..
         if self.needs_access_log:
@@ -171,7 +175,7 @@ class HTTPHandler:
                 logger.info(msg)
 
         # Now, return the response to our caller.
-        return [payload]
+        return payload if is_stream else [payload]
 
 # ################################################################################################################################
 # ################################################################################################################################
@@ -65,6 +65,7 @@ from zato.server.connection.email import IMAPAPI, IMAPConnStore, SMTPAPI, SMTPCo
 from zato.server.connection.ftp import FTPStore
 from zato.server.connection.http_soap.channel import RequestDispatcher, RequestHandler
 from zato.server.connection.http_soap.outgoing import HTTPSOAPWrapper, SudsSOAPWrapper
+from zato.server.connection.http_soap.resilience import config_keys as http_resilience_config_keys
 from zato.server.connection.http_soap.url_data import URLData
 from zato.server.connection.odoo import OdooWrapper
 from zato.server.connection.sap import SAPWrapper
@@ -598,9 +599,16 @@ class WorkerStore(_WorkerStoreBase):
             'serialization_type':config.serialization_type,
             'timeout':config.timeout,
             'content_type':config.content_type,
+            'cache_type':config.get('cache_type'),
+            'cache_name':config.get('cache_name'),
+            'cache_expiry':config.get('cache_expiry'),
         }
         wrapper_config.update(sec_config)
 
+        # Optional limits, circuit breaker and retries, all of which are opaque attributes
+        for name in http_resilience_config_keys:
+            wrapper_config[name] = config.get(name)
+
         # Key 'sec_tls_ca_cert_verify_strategy' was added in 3.2
         # so we need to handle cases when it exists or it does not.
         sec_tls_ca_cert_verify_strategy = config.get('sec_tls_ca_cert_verify_strategy')
@@ -11,8 +11,11 @@ from base64 import b64encode
 from logging import getLogger
 from traceback import format_exc
 
+# Bunch
+from bunch import Bunch
+
 # gevent
-from gevent import sleep, spawn
+from gevent import sleep, spawn, spawn_later
 from gevent.lock import RLock
 
 # python-memcached
@@ -27,6 +30,7 @@ from zato.common.api import CACHE, ZATO_NOT_GIVEN
 from zato.common.broker_message import CACHE as CACHE_BROKER_MSG
 from zato.common.typing_ import cast_
 from zato.common.util.api import parse_extra_into_dict
+from zato.server.connection.cache_shmem import SharedMemoryCache
 
 # Python 2/3 compatibility
 from zato.common.ext.future.utils import iteritems, itervalues
@@ -37,7 +41,7 @@ from zato.common.py23_ import pickle_dumps
 # ################################################################################################################################
 
 if 0:
-    from zato.common.typing_ import any_
+    from zato.common.typing_ import any_, anydict
 
 # ################################################################################################################################
 # ################################################################################################################################
@@ -78,6 +82,9 @@ for builtin_op in builtin_ops:
 
 default_get = ZATO_NOT_GIVEN # A singleton to indicate that no default for Cache.get was given on input
 
+# State changes that fully determine a key's state, i.e. any earlier pending change to the same key can be dropped
+_key_replacing_ops = {CACHE.STATE_CHANGED.SET, CACHE.STATE_CHANGED.DELETE}
+
 _no_key = 'zato-no-key'
 _no_value = 'zato-no-value'
 
@@ -90,11 +97,92 @@ class Cache:
     def __init__(self, config):
         self.config = config
         self.after_state_changed_callback = self.config.after_state_changed_callback
+        self.after_state_changed_batch_callback = self.config.after_state_changed_batch_callback
         self.needs_sync = self.config.sync_method != CACHE.SYNC_METHOD.NO_SYNC.id
         self.impl = _CyCache(self.config.max_size, self.config.max_item_size, self.config.extend_expiry_on_get,
-            self.config.extend_expiry_on_set)
+            self.config.extend_expiry_on_set, track_positions=self.config.get('track_positions', False),
+            index_prefix=self.config.get('index_prefix', False),
+            index_suffix=self.config.get('index_suffix', False), index_contains=self.config.get('index_contains', False))
+
+        # State changes waiting to be sent to other workers if sync_method is batched. Changes superseded by later ones
+        # to the same key are replaced with None and _sync_batch_by_key maps keys to their pending changes in _sync_batch.
+        self._sync_batch = []
+        self._sync_batch_by_key = {}
+        self._sync_batch_lock = RLock()
+        self._sync_batch_flush_scheduled = False
+        self._set_sync_batch_config(self.config)
+
         spawn(self._delete_expired)
 
+# ################################################################################################################################
+
+    def _set_sync_batch_config(self, config):
+        self.sync_batched = config.sync_method == CACHE.SYNC_METHOD.BATCHED.id
+        self.sync_batch_window = int(config.get('sync_batch_window') or CACHE.DEFAULT.SYNC_BATCH_WINDOW) / 1000.0
+        self.sync_batch_max_ops = int(config.get('sync_batch_max_ops') or CACHE.DEFAULT.SYNC_BATCH_MAX_OPS)
+
+# ################################################################################################################################
+
+    def _sync(self, op, data, _key_replacing_ops=_key_replacing_ops, _EXPIRE=CACHE.STATE_CHANGED.EXPIRE,
+        _CLEAR=CACHE.STATE_CHANGED.CLEAR):
+        """ Sends information about a state change to other worker processes, either immediately or, if sync_method is batched,
+        as part of a batch of changes that is sent after sync_batch_window milliseconds or once there are sync_batch_max_ops
+        changes in the batch. Changes to the same key are coalesced - only the latest one is sent.
+        """
+        if not self.sync_batched:
+            spawn(self.after_state_changed_callback, op, self.config.name, data)
+            return
+
+        with self._sync_batch_lock:
+
+            batch = self._sync_batch
+            by_key = self._sync_batch_by_key
+
+            # This change determines the key's state so anything still pending for that key can be dropped ..
+            if op in _key_replacing_ops:
+                for idx in by_key.pop(data['key'], ()):
+                    batch[idx] = None
+                by_key[data['key']] = [len(batch)]
+
+            # .. this one needs to be applied after what is already pending for that key ..
+            elif op == _EXPIRE:
+                by_key.setdefault(data['key'], []).append(len(batch))
+
+            # .. everything pending is going to be cleared anyway ..
+            elif op == _CLEAR:
+                batch[:] = []
+                by_key.clear()
+
+            # .. pattern-based changes may affect any key so nothing pending can be coalesced with what comes after them.
+            else:
+                by_key.clear()
+
+            batch.append((op, data))
+
+            if len(batch) >= self.sync_batch_max_ops:
+                self._sync_batch_flush_scheduled = True
+                spawn(self._flush_sync_batch)
+
+            elif not self._sync_batch_flush_scheduled:
+                self._sync_batch_flush_scheduled = True
+                spawn_later(self.sync_batch_window, self._flush_sync_batch)
+
+# ################################################################################################################################
+
+    def _flush_sync_batch(self):
+        """ Sends all the pending state changes to other worker processes in one message.
+        """
+        with self._sync_batch_lock:
+            batch = self._sync_batch
+            self._sync_batch = []
+            self._sync_batch_by_key = {}
+            self._sync_batch_flush_scheduled = False
+
+        items = [item for item in batch if item is not None]
+
+        if items:
+            self.after_state_changed_batch_callback(self.config.name, items)
+
 # ################################################################################################################################
 
     def __getitem__(self, key):
@@ -196,7 +284,7 @@ class Cache:
         meta_ref = {'key':key, 'value':value, 'expiry':expiry} if self.needs_sync else None
         value = self.impl.set(key, value, expiry, details, meta_ref)
         if self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, meta_ref)
+            self._sync(_OP, meta_ref)
 
         return value
 
@@ -212,7 +300,7 @@ class Cache:
         out = self.impl.set_by_prefix(key, value, expiry, False, meta_ref, return_found, limit)
 
         if meta_ref['_any_found'] and self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, {
+            self._sync(_OP, {
                 'key':key,
                 'value':value,
                 'expiry':expiry,
@@ -234,7 +322,7 @@ class Cache:
         out = self.impl.set_by_suffix(key, value, expiry, False, meta_ref, return_found, limit)
 
         if out and self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, {
+            self._sync(_OP, {
                 'key':key,
                 'value':value,
                 'expiry':expiry,
@@ -256,7 +344,7 @@ class Cache:
         out = self.impl.set_by_regex(key, value, expiry, False, meta_ref, return_found, limit)
 
         if out and self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, {
+            self._sync(_OP, {
                 'key':key,
                 'value':value,
                 'expiry':expiry,
@@ -278,7 +366,7 @@ class Cache:
         out = self.impl.set_contains(key, value, expiry, False, meta_ref, return_found, limit)
 
         if out and self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, {
+            self._sync(_OP, {
                 'key':key,
                 'value':value,
                 'expiry':expiry,
@@ -300,7 +388,7 @@ class Cache:
         out = self.impl.set_not_contains(key, value, expiry, False, meta_ref, return_found, limit)
 
         if out and self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, {
+            self._sync(_OP, {
                 'key':key,
                 'value':value,
                 'expiry':expiry,
@@ -322,7 +410,7 @@ class Cache:
         out = self.impl.set_contains_all(key, value, expiry, False, meta_ref, return_found, limit)
 
         if out and self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, {
+            self._sync(_OP, {
                 'key':key,
                 'value':value,
                 'expiry':expiry,
@@ -344,7 +432,7 @@ class Cache:
         out = self.impl.set_contains_any(key, value, expiry, False, meta_ref, return_found, limit)
 
         if out and self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, {
+            self._sync(_OP, {
                 'key':key,
                 'value':value,
                 'expiry':expiry,
@@ -366,7 +454,7 @@ class Cache:
                 raise
         else:
             if self.needs_sync:
-                spawn(self.after_state_changed_callback, _OP, self.config.name, {'key':key})
+                self._sync(_OP, {'key':key})
 
             return value
 
@@ -378,7 +466,7 @@ class Cache:
         """
         out = self.impl.delete_by_prefix(key, return_found, limit)
         if out and self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, {
+            self._sync(_OP, {
                 'key':key,
                 'limit':limit
             })
@@ -393,7 +481,7 @@ class Cache:
         """
         out = self.impl.delete_by_suffix(key, return_found, limit)
         if out and self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, {
+            self._sync(_OP, {
                 'key':key,
                 'limit':limit
             })
@@ -408,7 +496,7 @@ class Cache:
         """
         out = self.impl.delete_by_regex(key, return_found, limit)
         if out and self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, {
+            self._sync(_OP, {
                 'key':key,
                 'limit':limit
             })
@@ -423,7 +511,7 @@ class Cache:
         """
         out = self.impl.delete_contains(key, return_found, limit)
         if out and self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, {
+            self._sync(_OP, {
                 'key':key,
                 'limit':limit
             })
@@ -438,7 +526,7 @@ class Cache:
         """
         out = self.impl.delete_not_contains(key, return_found, limit)
         if out and self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, {
+            self._sync(_OP, {
                 'key':key,
                 'limit':limit
             })
@@ -453,7 +541,7 @@ class Cache:
         """
         out = self.impl.delete_contains_all(key, return_found, limit)
         if out and self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, {
+            self._sync(_OP, {
                 'key':key,
                 'limit':limit
             })
@@ -468,7 +556,7 @@ class Cache:
         """
         out = self.impl.delete_contains_any(key, return_found, limit)
         if out and self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, {
+            self._sync(_OP, {
                 'key':key,
                 'limit':limit
             })
@@ -484,7 +572,7 @@ class Cache:
         found_key = self.impl.expire(key, expiry, meta_ref)
 
         if self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, meta_ref)
+            self._sync(_OP, meta_ref)
 
         return found_key
 
@@ -495,7 +583,7 @@ class Cache:
         """
         out = self.impl.expire_by_prefix(key, expiry)
         if out and self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, {
+            self._sync(_OP, {
                 'key':key,
                 'expiry':expiry,
                 'limit':limit
@@ -510,7 +598,7 @@ class Cache:
         """
         out = self.impl.expire_by_suffix(key, expiry)
         if out and self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, {
+            self._sync(_OP, {
                 'key':key,
                 'expiry':expiry,
                 'limit':limit
@@ -525,7 +613,7 @@ class Cache:
         """
         out = self.impl.expire_by_regex(key, expiry)
         if out and self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, {
+            self._sync(_OP, {
                 'key':key,
                 'expiry':expiry,
                 'limit':limit
@@ -540,7 +628,7 @@ class Cache:
         """
         out = self.impl.expire_contains(key, expiry)
         if out and self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, {
+            self._sync(_OP, {
                 'key':key,
                 'expiry':expiry,
                 'limit':limit
@@ -555,7 +643,7 @@ class Cache:
         """
         out = self.impl.expire_not_contains(key, expiry)
         if out and self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, {
+            self._sync(_OP, {
                 'key':key,
                 'expiry':expiry,
                 'limit':limit
@@ -570,7 +658,7 @@ class Cache:
         """
         out = self.impl.expire_contains_all(key, expiry)
         if out and self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, {
+            self._sync(_OP, {
                 'key':key,
                 'expiry':expiry,
                 'limit':limit
@@ -585,7 +673,7 @@ class Cache:
         """
         out = self.impl.expire_contains_any(key, expiry)
         if out and self.needs_sync:
-            spawn(self.after_state_changed_callback, _OP, self.config.name, {
+            self._sync(_OP, {
                 'key':key,
                 'expiry':expiry,
                 'limit':limit
@@ -643,7 +731,7 @@ class Cache:
         self.impl.clear()
 
         if self.needs_sync:
-            spawn(self.after_state_changed_callback, _CLEAR, self.config.name, {})
+            self._sync(_CLEAR, {})
 
 # ################################################################################################################################
 
@@ -651,6 +739,20 @@ class Cache:
         self.needs_sync = self.config.sync_method != CACHE.SYNC_METHOD.NO_SYNC.id
         self.impl.update_config(config)
 
+        # Send out anything that was batched under the previous configuration
+        if self.sync_batched:
+            self._flush_sync_batch()
+
+        self._set_sync_batch_config(config)
+
+# ################################################################################################################################
+
+    def get_stats(self) -> 'anydict':
+        """ Returns usage statistics of this cache, including information about how many keys the most recent
+        expiration sweep deleted and how long it took.
+        """
+        return self.impl.get_stats()
+
 # ################################################################################################################################
 
     def _delete_expired(self, interval=5, _sleep=sleep):
@@ -666,7 +768,8 @@ class Cache:
                     _sleep(2)
                 else:
                     if deleted:
-                        logger.info('Cache `%s` deleted keys expired in the last %ss - %s', self.config.name, interval, deleted)
+                        logger.info('Cache `%s` deleted keys expired in the last %ss (%s in %.6fs) - %s',
+                            self.config.name, interval, len(deleted), self.impl.last_sweep_duration, deleted)
         except Exception:
             logger.warning('Exception in _delete_expired loop %s', format_exc())
 
@@ -820,6 +923,22 @@ class Cache:
         """
         self.impl.clear()
 
+# ################################################################################################################################
+
+    def sync_after_batch(self, data, _CLEAR=CACHE.STATE_CHANGED.CLEAR):
+        """ Invoked by Cache API to synchronizes this worker's cache after a batch of operations in another worker process.
+        Each change is applied by the same sync_after_* method that would have handled it had it not been batched.
+        """
+        for item in data['items']:
+            item = Bunch(item)
+            try:
+                if item.op == _CLEAR:
+                    self.sync_after_clear()
+                else:
+                    getattr(self, 'sync_after_{}'.format(item.op.lower()))(item)
+            except Exception:
+                logger.warning('Could not apply batched `%s` in cache `%s`, e:`%s`', item.op, self.config.name, format_exc())
+
 # ################################################################################################################################
 
 class _NotConfiguredAPI:
@@ -850,7 +969,33 @@ class CacheAPI:
 
 # ################################################################################################################################
 
-    def after_state_changed(self, op, cache_name, data, _broker_msg=builtin_op_to_broker_msg, _pickle_dumps=pickle_dumps):
+    def _pickle_state_change(self, data, _pickle_dumps=pickle_dumps):
+        """ Pickles keys and values of a state change that cannot be sent to other worker processes as they are.
+        """
+        key = data.get('key', _no_key)
+        value = data.get('value', _no_value)
+
+        if isinstance(key, basestring):
+            data['is_key_pickled'] = False
+        else:
+            data['is_key_pickled'] = True
+            data['key'] = _pickle_dumps(key)
+
+        if value:
+            if isinstance(value, basestring):
+                data['is_value_pickled'] = False
+            else:
+                data['is_value_pickled'] = True
+                value = _pickle_dumps(value)
+                value = b64encode(value)
+                value = value.decode('utf8')
+                data['value'] = value
+        else:
+            data['is_value_pickled'] = False
+
+# ################################################################################################################################
+
+    def after_state_changed(self, op, cache_name, data, _broker_msg=builtin_op_to_broker_msg):
         """ Callback method invoked by each cache if it requires synchronization with other worker processes.
         """
         try:
@@ -859,40 +1004,68 @@ class CacheAPI:
             data['cache_name'] = cache_name
             data['source_worker_id'] = self.server.worker_id
 
-            key = data.get('key', _no_key)
-            value = data.get('value', _no_value)
-
-            if isinstance(key, basestring):
-                data['is_key_pickled'] = False
-            else:
-                data['is_key_pickled'] = True
-                data['key'] = _pickle_dumps(key)
-
-            if value:
-                if isinstance(value, basestring):
-                    data['is_value_pickled'] = False
-                else:
-                    data['is_value_pickled'] = True
-                    value = _pickle_dumps(value)
-                    value = b64encode(value)
-                    value = value.decode('utf8')
-                    data['value'] = value
-            else:
-                data['is_value_pickled'] = False
-
+            self._pickle_state_change(data)
             self.server.broker_client.publish(data)
         except Exception:
             logger.warning('Could not run `%s` after_state_changed in cache `%s`, data:`%s`, e:`%s`',
                 op, cache_name, data, format_exc())
 
+# ################################################################################################################################
+
+    def after_state_changed_batch(self, cache_name, items,
+        _action=CACHE_BROKER_MSG.BUILTIN_STATE_CHANGED_BATCH.value):
+        """ Callback method invoked by caches whose sync_method is batched - sends a list of (op, data) state changes
+        to other worker processes in one message.
+        """
+        try:
+            out = []
+
+            for op, data in items:
+                data['op'] = op
+                self._pickle_state_change(data)
+                out.append(data)
+
+            self.server.broker_client.publish({
+                'action': _action,
+                'cache_name': cache_name,
+                'source_worker_id': self.server.worker_id,
+                'items': out,
+            })
+        except Exception:
+            logger.warning('Could not run after_state_changed_batch in cache `%s`, items:`%s`, e:`%s`',
+                cache_name, len(items), format_exc())
+
 # ################################################################################################################################
 
     def _create_builtin(self, config):
         """ A low-level method building a bCache object for built-in caches. Must be called with self.lock held.
         """
+        if config.get('storage') == CACHE.BUILTIN_STORAGE.SHARED_MEMORY.id:
+            server_key = '{}.{}'.format(self.server.cluster_id, self.server.name)
+            return SharedMemoryCache(config, server_key, self.server.deployment_key)
+
         config.after_state_changed_callback = self.after_state_changed
+        config.after_state_changed_batch_callback = self.after_state_changed_batch
         return Cache(config)
 
+# ################################################################################################################################
+
+    def _needs_new_builtin(self, cache, config):
+        """ Returns True if a built-in cache cannot be simply reconfigured after an edit but a new one needs to be created,
+        which is the case if it changes its storage or if it keeps it in shared memory whose layout changes.
+        """
+        is_shmem = config.get('storage') == CACHE.BUILTIN_STORAGE.SHARED_MEMORY.id
+
+        if is_shmem != isinstance(cache, SharedMemoryCache):
+            return True
+
+        if is_shmem:
+            return config.name != config.old_name or \
+                int(config.max_size) != cache.max_size or \
+                int(config.max_item_size) != cache.max_item_size
+
+        return False
+
 # ################################################################################################################################
 
     def _create_memcached(self, config):
@@ -946,7 +1119,14 @@ class CacheAPI:
         """
         if config.cache_type == CACHE.TYPE.BUILTIN:
             cache = self.caches[config.cache_type].pop(config.old_name)
-            cache.update_config(config)
+
+            if self._needs_new_builtin(cache, config):
+                if isinstance(cache, SharedMemoryCache):
+                    cache.close()
+                cache = self._create_builtin(config)
+            else:
+                cache.update_config(config)
+
             self._add_cache(config, cache)
         else:
             cache = self.caches[config.cache_type][config.old_name]
@@ -971,6 +1151,10 @@ class CacheAPI:
 
         if cache_type == CACHE.TYPE.BUILTIN:
             self._clear(cache_type, name)
+
+            # The region itself is left for other worker processes to detach from
+            if isinstance(cache, SharedMemoryCache):
+                cache.close()
         else:
             cache.disconnect_all()
 
@@ -1037,6 +1221,13 @@ class CacheAPI:
         """
         return len(self.caches[cache_type][name])
 
+# ################################################################################################################################
+
+    def get_stats(self, cache_type, name):
+        """ Returns usage statistics of a given cache.
+        """
+        return self.caches[cache_type][name].get_stats()
+
 # ################################################################################################################################
 
     def sync_after_set(self, cache_type, data):
@@ -1170,4 +1361,11 @@ class CacheAPI:
         """
         self.caches[cache_type][data.cache_name].sync_after_clear()
 
+# ################################################################################################################################
+
+    def sync_after_batch(self, cache_type, data):
+        """ Synchronizes the state of this worker's cache after a batch of operations in another worker process.
+        """
+        self.caches[cache_type][data.cache_name].sync_after_batch(data)
+
 # ################################################################################################################################
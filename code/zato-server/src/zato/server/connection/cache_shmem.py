@@ -0,0 +1,1342 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2023, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+import os
+from hashlib import sha256
+from logging import getLogger
+from mmap import mmap
+from re import compile as re_compile
+from struct import Struct
+from time import monotonic, time
+from traceback import format_exc
+from zlib import crc32
+
+# gevent
+from gevent import sleep, spawn
+
+try:
+    import posix_ipc as ipc
+except ImportError:
+    # Ignore it under Windows
+    pass
+
+# Zato
+from zato.cache import KeyExpiredError
+from zato.common.api import CACHE, ZATO_NOT_GIVEN
+from zato.common.py23_ import pickle_dumps, pickle_loads
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import any_, anydict, callable_, floatnone
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+logger = getLogger(__name__)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+default_get = ZATO_NOT_GIVEN # A singleton to indicate that no default for SharedMemoryCache.get was given on input
+
+# Names of shared memory regions and semaphores - each is followed by a server-specific, cache-specific, geometry-specific
+# and deployment-specific part, of 6 characters each, and names of semaphores end in the number of the stripe they lock.
+_shmem_prefix = 'zc'
+_sem_prefix = 'zl'
+_name_part_len = 6
+
+# Where POSIX shared memory objects are visible in the file system, if anywhere
+_dev_shm = '/dev/shm'
+
+_magic = b'ZATOSHMC'
+_version = 2
+
+# Magic, version, stripes, slots per stripe, slot size, max. key size
+_region_header = Struct('<8sIIIII')
+
+# Per-stripe counters - used slots, hits, misses, get_ops, set_ops, expired_total
+_stripe_stats = Struct('<6Q')
+_counter = Struct('<Q')
+
+# The stripe counters are followed by PIDs of the processes holding each stripe's lock, or 0 if it is not held
+_lock_owner = _counter
+
+# The PID of the process taking a stripe's lock over is kept right after the region header
+_reclaim_owner_offset = 32
+
+# State, key type, value type, key length, value length, expiry, expires_at,
+# last_write, prev_write, last_read, prev_read, hits
+_slot_header = Struct('<BBBxHIddddddQ')
+
+_stripe_stats_offset = 64
+_stats_used = 0
+_stats_hits = 1
+_stats_misses = 2
+_stats_get_ops = 3
+_stats_set_ops = 4
+_stats_expired_total = 5
+
+_slot_empty = 0
+_slot_used = 1
+_slot_deleted = 2
+
+_key_str = 0
+_key_bytes = 1
+_key_int = 2
+
+_value_str = 0
+_value_bytes = 1
+_value_pickle = 2
+
+# How many slots, at most, a key can be stored in, counting from the one its hash points to
+_max_probe_length = 16
+
+# The maximum number of stripes, i.e. independently locked parts of the hash table
+_max_stripes = 64
+
+# How many times a busy lock is tried again right after other greenlets run, and how many seconds to sleep between tries later on
+_lock_spin_tries = 10
+_lock_poll_interval = 0.001
+
+# For how many seconds, and how often, a process attaching to a region waits for the process creating it to initialise it
+_attach_timeout = 10.0
+_attach_poll_interval = 0.01
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+def _is_process_alive(pid:'int') -> 'bool':
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # It exists but belongs to another user
+        return True
+    else:
+        return True
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class Entry:
+    """ Represents an individual value stored in a shared-memory cache, returned if details are requested.
+    """
+    __slots__ = ('key', 'value', 'hash', 'expiry', 'expires_at', 'hits', 'position', 'last_read', 'prev_read',
+        'last_write', 'prev_write')
+
+    def to_dict(self) -> 'anydict':
+        return {
+            'key': self.key,
+            'value': self.value,
+            'hash': self.hash,
+            'expiry': self.expiry,
+            'expires_at': self.expires_at,
+            'hits': self.hits,
+            'position': self.position,
+            'last_read': self.last_read,
+            'prev_read': self.prev_read,
+            'last_write': self.last_write,
+            'prev_write': self.prev_write,
+        }
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class _StripeLock:
+    """ A named POSIX semaphore guarding one stripe of the hash table in all the processes that share it. The PID of the process
+    holding it is kept in the region so that, if that process dies in the middle of a critical section, others can take over
+    the lock, which is the only case when it changes hands without having been released first. A process may also die right
+    after acquiring the semaphore but before storing its PID, which is why a lock that is held while its owner has stayed 0
+    for longer than timeout seconds is taken over too. The same applies to the semaphore guarding the takeovers themselves.
+    """
+    __slots__ = ('name', 'sem', 'timeout', 'reclaim_sem', 'mmap', 'owner_offset', 'reclaim_zero_since')
+
+    def __init__(self, name:'str', timeout:'float', reclaim_sem:'any_', mmap:'any_', owner_offset:'int') -> 'None':
+        self.name = name
+        self.timeout = timeout
+        self.reclaim_sem = reclaim_sem
+        self.mmap = mmap
+        self.owner_offset = owner_offset
+        self.sem = ipc.Semaphore(name, ipc.O_CREAT, initial_value=1)
+
+        # Since when the semaphore guarding takeovers has been seen held without an owner
+        self.reclaim_zero_since = None # type: floatnone
+
+    def __enter__(self) -> 'None':
+        try:
+            self.sem.acquire(0)
+        except ipc.BusyError:
+            self._wait()
+
+        _lock_owner.pack_into(self.mmap, self.owner_offset, os.getpid())
+
+    def __exit__(self, *ignored:'any_') -> 'None':
+        _lock_owner.pack_into(self.mmap, self.owner_offset, 0)
+        self.sem.release()
+
+    def close(self) -> 'None':
+        self.sem.close()
+
+    def _get_owner(self) -> 'int':
+        return _lock_owner.unpack_from(self.mmap, self.owner_offset)[0]
+
+    def _wait(self) -> 'None':
+        """ Waits for the lock without blocking other greenlets. Each critical section takes microseconds so, if the lock
+        is still held after timeout seconds, we check whether the process holding it is still alive.
+        """
+        now = monotonic()
+        deadline = now + self.timeout
+        tries = 0
+        has_warned = False
+
+        # Since when the lock has been seen held without an owner
+        zero_since = now if not self._get_owner() else None
+
+        while True:
+
+            # Other greenlets of this process may be holding the lock so let them run first ..
+            sleep(0 if tries < _lock_spin_tries else _lock_poll_interval)
+            tries += 1
+
+            try:
+                self.sem.acquire(0)
+            except ipc.BusyError:
+                pass
+            else:
+                return
+
+            now = monotonic()
+
+            if self._get_owner():
+                zero_since = None
+            elif zero_since is None:
+                zero_since = now
+
+            # .. and only then see if its owner is gone.
+            if now < deadline:
+                continue
+
+            if self._reclaim(zero_since is not None and now - zero_since >= self.timeout):
+                return
+
+            if not has_warned:
+                logger.warning('Shared cache lock `%s` held by PID %s for over %ss', self.name, self._get_owner(), self.timeout)
+                has_warned = True
+
+            deadline = monotonic() + self.timeout
+
+    def _acquire_reclaim_sem(self) -> 'bool':
+        """ Acquires the semaphore guarding takeovers or takes it over if the process holding it is gone.
+        """
+        try:
+            self.reclaim_sem.acquire(0)
+        except ipc.BusyError:
+            pass
+        else:
+            self.reclaim_zero_since = None
+            _lock_owner.pack_into(self.mmap, _reclaim_owner_offset, os.getpid())
+            return True
+
+        now = monotonic()
+        owner = _lock_owner.unpack_from(self.mmap, _reclaim_owner_offset)[0]
+
+        if owner:
+            self.reclaim_zero_since = None
+            is_abandoned = not _is_process_alive(owner)
+        else:
+            if self.reclaim_zero_since is None:
+                self.reclaim_zero_since = now
+            is_abandoned = now - self.reclaim_zero_since >= self.timeout
+
+        if is_abandoned:
+            self.reclaim_zero_since = None
+            _lock_owner.pack_into(self.mmap, _reclaim_owner_offset, os.getpid())
+            logger.warning('Took over shared cache lock reclaiming for `%s` from PID %s', self.name, owner)
+
+        return is_abandoned
+
+    def _reclaim(self, is_zero_abandoned:'bool') -> 'bool':
+        """ Takes the lock over if the process holding it no longer exists or if it has had no owner for too long.
+        """
+        # Only one process at a time may take the lock over
+        if not self._acquire_reclaim_sem():
+            return False
+
+        try:
+            # The lock may have been released in the meantime
+            try:
+                self.sem.acquire(0)
+            except ipc.BusyError:
+                pass
+            else:
+                return True
+
+            owner = self._get_owner()
+
+            # The lock is held by a process that is still running, or its owner has just changed
+            if owner:
+                if _is_process_alive(owner):
+                    return False
+            elif not is_zero_abandoned:
+                return False
+
+            # The semaphore is still held on behalf of the process that died, so we do not acquire it, we become its owner.
+            _lock_owner.pack_into(self.mmap, self.owner_offset, os.getpid())
+
+            if owner:
+                logger.warning('Reclaimed shared cache lock `%s` held by PID %s which no longer exists', self.name, owner)
+            else:
+                logger.warning('Reclaimed shared cache lock `%s` held without an owner for over %ss', self.name, self.timeout)
+
+            return True
+
+        finally:
+            _lock_owner.pack_into(self.mmap, _reclaim_owner_offset, 0)
+            self.reclaim_sem.release()
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class SharedMemoryCache:
+    """ A built-in cache whose contents are kept in a memory-mapped region shared by all the worker processes of a server,
+    which means that there is only one copy of the data and that no state changes need to be sent to other workers.
+
+    The region is a hash table split into stripes, each guarded by its own named semaphore. A key can be stored
+    in one of the few slots following the one that its hash points to and, if all of them are taken, or if the stripe
+    is full already, the least recently used entry among them is evicted. Keys and values are kept in fixed-size slots,
+    strings and bytes as they are and all other values pickled, and the encoded value cannot be longer than max_item_size.
+    """
+    def __init__(self, config:'any_', server_key:'str', deployment_key:'str') -> 'None':
+        self.config = config
+        self.needs_sync = False
+        self.server_key = server_key
+        self.deployment_key = deployment_key
+        self.default_get = default_get
+
+        self.extend_expiry_on_get = config.extend_expiry_on_get
+        self.extend_expiry_on_set = config.extend_expiry_on_set
+
+        self.max_size = int(config.max_size)
+        self.max_item_size = int(config.max_item_size)
+        self.max_key_size = int(config.get('shmem_max_key_size') or CACHE.DEFAULT.SHMEM_MAX_KEY_SIZE)
+        self.stripes = min(int(config.get('shmem_stripes') or CACHE.DEFAULT.SHMEM_STRIPES), self.max_size, _max_stripes)
+        self.lock_timeout = float(config.get('shmem_lock_timeout') or CACHE.DEFAULT.SHMEM_LOCK_TIMEOUT)
+
+        # The geometry of the hash table - each stripe is at most two thirds full and together they never hold more
+        # than max_size entries.
+        self.stripe_capacity = self.max_size // self.stripes
+        self.slots_per_stripe = max(self.stripe_capacity + self.stripe_capacity // 2 + 1, _max_probe_length)
+        self.probe_length = min(_max_probe_length, self.slots_per_stripe)
+        self.slot_size = (_slot_header.size + self.max_key_size + self.max_item_size + 7) & ~7
+
+        self.lock_owners_offset = _stripe_stats_offset + self.stripes * _stripe_stats.size
+        self.slots_offset = (self.lock_owners_offset + self.stripes * _lock_owner.size + 63) & ~63
+        self.size = self.slots_offset + self.stripes * self.slots_per_stripe * self.slot_size
+
+        # Statistics of expiration sweeps are kept by each process for its own sweeps
+        self.sweeps = 0
+        self.last_sweep_expired = 0
+        self.last_sweep_duration = 0.0
+
+        self._regex_cache = {}
+        self._mem = None
+        self._mmap = None
+        self._locks = []
+        self._reclaim_sem = None
+
+        self.shmem_name = self.get_shmem_name()
+        self._open()
+
+        spawn(self._delete_expired)
+
+# ################################################################################################################################
+
+    def _get_name_part(self, value:'str') -> 'str':
+        return sha256(value.encode('utf8')).hexdigest()[:_name_part_len]
+
+# ################################################################################################################################
+
+    def _get_name_suffix(self) -> 'str':
+        """ Returns the part of names of the region and its semaphores that is specific to this server, cache,
+        hash table geometry and deployment.
+        """
+        geometry = '{}.{}.{}.{}'.format(self.max_size, self.max_item_size, self.max_key_size, self.stripes)
+
+        return '{}{}{}{}'.format(
+            self._get_name_part(self.server_key),
+            self._get_name_part(self.config.name),
+            self._get_name_part(geometry),
+            self._get_name_part(self.deployment_key),
+        )
+
+# ################################################################################################################################
+
+    def get_shmem_name(self) -> 'str':
+        return '/{}{}'.format(_shmem_prefix, self._get_name_suffix())
+
+# ################################################################################################################################
+
+    def _open(self) -> 'None':
+        """ Creates the shared region or attaches to one that another worker process has already created.
+        """
+        name_suffix = self._get_name_suffix()
+
+        try:
+            self._mem = ipc.SharedMemory(self.shmem_name, ipc.O_CREX, size=self.size)
+        except ipc.ExistentialError:
+            is_creator = False
+            self._mem = ipc.SharedMemory(self.shmem_name)
+
+            # The process that has just created the region may not have sized it yet,
+            # and mapping it before that would make our first access to it fail with SIGBUS.
+            self._wait_for_region(lambda: os.fstat(self._mem.fd).st_size >= self.size, 'sized')
+        else:
+            is_creator = True
+
+        self._mmap = mmap(self._mem.fd, self.size)
+        self._mem.close_fd()
+
+        # The region is zero-filled when created which means that all of its slots are empty already. The magic value
+        # is written last so that the rest of the header is already there once other processes see it.
+        if is_creator:
+            _region_header.pack_into(self._mmap, 0, b'', _version, self.stripes, self.slots_per_stripe, self.slot_size,
+                self.max_key_size)
+            self._mmap[:len(_magic)] = _magic
+
+        # Similarly, the creator may not have written the header yet.
+        else:
+            self._wait_for_region(lambda: _region_header.unpack_from(self._mmap, 0)[0] == _magic, 'initialised')
+
+            _, _, stripes, slots_per_stripe, slot_size, _ = _region_header.unpack_from(self._mmap, 0)
+            if (stripes, slots_per_stripe, slot_size) != (self.stripes, self.slots_per_stripe, self.slot_size):
+                raise ValueError('Shared cache region `{}` has an unexpected geometry {} != {}'.format(
+                    self.shmem_name, (stripes, slots_per_stripe, slot_size),
+                    (self.stripes, self.slots_per_stripe, self.slot_size)))
+
+        # Locks keep their owners' PIDs in the region itself
+        self._reclaim_sem = ipc.Semaphore('/{}{}rc'.format(_sem_prefix, name_suffix), ipc.O_CREAT, initial_value=1)
+
+        for idx in range(self.stripes):
+            self._locks.append(_StripeLock('/{}{}{:02d}'.format(_sem_prefix, name_suffix, idx), self.lock_timeout,
+                self._reclaim_sem, self._mmap, self.lock_owners_offset + idx * _lock_owner.size))
+
+        if is_creator:
+            logger.info('Created shared cache region `%s` for `%s` (%s bytes)', self.shmem_name, self.config.name, self.size)
+
+            # The previous deployments of this server will not need their regions anymore
+            self._remove_stale_regions(name_suffix)
+
+# ################################################################################################################################
+
+    def _wait_for_region(self, is_ready:'callable_', state:'str') -> 'None':
+        """ Waits until the process that created the region has brought it to a given state.
+        """
+        deadline = monotonic() + _attach_timeout
+
+        while not is_ready():
+            if monotonic() >= deadline:
+                raise Exception('Shared cache region `{}` was not {} in {}s'.format(self.shmem_name, state, _attach_timeout))
+            sleep(_attach_poll_interval)
+
+# ################################################################################################################################
+
+    def _remove_stale_regions(self, name_suffix:'str') -> 'None':
+        """ Unlinks regions and semaphores that previous deployments of the same cache left behind,
+        which is possible only on systems where shared memory objects are visible in the file system.
+        """
+        if not os.path.isdir(_dev_shm):
+            return
+
+        cache_prefix = name_suffix[:_name_part_len * 2]
+        shmem_prefix = _shmem_prefix + cache_prefix
+        sem_prefix = 'sem.' + _sem_prefix + cache_prefix
+        current_sem_prefix = 'sem.' + _sem_prefix + name_suffix
+
+        for file_name in os.listdir(_dev_shm):
+            try:
+                if file_name.startswith(shmem_prefix) and file_name != self.shmem_name[1:]:
+                    ipc.unlink_shared_memory('/' + file_name)
+                elif file_name.startswith(sem_prefix) and not file_name.startswith(current_sem_prefix):
+                    ipc.unlink_semaphore('/' + file_name[4:])
+                else:
+                    continue
+            except ipc.ExistentialError:
+                # Another worker process has just unlinked it
+                pass
+            else:
+                logger.info('Removed stale shared cache object `%s`', file_name)
+
+# ################################################################################################################################
+
+    def close(self) -> 'None':
+        """ Detaches this process from the shared region. The region itself is not unlinked because other worker
+        processes may still use it and new ones may attach to it after a restart.
+        """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+        for lock in self._locks:
+            lock.close()
+
+        self._locks[:] = []
+
+        if self._reclaim_sem is not None:
+            self._reclaim_sem.close()
+            self._reclaim_sem = None
+
+# ################################################################################################################################
+
+    def unlink(self) -> 'None':
+        """ Removes the region and its semaphores from the system - processes that still have them open may keep using them
+        but no new ones can attach to them anymore.
+        """
+        try:
+            ipc.unlink_shared_memory(self.shmem_name)
+        except ipc.ExistentialError:
+            pass
+
+        sems = [lock.sem for lock in self._locks]
+        if self._reclaim_sem is not None:
+            sems.append(self._reclaim_sem)
+
+        for sem in sems:
+            try:
+                sem.unlink()
+            except ipc.ExistentialError:
+                pass
+
+# ################################################################################################################################
+
+    def _encode_key(self, key:'any_') -> 'any_':
+        if isinstance(key, str):
+            key_type, key_bytes = _key_str, key.encode('utf8')
+        elif isinstance(key, bytes):
+            key_type, key_bytes = _key_bytes, key
+        elif isinstance(key, int):
+            key_type, key_bytes = _key_int, str(key).encode('utf8')
+        else:
+            raise ValueError('Key must be an instance of one of {}'.format((bytes, str, int)))
+
+        if len(key_bytes) > self.max_key_size:
+            raise ValueError('Key too long {} > {}'.format(len(key_bytes), self.max_key_size))
+
+        return key_type, key_bytes
+
+# ################################################################################################################################
+
+    def _decode_key(self, key_type:'int', key_bytes:'bytes') -> 'any_':
+        if key_type == _key_str:
+            return key_bytes.decode('utf8')
+        elif key_type == _key_bytes:
+            return key_bytes
+        else:
+            return int(key_bytes)
+
+# ################################################################################################################################
+
+    def _encode_value(self, value:'any_') -> 'any_':
+        if isinstance(value, str):
+            value_type, value_bytes = _value_str, value.encode('utf8')
+        elif isinstance(value, bytes):
+            value_type, value_bytes = _value_bytes, value
+        else:
+            value_type, value_bytes = _value_pickle, pickle_dumps(value)
+
+        if len(value_bytes) > self.max_item_size:
+            raise ValueError('Value too long {} > {}'.format(len(value_bytes), self.max_item_size))
+
+        return value_type, value_bytes
+
+# ################################################################################################################################
+
+    def _decode_value(self, value_type:'int', value_bytes:'bytes') -> 'any_':
+        if value_type == _value_str:
+            return value_bytes.decode('utf8')
+        elif value_type == _value_bytes:
+            return value_bytes
+        else:
+            return pickle_loads(value_bytes)
+
+# ################################################################################################################################
+
+    def _get_location(self, key_type:'int', key_bytes:'bytes') -> 'any_':
+        """ Returns the stripe a key belongs to and the slot, within the stripe, that its hash points to.
+        """
+        key_hash = crc32(key_bytes, key_type)
+        return key_hash % self.stripes, (key_hash // self.stripes) % self.slots_per_stripe
+
+# ################################################################################################################################
+
+    def _get_slot_offset(self, stripe_idx:'int', slot_idx:'int') -> 'int':
+        return self.slots_offset + (stripe_idx * self.slots_per_stripe + slot_idx) * self.slot_size
+
+# ################################################################################################################################
+
+    def _incr_stats(self, stripe_idx:'int', idx:'int', by:'int'=1) -> 'None':
+        offset = _stripe_stats_offset + stripe_idx * _stripe_stats.size + idx * _counter.size
+        _counter.pack_into(self._mmap, offset, _counter.unpack_from(self._mmap, offset)[0] + by)
+
+# ################################################################################################################################
+
+    def _get_stripe_used(self, stripe_idx:'int') -> 'int':
+        return _stripe_stats.unpack_from(self._mmap, _stripe_stats_offset + stripe_idx * _stripe_stats.size)[_stats_used]
+
+# ################################################################################################################################
+
+    def _find(self, stripe_idx:'int', slot_idx:'int', key_type:'int', key_bytes:'bytes', needs_free:'bool'=False) -> 'any_':
+        """ Looks up the slot that a key is stored in. Optionally, also returns a free slot a new key could be stored in
+        and the least recently used one that could be evicted to make room for it. Must be called with the stripe's lock held.
+        """
+        mm = self._mmap
+        key_len = len(key_bytes)
+        header_size = _slot_header.size
+
+        free_offset = -1
+        lru_offset = -1
+        lru_access = -1.0
+
+        for probe_idx in range(self.probe_length):
+            offset = self._get_slot_offset(stripe_idx, (slot_idx + probe_idx) % self.slots_per_stripe)
+            header = _slot_header.unpack_from(mm, offset)
+            state = header[0]
+
+            if state == _slot_used:
+                if header[1] == key_type and header[3] == key_len and mm[offset+header_size:offset+header_size+key_len] == key_bytes:
+                    return offset, header, free_offset, lru_offset
+
+                if needs_free:
+                    last_access = max(header[7], header[9])
+                    if lru_offset == -1 or last_access < lru_access:
+                        lru_offset = offset
+                        lru_access = last_access
+
+            elif state == _slot_empty:
+                if free_offset == -1:
+                    free_offset = offset
+
+                # Keys are never stored past an empty slot so there is nothing more to look up,
+                # unless we are to look for the least recently used entry too.
+                if not needs_free:
+                    break
+
+            elif free_offset == -1:
+                free_offset = offset
+
+        return -1, None, free_offset, lru_offset
+
+# ################################################################################################################################
+
+    def _find_stripe_lru(self, stripe_idx:'int') -> 'int':
+        """ Returns the least recently used entry in the whole of a stripe. Must be called with the stripe's lock held.
+        """
+        mm = self._mmap
+        lru_offset = -1
+        lru_access = -1.0
+
+        for slot_idx in range(self.slots_per_stripe):
+            offset = self._get_slot_offset(stripe_idx, slot_idx)
+            if mm[offset] == _slot_used:
+                header = _slot_header.unpack_from(mm, offset)
+                last_access = max(header[7], header[9])
+                if lru_offset == -1 or last_access < lru_access:
+                    lru_offset = offset
+                    lru_access = last_access
+
+        return lru_offset
+
+# ################################################################################################################################
+
+    def _read_value(self, offset:'int', header:'any_') -> 'any_':
+        start = offset + _slot_header.size + self.max_key_size
+        return self._decode_value(header[2], self._mmap[start:start+header[4]])
+
+# ################################################################################################################################
+
+    def _read_key(self, offset:'int', header:'any_') -> 'any_':
+        start = offset + _slot_header.size
+        return self._decode_key(header[1], self._mmap[start:start+header[3]])
+
+# ################################################################################################################################
+
+    def _write_slot(self, offset:'int', header:'any_', key_bytes:'any_'=None, value_bytes:'any_'=None) -> 'None':
+        mm = self._mmap
+        _slot_header.pack_into(mm, offset, *header)
+
+        if key_bytes is not None:
+            start = offset + _slot_header.size
+            mm[start:start+len(key_bytes)] = key_bytes
+
+        if value_bytes is not None:
+            start = offset + _slot_header.size + self.max_key_size
+            mm[start:start+len(value_bytes)] = value_bytes
+
+# ################################################################################################################################
+
+    def _free_slot(self, stripe_idx:'int', offset:'int', is_expired:'bool'=False) -> 'None':
+        """ Marks a slot as deleted. Must be called with the stripe's lock held.
+        """
+        self._mmap[offset] = _slot_deleted
+        self._incr_stats(stripe_idx, _stats_used, -1)
+
+        if is_expired:
+            self._incr_stats(stripe_idx, _stats_expired_total)
+
+# ################################################################################################################################
+
+    def _get_entry(self, offset:'int', header:'any_', key:'any_') -> 'Entry':
+        start = offset + _slot_header.size + self.max_key_size
+        value_bytes = self._mmap[start:start+header[4]]
+
+        entry = Entry()
+        entry.key = key
+        entry.value = self._decode_value(header[2], value_bytes)
+        entry.hash = sha256(value_bytes).hexdigest()
+        entry.expiry, entry.expires_at, entry.last_write, entry.prev_write, entry.last_read, entry.prev_read, \
+            entry.hits = header[5:]
+        entry.position = -1
+
+        return entry
+
+# ################################################################################################################################
+
+    def _on_read(self, offset:'int', header:'any_', now:'float') -> 'any_':
+        """ Updates access information and, if configured to, prolongs the expiration time of an entry that has just been read.
+        Must be called with the stripe's lock held.
+        """
+        header = list(header)
+        header[10] = header[9]
+        header[9] = now
+        header[11] += 1
+
+        if self.extend_expiry_on_get and header[5]:
+            header[6] = now + header[5]
+
+        self._write_slot(offset, header)
+        return header
+
+# ################################################################################################################################
+
+    def _on_write(self, stripe_idx:'int', offset:'int', header:'any_', value_type:'any_', value_bytes:'any_', expiry:'float',
+        now:'float') -> 'None':
+        """ Stores a new value and expiration time of an entry that already exists, following the same rules that the
+        built-in cache uses. Value type and bytes are None if only expiry is to be changed. Must be called with the stripe's
+        lock held.
+        """
+        header = list(header)
+
+        # If we have a key that previously was not using expiry, we must set it now if expiry is given on input.
+        if not header[6]:
+            if expiry:
+                header[5] = expiry
+                header[6] = now + expiry
+        else:
+            # Mark as deleted an entry that has already expired
+            if now >= header[6]:
+                self._free_slot(stripe_idx, offset, True)
+                raise KeyExpiredError(self._read_key(offset, header))
+
+            # If expiry == 0.0 it means that we are resetting an already existing expiry time
+            elif expiry == 0.0:
+                header[5] = 0.0
+                header[6] = 0.0
+
+            # The entry exists and has not expired so now, if we are configured to, prolong its expiration time
+            elif self.extend_expiry_on_set and header[5]:
+                header[6] = now + header[5]
+
+        if value_bytes is not None:
+            header[2] = value_type
+            header[4] = len(value_bytes)
+
+        header[8] = header[7]
+        header[7] = now
+
+        self._write_slot(offset, header, None, value_bytes)
+
+# ################################################################################################################################
+
+    def __getitem__(self, key:'any_') -> 'any_':
+        if isinstance(key, slice):
+            return self.get_slice(key.start, key.stop, key.step)
+        else:
+            return self.get(key)
+
+# ################################################################################################################################
+
+    def __setitem__(self, key:'any_', value:'any_') -> 'any_':
+        return self.set(key, value)
+
+# ################################################################################################################################
+
+    def __delitem__(self, key:'any_') -> 'any_':
+        return self.delete(key)
+
+# ################################################################################################################################
+
+    def __contains__(self, key:'any_') -> 'bool':
+        key_type, key_bytes = self._encode_key(key)
+        stripe_idx, slot_idx = self._get_location(key_type, key_bytes)
+
+        with self._locks[stripe_idx]:
+            return self._find(stripe_idx, slot_idx, key_type, key_bytes)[0] != -1
+
+# ################################################################################################################################
+
+    def __len__(self) -> 'int':
+        return sum(self._get_stripe_used(stripe_idx) for stripe_idx in range(self.stripes))
+
+# ################################################################################################################################
+
+    def get(self, key:'any_', default:'any_'=default_get, details:'bool'=False) -> 'any_':
+        """ Returns a value stored under a given key. If details is True, return metadata about the key as well.
+        """
+        key_type, key_bytes = self._encode_key(key)
+        stripe_idx, slot_idx = self._get_location(key_type, key_bytes)
+        now = time()
+
+        with self._locks[stripe_idx]:
+            offset, header, _, _ = self._find(stripe_idx, slot_idx, key_type, key_bytes)
+
+            if offset == -1:
+                self._incr_stats(stripe_idx, _stats_misses)
+                return None if default is default_get else default
+
+            # We have the key but we must first ensure that it's not expired already
+            if header[6] and now >= header[6]:
+                self._free_slot(stripe_idx, offset, True)
+                raise KeyExpiredError(key)
+
+            self._incr_stats(stripe_idx, _stats_get_ops)
+            self._incr_stats(stripe_idx, _stats_hits)
+
+            header = self._on_read(offset, header, now)
+            return self._get_entry(offset, header, key) if details else self._read_value(offset, header)
+
+# ################################################################################################################################
+
+    def has_key(self, key:'any_', default:'any_'=default_get, details:'bool'=False) -> 'bool':
+        """ Returns True or False, depending on whether such a key exists in the cache or not.
+        """
+        value = self.get(key, default=default, details=details)
+        return value != ZATO_NOT_GIVEN
+
+# ################################################################################################################################
+
+    def set(self, key:'any_', value:'any_', expiry:'float'=0.0, details:'bool'=False) -> 'any_':
+        """ Sets key to a given value. Key must be string/unicode. Value must be an integer or string/unicode.
+        Expiry is in seconds (or a fraction of).
+        """
+        key_type, key_bytes = self._encode_key(key)
+        value_type, value_bytes = self._encode_value(value)
+        stripe_idx, slot_idx = self._get_location(key_type, key_bytes)
+        now = time()
+
+        with self._locks[stripe_idx]:
+
+            self._incr_stats(stripe_idx, _stats_set_ops)
+            offset, header, free_offset, lru_offset = self._find(stripe_idx, slot_idx, key_type, key_bytes, True)
+
+            # Ok, we have this key in cache
+            if offset != -1:
+                out = None if details else self._read_value(offset, header)
+                self._on_write(stripe_idx, offset, header, value_type, value_bytes, expiry, now)
+
+            # No such key in cache - let's add it, making room for it first if needed.
+            else:
+                out = None
+
+                if free_offset == -1:
+                    offset = lru_offset
+                    self._free_slot(stripe_idx, offset)
+
+                else:
+                    offset = free_offset
+
+                    # The stripe is full so an entry needs to be evicted even though there is a free slot for the new one
+                    if self._get_stripe_used(stripe_idx) >= self.stripe_capacity:
+                        if lru_offset == -1:
+                            lru_offset = self._find_stripe_lru(stripe_idx)
+                        self._free_slot(stripe_idx, lru_offset)
+
+                self._write_slot(offset, (_slot_used, key_type, value_type, len(key_bytes), len(value_bytes),
+                    expiry, now + expiry if expiry else 0.0, now, 0.0, 0.0, 0.0, 0), key_bytes, value_bytes)
+                self._incr_stats(stripe_idx, _stats_used)
+
+            if details:
+                return self._get_entry(offset, _slot_header.unpack_from(self._mmap, offset), key)
+            else:
+                return out
+
+# ################################################################################################################################
+
+    def delete(self, key:'any_', raise_key_error:'bool'=True) -> 'any_':
+        """ Deletes a cache entry by its key.
+        """
+        key_type, key_bytes = self._encode_key(key)
+        stripe_idx, slot_idx = self._get_location(key_type, key_bytes)
+
+        with self._locks[stripe_idx]:
+            offset, header, _, _ = self._find(stripe_idx, slot_idx, key_type, key_bytes)
+
+            if offset == -1:
+                if raise_key_error:
+                    raise KeyError(key)
+            else:
+                value = self._read_value(offset, header)
+                self._free_slot(stripe_idx, offset)
+                return value
+
+# ################################################################################################################################
+
+    def expire(self, key:'any_', expiry:'float'=0.0) -> 'bool':
+        """ Sets expiry in seconds (or a fraction of) for a given key.
+        """
+        key_type, key_bytes = self._encode_key(key)
+        stripe_idx, slot_idx = self._get_location(key_type, key_bytes)
+
+        with self._locks[stripe_idx]:
+            offset, header, _, _ = self._find(stripe_idx, slot_idx, key_type, key_bytes)
+
+            if offset == -1:
+                return False
+            else:
+                self._on_write(stripe_idx, offset, header, None, None, expiry, time())
+                return True
+
+# ################################################################################################################################
+
+    def _for_matching(self, matcher:'callable_', limit:'int', func:'callable_') -> 'anydict':
+        """ Invokes func for each non-expired entry with a string key that matches the input criteria, up to limit
+        entries if limit is given, and returns a dictionary of func's results by their keys.
+        """
+        out = {}
+        mm = self._mmap
+        now = time()
+
+        for stripe_idx in range(self.stripes):
+            with self._locks[stripe_idx]:
+                for slot_idx in range(self.slots_per_stripe):
+                    offset = self._get_slot_offset(stripe_idx, slot_idx)
+
+                    if mm[offset] != _slot_used:
+                        continue
+
+                    header = _slot_header.unpack_from(mm, offset)
+                    if header[1] != _key_str:
+                        continue
+
+                    key = self._read_key(offset, header)
+                    if not matcher(key):
+                        continue
+
+                    if header[6] and now >= header[6]:
+                        self._free_slot(stripe_idx, offset, True)
+                        continue
+
+                    out[key] = func(stripe_idx, offset, header, key, now)
+
+                    # Our caller knows how many keys to look up at most
+                    if len(out) == limit:
+                        return out
+
+        return out
+
+# ################################################################################################################################
+
+    def _get_matching(self, matcher:'callable_', details:'bool', limit:'int') -> 'anydict':
+
+        def _get(stripe_idx, offset, header, key, now):
+            header = self._on_read(offset, header, now)
+            return self._get_entry(offset, header, key) if details else self._read_value(offset, header)
+
+        return self._for_matching(matcher, limit, _get)
+
+# ################################################################################################################################
+
+    def _set_matching(self, matcher:'callable_', value:'any_', expiry:'float', return_found:'bool', details:'bool',
+        limit:'int') -> 'anydict':
+
+        value_type, value_bytes = self._encode_value(value)
+
+        def _set(stripe_idx, offset, header, key, now):
+
+            # Read the current value before it is overwritten, this is why we can return value alone, without any metadata.
+            out = (self._get_entry(offset, header, key) if details else self._read_value(offset, header)) \
+                if return_found else None
+            self._on_write(stripe_idx, offset, header, value_type, value_bytes, expiry, now)
+            return out
+
+        out = self._for_matching(matcher, limit, _set)
+        return out if return_found else {}
+
+# ################################################################################################################################
+
+    def _delete_matching(self, matcher:'callable_', return_found:'bool', limit:'int') -> 'anydict':
+
+        def _delete(stripe_idx, offset, header, key, now):
+            out = self._read_value(offset, header) if return_found else None
+            self._free_slot(stripe_idx, offset)
+            return out
+
+        out = self._for_matching(matcher, limit, _delete)
+        return out if return_found else {}
+
+# ################################################################################################################################
+
+    def _expire_matching(self, matcher:'callable_', expiry:'float', limit:'int') -> 'bool':
+
+        def _expire(stripe_idx, offset, header, key, now):
+            self._on_write(stripe_idx, offset, header, None, None, expiry, now)
+
+        return bool(self._for_matching(matcher, limit, _expire))
+
+# ################################################################################################################################
+
+    def _get_regex(self, pattern:'str') -> 'any_':
+        regex = self._regex_cache.get(pattern)
+        if regex is None:
+            regex = self._regex_cache[pattern] = re_compile(pattern)
+        return regex
+
+# ################################################################################################################################
+
+    def get_by_prefix(self, key:'str', details:'bool'=False, limit:'int'=0) -> 'anydict':
+        """ Returns a dictionary of key:value items for keys matching the prefix given on input.
+        """
+        return self._get_matching(lambda elem: elem.startswith(key), details, limit)
+
+    def get_by_suffix(self, key:'str', details:'bool'=False, limit:'int'=0) -> 'anydict':
+        """ Returns a dictionary of key:value items for keys matching the suffix given on input.
+        """
+        return self._get_matching(lambda elem: elem.endswith(key), details, limit)
+
+    def get_by_regex(self, key:'str', details:'bool'=False, limit:'int'=0) -> 'anydict':
+        """ Returns a dictionary of key:value items for keys matching the regular expression given on input.
+        """
+        return self._get_matching(self._get_regex(key).match, details, limit)
+
+    def get_contains(self, key:'str', details:'bool'=False, limit:'int'=0) -> 'anydict':
+        """ Returns a dictionary of key:value items for keys containing the string given on input.
+        """
+        return self._get_matching(lambda elem: key in elem, details, limit)
+
+    def get_not_contains(self, key:'str', details:'bool'=False, limit:'int'=0) -> 'anydict':
+        """ Returns a dictionary of key:value items for keys that don't contain the string given on input.
+        """
+        return self._get_matching(lambda elem: key not in elem, details, limit)
+
+    def get_contains_all(self, key:'any_', details:'bool'=False, limit:'int'=0) -> 'anydict':
+        """ Returns a dictionary of key:value items for keys that contain all of elements in the input list of strings.
+        """
+        return self._get_matching(lambda elem: all(item in elem for item in key), details, limit)
+
+    def get_contains_any(self, key:'any_', details:'bool'=False, limit:'int'=0) -> 'anydict':
+        """ Returns a dictionary of key:value items for keys that contain at least one of elements in the input list of strings.
+        """
+        return self._get_matching(lambda elem: any(item in elem for item in key), details, limit)
+
+# ################################################################################################################################
+
+    def set_by_prefix(self, key:'str', value:'any_', expiry:'float'=0.0, return_found:'bool'=False, details:'bool'=False,
+        limit:'int'=0) -> 'anydict':
+        """ Sets keys matching the prefix of a given value. Optionally, returns all matched keys and their previous values.
+        """
+        return self._set_matching(lambda elem: elem.startswith(key), value, expiry, return_found, details, limit)
+
+    def set_by_suffix(self, key:'str', value:'any_', expiry:'float'=0.0, return_found:'bool'=False, details:'bool'=False,
+        limit:'int'=0) -> 'anydict':
+        """ Sets keys matching the suffix to a given value. Optionally, returns all matched keys and their previous values.
+        """
+        return self._set_matching(lambda elem: elem.endswith(key), value, expiry, return_found, details, limit)
+
+    def set_by_regex(self, key:'str', value:'any_', expiry:'float'=0.0, return_found:'bool'=False, details:'bool'=False,
+        limit:'int'=0) -> 'anydict':
+        """ Sets keys matching the regular expression to a given value. Optionally, returns all matched keys
+        and their previous values.
+        """
+        return self._set_matching(self._get_regex(key).match, value, expiry, return_found, details, limit)
+
+    def set_contains(self, key:'str', value:'any_', expiry:'float'=0.0, return_found:'bool'=False, details:'bool'=False,
+        limit:'int'=0) -> 'anydict':
+        """ Sets keys containing the input string to a given value. Optionally, returns all matched keys
+        and their previous values.
+        """
+        return self._set_matching(lambda elem: key in elem, value, expiry, return_found, details, limit)
+
+    def set_not_contains(self, key:'str', value:'any_', expiry:'float'=0.0, return_found:'bool'=False, details:'bool'=False,
+        limit:'int'=0) -> 'anydict':
+        """ Sets keys that don't contain the input string to a given value. Optionally, returns all matched keys
+        and their previous values.
+        """
+        return self._set_matching(lambda elem: key not in elem, value, expiry, return_found, details, limit)
+
+    def set_contains_all(self, key:'any_', value:'any_', expiry:'float'=0.0, return_found:'bool'=False, details:'bool'=False,
+        limit:'int'=0) -> 'anydict':
+        """ Sets keys that contain all of the input strings to a given value. Optionally, returns all matched keys
+        and their previous values.
+        """
+        return self._set_matching(lambda elem: all(item in elem for item in key), value, expiry, return_found, details, limit)
+
+    def set_contains_any(self, key:'any_', value:'any_', expiry:'float'=0.0, return_found:'bool'=False, details:'bool'=False,
+        limit:'int'=0) -> 'anydict':
+        """ Sets keys that contain at least one of the input strings to a given value. Optionally, returns all matched keys
+        and their previous values.
+        """
+        return self._set_matching(lambda elem: any(item in elem for item in key), value, expiry, return_found, details, limit)
+
+# ################################################################################################################################
+
+    def delete_by_prefix(self, key:'str', return_found:'bool'=False, limit:'int'=0) -> 'anydict':
+        """ Deletes cache entries by their key prefixes. Optionally, returns all matched keys and their previous values.
+        """
+        return self._delete_matching(lambda elem: elem.startswith(key), return_found, limit)
+
+    def delete_by_suffix(self, key:'str', return_found:'bool'=False, limit:'int'=0) -> 'anydict':
+        """ Deletes cache entries by their key suffixes. Optionally, returns all matched keys and their previous values.
+        """
+        return self._delete_matching(lambda elem: elem.endswith(key), return_found, limit)
+
+    def delete_by_regex(self, key:'str', return_found:'bool'=False, limit:'int'=0) -> 'anydict':
+        """ Deletes cache entries with keys matching the input regular expression. Optionally, returns all matched keys
+        and their previous values.
+        """
+        return self._delete_matching(self._get_regex(key).match, return_found, limit)
+
+    def delete_contains(self, key:'str', return_found:'bool'=False, limit:'int'=0) -> 'anydict':
+        """ Deletes cache entries with keys containing the input string. Optionally, returns all matched keys
+        and their previous values.
+        """
+        return self._delete_matching(lambda elem: key in elem, return_found, limit)
+
+    def delete_not_contains(self, key:'str', return_found:'bool'=False, limit:'int'=0) -> 'anydict':
+        """ Deletes cache entries with keys that don't contain the input string. Optionally, returns all matched keys
+        and their previous values.
+        """
+        return self._delete_matching(lambda elem: key not in elem, return_found, limit)
+
+    def delete_contains_all(self, key:'any_', return_found:'bool'=False, limit:'int'=0) -> 'anydict':
+        """ Deletes cache entries with keys containing all of the input strings. Optionally, returns all matched keys
+        and their previous values.
+        """
+        return self._delete_matching(lambda elem: all(item in elem for item in key), return_found, limit)
+
+    def delete_contains_any(self, key:'any_', return_found:'bool'=False, limit:'int'=0) -> 'anydict':
+        """ Deletes cache entries with keys containing at least one of the input strings. Optionally, returns all matched keys
+        and their previous values.
+        """
+        return self._delete_matching(lambda elem: any(item in elem for item in key), return_found, limit)
+
+# ################################################################################################################################
+
+    def expire_by_prefix(self, key:'str', expiry:'float'=0.0, limit:'int'=0) -> 'bool':
+        """ Sets expiry in seconds (or a fraction of) for all keys matching the input prefix.
+        """
+        return self._expire_matching(lambda elem: elem.startswith(key), expiry, limit)
+
+    def expire_by_suffix(self, key:'str', expiry:'float'=0.0, limit:'int'=0) -> 'bool':
+        """ Sets expiry in seconds (or a fraction of) for all keys matching the input suffix.
+        """
+        return self._expire_matching(lambda elem: elem.endswith(key), expiry, limit)
+
+    def expire_by_regex(self, key:'str', expiry:'float'=0.0, limit:'int'=0) -> 'bool':
+        """ Sets expiry in seconds (or a fraction of) for all keys matching the input regular expression.
+        """
+        return self._expire_matching(self._get_regex(key).match, expiry, limit)
+
+    def expire_contains(self, key:'str', expiry:'float'=0.0, limit:'int'=0) -> 'bool':
+        """ Sets expiry in seconds (or a fraction of) for all keys containing the input string.
+        """
+        return self._expire_matching(lambda elem: key in elem, expiry, limit)
+
+    def expire_not_contains(self, key:'str', expiry:'float'=0.0, limit:'int'=0) -> 'bool':
+        """ Sets expiry in seconds (or a fraction of) for all keys that don't contain the input string.
+        """
+        return self._expire_matching(lambda elem: key not in elem, expiry, limit)
+
+    def expire_contains_all(self, key:'any_', expiry:'float'=0.0, limit:'int'=0) -> 'bool':
+        """ Sets expiry in seconds (or a fraction of) for all keys containing all of the input strings.
+        """
+        return self._expire_matching(lambda elem: all(item in elem for item in key), expiry, limit)
+
+    def expire_contains_any(self, key:'any_', expiry:'float'=0.0, limit:'int'=0) -> 'bool':
+        """ Sets expiry in seconds (or a fraction of) for all keys containing at least one of the input strings.
+        """
+        return self._expire_matching(lambda elem: any(item in elem for item in key), expiry, limit)
+
+# ################################################################################################################################
+
+    def _get_all(self) -> 'any_':
+        """ Returns (offset, header, key) for each entry in the cache, from the most to the least recently used one.
+        """
+        out = []
+        mm = self._mmap
+        now = time()
+
+        for stripe_idx in range(self.stripes):
+            with self._locks[stripe_idx]:
+                for slot_idx in range(self.slots_per_stripe):
+                    offset = self._get_slot_offset(stripe_idx, slot_idx)
+                    if mm[offset] != _slot_used:
+                        continue
+
+                    header = _slot_header.unpack_from(mm, offset)
+                    if header[6] and now >= header[6]:
+                        continue
+
+                    out.append((offset, header, self._read_key(offset, header)))
+
+        out.sort(key=lambda item: max(item[1][7], item[1][9]), reverse=True)
+        return out
+
+# ################################################################################################################################
+
+    def keys(self) -> 'any_':
+        """ Returns all keys in the cache - like dict.keys().
+        """
+        return [key for _, _, key in self._get_all()]
+
+    def iterkeys(self) -> 'any_':
+        """ Returns an iterator over all keys in the cache - like dict.iterkeys().
+        """
+        return iter(self.keys())
+
+    def values(self) -> 'any_':
+        """ Returns all entries in the cache - like dict.values().
+        """
+        return [self._get_entry(offset, header, key) for offset, header, key in self._get_all()]
+
+    def itervalues(self) -> 'any_':
+        """ Returns an iterator over all entries in the cache - like dict.itervalues().
+        """
+        return iter(self.values())
+
+    def items(self) -> 'any_':
+        """ Returns all keys and entries in the cache - like dict.items().
+        """
+        return [(key, self._get_entry(offset, header, key)) for offset, header, key in self._get_all()]
+
+    def iteritems(self) -> 'any_':
+        """ Returns an iterator over all keys and entries in the cache - like dict.iteritems().
+        """
+        return iter(self.items())
+
+# ################################################################################################################################
+
+    def get_slice(self, start:'any_', stop:'any_', step:'any_') -> 'any_':
+        items = self._get_all()
+        for position in range(len(items))[start:stop:step]:
+            offset, header, key = items[position]
+            as_dict = self._get_entry(offset, header, key).to_dict()
+            as_dict['position'] = position
+            yield as_dict
+
+# ################################################################################################################################
+
+    def clear(self) -> 'None':
+        """ Clears the cache - removes all entries.
+        """
+        mm = self._mmap
+
+        for stripe_idx in range(self.stripes):
+            with self._locks[stripe_idx]:
+                for slot_idx in range(self.slots_per_stripe):
+                    offset = self._get_slot_offset(stripe_idx, slot_idx)
+                    if mm[offset] != _slot_empty:
+                        mm[offset] = _slot_empty
+                _stripe_stats.pack_into(mm, _stripe_stats_offset + stripe_idx * _stripe_stats.size, 0, 0, 0, 0, 0, 0)
+
+# ################################################################################################################################
+
+    def update_config(self, config:'any_') -> 'None':
+        self.config = config
+        self.extend_expiry_on_get = config.extend_expiry_on_get
+        self.extend_expiry_on_set = config.extend_expiry_on_set
+
+# ################################################################################################################################
+
+    def get_stats(self) -> 'anydict':
+        """ Returns usage statistics of this cache - counters of operations are shared by all worker processes
+        whereas ones about expiration sweeps refer to this process only.
+        """
+        totals = [0] * 6
+
+        for stripe_idx in range(self.stripes):
+            stats = _stripe_stats.unpack_from(self._mmap, _stripe_stats_offset + stripe_idx * _stripe_stats.size)
+            for idx, value in enumerate(stats):
+                totals[idx] += value
+
+        return {
+            'size': totals[_stats_used],
+            'max_size': self.max_size,
+            'hits': totals[_stats_hits],
+            'misses': totals[_stats_misses],
+            'get_ops': totals[_stats_get_ops],
+            'set_ops': totals[_stats_set_ops],
+            'expiry_heap_size': 0,
+            'sweeps': self.sweeps,
+            'expired_total': totals[_stats_expired_total],
+            'last_sweep_expired': self.last_sweep_expired,
+            'last_sweep_duration': self.last_sweep_duration,
+        }
+
+# ################################################################################################################################
+
+    def delete_expired(self) -> 'any_':
+        """ Deletes all expired entries and returns their keys.
+        """
+        out = []
+        mm = self._mmap
+        start = now = time()
+
+        for stripe_idx in range(self.stripes):
+            with self._locks[stripe_idx]:
+                for slot_idx in range(self.slots_per_stripe):
+                    offset = self._get_slot_offset(stripe_idx, slot_idx)
+                    if mm[offset] != _slot_used:
+                        continue
+
+                    header = _slot_header.unpack_from(mm, offset)
+                    if header[6] and now >= header[6]:
+                        out.append(self._read_key(offset, header))
+                        self._free_slot(stripe_idx, offset, True)
+
+        self.sweeps += 1
+        self.last_sweep_expired = len(out)
+        self.last_sweep_duration = time() - start
+
+        return out
+
+# ################################################################################################################################
+
+    def _delete_expired(self, interval:'int'=5, _sleep:'callable_'=sleep) -> 'None':
+        """ Invokes in its own greenlet in background to delete expired cache entries.
+        """
+        try:
+            while self._mmap is not None:
+                try:
+                    _sleep(interval)
+                    if self._mmap is None:
+                        break
+                    deleted = self.delete_expired()
+                except Exception:
+                    logger.warning('Exception while deleting expired keys %s', format_exc())
+                    _sleep(2)
+                else:
+                    if deleted:
+                        logger.info('Cache `%s` deleted keys expired in the last %ss (%s in %.6fs) - %s',
+                            self.config.name, interval, len(deleted), self.last_sweep_duration, deleted)
+        except Exception:
+            logger.warning('Exception in _delete_expired loop %s', format_exc())
+
+# ################################################################################################################################
+# ################################################################################################################################
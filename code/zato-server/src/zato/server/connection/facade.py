@@ -9,6 +9,7 @@ Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
 # stdlib
 import os
 from datetime import datetime, timedelta, timezone
+from time import monotonic
 
 # Arrow
 from arrow import Arrow
@@ -17,16 +18,22 @@ from arrow import Arrow
 from dateutil.parser import parse as dt_parse
 from dateutil.tz.tz import tzutc
 
+# gevent
+from gevent import joinall, killall, spawn
+from gevent.lock import BoundedSemaphore
+
 # Zato
 from zato.common.api import SCHEDULER
 from zato.common.json_internal import dumps
+from zato.common.typing_ import dataclass
 
 ################################################################################################################################
 ################################################################################################################################
 
 if 0:
     from requests import Response
-    from zato.common.typing_ import any_, callnone
+    from zato.common.typing_ import any_, anylist, anytuple, callnone, list_, stranydict
+    from zato.cy.reqresp.response import Response as ServiceResponse
     from zato.server.base.parallel import ParallelServer
     from zato.server.config import ConfigDict
     from zato.server.connection.http_soap.outgoing import HTTPSOAPWrapper
@@ -37,6 +44,9 @@ if 0:
 
 _utz_utc = timezone.utc
 
+# For how many seconds RESTFacade.gather waits for calls that missed their deadline to be killed
+_gather_kill_timeout = 1.0
+
 ################################################################################################################################
 ################################################################################################################################
 
@@ -123,11 +133,30 @@ class SchedulerFacade:
 # ################################################################################################################################
 # ################################################################################################################################
 
+@dataclass(init=False)
+class RESTCallResult:
+    """ The outcome of one of the calls made by RESTFacade.gather.
+    """
+    name: 'str'
+    method: 'str'
+    response: 'Response | None' = None
+    exception: 'Exception | None' = None
+    is_timeout: 'bool' = False
+    time_ms: 'float' = 0.0
+
+    @property
+    def is_ok(self) -> 'bool':
+        return self.exception is None and (not self.is_timeout) and bool(self.response is not None and self.response.ok)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
 class RESTFacade:
     """ A facade through which self.rest calls can be made.
     """
     cid: 'str'
     _out_plain_http: 'ConfigDict'
+    _response: 'ServiceResponse | None'
 
     name_prefix: 'str' = ''
     needs_facade: 'bool' = True
@@ -136,9 +165,10 @@ class RESTFacade:
     before_call_func: 'callnone' = None
     after_call_func:  'callnone' = None
 
-    def init(self, cid:'str', _out_plain_http:'ConfigDict') -> 'None':
+    def init(self, cid:'str', _out_plain_http:'ConfigDict', _response:'ServiceResponse | None'=None) -> 'None':
         self.cid = cid
         self._out_plain_http = _out_plain_http
+        self._response = _response
 
 # ################################################################################################################################
 
@@ -198,6 +228,108 @@ class RESTFacade:
         # If we are here, it means that we must have found the correct name
         return self._get(name, needs_prefix=False)
 
+# ################################################################################################################################
+
+    def gather(self, calls:'anylist', *, deadline:'float'=0.0, pool_size:'int'=0) -> 'list_[RESTCallResult]':
+        """ Makes many REST calls concurrently and returns their results in the same order as the calls were given.
+        Each call is a dict with the name of a connection, a method ('get' by default), and any other keyword arguments
+        that a given method accepts, such as data, params or headers, e.g.:
+
+        self.rest.gather([
+            {'name': 'CRM', 'params': {'customer_id': 123}},
+            {'name': 'Billing', 'method': 'post', 'data': {'customer_id': 123}},
+        ], deadline=2.5)
+
+        Calls to the same connection are made by at most pool_size greenlets at a time, by default as many as there are
+        connections in its pool, which means that all of them can reuse keep-alive connections. If a deadline, in seconds,
+        is given, the calls still running once it is reached are killed and their results have is_timeout set to True.
+        Exceptions are never raised, they are returned in results instead. Timings of each call are stored in
+        self.response.meta['rest_gather'].
+        """
+        # Local variables
+        results = [] # type: list_[RESTCallResult]
+        greenlets = []
+        greenlet_results = [] # type: list_[RESTCallResult]
+        pool_by_name = {} # type: stranydict
+
+        for call in calls:
+
+            call = dict(call)
+            name = call.pop('name')
+            method = call.pop('method', 'get')
+
+            result = RESTCallResult()
+            result.name = name
+            result.method = method
+            results.append(result)
+
+            try:
+                invoker = self[name]
+                func = getattr(invoker, method)
+            except Exception as e:
+                result.exception = e
+                continue
+
+            # Each connection has its own pool of greenlets ..
+            pool = pool_by_name.get(name)
+            if not pool:
+                pool = pool_by_name[name] = BoundedSemaphore(pool_size or invoker.conn.pool_size)
+
+            # .. and all the calls are started at once, waiting for their turn in their pools.
+            greenlets.append(spawn(self._gather_call, pool, func, call))
+            greenlet_results.append(result)
+
+        start = monotonic()
+        _ = joinall(greenlets, timeout=deadline or None)
+        now = monotonic()
+
+        # Results are populated here rather than in the greenlets so that the ones that missed the deadline
+        # cannot modify them after we return ..
+        for greenlet, result in zip(greenlets, greenlet_results):
+            if greenlet.successful():
+                result.response, result.exception, result.time_ms = greenlet.value
+            else:
+                # A greenlet may have been ready before the deadline and still not succeed,
+                # e.g. because of a BaseException that our greenlets do not catch.
+                if greenlet.ready():
+                    result.exception = greenlet.exception
+                else:
+                    result.is_timeout = True
+                result.time_ms = (now - start) * 1000
+
+        # .. and we wait for them to be killed so that they release any resources that they hold before we return,
+        # e.g. half-open circuit breakers need to learn that their probes failed.
+        pending = [greenlet for greenlet in greenlets if not greenlet.ready()]
+        if pending:
+            killall(pending, block=True, timeout=_gather_kill_timeout)
+
+        # Record how long each call took
+        if self._response is not None:
+            timings = self._response.meta.setdefault('rest_gather', [])
+            for result in results:
+                timings.append({
+                    'name': result.name,
+                    'method': result.method,
+                    'status_code': result.response.status_code if result.response is not None else None,
+                    'is_ok': result.is_ok,
+                    'is_timeout': result.is_timeout,
+                    'time_ms': round(result.time_ms, 3),
+                })
+
+        return results
+
+# ################################################################################################################################
+
+    def _gather_call(self, pool:'BoundedSemaphore', func:'any_', kwargs:'stranydict') -> 'anytuple':
+        """ Makes a single call for gather and returns its response, exception and time in milliseconds.
+        """
+        with pool:
+            start = monotonic()
+            try:
+                return func(**kwargs), None, (monotonic() - start) * 1000
+            except Exception as e:
+                return None, e, (monotonic() - start) * 1000
+
 # ################################################################################################################################
 # ################################################################################################################################
 
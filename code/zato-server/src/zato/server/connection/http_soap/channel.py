@@ -11,10 +11,16 @@ import logging
 from datetime import datetime
 from gzip import GzipFile
 from hashlib import sha256
-from http.client import BAD_REQUEST, FORBIDDEN, INTERNAL_SERVER_ERROR, METHOD_NOT_ALLOWED, NOT_FOUND, UNAUTHORIZED
+from http.client import BAD_REQUEST, FORBIDDEN, INTERNAL_SERVER_ERROR, METHOD_NOT_ALLOWED, NOT_FOUND, NOT_MODIFIED, \
+     UNAUTHORIZED
 from io import StringIO
+from time import time
 from traceback import format_exc
 
+# gevent
+from gevent import spawn
+from gevent.event import AsyncResult
+
 # regex
 from regex import compile as regex_compile
 
@@ -30,9 +36,11 @@ from zato.common.json_schema import DictError as JSONSchemaDictError, Validation
 from zato.common.marshal_.api import Model, ModelValidationError
 from zato.common.rate_limiting.common import AddressNotAllowed, BaseException as RateLimitingException, RateLimitReached
 from zato.common.typing_ import cast_
+from zato.common.util.api import new_cid
 from zato.common.util.auth import enrich_with_sec_data, extract_basic_auth
 from zato.common.util.exception import pretty_format_exception
-from zato.common.util.http_ import get_form_data as util_get_form_data, QueryDict
+from zato.common.util.http_ import get_form_data as util_get_form_data, is_stream_payload, iter_gzip, iter_stream_payload, \
+     QueryDict, RequestStream
 from zato.cy.reqresp.payload import SimpleIOPayload as CySimpleIOPayload
 from zato.server.connection.http_soap import BadRequest, ClientHTTPError, Forbidden, MethodNotAllowed, NotFound, \
      TooManyRequests, Unauthorized
@@ -112,6 +120,15 @@ class ModuleCtx:
     Dict_Like = {DATA_FORMAT.JSON, DATA_FORMAT.DICT, DATA_FORMAT.FORM_DATA}
     Form_Data_Content_Type = ('application/x-www-form-urlencoded', 'multipart/form-data')
 
+    # How long to wait for another request that is already obtaining a response to be cached
+    Cache_Single_Flight_Timeout = 90
+
+    # Only requests with these methods can receive 304 responses to their If-None-Match headers
+    Conditional_Methods = {'GET', 'HEAD'}
+
+    # How many bytes of a streamed request or response to keep in memory at a time, unless a channel says otherwise
+    Stream_Buffer_Size = 65536
+
 # ################################################################################################################################
 
 response_404     = 'URL not found (CID:{})'
@@ -161,13 +178,28 @@ def get_client_error_wrapper(transport:'str', data_format:'str') -> 'callable_':
 class _CachedResponse:
     """ A wrapper for responses served from caches.
     """
-    __slots__ = ('payload', 'content_type', 'headers', 'status_code')
+    __slots__ = ('payload', 'content_type', 'headers', 'status_code', 'etag', 'fresh_until')
 
-    def __init__(self, payload:'any_', content_type:'str', headers:'stranydict', status_code:'int') -> 'None':
+    def __init__(
+        self,
+        payload:'any_',
+        content_type:'str',
+        headers:'stranydict',
+        status_code:'int',
+        etag:'str'='',
+        fresh_until:'float'=0.0,
+    ) -> 'None':
         self.payload = payload
         self.content_type = content_type
         self.headers = headers
         self.status_code = status_code
+        self.etag = etag
+        self.fresh_until = fresh_until
+
+    @staticmethod
+    def from_dict(data:'stranydict') -> '_CachedResponse':
+        return _CachedResponse(data['payload'], data['content_type'], data['headers'], data['status_code'],
+            data.get('etag') or '', data.get('fresh_until') or 0.0)
 
 # ################################################################################################################################
 
@@ -267,8 +299,17 @@ class RequestDispatcher:
         # This is needed in parallel.py's on_wsgi_request
         wsgi_environ['zato.channel_item'] = channel_item
 
-        # Read the raw data
-        payload = wsgi_environ['wsgi.input'].read()
+        # Read the raw data, unless this is a streaming channel, in which case the service will read it in chunks itself
+        if channel_item and channel_item.get('is_streaming'):
+            payload = b''
+            content_length = wsgi_environ.get('CONTENT_LENGTH')
+            wsgi_environ['zato.http.request.stream'] = RequestStream(
+                wsgi_environ['wsgi.input'],
+                channel_item.get('stream_buffer_size') or ModuleCtx.Stream_Buffer_Size,
+                int(content_length) if content_length else None,
+            )
+        else:
+            payload = wsgi_environ['wsgi.input'].read()
 
         # Store for later use prior to any kind of parsing
         wsgi_environ['zato.http.raw_request'] = payload
@@ -418,7 +459,26 @@ class RequestDispatcher:
                 wsgi_environ['zato.http.response.headers'].update(response.headers)
                 wsgi_environ['zato.http.response.status'] = status_response[response.status_code]
 
-                if channel_item['content_encoding'] == 'gzip':
+                # The service produced a generator or a file-like object ..
+                if is_stream_payload(response.payload):
+
+                    chunks = iter_stream_payload(
+                        response.payload, channel_item.get('stream_buffer_size') or ModuleCtx.Stream_Buffer_Size)
+
+                    # .. which streaming channels send to the client chunk by chunk, without keeping all of it in memory,
+                    # .. and without storing it in the audit log ..
+                    if channel_item.get('is_streaming'):
+                        if channel_item['content_encoding'] == 'gzip':
+                            chunks = iter_gzip(chunks)
+                            wsgi_environ['zato.http.response.headers']['Content-Encoding'] = 'gzip'
+                        return chunks
+
+                    # .. whereas other channels return it in one piece.
+                    else:
+                        response.payload = b''.join(chunks)
+
+                # There is no body to compress in responses to conditional requests
+                if channel_item['content_encoding'] == 'gzip' and response.status_code != NOT_MODIFIED:
 
                     s = StringIO()
                     with GzipFile(fileobj=s, mode='w') as f: # type: ignore
@@ -668,6 +728,10 @@ class RequestHandler:
     def __init__(self, server:'ParallelServer') -> 'None':
         self.server = server
 
+        # Cache keys of responses that are being currently obtained, mapped to their results,
+        # so that concurrent requests for the same key do not invoke the same service in parallel.
+        self._cache_in_flight = {} # type: dict[str, AsyncResult]
+
 # ################################################################################################################################
 
     def _set_response_data(self, service:'Service', **kwargs:'any_'):
@@ -775,28 +839,93 @@ class RequestHandler:
 
         # If there is any response, we can now load into a format that our callers expect
         if response:
-            response = loads(response)
-            response = _CachedResponse(response['payload'], response['content_type'], response['headers'],
-                response['status_code'])
+            response = _CachedResponse.from_dict(loads(response))
 
         return cache_key, response
 
 # ################################################################################################################################
 
-    def set_response_in_cache(self, channel_item:'any_', key:'str', response:'any_'):
+    def set_response_in_cache(self, channel_item:'any_', key:'str', response:'any_') -> 'stranydict | None':
         """ Caches responses from this channel's invocation for as long as the cache is configured to keep it.
+        If the channel has a cache expiry, the response is fresh for that many seconds and, if stale responses
+        are allowed, it is kept for additional cache_stale_ttl seconds during which it is served while being refreshed.
+        Returns the data cached or None if the response could not be cached.
         """
-        self.server.set_in_cache(channel_item['cache_type'], channel_item['cache_name'], key, dumps({
-            'payload': response.payload,
+        cache_expiry = channel_item.get('cache_expiry') or 0
+        cache_stale_ttl = channel_item.get('cache_stale_ttl') or 0
+
+        # Generators and file-like objects are read in full, just like channels that are not streaming return them ..
+        if is_stream_payload(response.payload):
+            response.payload = b''.join(iter_stream_payload(
+                response.payload, channel_item.get('stream_buffer_size') or ModuleCtx.Stream_Buffer_Size))
+
+        # .. and, because responses are cached as JSON, only textual ones can be cached.
+        payload = response.payload
+        if isinstance(payload, bytes):
+            try:
+                payload = payload.decode('utf8')
+            except UnicodeDecodeError:
+                logger.info('Not caching a binary response of `%s`', channel_item['name'])
+                return None
+
+        # ETags are computed once, when a response is stored, rather than each time it is served ..
+        if channel_item.get('cache_etag'):
+            etag_data = payload.encode('utf8') if isinstance(payload, str) else payload
+            etag = '"{}"'.format(sha256(etag_data or b'').hexdigest())
+            response.headers['ETag'] = etag
+        else:
+            etag = ''
+
+        data = {
+            'payload': payload,
             'content_type': response.content_type,
             'headers': response.headers,
             'status_code': response.status_code,
-        }))
+            'etag': etag,
+            'fresh_until': time() + cache_expiry if cache_expiry else 0.0,
+        }
+
+        # .. and without an expiry of its own, the response is kept for as long as the cache's default expiry says.
+        expiry = cache_expiry + cache_stale_ttl if cache_expiry else 0.0
+
+        self.server.set_in_cache(channel_item['cache_type'], channel_item['cache_name'], key, dumps(data), expiry)
+
+        return data
 
 # ################################################################################################################################
 
-    def handle(
+    def _get_conditional_response(self, response:'any_', wsgi_environ:'stranydict') -> 'any_':
+        """ Returns a bodiless 304 response if the client already has the current version of a response with an ETag.
+        """
+        # If-None-Match means that a request is to be performed only if there is no match for other methods
+        if wsgi_environ.get('REQUEST_METHOD') not in ModuleCtx.Conditional_Methods:
+            return response
+
+        etag = response.headers.get('ETag') if response.headers else None
+        if not etag:
+            return response
+
+        if_none_match = wsgi_environ.get('HTTP_IF_NONE_MATCH')
+        if not if_none_match:
+            return response
+
+        for elem in if_none_match.split(','):
+            elem = elem.strip()
+
+            # Weak comparison is used for GET requests, as per RFC 9110
+            if elem.startswith('W/'):
+                elem = elem[2:]
+
+            if elem == '*' or elem == etag:
+                return _CachedResponse('', response.content_type, {'ETag': etag}, NOT_MODIFIED)
+
+        return response
+
+# ################################################################################################################################
+
+    def _invoke_service(
         self,
+        service:'Service',
         cid:'str',
         url_match:'any_',
         channel_item:'any_',
@@ -805,26 +934,9 @@ class RequestHandler:
         worker_store:'WorkerStore',
         simple_io_config:'stranydict',
         post_data:'dictnone',
-        path_info:'str',
         channel_params:'stranydict',
         zato_response_headers_container:'stranydict',
     ) -> 'any_':
-        """ Create a new instance of a service and invoke it.
-        """
-        service, is_active = self.server.service_store.new_instance(channel_item.service_impl_name)
-        if not is_active:
-            logger.warning('Could not invoke an inactive service:`%s`, cid:`%s`', service.get_name(), cid)
-            raise NotFound(cid, response_404.format(
-                path_info, wsgi_environ.get('REQUEST_METHOD'), wsgi_environ.get('HTTP_ACCEPT'), cid))
-
-        # This is needed for type checking to make sure the name is bound
-        cache_key = ''
-
-        # If caching is configured for this channel, we need to first check if there is no response already
-        if channel_item['cache_type']:
-            cache_key, response = self.get_response_from_cache(service, raw_request, channel_item, channel_params, wsgi_environ)
-            if response:
-                return response
 
         # Add any path params matched to WSGI environment so it can be easily accessible later on
         wsgi_environ['zato.http.path_params'] = url_match
@@ -833,8 +945,7 @@ class RequestHandler:
         if channel_item['data_format'] == ModuleCtx.SIO_FORM_DATA:
             wsgi_environ['zato.request.payload'] = post_data
 
-        # No cache for this channel or no cached response, invoke the service then.
-        response = service.update_handle(self._set_response_data, service, raw_request,
+        return service.update_handle(self._set_response_data, service, raw_request,
             CHANNEL.HTTP_SOAP, channel_item.data_format, channel_item.transport, self.server,
             cast_('BrokerClient', worker_store.broker_client),
             worker_store, cid, simple_io_config, wsgi_environ=wsgi_environ,
@@ -843,13 +954,174 @@ class RequestHandler:
             params_priority=channel_item.params_pri,
             zato_response_headers_container=zato_response_headers_container)
 
-        # Cache the response if needed (cache_key was already created on return from get_response_from_cache)
-        if channel_item['cache_type']:
-            self.set_response_in_cache(channel_item, cache_key, response)
+# ################################################################################################################################
+
+    def _invoke_and_cache(
+        self,
+        channel_item:'any_',
+        cache_key:'str',
+        invoke_func:'callable_',
+        single_flight:'bool',
+    ) -> 'any_':
+        """ Invokes a service and caches its response. With single-flight, only one request for a given key
+        invokes the service at a time and any others that arrive in the meantime receive the same response.
+        """
+        if not single_flight:
+            response = invoke_func()
+            _ = self.set_response_in_cache(channel_item, cache_key, response)
+            return response
+
+        # Someone is already obtaining this response so we can wait for it ..
+        in_flight = self._cache_in_flight.get(cache_key)
+        if in_flight is not None:
+            _ = in_flight.wait(ModuleCtx.Cache_Single_Flight_Timeout)
+
+            # .. if the request that we were waiting for did not produce a response in time, if it failed,
+            # .. or if its response could not be cached, we need to invoke the service ourselves, without any coordination.
+            if not (in_flight.successful() and in_flight.value):
+                response = invoke_func()
+                _ = self.set_response_in_cache(channel_item, cache_key, response)
+                return response
+            else:
+                return _CachedResponse.from_dict(in_flight.value)
+
+        # .. otherwise, it is our job to obtain it.
+        in_flight = AsyncResult()
+        self._cache_in_flight[cache_key] = in_flight
+
+        try:
+            response = invoke_func()
+            data = self.set_response_in_cache(channel_item, cache_key, response)
+        except Exception as e:
+            in_flight.set_exception(e)
+            raise
+        else:
+            in_flight.set(data)
+            return response
+        finally:
+            _ = self._cache_in_flight.pop(cache_key, None)
+
+# ################################################################################################################################
+
+    def _refresh_cache(
+        self,
+        cache_key:'str',
+        url_match:'any_',
+        channel_item:'any_',
+        wsgi_environ:'stranydict',
+        raw_request:'str',
+        worker_store:'WorkerStore',
+        simple_io_config:'stranydict',
+        post_data:'dictnone',
+        channel_params:'stranydict',
+    ) -> 'None':
+        """ Obtains a new response for a stale one that was already served from the cache.
+        """
+        service, is_active = self.server.service_store.new_instance(channel_item.service_impl_name)
+        cid = new_cid()
+
+        # The service may have been deactivated after the response was cached
+        if not is_active:
+            logger.info('Not refreshing a cached response of `%s` with an inactive service:`%s`, cid:`%s`',
+                channel_item['name'], service.get_name(), cid)
+            return
+
+        def invoke_func() -> 'any_':
+            return self._invoke_service(service, cid, url_match, channel_item, wsgi_environ, raw_request, worker_store,
+                simple_io_config, post_data, dict(channel_params), {})
+
+        try:
+            # Refreshing is always single-flight so that a stale response is refreshed only once
+            _ = self._invoke_and_cache(channel_item, cache_key, invoke_func, True)
+        except Exception:
+            logger.warning('Could not refresh a cached response of `%s`, cid:`%s`, e:`%s`',
+                channel_item['name'], cid, format_exc())
+        else:
+            # The response has been obtained so the instance can be reused if the service has a pool of them
+            if service.instance_pool_size:
+                self.server.service_store.release_instance(service)
+
+# ################################################################################################################################
+
+    def handle(
+        self,
+        cid:'str',
+        url_match:'any_',
+        channel_item:'any_',
+        wsgi_environ:'stranydict',
+        raw_request:'str',
+        worker_store:'WorkerStore',
+        simple_io_config:'stranydict',
+        post_data:'dictnone',
+        path_info:'str',
+        channel_params:'stranydict',
+        zato_response_headers_container:'stranydict',
+    ) -> 'any_':
+        """ Create a new instance of a service and invoke it.
+        """
+        service, is_active = self.server.service_store.new_instance(channel_item.service_impl_name)
+        if not is_active:
+            logger.warning('Could not invoke an inactive service:`%s`, cid:`%s`', service.get_name(), cid)
+            raise NotFound(cid, response_404.format(
+                path_info, wsgi_environ.get('REQUEST_METHOD'), wsgi_environ.get('HTTP_ACCEPT'), cid))
+
+        response = self._get_response(service, cid, url_match, channel_item, wsgi_environ, raw_request, worker_store,
+            simple_io_config, post_data, channel_params, zato_response_headers_container)
+
+        # The response has been obtained, no matter if from the service or from the cache, so the instance
+        # can be reused if the service has a pool of them. Instances with stream payloads are not released
+        # because their responses are still to be read.
+        if service.instance_pool_size:
+            self.server.service_store.release_instance(service)
 
-        # Having used the cache or not, we can return the response now
         return response
 
+# ################################################################################################################################
+
+    def _get_response(
+        self,
+        service:'Service',
+        cid:'str',
+        url_match:'any_',
+        channel_item:'any_',
+        wsgi_environ:'stranydict',
+        raw_request:'str',
+        worker_store:'WorkerStore',
+        simple_io_config:'stranydict',
+        post_data:'dictnone',
+        channel_params:'stranydict',
+        zato_response_headers_container:'stranydict',
+    ) -> 'any_':
+        """ Returns a response to a request, either from the cache or by invoking the service.
+        """
+        # No cache for this channel, invoke the service then. Streaming channels are never cached
+        # because their requests are not read upfront, which means that there is nothing to compute cache keys from.
+        if not channel_item['cache_type'] or channel_item.get('is_streaming'):
+            return self._invoke_service(service, cid, url_match, channel_item, wsgi_environ, raw_request, worker_store,
+                simple_io_config, post_data, channel_params, zato_response_headers_container)
+
+        # Caching is configured for this channel so we need to first check if there is no response already ..
+        cache_key, response = self.get_response_from_cache(service, raw_request, channel_item, channel_params, wsgi_environ)
+
+        if response:
+
+            # .. a stale response is still returned but, in background, we obtain a fresh one for subsequent requests ..
+            if response.fresh_until and response.fresh_until < time():
+                if cache_key not in self._cache_in_flight:
+                    _ = spawn(self._refresh_cache, cache_key, url_match, channel_item, dict(wsgi_environ), raw_request,
+                        worker_store, simple_io_config, post_data, channel_params)
+
+            return self._get_conditional_response(response, wsgi_environ)
+
+        # .. there was no cached response so we invoke the service and cache what it returns.
+        def invoke_func() -> 'any_':
+            return self._invoke_service(service, cid, url_match, channel_item, wsgi_environ, raw_request, worker_store,
+                simple_io_config, post_data, channel_params, zato_response_headers_container)
+
+        response = self._invoke_and_cache(channel_item, cache_key, invoke_func, channel_item.get('cache_single_flight'))
+
+        return self._get_conditional_response(response, wsgi_environ)
+
 # ################################################################################################################################
 
     def _needs_admin_response(
@@ -884,6 +1156,10 @@ class RequestHandler:
 
                 response.payload = dumps(payload)
         else:
+            # Generators and file-like objects are streamed as they are
+            if is_stream_payload(response.payload):
+                return
+
             if not isinstance(response.payload, str):
                 if isinstance(response.payload, dict) and data_format in ModuleCtx.Dict_Like:
                     response.payload = dumps(response.payload)
@@ -10,19 +10,22 @@ Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
 import os
 from copy import deepcopy
 from datetime import datetime
-from http.client import OK
+from http.client import NOT_MODIFIED, OK
 from io import StringIO
 from logging import DEBUG, getLogger
+from random import random
+from time import monotonic, time
 from traceback import format_exc
 from urllib.parse import urlencode
 
 # gevent
-from gevent.lock import RLock
+from gevent import sleep
+from gevent.lock import BoundedSemaphore, RLock
 
 # requests
 from requests import Response as _RequestsResponse
 from requests.adapters import HTTPAdapter
-from requests.exceptions import Timeout as RequestsTimeout
+from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout as RequestsTimeout
 from requests.sessions import Session as RequestsSession
 
 # requests-ntlm
@@ -32,14 +35,17 @@ from requests_ntlm import HttpNtlmAuth
 from requests_toolbelt import MultipartEncoder
 
 # Zato
-from zato.common.api import ContentType, CONTENT_TYPE, DATA_FORMAT, NotGiven, SEC_DEF_TYPE, URL_TYPE
-from zato.common.exception import Inactive, TimeoutException
+from zato.common.api import ContentType, CONTENT_TYPE, DATA_FORMAT, DEFAULT_HTTP_POOL_SIZE, NotGiven, SEC_DEF_TYPE, URL_TYPE
+from zato.common.exception import CircuitOpenException, Inactive, TimeoutException
 from zato.common.json_ import dumps, loads
 from zato.common.marshal_.api import extract_model_class, is_list, Model
 from zato.common.typing_ import cast_
 from zato.common.util.api import get_component_name
 from zato.common.util.config import extract_param_placeholders
 from zato.common.util.open_ import open_rb
+from zato.server.connection.http_soap.outgoing_cache import ModuleCtx as CacheModuleCtx, OutgoingResponseCache
+from zato.server.connection.http_soap.resilience import CircuitBreaker, ConnectionStats, get_config_int, ModuleCtx, \
+     RetryBudget
 from zato.server.connection.queue import ConnectionQueue
 
 # ################################################################################################################################
@@ -76,6 +82,12 @@ _OAuth = SEC_DEF_TYPE.OAUTH
 _TLS_Key_Cert = SEC_DEF_TYPE.TLS_KEY_CERT
 _WSS = SEC_DEF_TYPE.WSS
 
+# Only these methods are retried because sending them more than once has the same effect as sending them once
+_idempotent_methods = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'TRACE'}
+
+# Responses with these status codes are retried because they mean that the request was not processed
+_retry_status_codes = {502, 503, 504}
+
 # ################################################################################################################################
 # ################################################################################################################################
 
@@ -111,8 +123,28 @@ class BaseHTTPSOAPWrapper:
         self.RequestsSession = RequestsSession or _requests_session
         self.server = cast_('ParallelServer', server)
         self.session = RequestsSession()
-        self.https_adapter = HTTPSAdapter()
+
+        # Each connection keeps as many connections to the remote end as its pool size indicates ..
+        self.pool_size = get_config_int(self.config, 'pool_size', DEFAULT_HTTP_POOL_SIZE)
+        self.http_adapter = HTTPAdapter(pool_maxsize=self.pool_size)
+        self.https_adapter = HTTPSAdapter(pool_maxsize=self.pool_size)
+        self.session.mount('http://', self.http_adapter)
         self.session.mount('https://', self.https_adapter)
+
+        # .. optionally, it limits how many requests can be sent at a time, so that a slow remote end does not tie up
+        # .. all the greenlets that call it, ..
+        self.max_in_flight = get_config_int(self.config, 'max_in_flight')
+        self.in_flight = BoundedSemaphore(self.max_in_flight) if self.max_in_flight else None
+
+        # .. it can stop calling a remote end that keeps failing ..
+        self.breaker = CircuitBreaker.from_config(self.config)
+
+        # .. and retry idempotent requests, though only as many as the budget allows.
+        self.retry_max = get_config_int(self.config, 'retry_max')
+        self.retry_budget = RetryBudget(get_config_int(self.config, 'retry_budget', ModuleCtx.Retry_Budget)) \
+            if self.retry_max else None
+
+        self.stats = ConnectionStats()
         self._component_name = get_component_name()
         self.default_content_type = self.get_default_content_type()
 
@@ -323,8 +355,8 @@ class BaseHTTPSOAPWrapper:
             logger.info(msg)
 
             # .. do send it ..
-            response = self.session.request(
-                method, address, data=data, json=json, auth=auth, headers=headers, hooks=hooks,
+            response = self._send(
+                cid, method, address, data=data, json=json, auth=auth, headers=headers, hooks=hooks,
                 cert=cert, verify=tls_verify, timeout=self.config['timeout'], *args, **kwargs)
 
             # .. log what we received ..
@@ -337,6 +369,121 @@ class BaseHTTPSOAPWrapper:
         except RequestsTimeout:
             raise TimeoutException(cid, format_exc())
 
+# ################################################################################################################################
+
+    def _send(self, cid:'str', method:'str', address:'str', *args:'any_', **kwargs:'any_') -> '_RequestsResponse':
+        """ Sends a request through the session, waiting for an in-flight slot first, if they are limited.
+        """
+        self.stats.calls += 1
+
+        if not self.in_flight:
+            return self._send_with_retries(cid, method, address, *args, **kwargs)
+
+        if not self.in_flight.acquire(timeout=self.config['timeout'] or None):
+            self.stats.in_flight_rejected += 1
+            raise TimeoutException(cid, 'No free in-flight slot in `{}` (max. {})'.format(
+                self.config['name'], self.max_in_flight))
+
+        try:
+            return self._send_with_retries(cid, method, address, *args, **kwargs)
+        finally:
+            self.in_flight.release()
+
+# ################################################################################################################################
+
+    def _send_with_retries(self, cid:'str', method:'str', address:'str', *args:'any_', **kwargs:'any_') -> '_RequestsResponse':
+
+        # Local variables
+        stats = self.stats
+        breaker = self.breaker
+        retry_budget = self.retry_budget
+        can_retry = retry_budget and method.upper() in _idempotent_methods
+        attempt = 0
+
+        # Each call earns a fraction of a retry
+        if retry_budget:
+            retry_budget.on_request()
+
+        while True:
+
+            attempt += 1
+
+            if breaker and not breaker.allow_request():
+                raise CircuitOpenException(cid, 'Circuit breaker is open for `{}`'.format(self.config['name']))
+
+            response = None
+            error = None
+            start = monotonic()
+
+            try:
+                response = self.session.request(method, address, *args, **kwargs)
+            except Exception as e:
+                error = e
+            except BaseException:
+
+                # Our greenlet was killed or its gevent.Timeout expired, which is a failure too. If we did not report it,
+                # and this call was a probe, a half-open breaker would be waiting for its result forever.
+                self._on_result(start, True)
+                raise
+
+            # Record what happened ..
+            is_failure = error is not None or response.status_code >= 500 # type: ignore
+            self._on_result(start, is_failure)
+
+            # .. check if the request can be retried ..
+            if can_retry and attempt <= self.retry_max:
+
+                if error is not None:
+                    needs_retry = isinstance(error, (RequestsConnectionError, RequestsTimeout))
+                else:
+                    needs_retry = response.status_code in _retry_status_codes # type: ignore
+
+                if needs_retry:
+                    if retry_budget.try_spend(): # type: ignore
+                        stats.retries += 1
+                        backoff = min(ModuleCtx.Retry_Backoff * 2 ** (attempt - 1), ModuleCtx.Retry_Backoff_Max) * random()
+                        logger.info('REST out retry → cid=%s; %s %s; attempt=%s; backoff=%.3f; e=%s', cid, method, address,
+                            attempt, backoff, error if error is not None else response.status_code) # type: ignore
+                        sleep(backoff)
+                        continue
+                    else:
+                        stats.retries_denied += 1
+
+            # .. if we are here, there will be no more retries.
+            if error is not None:
+                raise error
+
+            return response # type: ignore
+
+# ################################################################################################################################
+
+    def _on_result(self, start:'float', is_failure:'bool') -> 'None':
+        """ Records the result of a request started at a given time in statistics and in the circuit breaker, if any.
+        """
+        time_ms = (monotonic() - start) * 1000
+
+        self.stats.requests += 1
+        self.stats.errors += is_failure
+        self.stats.latency.observe(time_ms)
+
+        if self.breaker:
+            self.breaker.on_result(is_failure, time_ms)
+
+# ################################################################################################################################
+
+    def get_stats(self) -> 'stranydict':
+        """ Returns statistics of this connection in the current worker process.
+        """
+        return {
+            'name': self.config['name'],
+            'pool_size': self.pool_size,
+            'max_in_flight': self.max_in_flight,
+            'in_flight': (self.max_in_flight - self.in_flight.counter) if self.in_flight else None,
+            'breaker': self.breaker.to_dict() if self.breaker else None,
+            'retry_tokens': round(self.retry_budget.tokens, 3) if self.retry_budget else None,
+            **self.stats.to_dict(),
+        }
+
 # ################################################################################################################################
 
     def _get_bearer_token_auth(self, sec_def_name:'str', scopes:'str', data_format:'str') -> 'BearerTokenInfoResult':
@@ -467,6 +614,9 @@ class HTTPSOAPWrapper(BaseHTTPSOAPWrapper):
         super(HTTPSOAPWrapper, self).__init__(config, requests_module, server)
         self.server = server
 
+        # Responses to GET requests are cached only if the connection has a cache assigned
+        self.response_cache = OutgoingResponseCache.from_config(server, config)
+
 # ################################################################################################################################
 
     def __str__(self) -> 'str':
@@ -617,14 +767,28 @@ class HTTPSOAPWrapper(BaseHTTPSOAPWrapper):
             if isinstance(data, str):
                 data = data.encode('utf-8')
 
-        # .. do invoke the connection ..
-        response = self.invoke_http(cid, method, address, data, headers, {}, params=qs_params, *args, **kwargs)
+        # .. GET requests may be served from cache, if there is one and the response is not to be streamed ..
+        if self.response_cache and method == 'GET' and not kwargs.get('stream'):
+            response = self._get_with_cache(cid, address, data, headers, qs_params, *args, **kwargs)
+
+        # .. otherwise, do invoke the connection ..
+        else:
+            response = self.invoke_http(cid, method, address, data, headers, {}, params=qs_params, *args, **kwargs)
+            response.data = self._get_response_data(response) # type: ignore
 
-        # .. by default, we have no parsed response at all, ..
-        # .. which means that we can assume it will be the same as the raw, text response ..
-        response.data = response.text # type: ignore
+        # .. if we have a model class on input, deserialize the received response into one ..
+        if model:
+            response.data = self.server.marshal_api.from_dict(None, response.data, model) # type: ignore
+
+        # .. now, return the response to the caller.
+        return cast_('Response', response)
+
+# ################################################################################################################################
 
-        # .. check if we are explicitly told that we handle JSON ..
+    def _get_response_data(self, response:'_RequestsResponse') -> 'any_':
+        """ Returns the body of a response, parsed if it is JSON.
+        """
+        # Check if we are explicitly told that we handle JSON ..
         _has_data_format_json = self.config['data_format'] == DATA_FORMAT.JSON
 
         # .. check if we perhaps received JSON in the response ..
@@ -636,16 +800,86 @@ class HTTPSOAPWrapper(BaseHTTPSOAPWrapper):
         # .. if yes, try to parse the response accordingly ..
         if _is_json:
             try:
-                response.data = loads(response.text or '""') # type: ignore
+                return loads(response.text or '""')
             except ValueError as e:
                 raise Exception('Could not parse JSON response `{}`; e:`{}`'.format(response.text, e.args[0]))
 
-        # .. if we have a model class on input, deserialize the received response into one ..
-        if model:
-            response.data = self.server.marshal_api.from_dict(None, response.data, model) # type: ignore
+        # .. otherwise, the data is the same as the raw, text response.
+        else:
+            return response.text
 
-        # .. now, return the response to the caller.
-        return cast_('Response', response)
+# ################################################################################################################################
+
+    def _get_with_cache(
+        self,
+        cid:'str',
+        address:'str',
+        data:'any_',
+        headers:'strstrdict',
+        params:'stranydict',
+        *args:'any_',
+        **kwargs:'any_'
+    ) -> '_RequestsResponse':
+        """ Sends a GET request unless its response is already cached and fresh. Stale responses are revalidated
+        and they may be returned if the remote end is not available, as long as stale-if-error allows it.
+        """
+        # Local variables
+        cache = cast_('OutgoingResponseCache', self.response_cache)
+        stats = self.stats
+
+        # Responses may depend on security definitions given on input so they are part of the key
+        key = cache.get_key(address, params, kwargs.get('sec_def_name'), kwargs.get('auth_scopes'))
+
+        entry = cache.get(key, headers)
+        now = time()
+
+        # We have a fresh response, there is no need to send anything ..
+        if entry and cache.is_fresh(entry, now):
+            stats.cache_hits += 1
+            logger.info('REST out ← cid=%s; GET %s; name:%s; from cache', cid, address, self.config['name'])
+            return cache.to_response(entry)
+
+        # .. we have a stale one and we can ask if it is still valid ..
+        if entry:
+            cache.add_conditions(entry, headers)
+
+            try:
+                response = self.invoke_http(cid, 'GET', address, data, headers, {}, params=params, *args, **kwargs)
+            except Exception as e:
+                if cache.can_serve_stale(entry, now):
+                    return self._get_stale_response(cid, address, entry, e)
+                raise
+
+            # .. it is still valid ..
+            if response.status_code == NOT_MODIFIED:
+                stats.cache_revalidations += 1
+                return cache.to_response(cache.refresh(key, entry, response, now))
+
+            # .. it is not valid but the remote end has an error so we can still return it ..
+            if response.status_code in CacheModuleCtx.Error_Status_Codes and cache.can_serve_stale(entry, now):
+                return self._get_stale_response(cid, address, entry, response.status_code)
+
+        # .. or we do not have any response at all.
+        else:
+            response = self.invoke_http(cid, 'GET', address, data, headers, {}, params=params, *args, **kwargs)
+
+        # If we are here, the remote end returned a new response which we can store for later use
+        stats.cache_misses += 1
+
+        response.data = self._get_response_data(response) # type: ignore
+        _ = cache.store(key, response, headers, now)
+
+        return response
+
+# ################################################################################################################################
+
+    def _get_stale_response(self, cid:'str', address:'str', entry:'stranydict', reason:'any_') -> '_RequestsResponse':
+
+        self.stats.cache_stale_if_error += 1
+        logger.warning('REST out ← cid=%s; GET %s; name:%s; stale response from cache after `%s`',
+            cid, address, self.config['name'], reason)
+
+        return cast_('OutgoingResponseCache', self.response_cache).to_response(entry)
 
 # ################################################################################################################################
 
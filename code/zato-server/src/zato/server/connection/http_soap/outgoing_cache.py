@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+from email.utils import parsedate_to_datetime
+from hashlib import sha256
+from http.client import BAD_GATEWAY, GATEWAY_TIMEOUT, INTERNAL_SERVER_ERROR, NON_AUTHORITATIVE_INFORMATION, OK, \
+     SERVICE_UNAVAILABLE
+
+# requests
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import any_, anydict, floatnone, stranydict, strdict
+    from zato.server.base.parallel import ParallelServer
+    ParallelServer = ParallelServer
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class ModuleCtx:
+
+    # Only responses with these status codes are stored
+    Cacheable_Status_Codes = {OK, NON_AUTHORITATIVE_INFORMATION}
+
+    # Such responses, just like exceptions, let stale responses be served if stale-if-error allows it
+    Error_Status_Codes = {INTERNAL_SERVER_ERROR, BAD_GATEWAY, SERVICE_UNAVAILABLE, GATEWAY_TIMEOUT}
+
+    # For how many seconds stale responses with validators are kept for revalidation, unless cache_expiry says otherwise
+    Revalidation_Keep_Time = 3600
+
+    # Headers of 304 responses that are not to be copied to the stored ones
+    Not_Modified_Skip_Headers = {'content-length', 'content-encoding', 'transfer-encoding'}
+
+    # Stale responses with any of these directives are never served, not even if stale-if-error allows it
+    Revalidate_Directives = {'must-revalidate', 'proxy-revalidate', 's-maxage'}
+
+    # Responses to requests with credentials can be stored only if one of these directives says so, as per RFC 9111, 3.5
+    Authorization_Directives = {'public', 's-maxage', 'must-revalidate'}
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+def parse_cache_control(value:'str') -> 'strdict':
+    """ Returns Cache-Control directives, with names lower-cased, and empty strings for directives without arguments.
+    """
+    out = {}
+
+    for elem in value.split(','):
+        name, has_arg, arg = elem.partition('=')
+        name = name.strip().lower()
+        if name:
+            out[name] = arg.strip().strip('"') if has_arg else ''
+
+    return out
+
+# ################################################################################################################################
+
+def _get_seconds(value:'str | None') -> 'floatnone':
+    """ Returns a non-negative number of seconds out of a header or directive value, or None if there is no value.
+    """
+    if value is None:
+        return None
+    try:
+        return max(float(int(value)), 0.0)
+    except ValueError:
+        return 0.0
+
+# ################################################################################################################################
+
+def _parse_http_date(value:'str') -> 'floatnone':
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+# ################################################################################################################################
+
+def get_freshness_lifetime(headers:'any_', directives:'strdict', now:'float') -> 'float':
+    """ Returns for how many more seconds a response is fresh, as per RFC 9111, section 4.2.
+    """
+    # Such responses can be stored but each use of them requires a revalidation
+    if 'no-cache' in directives:
+        return 0.0
+
+    # We are a shared cache so s-maxage takes precedence over max-age
+    lifetime = _get_seconds(directives.get('s-maxage', directives.get('max-age')))
+
+    if lifetime is None:
+
+        expires = headers.get('Expires')
+        if not expires:
+            return 0.0
+
+        # An invalid date, such as 0, means that the response has already expired
+        expires = _parse_http_date(expires)
+        if expires is None:
+            return 0.0
+
+        date = _parse_http_date(headers.get('Date') or '') or now
+        lifetime = expires - date
+
+    # How long the response has already spent in other caches
+    age = _get_seconds(headers.get('Age')) or 0.0
+
+    return max(lifetime - age, 0.0)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class OutgoingResponseCache:
+    """ A shared cache of responses to GET requests sent through an outgoing REST connection, kept in one of the caches
+    from the cache API. It follows the response's Cache-Control (max-age, s-maxage, no-cache, no-store, private, public,
+    must-revalidate, proxy-revalidate and stale-if-error), Expires, Age and Vary headers. Because all the callers
+    of a connection share it, it never stores private responses and it stores responses to requests with an Authorization
+    header only if they are explicitly allowed to be shared. Stale responses are revalidated with conditional requests
+    using their ETag and Last-Modified headers. Responses are stored along with their already parsed data, which is shared
+    by all the callers that receive it from cache and which should not be modified in place.
+    """
+    def __init__(self, server:'ParallelServer', config:'stranydict') -> 'None':
+        self.server = server
+        self.conn_id = config['id']
+        self.cache_type = config['cache_type']
+        self.cache_name = config['cache_name']
+        self.keep_time = int(config.get('cache_expiry') or ModuleCtx.Revalidation_Keep_Time)
+
+# ################################################################################################################################
+
+    @staticmethod
+    def from_config(server:'ParallelServer', config:'stranydict') -> 'OutgoingResponseCache | None':
+        """ Returns a new cache if the connection has one assigned or None otherwise.
+        """
+        if config.get('cache_type') and config.get('cache_name'):
+            return OutgoingResponseCache(server, config)
+
+# ################################################################################################################################
+
+    def get_key(self, address:'str', params:'anydict', *extra:'any_') -> 'str':
+        """ Builds a key out of the request's address, query string and anything else that the response depends on,
+        such as security definitions used. The order of query string parameters does not matter.
+        """
+        query_string = str(sorted(params.items())) if params else ''
+        data = '{}{}{}'.format(address, query_string, extra)
+        return 'http-out-{}-{}'.format(self.conn_id, sha256(data.encode('utf8')).hexdigest())
+
+# ################################################################################################################################
+
+    def get(self, key:'str', request_headers:'strdict') -> 'stranydict | None':
+        """ Returns a stored response, fresh or not, if there is one matching the request's headers.
+        """
+        entry = self.server.get_from_cache(self.cache_type, self.cache_name, key)
+        if not entry:
+            return None
+
+        # Each of the headers that the response varies by must have the same value as when it was stored
+        if entry['vary']:
+            request_headers = _lower_keys(request_headers)
+            for name, value in entry['vary'].items():
+                if request_headers.get(name) != value:
+                    return None
+
+        return entry
+
+# ################################################################################################################################
+
+    def is_fresh(self, entry:'stranydict', now:'float') -> 'bool':
+        return now < entry['fresh_until']
+
+# ################################################################################################################################
+
+    def can_serve_stale(self, entry:'stranydict', now:'float') -> 'bool':
+        return now < entry['fresh_until'] + entry['stale_if_error']
+
+# ################################################################################################################################
+
+    def add_conditions(self, entry:'stranydict', request_headers:'strdict') -> 'None':
+        """ Turns a request into a conditional one, based on the validators of a stored response.
+        """
+        if entry['etag']:
+            request_headers['If-None-Match'] = entry['etag']
+
+        if entry['last_modified']:
+            request_headers['If-Modified-Since'] = entry['last_modified']
+
+# ################################################################################################################################
+
+    def store(self, key:'str', response:'Response', request_headers:'strdict', now:'float') -> 'bool':
+        """ Stores a response, including its already parsed data, if its status code and headers allow it.
+        """
+        if response.status_code not in ModuleCtx.Cacheable_Status_Codes:
+            return False
+
+        headers = response.headers
+        directives = parse_cache_control(headers.get('Cache-Control') or '')
+
+        if not _is_shareable(directives):
+            return False
+
+        request_headers = _lower_keys(request_headers)
+
+        # Credentials may have given our caller access to a response that other callers are not meant to receive
+        if 'authorization' in request_headers:
+            if not ModuleCtx.Authorization_Directives.intersection(directives):
+                return False
+
+        # Responses that vary by anything at all cannot be matched with requests
+        vary = {}
+        vary_header = headers.get('Vary')
+
+        if vary_header:
+            for name in vary_header.split(','):
+                name = name.strip().lower()
+                if name == '*':
+                    return False
+                elif name:
+                    vary[name] = request_headers.get(name)
+
+        entry = {
+            'data': getattr(response, 'data', None),
+            'content': response.content,
+            'encoding': response.encoding,
+            'status_code': response.status_code,
+            'headers': dict(headers),
+            'url': response.url,
+            'vary': vary,
+        }
+
+        return self._set(key, entry, directives, now)
+
+# ################################################################################################################################
+
+    def refresh(self, key:'str', entry:'stranydict', response:'Response', now:'float') -> 'stranydict':
+        """ Updates a stored response with the headers of a 304 response received when revalidating it.
+        """
+        headers = entry['headers'] = dict(entry['headers'])
+
+        # Headers of the stored response are replaced regardless of how they are capitalised
+        names = {name.lower(): name for name in headers}
+
+        for name, value in response.headers.items():
+            name_lower = name.lower()
+            if name_lower not in ModuleCtx.Not_Modified_Skip_Headers:
+                _ = headers.pop(names.get(name_lower, name), None)
+                headers[name] = value
+
+        directives = parse_cache_control(headers.get('Cache-Control') or '')
+
+        if _is_shareable(directives):
+            _ = self._set(key, entry, directives, now)
+
+        return entry
+
+# ################################################################################################################################
+
+    def _set(self, key:'str', entry:'stranydict', directives:'strdict', now:'float') -> 'bool':
+
+        headers = CaseInsensitiveDict(entry['headers'])
+
+        # Validators let stale responses be revalidated ..
+        entry['etag'] = headers.get('ETag')
+        entry['last_modified'] = headers.get('Last-Modified')
+
+        # .. and stale-if-error lets them be served when the remote end returns errors, unless they must be revalidated,
+        # which, in shared caches such as ours, s-maxage and proxy-revalidate require as well.
+        if ModuleCtx.Revalidate_Directives.intersection(directives):
+            stale_if_error = 0.0
+        else:
+            stale_if_error = _get_seconds(directives.get('stale-if-error')) or 0.0
+
+        lifetime = get_freshness_lifetime(headers, directives, now)
+
+        entry['fresh_until'] = now + lifetime
+        entry['stale_if_error'] = stale_if_error
+
+        # Responses are kept for as long as they may be served. If they can be revalidated, they are kept for longer.
+        expiry = lifetime + stale_if_error
+        if entry['etag'] or entry['last_modified']:
+            expiry = max(expiry, lifetime + self.keep_time)
+
+        # There is no point in storing responses that will never be used
+        if not expiry:
+            return False
+
+        self.server.set_in_cache(self.cache_type, self.cache_name, key, entry, expiry)
+        return True
+
+# ################################################################################################################################
+
+    def to_response(self, entry:'stranydict') -> 'Response':
+        """ Returns a new response object, with its already parsed data, built out of a stored response.
+        """
+        response = Response()
+        response.status_code = entry['status_code']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = entry['encoding']
+        response.url = entry['url']
+        response._content = entry['content']
+        response.data = entry['data'] # type: ignore
+
+        return response
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+def _lower_keys(data:'strdict') -> 'strdict':
+    return {key.lower(): value for key, value in data.items()}
+
+# ################################################################################################################################
+
+def _is_shareable(directives:'strdict') -> 'bool':
+    """ Returns True if a response with the given Cache-Control directives can be stored in a shared cache.
+    """
+    return not ('no-store' in directives or 'private' in directives)
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+from bisect import bisect_left
+from time import monotonic
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import any_, stranydict
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class ModuleCtx:
+
+    # Upper bounds of latency histogram buckets, in milliseconds
+    Latency_Buckets = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+    # How many calls need to be made in a window before the circuit breaker may open
+    Breaker_Min_Calls = 20
+
+    # How long each of the breaker's windows is, in seconds
+    Breaker_Window = 60
+
+    # For how many seconds an open breaker rejects calls before letting probes through
+    Breaker_Open_Time = 30
+
+    # How many probes in a row need to succeed to close a half-open breaker
+    Breaker_Half_Open_Calls = 3
+
+    # By default, each call earns this many percent of a retry
+    Retry_Budget = 20
+
+    # How many retries can be saved up in a budget
+    Retry_Budget_Max = 10
+
+    # Retries back off exponentially starting at this many seconds ..
+    Retry_Backoff = 0.05
+
+    # .. but they never wait more than this many seconds.
+    Retry_Backoff_Max = 2.0
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+# Opaque attributes of outgoing connections that configure the objects below
+config_keys = (
+    'max_in_flight',
+    'retry_max',
+    'retry_budget',
+    'breaker_error_rate',
+    'breaker_slow_call_rate',
+    'breaker_slow_call_time',
+    'breaker_min_calls',
+    'breaker_window',
+    'breaker_open_time',
+    'breaker_half_open_calls',
+)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+def get_config_int(config:'stranydict', key:'str', default:'int'=0) -> 'int':
+    """ Returns an integer value of an opaque configuration key, which may be missing, empty or a string.
+    """
+    value = config.get(key)
+    return int(value) if value else default
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class BreakerState:
+    Closed    = 'closed'
+    Open      = 'open'
+    Half_Open = 'half-open'
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class LatencyHistogram:
+    """ Counts how many calls fell into each of the latency buckets, without keeping the individual times.
+    """
+    __slots__ = ('buckets', 'counts', 'count', 'total', 'max')
+
+    def __init__(self, buckets:'any_'=ModuleCtx.Latency_Buckets) -> 'None':
+        self.buckets = buckets
+
+        # The last one is for calls slower than the last bucket
+        self.counts = [0] * (len(buckets) + 1)
+
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+# ################################################################################################################################
+
+    def observe(self, time_ms:'float', _bisect_left:'any_'=bisect_left) -> 'None':
+        self.counts[_bisect_left(self.buckets, time_ms)] += 1
+        self.count += 1
+        self.total += time_ms
+        if time_ms > self.max:
+            self.max = time_ms
+
+# ################################################################################################################################
+
+    def get_percentile(self, percentile:'float') -> 'float':
+        """ Returns the upper bound of the bucket that the given percentile falls into.
+        """
+        if not self.count:
+            return 0.0
+
+        needed = self.count * percentile / 100.0
+        seen = 0
+
+        for idx, count in enumerate(self.counts):
+            seen += count
+            if seen >= needed:
+                if idx < len(self.buckets):
+                    return min(float(self.buckets[idx]), self.max)
+                break
+
+        return self.max
+
+# ################################################################################################################################
+
+    def to_dict(self) -> 'stranydict':
+
+        buckets = {}
+        for bucket, count in zip(self.buckets, self.counts):
+            buckets['le_{}'.format(bucket)] = count
+        buckets['inf'] = self.counts[-1]
+
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max, 3),
+            'p50_ms': self.get_percentile(50),
+            'p90_ms': self.get_percentile(90),
+            'p99_ms': self.get_percentile(99),
+            'buckets': buckets,
+        }
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class CircuitBreaker:
+    """ Stops calls to a remote end once too many of them fail or are too slow within a window. After open_time seconds,
+    a few probes are let through and, if all of them succeed, the breaker closes again. Otherwise, it opens once more.
+    A failure is an exception or an HTTP 5xx response and a call is slow if it takes at least slow_call_time milliseconds.
+    """
+    def __init__(
+        self,
+        *,
+        error_rate:'int',
+        slow_call_rate:'int',
+        slow_call_time:'int',
+        min_calls:'int',
+        window:'int',
+        open_time:'int',
+        half_open_calls:'int',
+    ) -> 'None':
+
+        # Percentages of failed and slow calls at which the breaker opens, zero means that a given check is disabled
+        self.error_rate = error_rate
+        self.slow_call_rate = slow_call_rate if slow_call_time else 0
+
+        self.slow_call_time = slow_call_time
+        self.min_calls = min_calls
+        self.window = window
+        self.open_time = open_time
+        self.half_open_calls = half_open_calls
+
+        self.state = BreakerState.Closed
+
+        # The current window
+        self.window_start = monotonic()
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+
+        # When the breaker was last opened and how many probes can still be let through or have succeeded
+        self.opened_at = 0.0
+        self.probes_left = 0
+        self.probes_ok = 0
+
+        # Totals since the breaker was created
+        self.times_opened = 0
+        self.rejected = 0
+
+# ################################################################################################################################
+
+    @staticmethod
+    def from_config(config:'stranydict') -> 'CircuitBreaker | None':
+        """ Returns a new breaker if the configuration enables it or None otherwise.
+        """
+        error_rate = get_config_int(config, 'breaker_error_rate')
+        slow_call_rate = get_config_int(config, 'breaker_slow_call_rate')
+
+        if not (error_rate or slow_call_rate):
+            return None
+
+        return CircuitBreaker(
+            error_rate=error_rate,
+            slow_call_rate=slow_call_rate,
+            slow_call_time=get_config_int(config, 'breaker_slow_call_time'),
+            min_calls=get_config_int(config, 'breaker_min_calls', ModuleCtx.Breaker_Min_Calls),
+            window=get_config_int(config, 'breaker_window', ModuleCtx.Breaker_Window),
+            open_time=get_config_int(config, 'breaker_open_time', ModuleCtx.Breaker_Open_Time),
+            half_open_calls=get_config_int(config, 'breaker_half_open_calls', ModuleCtx.Breaker_Half_Open_Calls),
+        )
+
+# ################################################################################################################################
+
+    def _reset_window(self, now:'float') -> 'None':
+        self.window_start = now
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+
+# ################################################################################################################################
+
+    def _open(self, now:'float') -> 'None':
+        self.state = BreakerState.Open
+        self.opened_at = now
+        self.times_opened += 1
+
+# ################################################################################################################################
+
+    def allow_request(self) -> 'bool':
+        """ Returns True if a call can be made now. Each call allowed must be followed by on_result.
+        """
+        if self.state == BreakerState.Closed:
+            return True
+
+        if self.state == BreakerState.Open:
+
+            # Let probes through once enough time has passed ..
+            if monotonic() - self.opened_at >= self.open_time:
+                self.state = BreakerState.Half_Open
+                self.probes_left = self.half_open_calls
+                self.probes_ok = 0
+
+            # .. otherwise, reject the call outright.
+            else:
+                self.rejected += 1
+                return False
+
+        # We are half-open here
+        if self.probes_left > 0:
+            self.probes_left -= 1
+            return True
+
+        self.rejected += 1
+        return False
+
+# ################################################################################################################################
+
+    def on_result(self, is_failure:'bool', time_ms:'float') -> 'None':
+
+        now = monotonic()
+        is_slow = bool(self.slow_call_time) and time_ms >= self.slow_call_time
+
+        if self.state == BreakerState.Half_Open:
+
+            # A single bad probe opens the breaker again ..
+            if is_failure or is_slow:
+                self._open(now)
+
+            # .. whereas enough good ones close it.
+            else:
+                self.probes_ok += 1
+                if self.probes_ok >= self.half_open_calls:
+                    self.state = BreakerState.Closed
+                    self._reset_window(now)
+
+            return
+
+        # This was a call started before the breaker opened
+        if self.state == BreakerState.Open:
+            return
+
+        if now - self.window_start >= self.window:
+            self._reset_window(now)
+
+        self.calls += 1
+        self.failures += is_failure
+        self.slow_calls += is_slow
+
+        if self.calls < self.min_calls:
+            return
+
+        if self.error_rate and self.failures * 100 >= self.error_rate * self.calls:
+            self._open(now)
+
+        elif self.slow_call_rate and self.slow_calls * 100 >= self.slow_call_rate * self.calls:
+            self._open(now)
+
+# ################################################################################################################################
+
+    def to_dict(self) -> 'stranydict':
+        return {
+            'state': self.state,
+            'calls': self.calls,
+            'failures': self.failures,
+            'slow_calls': self.slow_calls,
+            'times_opened': self.times_opened,
+            'rejected': self.rejected,
+        }
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class RetryBudget:
+    """ A token bucket limiting retries to a percentage of requests. Each request deposits a fraction of a token
+    and each retry needs a full one, which means that retries stop when a remote end fails for all requests,
+    instead of multiplying the load on it.
+    """
+    __slots__ = ('ratio', 'max_tokens', 'tokens')
+
+    def __init__(self, budget:'int', max_tokens:'int'=ModuleCtx.Retry_Budget_Max) -> 'None':
+        self.ratio = budget / 100.0
+        self.max_tokens = max_tokens
+        self.tokens = float(max_tokens)
+
+    def on_request(self) -> 'None':
+        tokens = self.tokens + self.ratio
+        self.tokens = tokens if tokens < self.max_tokens else self.max_tokens
+
+    def try_spend(self) -> 'bool':
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        else:
+            return False
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class ConnectionStats:
+    """ Statistics of an outgoing connection, kept separately by each worker process.
+    """
+    def __init__(self) -> 'None':
+
+        # How many calls were made by users and how many requests were sent, including retries
+        self.calls = 0
+        self.requests = 0
+
+        # Exceptions and HTTP 5xx responses
+        self.errors = 0
+
+        # Retries made and those that the retry budget did not allow
+        self.retries = 0
+        self.retries_denied = 0
+
+        # Calls that could not obtain an in-flight slot in time
+        self.in_flight_rejected = 0
+
+        # GET requests served from a response cache, those that were not, those that were served after a 304 response
+        # to a conditional request and stale responses served because of errors, as stale-if-error allows it.
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_revalidations = 0
+        self.cache_stale_if_error = 0
+
+        self.latency = LatencyHistogram()
+
+    def to_dict(self) -> 'stranydict':
+        return {
+            'calls': self.calls,
+            'requests': self.requests,
+            'errors': self.errors,
+            'retries': self.retries,
+            'retries_denied': self.retries_denied,
+            'in_flight_rejected': self.in_flight_rejected,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'cache_revalidations': self.cache_revalidations,
+            'cache_stale_if_error': self.cache_stale_if_error,
+            'latency': self.latency.to_dict(),
+        }
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -506,7 +506,8 @@ class URLData(CyURLData, OAuthDataStore):
 
         # No error, let's delete channel info
         if match_idx != ZATO_NONE:
-            self.channel_data.pop(match_idx)
+            old_data = self.channel_data.pop(match_idx)
+            self.remove_channel(old_data)
 
 # ################################################################################################################################
 
@@ -899,7 +900,7 @@ class URLData(CyURLData, OAuthDataStore):
 
     def sort_channel_data(self):
         """ Sorts channel items by name and then re-arranges the result so that user-facing services are closer to the begining
-        of the list which makes it faster to look them up - searches in the list are O(n).
+        of the list. URL matching uses the same order, as maintained by self.router.
         """
         channel_data = []
         user_services = []
@@ -929,8 +930,9 @@ class URLData(CyURLData, OAuthDataStore):
         for name in('connection', 'content_type', 'data_format', 'host', 'id', 'has_rbac', 'impl_name', 'is_active',
             'is_internal', 'merge_url_params_req', 'method', 'name', 'params_pri', 'ping_method', 'pool_size', 'service_id',
             'service_name', 'soap_action', 'soap_version', 'transport', 'url_params_pri', 'url_path', 'sec_use_rbac',
-            'cache_type', 'cache_id', 'cache_name', 'cache_expiry', 'content_encoding', 'match_slash', 'hl7_version',
-            'json_path', 'should_parse_on_input', 'should_validate', 'should_return_errors', 'data_encoding',
+            'cache_type', 'cache_id', 'cache_name', 'cache_expiry', 'cache_single_flight', 'cache_stale_ttl', 'cache_etag',
+            'content_encoding', 'match_slash', 'hl7_version', 'json_path', 'should_parse_on_input', 'should_validate',
+            'should_return_errors', 'data_encoding', 'is_streaming', 'stream_buffer_size',
             'is_audit_log_sent_active', 'is_audit_log_received_active', 'max_len_messages_sent', 'max_len_messages_received',
             'max_bytes_per_message_sent', 'max_bytes_per_message_received', 'security_groups', 'security_groups_ctx'):
 
@@ -1007,6 +1009,7 @@ class URLData(CyURLData, OAuthDataStore):
         match_target = get_match_target(msg, http_methods_allowed_re=self.worker.server.http_methods_allowed_re)
         channel_item = self._channel_item_from_msg(msg, match_target, old_data)
         self.channel_data.append(channel_item)
+        self.add_channel(channel_item)
         self.url_sec[match_target] = self._sec_info_from_msg(msg)
 
         self._remove_from_cache(match_target)
@@ -1045,6 +1048,7 @@ class URLData(CyURLData, OAuthDataStore):
         # No error, let's delete channel info
         if match_idx != ZATO_NONE:
             old_data = self.channel_data.pop(match_idx)
+            self.remove_channel(old_data)
         else:
             old_data = {}
 
@@ -9,6 +9,9 @@ Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
 # stdlib
 from logging import getLogger
 
+# gevent
+from gevent.pool import Pool
+
 # Zato
 from zato.common.ext.dataclasses import dataclass
 from zato.common.typing_ import cast_, list_field
@@ -18,7 +21,7 @@ from zato.server.connection.server.rpc.invoker import LocalServerInvoker, Remote
 # ################################################################################################################################
 
 if 0:
-    from zato.common.typing_ import any_, anylist, generator_, stranydict
+    from zato.common.typing_ import any_, anydict, anylist, dictnone, generator_, stranydict
     from zato.server.base.parallel import ParallelServer
     from zato.server.connection.server.rpc.config import ConfigSource, RPCServerInvocationCtx
     from zato.server.connection.server.rpc.invoker import PerPIDResponse, ServerInvoker
@@ -62,15 +65,22 @@ class ConfigCtx:
         ctx = self.config_source.get_server_ctx(self.parallel_server, self.config_source.current_cluster_name, server_name)
         return self.remote_server_invoker_class(ctx)
 
-    def get_remote_server_invoker_list(self) -> 'generator_[ServerInvoker, None, None]':
+    def get_remote_server_invoker_list(self, existing:'dictnone'=None) -> 'generator_[ServerInvoker, None, None]':
+        """ Yields invokers for all the servers, reusing the existing ones, along with their open connections,
+        if their configuration has not changed.
+        """
+        existing = existing or {}
         ctx_list = self.config_source.get_server_ctx_list(self.config_source.current_cluster_name)
         for ctx in ctx_list:
+            invoker = existing.get(ctx.server_name)
             if ctx.server_name == self.config_source.current_server_name:
-                cluster_name = cast_('str', ctx.cluster_name)
-                server_name  = cast_('str', ctx.server_name)
-                invoker = self.local_server_invoker_class(self.parallel_server, cluster_name, server_name)
+                if not isinstance(invoker, self.local_server_invoker_class):
+                    cluster_name = cast_('str', ctx.cluster_name)
+                    server_name  = cast_('str', ctx.server_name)
+                    invoker = self.local_server_invoker_class(self.parallel_server, cluster_name, server_name)
             else:
-                invoker = self.remote_server_invoker_class(ctx)
+                if not (isinstance(invoker, self.remote_server_invoker_class) and invoker.invocation_ctx == ctx):
+                    invoker = self.remote_server_invoker_class(ctx)
             yield invoker
 
 # ################################################################################################################################
@@ -79,6 +89,13 @@ class ConfigCtx:
 class ServerRPC:
     """ A facade through which Zato servers can be invoked.
     """
+
+    # How many servers at most to invoke concurrently in invoke_all
+    max_concurrency = 32
+
+    # How many seconds to wait at most for all the servers to respond in invoke_all
+    deadline = 90
+
     def __init__(self, config_ctx:'ConfigCtx') -> 'None':
         self.config_ctx = config_ctx
         self.current_cluster_name = self.config_ctx.config_source.current_cluster_name
@@ -115,8 +132,37 @@ class ServerRPC:
 # ################################################################################################################################
 
     def populate_invokers(self) -> 'None':
-        for invoker in self.config_ctx.get_remote_server_invoker_list():
-            self._invokers[invoker.server_name] = invoker
+
+        invokers = {}
+
+        for invoker in self.config_ctx.get_remote_server_invoker_list(self._invokers):
+            invokers[invoker.server_name] = invoker
+
+        # Close connections to servers that no longer exist or whose configuration changed ..
+        for server_name, invoker in self._invokers.items():
+            if invokers.get(server_name) is not invoker:
+                if isinstance(invoker, RemoteServerInvoker):
+                    invoker.close()
+
+        # .. and use the current ones from now on.
+        self._invokers = invokers
+
+# ################################################################################################################################
+
+    def _invoke_server(
+        self,
+        invoker,  # type: ServerInvoker
+        service,  # type: str
+        request,  # type: any_
+        *args,    # type: any_
+        **kwargs  # type: any_
+    ) -> 'any_':
+        """ Invokes all the PIDs of a single server, returning either their responses or an exception.
+        """
+        try:
+            return invoker.invoke_all_pids(service, request, *args, **kwargs)
+        except Exception as e:
+            return e
 
 # ################################################################################################################################
 
@@ -128,23 +174,62 @@ class ServerRPC:
         **kwargs        # type: any_
     ) -> 'InvokeAllResult':
 
+        # How long we can wait for all the servers to respond
+        deadline = kwargs.pop('deadline', None) or self.deadline
+
         # First, make sure that we are aware of all the servers currently available
         self.populate_invokers()
 
         # Response to produce
         out = InvokeAllResult()
 
-        # Now, invoke all the servers ..
-        for invoker in self._invokers.values():
-            invoker = cast_('ServerInvoker', invoker)
+        # Now, invoke all the servers concurrently ..
+        pool = Pool(self.max_concurrency)
+        greenlets = {}
+
+        for server_name, invoker in self._invokers.items():
+            greenlets[server_name] = pool.spawn(self._invoke_server, invoker, service, request, *args, **kwargs)
+
+        # .. wait for all of them to respond, though no longer than the deadline allows for ..
+        _ = pool.join(timeout=deadline)
+
+        for server_name, greenlet in greenlets.items():
+
+            # .. this server did not respond in time ..
+            if not greenlet.ready():
+                greenlet.kill(block=False)
+                out.is_ok = False
+                self.logger.warning('Server `%s` did not respond to `%s` within %ss', server_name, service, deadline)
+                continue
+
+            response = greenlet.value
+
+            # .. the invocation of this server failed ..
+            if isinstance(response, Exception):
+                out.is_ok = False
+                self.logger.warning('Server `%s` could not be invoked with `%s` -> `%s`', server_name, service, response)
+                continue
 
             # .. each response object received is a list of sub-responses,
             # .. with each sub-response representing a specific PID ..
-            response = invoker.invoke_all_pids(service, request, *args, **kwargs)
-            out.data.extend(response)
+            if response:
+                out.data.extend(response)
 
         # .. now we can return the result.
         return out
 
+# ################################################################################################################################
+
+    def get_stats(self) -> 'anydict':
+        """ Returns latency and error statistics of invocations of each remote server.
+        """
+        out = {} # type: anydict
+
+        for server_name, invoker in self._invokers.items():
+            if isinstance(invoker, RemoteServerInvoker):
+                out[server_name] = invoker.stats.to_dict()
+
+        return out
+
 # ################################################################################################################################
 # ################################################################################################################################
@@ -58,6 +58,12 @@ class RPCServerInvocationCtx:
     needs_ping:     'bool' = True
     crypto_use_tls: 'bool' = False
 
+    # How many persistent connections to keep open to the server
+    pool_size: 'int' = 10
+
+    # For how many seconds a successful ping or invocation means that the server is up and needs no new ping
+    health_ttl: 'float' = 5.0
+
 @dataclass(init=False)
 class InvocationCredentials:
     username: 'strnone' = None
@@ -8,9 +8,11 @@ Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
 
 # stdlib
 from logging import getLogger
+from time import monotonic
 
 # Requests
-from requests import get as requests_get
+from requests import Session
+from requests.adapters import HTTPAdapter
 
 # Zato
 from zato.client import AnyServiceInvoker
@@ -24,7 +26,7 @@ if 0:
     from requests import Response
     from typing import Callable
     from zato.client import ServiceInvokeResponse
-    from zato.common.typing_ import anydict, anylist, callable_, intnone, stranydict, strordictnone
+    from zato.common.typing_ import anydict, anylist, callable_, floatnone, intnone, stranydict, strordictnone
     from zato.server.base.parallel import ParallelServer
     from zato.server.connection.server.rpc.config import RPCServerInvocationCtx
 
@@ -56,6 +58,42 @@ class PerPIDResponse:
     pid_data: 'strordictnone' = dict_field()
     error_info: 'any_' = ''
 
+@dataclass(init=False)
+class InvocationStats:
+    """ Latency and error statistics of invocations of a remote server.
+    """
+    invocations: 'int' = 0
+    errors: 'int' = 0
+    total_time: 'float' = 0.0
+    min_time: 'floatnone' = None
+    max_time: 'float' = 0.0
+    last_time: 'float' = 0.0
+    last_error: 'str' = ''
+
+    def record(self, elapsed:'float', error:'str'='') -> 'None':
+
+        self.invocations += 1
+        self.total_time += elapsed
+        self.last_time = elapsed
+        self.max_time = max(self.max_time, elapsed)
+        self.min_time = elapsed if self.min_time is None else min(self.min_time, elapsed)
+
+        if error:
+            self.errors += 1
+            self.last_error = error
+
+    def to_dict(self) -> 'anydict':
+        return {
+            'invocations': self.invocations,
+            'errors': self.errors,
+            'total_time': self.total_time,
+            'avg_time': (self.total_time / self.invocations) if self.invocations else 0.0,
+            'min_time': self.min_time or 0.0,
+            'max_time': self.max_time,
+            'last_time': self.last_time,
+            'last_error': self.last_error,
+        }
+
 # ################################################################################################################################
 # ################################################################################################################################
 
@@ -132,19 +170,44 @@ class RemoteServerInvoker(ServerInvoker):
         # Credentials to connect to the remote server with
         credentials = (self.invocation_ctx.username, self.invocation_ctx.password)
 
-        # Now, we can build a client to the remote server
-        self.invoker = AnyServiceInvoker(self.address, self.url_path, credentials)
+        # A session with persistent connections to the remote server, shared by pings and actual invocations ..
+        self.session = Session()
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.invocation_ctx.pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # .. now, we can build a client to the remote server ..
+        self.invoker = AnyServiceInvoker(self.address, self.url_path, credentials, session=self.session)
+
+        # .. when the server was last known to be up, as given by time.monotonic ..
+        self.last_ok = 0.0
+
+        # .. and how its invocations have been performing so far.
+        self.stats = InvocationStats()
 
 # ################################################################################################################################
 
     def ping(self, ping_timeout:'intnone'=None) -> 'None':
         ping_timeout = ping_timeout or self.ping_timeout
-        _ = requests_get(self.ping_address, timeout=ping_timeout)
+        response = self.session.get(self.ping_address, timeout=ping_timeout)
+        response.close()
+        self.last_ok = monotonic()
+
+# ################################################################################################################################
+
+    def needs_ping(self) -> 'bool':
+        """ Returns True if the remote server should be pinged, i.e. if it has not been seen up within health_ttl seconds.
+        """
+        if not self.invocation_ctx.needs_ping:
+            return False
+        else:
+            return monotonic() - self.last_ok > self.invocation_ctx.health_ttl
 
 # ################################################################################################################################
 
     def close(self) -> 'None':
-        self.invoker.session.close()
+        self.session.close()
 
 # ################################################################################################################################
 
@@ -165,16 +228,33 @@ class RemoteServerInvoker(ServerInvoker):
                 service)
             return
 
-        # Optionally, ping the remote server to quickly find out if it is still available ..
-        if self.invocation_ctx.needs_ping:
-            ping_timeout = kwargs.get('ping_timeout') or self.ping_timeout
-            _ = requests_get(self.ping_address, timeout=ping_timeout)
+        start = monotonic()
 
-        # .. actually invoke the server now ..
-        response = invoke_func(service, request, *args, **kwargs) # type: ServiceInvokeResponse
-        response = response.data
+        try:
 
-        return response
+            # Optionally, ping the remote server to quickly find out if it is still available,
+            # unless we already know that it is because it responded recently ..
+            if self.needs_ping():
+                self.ping(kwargs.get('ping_timeout'))
+
+            # .. actually invoke the server now ..
+            response = invoke_func(service, request, *args, **kwargs) # type: ServiceInvokeResponse
+            response = response.data
+
+        except Exception as e:
+
+            # .. the server may be down so it will have to be pinged again next time ..
+            self.last_ok = 0.0
+            self.stats.record(monotonic() - start, '{}: {}'.format(e.__class__.__name__, e))
+            raise
+
+        else:
+
+            # .. a response means that the server is up ..
+            self.last_ok = monotonic()
+            self.stats.record(self.last_ok - start)
+
+            return response
 
 # ################################################################################################################################
 
@@ -66,6 +66,7 @@ logger_overflow = logging.getLogger('zato_pubsub_overflow')
 
 _ps_default = PUBSUB.DEFAULT
 _end_srv_id = PUBSUB.ENDPOINT_TYPE.SERVICE.id
+_topic_log = PUBSUB.GD_STORAGE.TOPIC_LOG.id
 
 # ################################################################################################################################
 # ################################################################################################################################
@@ -130,7 +131,11 @@ class PubSub:
         self.pubsub_tools = [] # type: list_[PubSubTool]
 
         # A backlog of messages that have at least one subscription, i.e. this is what delivery servers use.
-        self.sync_backlog = InRAMSync(self)
+        self.sync_backlog = InRAMSync(
+            self,
+            int(self.server.fs_server_config.pubsub.get('non_gd_backlog_max_bytes') or PUBSUB.DEFAULT.NON_GD_BACKLOG_MAX_BYTES),
+            self.server.fs_server_config.pubsub.get('non_gd_backlog_on_max_bytes') or PUBSUB.DEFAULT.ON_MAX_BACKLOG_BYTES,
+        )
 
         # How many messages have been published through this server, regardless of which topic they were for
         self.msg_pub_counter = 0
@@ -208,6 +213,8 @@ class PubSub:
     def stop(self) -> 'None':
         """ Stops all pub/sub tools, which in turn stops all the delivery tasks.
         """
+        self.notify_pub_sub_tasks_trigger.stop()
+
         for item in self.pubsub_tools:
             try:
                 item.stop()
@@ -594,6 +601,26 @@ class PubSub:
         with self.lock:
             return self._get_topic_by_sub_key(sub_key)
 
+# ################################################################################################################################
+
+    def get_topic_log_sub_key_list(self, sk_list:'strlist') -> 'strlist':
+        """ Returns sub_keys of subscriptions to topics whose GD messages are read from topic logs.
+        """
+        out = [] # type: strlist
+
+        with self.lock:
+            for sub_key in sk_list:
+                try:
+                    topic = self._get_topic_by_sub_key(sub_key)
+                except KeyError:
+                    # We do not know the subscription so its messages may be anywhere
+                    out.append(sub_key)
+                else:
+                    if topic.gd_storage == _topic_log:
+                        out.append(sub_key)
+
+        return out
+
 # ################################################################################################################################
 
     def get_topic_list_by_sub_key_list(self, sk_list:'strlist') -> 'strtopicdict':
@@ -1291,7 +1318,8 @@ class PubSub:
         """ Stores in RAM up to input non-GD messages for each sub_key. A backlog queue for each sub_key
         cannot be longer than topic's max_depth_non_gd and overflowed messages are not kept in RAM.
         They are not lost altogether though, because, if enabled by topic's use_overflow_log, all such messages
-        go to disk (or to another location that logger_overflown is configured to use).
+        go to disk (or to another location that logger_overflown is configured to use). Messages that would make
+        the whole backlog exceed its maximum size in bytes are stored in SQL as GD ones.
         """
         _logger.info('Storing in RAM. CID:`%r`, topic ID:`%r`, name:`%r`, sub_keys:`%r`, ngd-list:`%r`, e:`%s`',
             cid, topic_id, topic_name, sub_keys, [elem['pub_msg_id'] for elem in non_gd_msg_list], error_source)
@@ -1300,10 +1328,16 @@ class PubSub:
 
             # Store the non-GD messages in backlog ..
             topic = self.topic_api.get_topic_by_id(topic_id)
-            self.sync_backlog.add_messages(cid, topic_id, topic_name, topic.max_depth_non_gd, sub_keys, non_gd_msg_list)
+            to_spill = self.sync_backlog.add_messages(
+                cid, topic_id, topic_name, topic.max_depth_non_gd, sub_keys, non_gd_msg_list)
 
             # .. and set a flag to signal that there are some available.
-            self._set_sync_has_msg(topic_id, False, True, 'PubSub.store_in_ram ({})'.format(error_source))
+            if len(to_spill) < len(non_gd_msg_list):
+                self._set_sync_has_msg(topic_id, False, True, 'PubSub.store_in_ram ({})'.format(error_source))
+
+        # Messages that did not fit in RAM are stored in SQL, which is why we do it without self.lock held.
+        if to_spill:
+            self.impl_publisher.spill_to_gd(cid, topic, sub_keys, to_spill)
 
 # ################################################################################################################################
 
@@ -1604,6 +1638,10 @@ class PubSub:
         else:
             topic.sync_has_non_gd_msg = value
 
+        # Let the trigger know that there are new messages for the topic
+        if value:
+            self.notify_pub_sub_tasks_trigger.mark_topic_dirty(topic_id)
+
 # ################################################################################################################################
 
     def set_sync_has_msg(
@@ -1642,6 +1680,19 @@ class PubSub:
         """
         return self.pubapi.publish(name, *args, **kwargs)
 
+# ################################################################################################################################
+# ################################################################################################################################
+
+    def publish_bulk(
+        self,
+        request_list:'anylist',
+        **kwargs:'any_'
+    ) -> 'anylist':
+        """ Publishes messages to many topics at once, storing all the GD ones in a single SQL transaction.
+        POST /zato/pubsub/topics
+        """
+        return self.pubapi.publish_bulk(request_list, **kwargs)
+
 # ################################################################################################################################
 # ################################################################################################################################
 
@@ -24,7 +24,7 @@ from zato.common.util.wsx import find_wsx_environ
 if 0:
     from zato.common.model.wsx import WSXConnectorConfig
     from zato.common.typing_ import any_, anydict, anylist, anytuple, callable_, commondict, intnone, stranydict, \
-        strnone, strtuple
+        strnone, strtuple, tuple_
     from zato.server.connection.web_socket import WebSocket
     from zato.server.pubsub import PubSub
     from zato.server.pubsub.core.endpoint import EndpointAPI
@@ -95,6 +95,30 @@ class PubAPI:
         else:
             return wsx_environ
 
+# ################################################################################################################################
+# ################################################################################################################################
+
+    def _get_publisher_endpoint(self, from_service:'Service | None', endpoint_id:'intnone') -> 'tuple_[int, intnone]':
+        """ Returns the ID of an endpoint publishing messages and, if it is a WebSocket, the ID of its channel.
+        """
+        # Initialize here for type checking
+        ws_channel_id = None
+
+        # If this is a WebSocket, we need to find its ws_channel_id ..
+        if from_service:
+            wsx_environ = find_wsx_environ(from_service, raise_if_not_found=False)
+            if wsx_environ:
+                wsx_config = wsx_environ['ws_channel_config'] # type: WSXConnectorConfig
+                ws_channel_id = wsx_config.id
+                endpoint = self.endpoint_api.get_by_ws_channel_id(ws_channel_id)
+                return endpoint.id, ws_channel_id
+
+        # Otherwise, use various default data.
+        endpoint_id = endpoint_id or self.pubsub.get_default_internal_pubsub_endpoint_id()
+        endpoint_id = cast_('int', endpoint_id)
+
+        return endpoint_id, ws_channel_id
+
 # ################################################################################################################################
 # ################################################################################################################################
 
@@ -105,9 +129,6 @@ class PubAPI:
         # We need to import it here to avoid circular imports
         from zato.server.service import Service
 
-        # Initialize here for type checking
-        ws_channel_id = None
-
         # For later use
         from_service = cast_('Service', kwargs.get('service'))
         ext_client_id = from_service.name if from_service else kwargs.get('ext_client_id')
@@ -118,22 +139,8 @@ class PubAPI:
         has_gd = kwargs.get('has_gd')
         has_gd = cast_('bool', has_gd)
 
-        # By default, assume that cannot find any endpoint on input
-        endpoint_id = None
-
-        # If this is a WebSocket, we need to find its ws_channel_id ..
-        if from_service:
-            wsx_environ = find_wsx_environ(from_service, raise_if_not_found=False)
-            if wsx_environ:
-                wsx_config = wsx_environ['ws_channel_config'] # type: WSXConnectorConfig
-                ws_channel_id = wsx_config.id
-                endpoint = self.endpoint_api.get_by_ws_channel_id(ws_channel_id)
-                endpoint_id = endpoint.id
-
-        # Otherwise, use various default data.
-        if not endpoint_id:
-            endpoint_id = kwargs.get('endpoint_id') or self.pubsub.get_default_internal_pubsub_endpoint_id()
-            endpoint_id = cast_('int', endpoint_id)
+        # Find out who is publishing the message
+        endpoint_id, ws_channel_id = self._get_publisher_endpoint(from_service, kwargs.get('endpoint_id'))
 
         # If input name is a topic, let us just use it
         if self.topic_api.has_topic_by_name(name):
@@ -250,6 +257,51 @@ class PubAPI:
         if has_data:
             return response.get('msg_id') or response.get('msg_id_list')
 
+# ################################################################################################################################
+# ################################################################################################################################
+
+    def publish_bulk(self, request_list:'anylist', **kwargs:'any_') -> 'anylist':
+        """ Publishes messages to many topics at once, storing all the GD messages in a single SQL transaction.
+        Each element of the input list is a dict with a topic_name key and the same keys that self.publish accepts,
+        e.g. data or data_list. Unlike with self.publish, all the topics must already exist. Returns a list of dicts,
+        one for each request, with a topic_name and either msg_id or msg_id_list of the messages published.
+        POST /zato/pubsub/topics
+        """
+        # For later use
+        from_service = cast_('Service', kwargs.get('service'))
+        ext_client_id = from_service.name if from_service else kwargs.get('ext_client_id')
+        correl_id = kwargs.get('cid') or kwargs.get('correl_id')
+
+        # Find out who is publishing the messages
+        endpoint_id, ws_channel_id = self._get_publisher_endpoint(from_service, kwargs.get('endpoint_id'))
+
+        # Each request is given the same publisher's details
+        _request_list = [] # type: anylist
+
+        for item in request_list:
+
+            request = {}
+            request.update(item)
+
+            request['data'] = request.get('data') or ''
+            request['correl_id'] = request.get('correl_id') or correl_id
+            request['ext_client_id'] = request.get('ext_client_id') or ext_client_id
+            request['endpoint_id'] = endpoint_id
+            request['ws_channel_id'] = ws_channel_id
+
+            _request_list.append(request)
+
+        response = self.pubsub.invoke_service('zato.pubsub.publish.publish-bulk', {
+            'request_list': _request_list,
+        }, serialize=False)
+
+        if isinstance(response, dict):
+            if 'response' in response:
+                response = response['response']
+            return response.get('result_list') or []
+        else:
+            return response.result_list or []
+
 # ################################################################################################################################
 # ################################################################################################################################
 
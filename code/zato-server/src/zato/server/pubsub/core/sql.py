@@ -23,7 +23,7 @@ from zato.common.util.time_ import utcnow_as_ms
 
 if 0:
     from sqlalchemy.orm.session import Session as SASession
-    from zato.common.typing_ import any_, anytuple, callable_, intset, strlist
+    from zato.common.typing_ import any_, anytuple, callable_, intset, strlist, strlistnone
 
 # ################################################################################################################################
 # ################################################################################################################################
@@ -52,7 +52,8 @@ class SQLAPI:
         sub_key_list, # type: strlist
         last_sql_run, # type: float
         pub_time_max, # type: float
-        ignore_list   # type: intset
+        ignore_list,  # type: intset
+        cursor_sub_key_list=None # type: strlistnone
     ) -> 'anytuple':
         """ Returns all SQL messages queued up for all keys from sub_key_list.
         """
@@ -64,7 +65,7 @@ class SQLAPI:
 
         try:
             return _get_sql_messages_by_sub_key(session, self.cluster_id, sub_key_list,
-                last_sql_run, pub_time_max, ignore_list)
+                last_sql_run, pub_time_max, ignore_list, cursor_sub_key_list=cursor_sub_key_list)
         finally:
             if needs_close:
                 session.close()
@@ -75,10 +76,12 @@ class SQLAPI:
         self,
         session:'SASession',
         sub_key:'str',
-        pub_time_max:'float'
+        pub_time_max:'float',
+        may_have_cursor:'bool'=True
     ) -> 'anytuple':
 
-        query = _get_sql_msg_ids_by_sub_key(session, self.cluster_id, sub_key, 0.0, pub_time_max)
+        query = _get_sql_msg_ids_by_sub_key(session, self.cluster_id, sub_key, 0.0, pub_time_max,
+            may_have_cursor=may_have_cursor)
         return query.all()
 
 # ################################################################################################################################
@@ -88,10 +91,12 @@ class SQLAPI:
         session,      # type: any_
         sub_key,      # type: str
         pub_time_max, # type: float
-        msg_id_list   # type: strlist
+        msg_id_list,  # type: strlist
+        may_have_cursor=True # type: bool
     ) -> 'anytuple':
 
-        query = _get_sql_messages_by_msg_id_list(session, self.cluster_id, sub_key, pub_time_max, msg_id_list)
+        query = _get_sql_messages_by_msg_id_list(session, self.cluster_id, sub_key, pub_time_max, msg_id_list,
+            may_have_cursor=may_have_cursor)
         return query.all()
 
 # ################################################################################################################################
@@ -10,20 +10,25 @@ Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
 
 # stdlib
 import logging
+from heapq import heappop, heappush
 from traceback import format_exc
 
 # gevent
-from gevent import sleep, spawn
+from gevent import spawn
+from gevent.event import Event
+
+# Zato
 from zato.common.typing_ import cast_
 from zato.common.util.api import new_cid
+from zato.common.util.time_ import utcnow_as_ms
 
 # ################################################################################################################################
 # ################################################################################################################################
 
 if 0:
     from gevent.lock import RLock
-    from zato.common.typing_ import anydict, callable_, intanydict, intnone
-    from zato.server.pubsub.model import inttopicdict, sublist
+    from zato.common.typing_ import anydict, callable_, intanydict, intnone, intset, list_, tuple_
+    from zato.server.pubsub.model import inttopicdict, sublist, Topic
 
 # ################################################################################################################################
 # ################################################################################################################################
@@ -35,6 +40,13 @@ logger_zato = logging.getLogger('zato')
 # ################################################################################################################################
 
 class NotifyPubSubTasksTrigger:
+    """ Lets delivery tasks know that there are new messages for their topics. Topics are processed only when
+    a message has been published to them, which is signalled through self.mark_topic_dirty, and no sooner than
+    their task_sync_interval allows. Otherwise, the trigger sleeps.
+    """
+
+    # How long to sleep at most if there is nothing to do
+    max_wait = 1.0
 
     def __init__(
         self,
@@ -60,10 +72,74 @@ class NotifyPubSubTasksTrigger:
 
         self.keep_running = True
 
+        # IDs of topics that messages have been published to since the last time they were processed
+        self.dirty_topics = set() # type: intset
+
+        # A heap of (deadline, topic_id) tuples for topics that have messages but that cannot be synced
+        # before their deadlines because of their task_sync_interval, along with a set of their IDs.
+        self.deadlines = [] # type: list_[tuple_[float, int]]
+        self.scheduled_topics = set() # type: intset
+
+        # Set each time there is something for the trigger to do
+        self.wakeup = Event()
+
+# ################################################################################################################################
+
+    def mark_topic_dirty(self, topic_id:'int') -> 'None':
+        """ Signals that a message has been published to a given topic.
+        """
+        self.dirty_topics.add(topic_id)
+        self.wakeup.set()
+
+# ################################################################################################################################
+
+    def stop(self) -> 'None':
+        self.keep_running = False
+        self.wakeup.set()
+
+# ################################################################################################################################
+
+    def _schedule(self, topic:'Topic') -> 'None':
+        """ Makes sure that a given topic will be processed again once its task_sync_interval has elapsed.
+        Must be called with self.lock held.
+        """
+        if topic.id not in self.scheduled_topics:
+            self.scheduled_topics.add(topic.id)
+            heappush(self.deadlines, (topic.last_synced + topic.task_sync_interval, topic.id))
+
+# ################################################################################################################################
+
+    def _get_wait_time(self, _utcnow_as_ms:'callable_'=utcnow_as_ms) -> 'float':
+        """ Returns for how long to wait until the earliest topic deadline, if there is any.
+        """
+        if self.deadlines:
+            wait_time = self.deadlines[0][0] - _utcnow_as_ms()
+            return min(max(wait_time, 0.0), self.max_wait)
+        else:
+            return self.max_wait
+
+# ################################################################################################################################
+
+    def _pop_topics_to_sync(self, _utcnow_as_ms:'callable_'=utcnow_as_ms) -> 'intset':
+        """ Returns IDs of all topics that have been published to as well as of the ones whose deadlines have passed.
+        Must be called with self.lock held.
+        """
+        now = _utcnow_as_ms()
+
+        topic_ids = self.dirty_topics
+        self.dirty_topics = set()
+
+        while self.deadlines and self.deadlines[0][0] <= now:
+            _, topic_id = heappop(self.deadlines)
+            self.scheduled_topics.discard(topic_id)
+            topic_ids.add(topic_id)
+
+        return topic_ids
+
 # ################################################################################################################################
 
     def run(self) -> 'None':
-        """ A background greenlet which periodically lets delivery tasks know that there are perhaps
+        """ A background greenlet which lets delivery tasks know that there are perhaps
         new GD messages for the topic that this class represents.
         """
 
@@ -72,9 +148,9 @@ class NotifyPubSubTasksTrigger:
         _current_iter = 0
         _new_cid      = new_cid
         _spawn        = cast_('callable_', spawn)
-        _sleep        = cast_('callable_', sleep)
         _self_lock    = self.lock
         _self_topics  = self.topics
+        _self_wakeup  = self.wakeup
 
         _logger_info      = logger.info
         _logger_warn      = logger.warning
@@ -103,30 +179,42 @@ class NotifyPubSubTasksTrigger:
             # This may be handy for logging purposes, even if there is no max. for the loop iters
             _current_iter += 1
 
-            # Sleep for a while before continuing - the call to sleep is here because this while loop is quite long
-            # so it would be inconvenient to have it down below.
-            _sleep(0.01)
+            # Sleep until a message is published or until the earliest deadline of a topic that needs to be synced.
+            # The call to wait is here because this while loop is quite long so it would be inconvenient
+            # to have it down below.
+            _ = _self_wakeup.wait(self._get_wait_time())
 
             # Blocks other pub/sub processes for a moment
             with _self_lock:
 
+                # We are going to process everything that has accumulated so far
+                _self_wakeup.clear()
+
                 # Will map a few temporary objects down below
                 topic_id_dict = {} # type: intanydict
 
-                # Get all topics ..
-                for _topic in _self_topics.values():
+                # IDs of topics whose tasks have been already notified
+                processed_topic_ids = set() # type: intset
 
-                    # Does the topic require task synchronization now?
-                    if not _topic.needs_task_sync():
+                # Get all topics that may need to be synced ..
+                for topic_id in self._pop_topics_to_sync():
+
+                    # .. the topic may have been deleted in the meantime ..
+                    _topic = _self_topics.get(topic_id)
+                    if not _topic:
                         continue
-                    else:
-                        _topic.update_task_sync_time()
 
-                    # OK, the time has come for this topic to sync its state with subscribers
-                    # but still skip it if we know that there have been no messages published to it since the last time.
+                    # .. skip it if we know that there have been no messages published to it since the last time ..
                     if not (_topic.sync_has_gd_msg or _topic.sync_has_non_gd_msg):
                         continue
 
+                    # .. does the topic require task synchronization now? If not, we will return to it when it does.
+                    if not _topic.needs_task_sync():
+                        self._schedule(_topic)
+                        continue
+                    else:
+                        _topic.update_task_sync_time()
+
                     # There are some messages, let's see if there are subscribers ..
                     subs = [] # type: sublist
                     _subs = _self_get_subscriptions_by_topic(_topic.name)
@@ -136,10 +224,14 @@ class NotifyPubSubTasksTrigger:
                         if _self_get_delivery_server_by_sub_key(_sub.sub_key):
                             subs.append(_sub)
 
-                    # .. if there are any subscriptions at all, we store that information for later use.
+                    # .. if there are any subscriptions at all, we store that information for later use ..
                     if subs:
                         topic_id_dict[_topic.id] = (_topic.name, subs)
 
+                    # .. otherwise, the messages are still there so we check again later whether subscribers have appeared.
+                    else:
+                        self._schedule(_topic)
+
                 # OK, if we had any subscriptions for at least one topic and there are any messages waiting,
                 # we can continue.
                 try:
@@ -204,10 +296,18 @@ class NotifyPubSubTasksTrigger:
                         _self_set_sync_has_msg(topic_id, True, False, 'PubSub.loop')
                         _self_set_sync_has_msg(topic_id, False, False, 'PubSub.loop')
 
+                        processed_topic_ids.add(topic_id)
+
                 except Exception:
                     e_formatted = format_exc()
                     _logger_zato_warn(e_formatted)
                     _logger_warn(e_formatted)
 
+                    # Topics that we did not get to still have their messages so we need to return to them later on
+                    for topic_id in topic_id_dict:
+                        if topic_id not in processed_topic_ids:
+                            if topic := _self_topics.get(topic_id):
+                                self._schedule(topic)
+
 # ################################################################################################################################
 # ################################################################################################################################
@@ -11,11 +11,13 @@ Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
 # stdlib
 from logging import getLogger
 from threading import current_thread
+from time import monotonic
 from traceback import format_exc, format_exception
 from typing import Iterable as iterable_
 
 # gevent
 from gevent import sleep, spawn
+from gevent.event import Event
 from gevent.lock import RLock
 from gevent.thread import getcurrent
 
@@ -68,6 +70,42 @@ sqlmsgiter = iterable_['SQLRow']
 # ################################################################################################################################
 # ################################################################################################################################
 
+class WakeupCounter:
+    """ Counts how many times delivery tasks woke up. There is one counter per worker process and it lets one find out
+    what the idle cost of its delivery tasks is, i.e. the rate of wakeups that found no messages to deliver.
+    """
+    def __init__(self, _monotonic:'callable_'=monotonic) -> 'None':
+        self._monotonic = _monotonic
+        self.total = 0
+        self.total_idle = 0
+        self._last_total = 0
+        self._last_time = _monotonic()
+
+    def incr(self, has_messages:'bool') -> 'None':
+        self.total += 1
+        if not has_messages:
+            self.total_idle += 1
+
+    def get_per_second(self) -> 'float':
+        """ Returns the number of wakeups per second since the previous call to this method.
+        """
+        now = self._monotonic()
+        total = self.total
+
+        elapsed = now - self._last_time
+        per_second = (total - self._last_total) / elapsed if elapsed > 0 else 0.0
+
+        self._last_time = now
+        self._last_total = total
+
+        return per_second
+
+# All the delivery tasks of a worker process share this counter
+wakeup_counter = WakeupCounter()
+
+# ################################################################################################################################
+# ################################################################################################################################
+
 class DeliveryTask:
     """ Runs a greenlet responsible for delivery of messages for a given sub_key.
     """
@@ -123,6 +161,13 @@ class DeliveryTask:
         # A total of messages processed so far
         self.len_delivered = 0
 
+        # A total of times that this task woke up to look for messages
+        self.len_wakeups = 0
+
+        # Set each time new messages are added to self.delivery_list or when anything else needs our attention,
+        # which means that an idle task blocks on it rather than polling the list periodically.
+        self.wakeup_event = Event()
+
         # A list of messages that were requested to be deleted while a delivery was in progress, checked before each delivery.
         self.delete_requested:list_['Message'] = []
 
@@ -197,6 +242,7 @@ class DeliveryTask:
 
                 logger.info('Marking message(s) to be deleted `%s` from `%s` (%s)', msg_list, self.sub_key, self.topic_name)
                 self.delete_requested.extend(to_delete)
+                self.wake_up()
 
             # We do not send notifications and self.run never runs so we need to delete the messages here
             else:
@@ -483,32 +529,28 @@ class DeliveryTask:
 
 # ################################################################################################################################
 
-    def _should_wake(self, _now:'callable_'=utcnow_as_ms) -> 'bool':
-        """ Returns True if the task should be woken up e.g. because its time has come already to process messages,
-        assumming there are any waiting for it.
+    def wake_up(self) -> 'None':
+        """ Wakes up the task, e.g. because there are new messages in its delivery list or because its configuration changed.
         """
-        # Return quickly if we already know that there are some messages to deliver or clear ..
-        if self.delivery_list:
-            return True
-
-        # .. otherwise, we will wait until self.delivery_interval lapsed.
+        self.wakeup_event.set()
 
-        now = _now()
-        diff = round(now - self.last_iter_run, 2)
+# ################################################################################################################################
 
-        if diff >= self.delivery_interval:
-            if self.delivery_list:
-                logger.info('Waking task:%s now:%s last:%s diff:%s interval:%s len-list:%d',
-                    self.sub_key, now, self.last_iter_run, diff, self.delivery_interval, len(self.delivery_list))
-                return True
+    def _wait_for_messages(self, timeout:'float | None'=None) -> 'None':
+        """ Blocks until the task is woken up or until the timeout lapses, if there is one. Note that the event
+        is cleared only here, by the task itself, and always before it checks its delivery list again,
+        which means that a wakeup cannot be missed in between these two steps.
+        """
+        _ = self.wakeup_event.wait(timeout)
+        self.wakeup_event.clear()
 
-        # The above conditions are not met so we explicitly return False
-        return False
+        self.len_wakeups += 1
+        wakeup_counter.incr(bool(self.delivery_list))
 
 # ################################################################################################################################
 
     def run(self,
-        default_sleep_time=0.1,  # type: float
+        pull_check_interval=5,   # type: float
         status_code=run_deliv_sc # type: any_
     ) -> 'None':
         """ Runs the delivery task's main loop.
@@ -551,12 +593,12 @@ class DeliveryTask:
                 delivery_method = self.sub_config['delivery_method']
 
                 # We are a task that does not notify endpoints, i.e. we are pull-style and our subscribers
-                # will query us themselves so in this case we can sleep for a while and repeat the loop -
+                # will query us themselves so in this case we can wait for a while and repeat the loop -
                 # perhaps before the next iteration of the loop begins someone will change delivery_method
                 # to one that allows for notifications to be sent. If not, we will be simply looping forever,
                 # checking periodically below if the delivery method is still the same.
                 if delivery_method not in _notify_methods:
-                    sleep(5)
+                    self._wait_for_messages(pull_check_interval)
                     continue
 
                 # Apparently, our delivery method has changed since the last time our self.sub_config
@@ -570,13 +612,20 @@ class DeliveryTask:
                     self.previous_delivery_method = delivery_method
 
                 # Is there any message that we can try to deliver?
-                if self._should_wake():
+                if self.delivery_list:
+
+                    # If this is set to True, it will mean that none of the messages could be delivered in this iteration,
+                    # e.g. because a hook told us to skip them, and that we should try again after self.delivery_interval.
+                    should_wait_for_interval = False
 
                     with self.delivery_lock:
 
                         # Update last run time to be able to wake up in time for the next delivery
                         self.last_iter_run = utcnow_as_ms()
 
+                        # This is needed to find out below whether any message was delivered in this iteration
+                        len_delivered = self.len_delivered
+
                         # Get the list of all message IDs for which delivery was successful,
                         # indicating whether all currently lined up messages have been
                         # successfully delivered.
@@ -588,7 +637,7 @@ class DeliveryTask:
                             continue
 
                         if result.is_ok:
-                            continue
+                            should_wait_for_interval = bool(self.delivery_list) and len_delivered == self.len_delivered
 
                         # This was a runtime invocation error - for instance, a low-level WebSocket exception,
                         # which is unrecoverable and we need to stop our task. When the client reconnects,
@@ -596,9 +645,10 @@ class DeliveryTask:
                         elif result.reason_code == ReasonCode.Error_Runtime_Invoke:
                             self.stop()
 
-                        # Sleep for a moment because we have just run out of all messages.
+                        # We have just run out of all messages so there is nothing to do until new ones arrive,
+                        # which is what the next iteration of the loop will wait for.
                         elif result.reason_code == ReasonCode.No_Msg:
-                            sleep(default_sleep_time) # pyright: ignore[reportGeneralTypeIssues]
+                            pass
 
                         # Otherwise, sleep for a longer time because our endpoint must have returned an error.
                         # After this sleep, self.run_delivery will again attempt to deliver all messages
@@ -625,11 +675,17 @@ class DeliveryTask:
                                         # .. OK, we can sleep now.
                                         self._sleep_on_delivery_error(result, len_exception_list)
 
+                    # Nothing was delivered even though there are still some messages in the list, so we wait for
+                    # the delivery interval before trying again, unless new messages arrive in the meantime.
+                    if should_wait_for_interval:
+                        self._wait_for_messages(self.delivery_interval)
+
                 # There was no message to deliver in this turn ..
                 else:
 
-                    # .. thus, we can wait until one arrives.
-                    sleep(default_sleep_time) # pyright: ignore[reportGeneralTypeIssues]
+                    # .. thus, we can wait until one arrives, without any timeout, because whoever adds messages
+                    # to our delivery list will also wake us up.
+                    self._wait_for_messages()
 
         except Exception as e:
             error_msg = 'Exception in delivery task for sub_key:`%s`, e:`%s`'
@@ -694,6 +750,9 @@ class DeliveryTask:
             logger.info('Stopping delivery task for sub_key:`%s`', self.sub_key)
             self.keep_running = False
 
+            # Wake up the task so that it notices that it should stop
+            self.wake_up()
+
 # ################################################################################################################################
 
     def clear(self) -> 'None':
@@ -721,6 +780,9 @@ class DeliveryTask:
     def update_sub_config(self) -> 'None':
         self._set_sub_config_attrs()
 
+        # Our delivery method may have changed, e.g. from pull to notify, which is why we need to check it again
+        self.wake_up()
+
 # ################################################################################################################################
 
     def get_queue_depth(self) -> 'tuple_[int, int]':
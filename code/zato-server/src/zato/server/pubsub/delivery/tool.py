@@ -265,6 +265,14 @@ class PubSubTool:
         task = self.delivery_tasks[sub_key]
         task.update_sub_config()
 
+# ################################################################################################################################
+
+    def _wake_up_task(self, sub_key:'str') -> 'None':
+        """ Wakes up a delivery task after new messages were added to its delivery list.
+        """
+        if task := self.delivery_tasks.get(sub_key):
+            task.wake_up()
+
 # ################################################################################################################################
 
     def _add_non_gd_messages_by_sub_key(self, sub_key:'str', messages:'dictlist') -> 'None':
@@ -285,6 +293,9 @@ class PubSubTool:
             add = cast_('callable_', self.delivery_lists[sub_key].add)
             add(NonGDMessage(sub_key, self.server_name, self.server_pid, msg))
 
+        # Let the task know that it has new messages to deliver
+        self._wake_up_task(sub_key)
+
 # ################################################################################################################################
 
     def add_non_gd_messages_by_sub_key(self, sub_key:'str', messages:'dictlist') -> 'None':
@@ -420,7 +431,11 @@ class PubSubTool:
 
         logger.info('Using min last_gd_run `%r`', min_last_gd_run)
 
-        for msg in self.pubsub.get_sql_messages_by_sub_key(session, sub_key_list, min_last_gd_run, pub_time_max, ignore_list):
+        # Only subscriptions to topics with logs of messages may have cursors to look up
+        cursor_sub_key_list = self.pubsub.get_topic_log_sub_key_list(sub_key_list)
+
+        for msg in self.pubsub.get_sql_messages_by_sub_key(
+            session, sub_key_list, min_last_gd_run, pub_time_max, ignore_list, cursor_sub_key_list):
             yield msg
 
 # ################################################################################################################################
@@ -440,6 +455,9 @@ class PubSubTool:
             # logger.info('Adding a GD message `%s` to delivery_list=%s (%s)', gd_msg.pub_msg_id, hex(id(delivery_list)), sub_key)
             count += 1
 
+        if count:
+            self._wake_up_task(sub_key)
+
         # logger.info('Pushing %d GD message{}to task:%s; msg_ids:%s'.format(' ' if count==1 else 's '), count, sub_key, msg_ids)
 
 # ################################################################################################################################
@@ -475,8 +493,11 @@ class PubSubTool:
                 # One SQL session for all queries
                 session = self.pubsub.server.odb.session()
 
+                # Only subscriptions to topics with logs of messages may have cursors to look up
+                may_have_cursor = bool(self.pubsub.get_topic_log_sub_key_list([sub_key]))
+
                 # Get IDs of any messages already queued up so as to break them out into batches of messages to fetch
-                msg_ids = self.pubsub.get_initial_sql_msg_ids_by_sub_key(session, sub_key, pub_time_max)
+                msg_ids = self.pubsub.get_initial_sql_msg_ids_by_sub_key(session, sub_key, pub_time_max, may_have_cursor)
                 msg_ids = [elem.pub_msg_id for elem in msg_ids]
 
                 if msg_ids:
@@ -497,7 +518,8 @@ class PubSubTool:
                         # logger.info('Enqueuing group %d/%d (gs:%d) (%s, %s -> %s) `%s`',
                         #    idx, len_groups, _group_size, sub_key, topic_name, endpoint_name, group_msg_ids)
 
-                        msg_list = self.pubsub.get_sql_messages_by_msg_id_list(session, sub_key, pub_time_max, group_msg_ids)
+                        msg_list = self.pubsub.get_sql_messages_by_msg_id_list(
+                            session, sub_key, pub_time_max, group_msg_ids, may_have_cursor)
                         self._enqueue_gd_messages_by_sub_key(sub_key, msg_list)
 
             except Exception:
@@ -279,6 +279,8 @@ class Topic(ToDictBase):
     limit_message_expiry: 'int'
     limit_sub_inactivity: 'int'
 
+    gd_storage: 'str'
+
     def __init__(self, config:'anydict', server_name:'str', server_pid:'int') -> 'None':
         self.config = config
         self.server_name = server_name
@@ -297,6 +299,7 @@ class Topic(ToDictBase):
         self.limit_retention = config.get('limit_retention') or PUBSUB.DEFAULT.LimitTopicRetention
         self.limit_message_expiry = config.get('limit_message_expiry') or PUBSUB.DEFAULT.LimitMessageExpiry
         self.limit_sub_inactivity = config.get('limit_sub_inactivity') or PUBSUB.DEFAULT.LimitSubInactivity
+        self.gd_storage = config.get('gd_storage') or PUBSUB.DEFAULT.GD_STORAGE
         self.set_hooks()
 
         # For now, task sync interval is the same for GD and non-GD messages
@@ -30,8 +30,8 @@ from zato.common.api import PUBSUB, ZATO_NONE
 from zato.common.exception import Forbidden, NotFound, ServiceUnavailable
 from zato.common.json_ import dumps as json_dumps
 from zato.common.marshal_.api import Model
-from zato.common.odb.query.pubsub.publish import sql_publish_with_retry
-from zato.common.odb.query.pubsub.topic import get_gd_depth_topic
+from zato.common.odb.query.pubsub.publish import BulkPublishTopicCtx, sql_bulk_publish_with_retry, sql_publish_with_retry
+from zato.common.odb.query.pubsub.topic import get_gd_depth_topic, get_gd_depth_topic_list
 from zato.common.pubsub import new_msg_id, PubSubMessage
 from zato.common.typing_ import any_, anydict, anydictnone, anylistnone, anynone, boolnone, cast_, dict_field, intnone, \
     list_field, strlistnone, strnone
@@ -43,8 +43,9 @@ from zato.common.util.time_ import datetime_from_ms, datetime_to_ms, utcnow_as_m
 # ################################################################################################################################
 
 if 0:
+    from sqlalchemy.orm.session import Session as SASession
     from zato.common.marshal_.api import MarshalAPI
-    from zato.common.typing_ import anylist, callable_, dictlist, strlist, tuple_
+    from zato.common.typing_ import anylist, callable_, dictlist, intdict, intset, list_, strlist, tuple_
     from zato.server.base.parallel import ParallelServer
     from zato.server.pubsub import PubSub, Topic
     from zato.server.pubsub.model import sublist
@@ -483,6 +484,18 @@ class Publisher:
 
     def run(self, request:'PubRequest') -> 'PublicationResult':
 
+        # Create a wrapper object for all the request data and metadata ..
+        ctx = self.get_pub_ctx(request, utcnow_as_ms())
+
+        # .. and publish the message(s) now.
+        return self._publish(ctx)
+
+# ################################################################################################################################
+
+    def get_pub_ctx(self, request:'PubRequest', now:'float') -> 'PubCtx':
+        """ Validates a publication request and returns a context object with all the messages that it contains,
+        along with the subscriptions that they are to be delivered to.
+        """
         endpoint_id = request.endpoint_id
 
         # Will return publication pattern matched or raise an exception that we don't catch
@@ -497,9 +510,6 @@ class Publisher:
         if not topic.is_active:
             raise ServiceUnavailable(request.cid, 'Topic is inactive `{}`'.format(request.topic_name))
 
-        # We always count time in milliseconds since UNIX epoch
-        now = utcnow_as_ms()
-
         # Get all subscribers for that topic from local worker store
         all_subscriptions_by_topic = self.pubsub.get_subscriptions_by_topic(topic.name)
         len_all_sub = len(all_subscriptions_by_topic)
@@ -587,8 +597,7 @@ class Publisher:
             new_session_func = self.new_session_func,
         )
 
-        # We have all the request data, publish the message(s) now
-        return self._publish(ctx)
+        return ctx
 
 # ################################################################################################################################
 
@@ -605,6 +614,87 @@ class Publisher:
 
         return out
 
+# ################################################################################################################################
+
+    def _turn_msg_into_gd(self, msg:'anydict', reason:'str') -> 'None':
+        """ Turns a single non-GD message into a GD one.
+        """
+        msg['has_gd'] = True
+
+        logger_pubsub.info(_log_turning_gd_msg.format(reason), msg['pub_msg_id'])
+
+        data_prefix, data_prefix_short = self.get_data_prefixes(msg['data'])
+        msg['data_prefix'] = data_prefix
+        msg['data_prefix_short'] = data_prefix_short
+
+# ################################################################################################################################
+
+    def _turn_non_gd_into_gd(self, ctx:'PubCtx') -> 'None':
+        """ Turns all non-GD messages into GD ones, which is needed if there are no subscriptions to a topic.
+        """
+        for msg in ctx.non_gd_msg_list:
+            self._turn_msg_into_gd(msg, 'no subscribers')
+
+        # Note the reversed order - now non-GD messages are sent as GD ones and the list of non-GD messages is empty.
+        ctx.gd_msg_list = ctx.non_gd_msg_list[:]
+        ctx.non_gd_msg_list[:] = []
+        ctx.is_first_run = False
+
+# ################################################################################################################################
+
+    def spill_to_gd(self, cid:'str', topic:'Topic', sub_keys:'strlist', msg_list:'dictlist') -> 'None':
+        """ Stores in SQL non-GD messages that did not fit in the in-RAM backlog because it reached its maximum size.
+        Publication already succeeded from the publisher's perspective, which is why, if the topic's GD depth is reached too,
+        the messages go to the overflow log instead of an exception being raised.
+        """
+        # Only the subscriptions that the messages were meant for will receive them
+        subscriptions_by_topic = self.pubsub.get_subscriptions_by_topic(topic.name)
+        subscriptions_by_topic = [sub for sub in subscriptions_by_topic if sub.sub_key in sub_keys]
+
+        for msg in msg_list:
+            self._turn_msg_into_gd(msg, 'in-RAM backlog full')
+
+        now = utcnow_as_ms()
+
+        with closing(self.new_session_func()) as session:
+
+            current_depth = get_gd_depth_topic(session, self.server.cluster_id, topic.id)
+
+            if current_depth + len(msg_list) > topic.max_depth_gd:
+                for sub_key in sub_keys:
+                    self.pubsub.sync_backlog.log_messages_to_store(cid, topic.name, topic.max_depth_gd, sub_key, msg_list)
+                return
+
+            _ = sql_publish_with_retry(
+
+                now = now,
+                cid = cid,
+                topic_id = topic.id,
+                topic_name = topic.name,
+                cluster_id = self.server.cluster_id,
+                pub_counter = self.server.get_pub_counter(),
+
+                session = session,
+                new_session_func = self.new_session_func,
+                before_queue_insert_func = None,
+
+                gd_msg_list = msg_list,
+                subscriptions_by_topic = subscriptions_by_topic,
+                should_collect_ctx = False,
+                gd_storage = topic.gd_storage
+            )
+
+            session.commit()
+            self.server.incr_pub_counter()
+
+        self.pubsub.set_sync_has_msg(
+            topic_id = topic.id,
+            is_gd = True,
+            value = True,
+            source = 'Publish.spill_to_gd',
+            gd_pub_time_max = now
+        )
+
 # ################################################################################################################################
 
     def _publish(self, ctx:'PubCtx') -> 'PublicationResult':
@@ -681,7 +771,8 @@ class Publisher:
 
                     gd_msg_list = ctx.gd_msg_list,
                     subscriptions_by_topic = ctx.subscriptions_by_topic,
-                    should_collect_ctx = False
+                    should_collect_ctx = False,
+                    gd_storage = ctx.topic.gd_storage
                 )
 
                 # Run an SQL commit for all queries above ..
@@ -702,12 +793,7 @@ class Publisher:
         # Either commit succeeded or there were no GD messages on request but in both cases we can now,
         # optionally, store data in pub/sub audit log.
         if has_pubsub_audit_log:
-
-            log_msg = 'Message published. CID:`%s`, topic:`%s`, from:`%s`, ext_client_id:`%s`, pattern:`%s`, new_depth:`%s`' + \
-                  ', GD data:`%s`, non-GD data:`%s`'
-
-            logger_audit.info(log_msg, ctx.cid, ctx.topic.name, self.pubsub.endpoints[ctx.endpoint_id].name, # type: ignore
-                ctx.ext_client_id, ctx.pub_pattern_matched, ctx.current_depth, ctx.gd_msg_list, ctx.non_gd_msg_list)
+            self._log_audit(ctx)
 
         # If this is the very first time we are running during this invocation, try to deliver non-GD messages
         if ctx.is_first_run:
@@ -726,28 +812,36 @@ class Publisher:
             else:
                 if ctx.non_gd_msg_list:
 
-                    # Turn all non-GD messages into GD ones.
-                    for msg in ctx.non_gd_msg_list:
-                        msg['has_gd'] = True
+                    # Turn all non-GD messages into GD ones ..
+                    self._turn_non_gd_into_gd(ctx)
+
+                    # .. and re-run with GD and non-GD reversed now.
+                    return self._publish(ctx)
+
+        # Update topic and endpoint metadata in background if configured to
+        self._spawn_update_pub_metadata(ctx)
 
-                        logger_pubsub.info(_log_turning_gd_msg.format('no subscribers'), msg['pub_msg_id'])
+        # Build and return a response for our caller.
+        out = self._build_response(len_gd_msg_list, ctx)
+        return out
 
-                        data_prefix, data_prefix_short = self.get_data_prefixes(msg['data'])
-                        msg['data_prefix'] = data_prefix
-                        msg['data_prefix_short'] = data_prefix_short
+# ################################################################################################################################
 
-                    # Note the reversed order - now non-GD messages are sent as GD ones and the list of non-GD messages is empty.
-                    ctx.gd_msg_list = ctx.non_gd_msg_list[:]
-                    ctx.non_gd_msg_list[:] = []
-                    ctx.is_first_run = False
+    def _log_audit(self, ctx:'PubCtx') -> 'None':
 
-                    # Re-run with GD and non-GD reversed now
-                    return self._publish(ctx)
+        log_msg = 'Message published. CID:`%s`, topic:`%s`, from:`%s`, ext_client_id:`%s`, pattern:`%s`, new_depth:`%s`' + \
+              ', GD data:`%s`, non-GD data:`%s`'
+
+        logger_audit.info(log_msg, ctx.cid, ctx.topic.name, self.pubsub.endpoints[ctx.endpoint_id].name, # type: ignore
+            ctx.ext_client_id, ctx.pub_pattern_matched, ctx.current_depth, ctx.gd_msg_list, ctx.non_gd_msg_list)
 
-        # Update topic and endpoint metadata in background if configured to - we have a series of if's to confirm
-        # if it's needed because it is not a given that each publication will require the update and we also
-        # want to ensure that if there are two thigns to be updated at a time, it is only one greenlet spawned
-        # which will in turn use a single Redis pipeline to cut down on the number of Redis calls needed.
+# ################################################################################################################################
+
+    def _spawn_update_pub_metadata(self, ctx:'PubCtx') -> 'None':
+        """ We have a series of if's to confirm if it's needed because it is not a given that each publication
+        will require the update and we also want to ensure that if there are two thigns to be updated at a time,
+        it is only one greenlet spawned which will in turn use a single Redis pipeline to cut down on the number of Redis calls needed.
+        """
         if ctx.pubsub.has_meta_topic or ctx.pubsub.has_meta_endpoint:
 
             if ctx.pubsub.has_meta_topic and ctx.topic.needs_meta_update():
@@ -764,8 +858,158 @@ class Publisher:
                 _ = spawn(self.update_pub_metadata, ctx, has_topic, has_endpoint,
                     ctx.pubsub.endpoint_meta_data_len, ctx.pubsub.endpoint_meta_max_history)
 
-        # Build and return a response for our caller.
-        out = self._build_response(len_gd_msg_list, ctx)
+# ################################################################################################################################
+
+    def run_bulk_from_dict(self, cid:'str', data_list:'anylist') -> 'dictlist':
+        request_list = [
+            self.marshal_api.from_dict(cast_('Service', None), elem, PubRequest, extra={'cid':cid}) for elem in data_list]
+        return self.run_bulk(cid, request_list)
+
+# ################################################################################################################################
+
+    def run_bulk(self, cid:'str', request_list:'list_[PubRequest]') -> 'dictlist':
+        """ Publishes messages to many topics at once. Each request is a regular publication to a single topic
+        and GD messages from all of them are stored in SQL in a single transaction. Returns a list of results,
+        one for each request, in the same order as requests.
+        """
+        # We always count time in milliseconds since UNIX epoch
+        now = utcnow_as_ms()
+
+        # Validate all the requests and find their subscriptions before anything is published ..
+        ctx_list = [self.get_pub_ctx(request, now) for request in request_list]
+
+        # .. and publish all of them now.
+        return self._publish_bulk(cid, ctx_list, now)
+
+# ################################################################################################################################
+
+    def _check_depth_bulk(self, session:'SASession', ctx_list:'list_[PubCtx]') -> 'None':
+        """ Checks the GD depth of all the topics that need it with a single query, raising an exception
+        if any of them would exceed its maximum depth.
+        """
+        to_check = [ctx for ctx in ctx_list if ctx.topic.needs_depth_check()]
+
+        if not to_check:
+            return
+
+        topic_id_list = sorted({ctx.topic.id for ctx in to_check})
+        depth_by_topic_id = dict(get_gd_depth_topic_list(session, self.server.cluster_id, topic_id_list)) # type: intdict
+
+        # Note that there may be more than one request for the same topic,
+        # which is why the depth of a topic is updated after each of them.
+        for ctx in to_check:
+
+            new_depth = depth_by_topic_id.get(ctx.topic.id, 0) + len(ctx.gd_msg_list)
+
+            if new_depth > ctx.topic.max_depth_gd:
+                self.reject_publication(ctx.cid, ctx.topic.name, True)
+
+            ctx.current_depth = depth_by_topic_id[ctx.topic.id] = new_depth
+
+# ################################################################################################################################
+
+    def _publish_bulk(self, cid:'str', ctx_list:'list_[PubCtx]', now:'float') -> 'dictlist':
+        """ Publishes GD and non-GD messages to many topics, storing all the GD ones in SQL in a single transaction.
+        """
+        # Messages to topics without subscribers that are configured to drop them are not published at all
+        to_drop = set() # type: intset
+
+        for ctx in ctx_list:
+
+            if not ctx.subscriptions_by_topic:
+
+                log_msg = 'No matching subscribers found for topic `%s` (cid:%s, bulk)'
+
+                if ctx.topic.config.get('on_no_subs_pub') == PUBSUB.ON_NO_SUBS_PUB.DROP.id:
+                    logger_pubsub.info('Dropping messages. ' + log_msg, ctx.topic.name, ctx.cid)
+                    to_drop.add(id(ctx))
+                    continue
+                else:
+                    logger_pubsub.info(log_msg, ctx.topic.name, ctx.cid)
+
+                # Without subscriptions, we do not know to what delivery server non-GD messages should go,
+                # so we turn them into GD ones right away, which means that they are stored in the same transaction as the rest.
+                if ctx.non_gd_msg_list:
+                    self._turn_non_gd_into_gd(ctx)
+
+            # Increase message counters for this pub/sub server and endpoint, and for this topic
+            ctx.pubsub.incr_pubsub_msg_counter(ctx.endpoint_id)
+            ctx.topic.incr_topic_msg_counter(bool(ctx.gd_msg_list), bool(ctx.non_gd_msg_list))
+
+        to_publish = [ctx for ctx in ctx_list if id(ctx) not in to_drop]
+        gd_ctx_list = [ctx for ctx in to_publish if ctx.gd_msg_list]
+
+        # We run an SQL transaction only if there are any GD messages ..
+        if gd_ctx_list:
+
+            with closing(self.new_session_func()) as session:
+
+                # .. check the depth of all the topics at once ..
+                self._check_depth_bulk(session, gd_ctx_list)
+
+                # .. insert messages for all the topics and their subscribers ..
+                _ = sql_bulk_publish_with_retry(
+                    now = now,
+                    cid = cid,
+                    cluster_id = self.server.cluster_id,
+                    pub_counter = self.server.get_pub_counter(),
+                    session = session,
+                    new_session_func = self.new_session_func,
+                    topic_ctx_list = [
+                        BulkPublishTopicCtx(
+                            ctx.topic.id,
+                            ctx.topic.name,
+                            ctx.gd_msg_list,
+                            ctx.subscriptions_by_topic,
+                            ctx.topic.gd_storage
+                        ) for ctx in gd_ctx_list
+                    ]
+                )
+
+                # .. commit all of them ..
+                session.commit()
+
+                # .. increase the publication counter now that we have committed the messages ..
+                self.server.incr_pub_counter()
+
+            # .. and set a flag to signal that there are some GD messages available in each of the topics.
+            for topic_id in sorted({ctx.topic.id for ctx in gd_ctx_list}):
+                self.pubsub.set_sync_has_msg(
+                    topic_id = topic_id,
+                    is_gd = True,
+                    value = True,
+                    source = 'Publish.publish_bulk',
+                    gd_pub_time_max = now
+                )
+
+        for ctx in to_publish:
+
+            if self.server.has_pubsub_audit_log:
+                self._log_audit(ctx)
+
+            # Place all the non-GD messages in the in-RAM sync backlog
+            if ctx.subscriptions_by_topic and ctx.non_gd_msg_list:
+                ctx.pubsub.store_in_ram(ctx.cid, ctx.topic.id, ctx.topic.name,
+                    [item.sub_key for item in ctx.subscriptions_by_topic], ctx.non_gd_msg_list)
+
+            self._spawn_update_pub_metadata(ctx)
+
+        # Build a response for each of the requests, including the ones whose messages were dropped.
+        out = [] # type: dictlist
+
+        for ctx in ctx_list:
+
+            result = {'topic_name': ctx.topic.name} # type: anydict
+
+            if id(ctx) not in to_drop:
+                response = self._build_response(len(ctx.gd_msg_list), ctx)
+                if isinstance(response, str):
+                    result['msg_id'] = response
+                else:
+                    result['msg_id_list'] = response
+
+            out.append(result)
+
         return out
 
 # ################################################################################################################################
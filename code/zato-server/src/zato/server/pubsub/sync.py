@@ -10,6 +10,7 @@ Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
 
 # stdlib
 import logging
+from heapq import heapify, heappop, heappush
 from traceback import format_exc
 
 # gevent
@@ -19,8 +20,8 @@ from gevent.lock import RLock
 # Zato
 from zato.common.api import PUBSUB
 from zato.common.exception import BadRequest
-from zato.common.typing_ import any_, anydict, anylist, anyset, anytuple, callable_, dict_, dictlist, intsetdict, strlist, \
-     strdictdict, strset, strsetdict
+from zato.common.typing_ import any_, anydict, anylist, anyset, anytuple, callable_, dict_, dictlist, intdict, intsetdict, \
+     list_, strlist, strdictdict, strset, strsetdict, tuple_
 from zato.common.util.api import spawn_greenlet
 from zato.common.util.pubsub import make_short_msg_copy_from_dict
 from zato.common.util.time_ import utcnow_as_ms
@@ -62,6 +63,13 @@ _update_attrs = (
 # ################################################################################################################################
 
 _default_expiration = PUBSUB.DEFAULT.EXPIRATION
+_default_max_bytes = PUBSUB.DEFAULT.NON_GD_BACKLOG_MAX_BYTES
+_default_on_max_bytes = PUBSUB.DEFAULT.ON_MAX_BACKLOG_BYTES
+_drop_oldest = PUBSUB.ON_MAX_BACKLOG_BYTES.DROP_OLDEST.id
+
+# The expiry index is rebuilt if it has at least this many entries and more than twice as many as there are messages
+_expiry_index_min_rebuild = 1000
+
 default_sk_server_table_columns = 6, 15, 8, 6, 17, 80
 
 # ################################################################################################################################
@@ -116,11 +124,25 @@ class InRAMSync:
     sub_key_to_msg_id: 'strsetdict'
     msg_id_to_sub_key: 'strsetdict'
 
-    def __init__(self, pubsub:'PubSub') -> 'None':
+    expiry_index:   'list_[tuple_[float, str]]'
+    topic_id_bytes: 'intdict'
+    total_bytes:    'int'
+
+    def __init__(
+        self,
+        pubsub, # type: PubSub
+        max_bytes=_default_max_bytes,      # type: int
+        on_max_bytes=_default_on_max_bytes # type: str
+    ) -> 'None':
 
         self.lock = RLock()
         self.pubsub = pubsub
 
+        # How many bytes of data all the messages can take up, zero means that there is no limit,
+        # and what to do with the messages that would exceed it - store them in SQL or drop the oldest ones.
+        self.max_bytes = max_bytes
+        self.on_max_bytes = on_max_bytes
+
         # Msg ID   -> Message data - What is the actual contents of each message
         self.msg_id_to_msg = {}
 
@@ -133,6 +155,16 @@ class InRAMSync:
         # Msg ID   -> Sub key set  - What subscribers are interested in a given message
         self.msg_id_to_sub_key = {}
 
+        # A heap of (expiration_time, msg_id) tuples - which messages expire first. It may also contain messages
+        # that were already deleted or whose expiration time was updated, in which case such entries are skipped.
+        self.expiry_index = []
+
+        # Topic ID -> How many bytes of data its messages take up
+        self.topic_id_bytes = {}
+
+        # How many bytes of data all the messages take up
+        self.total_bytes = 0
+
         # Start in background a cleanup task that deletes all expired and removed messages
         _ = spawn_greenlet(self.run_cleanup_task)
 
@@ -147,11 +179,19 @@ class InRAMSync:
         sub_keys,   # type: strlist
         messages,   # type: dictlist
         _default_pri=_default_pri # type: int
-    ) -> 'None':
-        """ Adds all input messages to sub_keys for the topic.
+    ) -> 'dictlist':
+        """ Adds all input messages to sub_keys for the topic. Returns messages that could not be added
+        because the backlog reached its maximum size and which should be stored as GD ones instead.
         """
         with self.lock:
 
+            # Make sure that there is enough room for the messages ..
+            messages, to_spill = self._make_room(cid, topic_name, messages)
+
+            # .. there may be none at all if they all were too big.
+            if not messages:
+                return to_spill
+
             # Local aliases
             msg_ids = [msg['pub_msg_id'] for msg in messages]
             len_messages = len(messages)
@@ -174,8 +214,15 @@ class InRAMSync:
 
             # For each message given on input, store its actual contents ..
             for msg in messages:
+                self._on_msg_removed(self.msg_id_to_msg.get(msg['pub_msg_id']))
                 self.msg_id_to_msg[msg['pub_msg_id']] = msg
 
+                # .. make it known when it expires ..
+                heappush(self.expiry_index, (msg['expiration_time'], msg['pub_msg_id']))
+
+                # .. update the counters ..
+                self._incr_bytes(topic_id, self._get_msg_size(msg))
+
                 # We received timestamps as strings whereas our recipients require floats
                 # so we need to do the conversion here.
                 msg['pub_time'] = float(msg['pub_time'])
@@ -197,6 +244,94 @@ class InRAMSync:
             # .. and add a reference to it to the topic.
             topic_messages.update(msg_ids)
 
+            return to_spill
+
+# ################################################################################################################################
+
+    def _get_msg_size(self, msg:'anydict') -> 'int':
+        return msg.get('size') or 0
+
+# ################################################################################################################################
+
+    def _incr_bytes(self, topic_id:'int', value:'int') -> 'None':
+        """ Updates the counters of bytes that messages take up - must be called with self.lock held.
+        """
+        self.total_bytes += value
+        self.topic_id_bytes[topic_id] = self.topic_id_bytes.get(topic_id, 0) + value
+
+# ################################################################################################################################
+
+    def _on_msg_removed(self, msg:'anydict | None') -> 'None':
+        """ Updates the counters after a message was removed from self.msg_id_to_msg - must be called with self.lock held.
+        Its entry in the expiry index is not removed, it will be skipped when the message's expiration time comes.
+        """
+        if msg:
+            self._incr_bytes(msg['topic_id'], -self._get_msg_size(msg))
+
+# ################################################################################################################################
+
+    def _make_room(self, cid:'str', topic_name:'str', messages:'dictlist') -> 'tuple_[dictlist, dictlist]':
+        """ Returns messages that can be added without exceeding the backlog's maximum size and the ones that cannot be.
+        If configured to, the oldest messages are deleted to make room for new ones. Must be called with self.lock held.
+        """
+        # There is no limit at all
+        if not self.max_bytes:
+            return messages, []
+
+        # Local aliases
+        to_add = [] # type: dictlist
+        to_spill = [] # type: dictlist
+
+        if self.on_max_bytes == _drop_oldest:
+
+            # How many bytes would exceed the limit if all the messages were added, not counting the ones
+            # that are bigger than the whole backlog because there is no point in making room for them ..
+            new_bytes = sum(size for size in (self._get_msg_size(msg) for msg in messages) if size <= self.max_bytes)
+            to_free = self.total_bytes + new_bytes - self.max_bytes
+
+            # .. messages are kept in the order they were added which means that the oldest ones are first ..
+            to_drop = [] # type: anylist
+
+            if to_free > 0:
+                for msg in self.msg_id_to_msg.values():
+                    if to_free <= 0:
+                        break
+                    to_drop.append(msg)
+                    to_free -= self._get_msg_size(msg)
+
+            # .. now, we can drop them.
+            if to_drop:
+                self._log_max_bytes(cid, topic_name, 'Dropping {} oldest message(s)'.format(len(to_drop)))
+                logger_overflow.info('CID:%s, messages:%s', cid, to_drop)
+                self._delete_messages([msg['pub_msg_id'] for msg in to_drop])
+
+        # Add only as many messages as there is room for. If there is still no room for some,
+        # it means that they are bigger than the whole backlog, in which case they cannot be dropped either.
+        total_bytes = self.total_bytes
+
+        for msg in messages:
+            msg_size = self._get_msg_size(msg)
+            if total_bytes + msg_size > self.max_bytes:
+                to_spill.append(msg)
+            else:
+                to_add.append(msg)
+                total_bytes += msg_size
+
+        if to_spill:
+            self._log_max_bytes(cid, topic_name, 'Storing {} message(s) as GD ones'.format(len(to_spill)))
+
+        return to_add, to_spill
+
+# ################################################################################################################################
+
+    def _log_max_bytes(self, cid:'str', topic_name:'str', action:'str') -> 'None':
+
+        msg = 'Reached max in-RAM backlog size of %s bytes (current:%s) for topic `%s` (cid:%s). %s.'
+        args = (self.max_bytes, self.total_bytes, topic_name, cid, action)
+
+        logger.warning(msg, *args)
+        logger_zato.warning(msg, *args)
+
 # ################################################################################################################################
 
     def update_msg(
@@ -213,9 +348,16 @@ class InRAMSync:
                 logger_zato.warning(_warn, msg['msg_id'])
                 return False # No such message
             else:
+                self._on_msg_removed(_msg)
+
                 for attr in _update_attrs:
                     _msg[attr] = msg[attr]
 
+                self._incr_bytes(_msg['topic_id'], self._get_msg_size(_msg))
+
+                # The old entry in the expiry index will be skipped because its expiration time is different
+                heappush(self.expiry_index, (_msg['expiration_time'], _msg['pub_msg_id']))
+
                 # Ok, found and updated
                 return True
 
@@ -237,6 +379,7 @@ class InRAMSync:
 
             found_to_sub_key = self.msg_id_to_sub_key.pop(msg_id, None)
             found_to_msg = self.msg_id_to_msg.pop(msg_id, None)
+            self._on_msg_removed(found_to_msg)
 
             _has_topic_msg = False # Was the ID found for at least one topic
             _has_sk_msg = False     # Ditto but for sub_keys
@@ -362,14 +505,12 @@ class InRAMSync:
         for msg_id in to_delete_msg:
 
             # .. first, direct mappings ..
-            _ = self.msg_id_to_msg.pop(msg_id, None)
-
-            logger.info('Deleting msg from mapping dict `%s`, before:`%s`', msg_id, self.msg_id_to_msg)
+            self._on_msg_removed(self.msg_id_to_msg.pop(msg_id, None))
 
             # .. now, remove the message from topic ..
             self.topic_id_msg_id[topic_id].remove(msg_id)
 
-            logger.info('Deleting msg from mapping topic `%s`, after:`%s`', msg_id, self.topic_id_msg_id)
+            logger.info('Deleted msg `%s` from topic `%s`', msg_id, topic_id)
 
             # .. now, find the message for each sub_key ..
             for sub_key in sub_keys:
@@ -485,7 +626,7 @@ class InRAMSync:
                     # .. if the list is empty, it means that there no some subscribers left for that message,
                     # in which case we may deleted references to this message from other look-up structures.
                     if not current_subs:
-                        del self.msg_id_to_msg[msg_id]
+                        self._on_msg_removed(self.msg_id_to_msg.pop(msg_id))
                         topic_msg = self.topic_id_msg_id[topic_id]
                         topic_msg.remove(msg_id)
 
@@ -497,76 +638,93 @@ class InRAMSync:
     def run_cleanup_task(self, _utcnow:'callable_'=utcnow_as_ms, _sleep:'callable_'=sleep) -> 'None':
         """ A background task waking up periodically to remove all expired and retrieved messages from backlog.
         """
+        while True:
+            try:
+                len_expired = self.delete_expired(_utcnow())
+
+                if len_expired:
+                    suffix = 's' if len_expired > 1 else ''
+                    logger.info('In-RAM. Deleted %s pub/sub message%s. Left:%s (%s bytes)',
+                        len_expired, suffix, len(self.msg_id_to_msg), self.total_bytes)
+
+                # Sleep for a moment before checking again but don't do it with self.lock held.
+                _sleep(2)
+
+            except Exception:
+                e = format_exc()
+                log_msg = 'Could not remove messages from in-RAM backlog, e:`%s`'
+                logger.warning(log_msg, e)
+                logger_zato.warning(log_msg, e)
+                _sleep(0.1)
+
+# ################################################################################################################################
+
+    def delete_expired(self, now:'float') -> 'int':
+        """ Deletes all the messages that expired before or at now. Returns the number of messages deleted.
+        """
 
         # Forward declarations
         msg_id:   'str'
         sub_key:  'str'
         topic_id: 'int'
 
-        while True:
-            try:
-                with self.lock:
-
-                    # Local alias
-                    publishers = {} # type: dict_[int, Endpoint]
-
-                    # We keep them separate so as not to modify any objects during iteration.
-                    expired_msg = [] # type: anylist
+        with self.lock:
 
-                    # Calling it once will suffice.
-                    now = _utcnow()
+            # Local aliases
+            publishers = {} # type: dict_[int, Endpoint]
+            expiry_index = self.expiry_index
 
-                    for _, msg in self.msg_id_to_msg.items():
+            # We keep them separate so as not to modify any objects during iteration.
+            expired_msg = [] # type: anylist
 
-                        if now >= msg['expiration_time']:
+            # The index is ordered by expiration time so we need to look at expired messages only ..
+            while expiry_index and expiry_index[0][0] <= now:
 
-                            # It's possible that there will be many expired messages all sent by the same publisher
-                            # so there is no need to query self.pubsub for each message.
-                            if msg['published_by_id'] not in publishers:
-                                publishers[msg['published_by_id']] = self.pubsub.get_endpoint_by_id(msg['published_by_id'])
+                expiration_time, msg_id = heappop(expiry_index)
 
-                            # We can be sure that it is always found
-                            publisher = publishers[msg['published_by_id']] # type: Endpoint
+                # .. skipping the ones that were already deleted or whose expiration time changed in the meantime.
+                msg = self.msg_id_to_msg.get(msg_id)
+                if (not msg) or msg['expiration_time'] != expiration_time:
+                    continue
 
-                            # Log the message to make sure the expiration event is always logged ..
-                            logger_zato.info('Found an expired msg:`%s`, topic:`%s`, publisher:`%s`, pub_time:`%s`, exp:`%s`',
-                                msg['pub_msg_id'], msg['topic_name'], publisher.name, msg['pub_time'], msg['expiration'])
+                # It's possible that there will be many expired messages all sent by the same publisher
+                # so there is no need to query self.pubsub for each message.
+                if msg['published_by_id'] not in publishers:
+                    publishers[msg['published_by_id']] = self.pubsub.get_endpoint_by_id(msg['published_by_id'])
 
-                            # .. and append it to the list of messages to be deleted.
-                            expired_msg.append((msg['pub_msg_id'], msg['topic_id']))
+                # We can be sure that it is always found
+                publisher = publishers[msg['published_by_id']] # type: Endpoint
 
-                    # For logging what was done
-                    len_expired = len(expired_msg)
+                # Log the message to make sure the expiration event is always logged ..
+                logger_zato.info('Found an expired msg:`%s`, topic:`%s`, publisher:`%s`, pub_time:`%s`, exp:`%s`',
+                    msg['pub_msg_id'], msg['topic_name'], publisher.name, msg['pub_time'], msg['expiration'])
 
-                    # Iterate over all the expired messages found and delete them from in-RAM structures
-                    for msg_id, topic_id in expired_msg:
+                # .. and append it to the list of messages to be deleted.
+                expired_msg.append((msg['pub_msg_id'], msg['topic_id']))
 
-                        # Get all sub_keys waiting for these messages and delete the message from each one,
-                        # but note that there may be possibly no subscribers at all if the message was published
-                        # to a topic without any subscribers.
-                        for sub_key in self.msg_id_to_sub_key.pop(msg_id):
-                            self.sub_key_to_msg_id[sub_key].remove(msg_id)
+            # Iterate over all the expired messages found and delete them from in-RAM structures
+            for msg_id, topic_id in expired_msg:
 
-                        # Remove all references to the message from topic
-                        self.topic_id_msg_id[topic_id].remove(msg_id)
+                # Get all sub_keys waiting for these messages and delete the message from each one,
+                # but note that there may be possibly no subscribers at all if the message was published
+                # to a topic without any subscribers.
+                for sub_key in self.msg_id_to_sub_key.pop(msg_id, ()):
+                    self.sub_key_to_msg_id.get(sub_key, set()).discard(msg_id)
 
-                        # And finally, remove the message's contents
-                        del self.msg_id_to_msg[msg_id]
+                # Remove all references to the message from topic
+                self.topic_id_msg_id[topic_id].discard(msg_id)
 
-                suffix = 's' if (len_expired==0 or len_expired > 1) else ''
-                len_messages = len(self.msg_id_to_msg)
-                if len_expired or len_messages:
-                    logger.info('In-RAM. Deleted %s pub/sub message%s. Left:%s' % (len_expired, suffix, self.msg_id_to_msg))
+                # And finally, remove the message's contents
+                self._on_msg_removed(self.msg_id_to_msg.pop(msg_id))
 
-                # Sleep for a moment before checking again but don't do it with self.lock held.
-                _sleep(2)
+            # Entries of messages deleted before they expired stay in the index until their expiration time,
+            # which is why we rebuild it if there are many more of them than there are messages.
+            len_index = len(expiry_index)
+            if len_index >= _expiry_index_min_rebuild and len_index > 2 * len(self.msg_id_to_msg):
+                self.expiry_index = [(msg['expiration_time'], msg_id) for msg_id, msg in self.msg_id_to_msg.items()]
+                heapify(self.expiry_index)
 
-            except Exception:
-                e = format_exc()
-                log_msg = 'Could not remove messages from in-RAM backlog, e:`%s`'
-                logger.warning(log_msg, e)
-                logger_zato.warning(log_msg, e)
-                _sleep(0.1)
+            return len(expired_msg)
 
 # ################################################################################################################################
 
@@ -597,5 +755,28 @@ class InRAMSync:
         with self.lock:
             return len(self.topic_id_msg_id.get(topic_id, set()))
 
+# ################################################################################################################################
+
+    def get_stats(self) -> 'anydict':
+        """ Returns the number of messages in the backlog and how many bytes they take up, in total and for each topic.
+        """
+        with self.lock:
+
+            topics = {} # type: anydict
+
+            for topic_id, msg_id_set in self.topic_id_msg_id.items():
+                topics[topic_id] = {
+                    'messages': len(msg_id_set),
+                    'bytes': self.topic_id_bytes.get(topic_id, 0),
+                }
+
+            return {
+                'messages': len(self.msg_id_to_msg),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'on_max_bytes': self.on_max_bytes,
+                'topics': topics,
+            }
+
 # ################################################################################################################################
 # ################################################################################################################################
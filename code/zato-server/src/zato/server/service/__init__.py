@@ -167,6 +167,7 @@ _wsgi_channels = {CHANNEL.HTTP_SOAP, CHANNEL.INVOKE, CHANNEL.INVOKE_ASYNC}
 # ################################################################################################################################
 
 _response_raw_types=(bytes, str, dict, list, tuple, EtreeElement, Model, ObjectifiedElement)
+_raw_payload_types=(bytes, str)
 _utcnow = datetime.utcnow
 
 # ################################################################################################################################
@@ -379,13 +380,32 @@ class PatternsFacade:
 
 # ################################################################################################################################
 
+class _lazy_attr:
+    """ Builds an attribute of a service instance when it is accessed for the first time and then stores it in the instance,
+    which means that the descriptor is not consulted again, and that the attribute can be assigned to, like any other one.
+    """
+    __slots__ = ('func', 'name')
+
+    def __init__(self, func:'callable_') -> 'None':
+        self.func = func
+        self.name = func.__name__
+
+    def __get__(self, instance:'any_', owner:'any_') -> 'any_':
+
+        # Accessed through the class, e.g. by inspect or code completion
+        if instance is None:
+            return self
+
+        value = instance.__dict__[self.name] = self.func(instance)
+        return value
+
+# ################################################################################################################################
+
 class Service:
     """ A base class for all services deployed on Zato servers, no matter the transport and protocol, be it REST, IBM MQ
     or any other, regardless whether they arere built-in or user-defined ones.
     """
-    rest: 'RESTFacade'
     schedule: 'SchedulerFacade'
-    security: 'SecurityFacade'
 
     call_hooks:'bool' = True
     _filter_by = None
@@ -404,7 +424,6 @@ class Service:
 
     email:'EMailAPI | None' = None
     search:'SearchAPI | None' = None
-    patterns: 'PatternsFacade | None' = None
     cassandra_conn:'CassandraAPI | None' = None
     cassandra_query:'CassandraQueryAPI | None' = None
 
@@ -441,8 +460,10 @@ class Service:
     # Audit log
     audit_pii:'AuditPII'
 
-    # Vendors - Keysight
-    keysight: 'KeysightContainer'
+    # How many instances of the service can be kept for reuse by subsequent requests, if any.
+    # Services that set it should reset their own attributes, if they have any, in self.before_reuse,
+    # and they should not use self once their handle method returns, e.g. in greenlets that they spawn.
+    instance_pool_size: 'int' = 0
 
     # By default, services do not use JSON Schema
     schema = '' # type: str
@@ -492,29 +513,86 @@ class Service:
         self.name = self.__class__.__service_name # Will be set through .get_name by Service Store
         self.impl_name = self.__class__.__service_impl_name # Ditto
         self.logger = _get_logger(self.name) # type: Logger
+        self.has_validate_input = False
+        self.has_validate_output = False
+
+        self.usage = 0 # How many times the service has been invoked
+        self.slow_threshold = maxint # After how many ms to consider the response came too late
+
+        # Everything that is specific to a particular request
+        self._reset()
+
+        # Note that facades to outgoing connections, user configuration and other attributes
+        # that not every service needs are built only when they are accessed, which is what the methods below do.
+
+# ################################################################################################################################
+
+    def _reset(self) -> 'None':
+        """ Sets attributes that are specific to each request, either for a new instance or for one that will be reused.
+        """
         self.cid = ''
         self.in_reply_to = ''
         self.data_format = ''
         self.transport = ''
         self.wsgi_environ = {} # type: anydict
         self.job_type = ''     # type: str
-        self.environ = Bunch()
         self.request = Request(self) # type: Request
         self.response = Response(self.logger) # type: ignore
-        self.has_validate_input = False
-        self.has_validate_output = False
 
-        # This is where user configuration is kept
-        self.config = Bunch()
+# ################################################################################################################################
 
-        # This is kept for backward compatibility with code that uses self.user_config in services.
-        # Only self.config should be used in new services.
-        self.user_config = Bunch()
+    @_lazy_attr
+    def environ(self) -> 'Bunch':
+        return Bunch()
 
-        self.usage = 0 # How many times the service has been invoked
-        self.slow_threshold = maxint # After how many ms to consider the response came too late
+    @_lazy_attr
+    def config(self) -> 'Bunch':
+        """ This is where user configuration is kept.
+        """
+        return Bunch()
+
+    @_lazy_attr
+    def user_config(self) -> 'Bunch':
+        """ This is kept for backward compatibility with code that uses self.user_config in services.
+        Only self.config should be used in new services.
+        """
+        return Bunch()
+
+    @_lazy_attr
+    def security(self) -> 'SecurityFacade':
+        """ The facade is stateless so the one that the server has is shared by all the services.
+        """
+        return getattr(self.server, 'security_facade', None) or SecurityFacade(self.server)
+
+    @_lazy_attr
+    def rest(self) -> 'RESTFacade':
+        """ REST facade for outgoing connections.
+        """
+        rest = RESTFacade()
+        rest.init(self.cid, self._out_plain_http, self.response)
+        return rest
+
+    @_lazy_attr
+    def keysight(self) -> 'KeysightContainer':
+        """ Vendors - Keysight.
+        """
+        keysight = KeysightContainer()
+        keysight.init(self.cid, self._out_plain_http)
+        return keysight
 
-        self.out = self.outgoing = Outgoing(
+    @_lazy_attr
+    def patterns(self) -> 'PatternsFacade | None':
+        if self.component_enabled_patterns:
+            return PatternsFacade(self, self.server.internal_cache_patterns, self.server.internal_cache_lock_patterns)
+
+    @_lazy_attr
+    def outgoing(self) -> 'Outgoing':
+        return self.out
+
+    @_lazy_attr
+    def out(self) -> 'Outgoing':
+
+        out = Outgoing(
             self.amqp,
             self._out_ftp,
             WMQFacade(self) if self.component_enabled_ibm_mq else None,
@@ -532,14 +610,13 @@ class Service:
             self._worker_store.outconn_mongodb,
             self._worker_store.def_kafka,
             self.kvdb
-        ) # type: Outgoing
-
-        # REST facade for outgoing connections
-        self.rest = RESTFacade()
+        )
 
         if self.component_enabled_hl7:
             hl7_api = HL7API(self._worker_store.outconn_hl7_fhir, self._worker_store.outconn_hl7_mllp)
-            self.out.hl7 = hl7_api
+            out.hl7 = hl7_api
+
+        return out
 
 # ################################################################################################################################
 
@@ -634,9 +711,6 @@ class Service:
             if not Service.search:
                 Service.search = SearchAPI(self._worker_store.search_es_api, self._worker_store.search_solr_api)
 
-        if self.component_enabled_patterns:
-            self.patterns = PatternsFacade(self, self.server.internal_cache_patterns, self.server.internal_cache_lock_patterns)
-
         if may_have_wsgi_environ:
             self.request.http.init(self.wsgi_environ)
 
@@ -648,12 +722,18 @@ class Service:
         # Cache is always enabled
         self.cache = self._worker_store.cache_api
 
-        # REST facade
-        self.rest.init(self.cid, self._out_plain_http)
+        # The facades below are built when they are first needed but, if they already exist,
+        # e.g. because the instance is being reused, they need to know of the current request.
+        _dict = self.__dict__
 
-        # Vendors - Keysight
-        self.keysight = KeysightContainer()
-        self.keysight.init(self.cid, self._out_plain_http)
+        if 'rest' in _dict:
+            self.rest.init(self.cid, self._out_plain_http, self.response)
+
+        if 'keysight' in _dict:
+            self.keysight.init(self.cid, self._out_plain_http)
+
+        if 'patterns' in _dict:
+            del _dict['patterns']
 
 # ################################################################################################################################
 
@@ -798,11 +878,14 @@ class Service:
                 # Check if there is a JSON Schema validator attached to the service and if so,
                 # validate input before proceeding any further.
                 if service._json_schema_validator and service._json_schema_validator.is_initialized:
-                    if isinstance(raw_request, str):
-                        data = raw_request.decode('utf8') # type: ignore
-                        data = loads(data)
+
+                    # The request has been already parsed above and this is the same payload that SimpleIO or models
+                    # will receive, which means that we parse it here only if the data format did not let it be parsed earlier.
+                    if isinstance(payload, _raw_payload_types):
+                        data = loads(payload) if payload else None
                     else:
-                        data = raw_request
+                        data = payload
+
                     validation_result = service._json_schema_validator.validate(cid, data)
                     if not validation_result:
                         error = validation_result.get_error()
@@ -1010,7 +1093,13 @@ class Service:
                 if raise_timeout:
                     raise
         else:
-            return self.update_handle(*invoke_args, **kwargs)
+            response = self.update_handle(*invoke_args, **kwargs)
+
+            # The instance can be reused by other requests if the service has a pool of them
+            if service.instance_pool_size:
+                self.server.service_store.release_instance(service)
+
+            return response
 
 # ################################################################################################################################
 
@@ -1244,6 +1333,11 @@ class Service:
         """ Offers the last chance to influence the service's operations.
         """
 
+    def before_reuse(self, _zato_no_op_marker=zato_no_op_marker): # type: ignore
+        """ Invoked before an instance of a service that has instance_pool_size set is returned to the pool.
+        Any attributes that the service keeps in self should be reset here.
+        """
+
     @staticmethod
     def after_add_to_store(logger): # type: ignore
         """ Invoked right after the class has been added to the service store.
@@ -1350,7 +1444,6 @@ class Service:
         service.user_config = server.user_config
         service.static_config = server.static_config
         service.time = server.time_util
-        service.security = SecurityFacade(service.server)
 
         if channel_params:
             service.request.channel_params.update(channel_params)
@@ -34,7 +34,10 @@ list_func = cache_builtin_list
 skip_create_integrity_error = True
 skip_if_exists = True
 skip_input_params = ['cache_id']
-output_optional_extra = ['current_size', 'cache_id']
+create_edit_input_optional_extra = [Int('sync_batch_window'), Int('sync_batch_max_ops'), 'storage',
+    Bool('index_prefix'), Bool('index_suffix'), Bool('index_contains'), Bool('track_positions')]
+output_optional_extra = ['current_size', 'cache_id', Int('sync_batch_window'), Int('sync_batch_max_ops'), 'storage',
+    Bool('index_prefix'), Bool('index_suffix'), Bool('index_contains'), Bool('track_positions')]
 
 # ################################################################################################################################
 
@@ -128,6 +131,24 @@ class Delete(AdminService):
 
 # ################################################################################################################################
 
+class GetStats(AdminService):
+    """ Returns usage statistics of a cache, including ones about its expiration sweeps.
+    """
+    class SimpleIO(AdminSIO):
+        input_required = ('cluster_id', 'cache_id')
+        output_required = ('name', Int('size'), Int('max_size'), Int('hits'), Int('misses'), Int('get_ops'), Int('set_ops'),
+            Int('expiry_heap_size'), Int('sweeps'), Int('expired_total'), Int('last_sweep_expired'), 'last_sweep_duration')
+
+    def handle(self):
+        cache = self.server.odb.get_cache_builtin(self.server.cluster_id, self.request.input.cache_id)
+
+        response = self.cache.get_stats(_COMMON_CACHE.TYPE.BUILTIN, cache.name)
+        response['name'] = cache.name
+
+        self.response.payload = response
+
+# ################################################################################################################################
+
 class Clear(AdminService):
     """ Clears out a cache by its ID - deletes all keys and values.
     """
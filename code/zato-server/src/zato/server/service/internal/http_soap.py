@@ -94,6 +94,8 @@ class _BaseGet(AdminService):
             'method', 'soap_action', 'soap_version', 'data_format', 'host', 'ping_method', 'pool_size', 'merge_url_params_req', \
             'url_params_pri', 'params_pri', 'serialization_type', 'timeout', AsIs('sec_tls_ca_cert_id'), Boolean('has_rbac'), \
             'content_type', Boolean('sec_use_rbac'), 'cache_id', 'cache_name', Integer('cache_expiry'), 'cache_type', \
+            Boolean('cache_single_flight'), Integer('cache_stale_ttl'), Boolean('cache_etag'), \
+            Boolean('is_streaming'), Integer('stream_buffer_size'), \
             'content_encoding', Boolean('match_slash'), 'http_accept', List('service_whitelist'), 'is_rate_limit_active', \
                 'rate_limit_type', 'rate_limit_def', Boolean('rate_limit_check_parent_def'), \
                 'hl7_version', 'json_path', 'should_parse_on_input', 'should_validate', 'should_return_errors', \
@@ -101,7 +103,10 @@ class _BaseGet(AdminService):
                 Integer('max_len_messages_sent'), Integer('max_len_messages_received'), \
                 Integer('max_bytes_per_message_sent'), Integer('max_bytes_per_message_received'), \
                 'username', 'is_wrapper', 'wrapper_type', AsIs('security_groups'), 'security_group_count', \
-                'security_group_member_count', 'needs_security_group_names'
+                'security_group_member_count', 'needs_security_group_names', Integer('max_in_flight'), \
+                Integer('retry_max'), Integer('retry_budget'), Integer('breaker_error_rate'), \
+                Integer('breaker_slow_call_rate'), Integer('breaker_slow_call_time'), Integer('breaker_min_calls'), \
+                Integer('breaker_window'), Integer('breaker_open_time'), Integer('breaker_half_open_calls')
 
 # ################################################################################################################################
 
@@ -394,7 +399,9 @@ class Create(_CreateEdit):
         input_optional = 'service', 'service_id', AsIs('security_id'), 'method', 'soap_action', 'soap_version', 'data_format', \
             'host', 'ping_method', 'pool_size', Boolean('merge_url_params_req'), 'url_params_pri', 'params_pri', \
             'serialization_type', 'timeout', AsIs('sec_tls_ca_cert_id'), Boolean('has_rbac'), 'content_type', \
-            'cache_id', Integer('cache_expiry'), 'content_encoding', Boolean('match_slash'), 'http_accept', \
+            'cache_id', Integer('cache_expiry'), Boolean('cache_single_flight'), Integer('cache_stale_ttl'), \
+            Boolean('cache_etag'), Boolean('is_streaming'), Integer('stream_buffer_size'), 'content_encoding', \
+            Boolean('match_slash'), 'http_accept', \
             List('service_whitelist'), 'is_rate_limit_active', 'rate_limit_type', 'rate_limit_def', \
             Boolean('rate_limit_check_parent_def'), Boolean('sec_use_rbac'), 'hl7_version', 'json_path', \
             'should_parse_on_input', 'should_validate', 'should_return_errors', 'data_encoding', \
@@ -402,7 +409,10 @@ class Create(_CreateEdit):
             Integer('max_len_messages_sent'), Integer('max_len_messages_received'), \
             Integer('max_bytes_per_message_sent'), Integer('max_bytes_per_message_received'), \
             'is_active', 'transport', 'is_internal', 'cluster_id', 'tls_verify', \
-            'is_wrapper', 'wrapper_type', 'username', 'password', AsIs('security_groups')
+            'is_wrapper', 'wrapper_type', 'username', 'password', AsIs('security_groups'), Integer('max_in_flight'), \
+            Integer('retry_max'), Integer('retry_budget'), Integer('breaker_error_rate'), Integer('breaker_slow_call_rate'), \
+            Integer('breaker_slow_call_time'), Integer('breaker_min_calls'), Integer('breaker_window'), \
+            Integer('breaker_open_time'), Integer('breaker_half_open_calls')
         output_required = 'id', 'name'
         output_optional = 'url_path'
 
@@ -543,13 +553,14 @@ class Create(_CreateEdit):
                     input.service_id = service.id
                     input.service_name = service.name
 
-                    cache = cache_by_id(session, input.cluster_id, item.cache_id) if item.cache_id else None
-                    if cache:
-                        input.cache_type = cache.cache_type
-                        input.cache_name = cache.name
-                    else:
-                        input.cache_type = None
-                        input.cache_name = None
+                # Both channels and outgoing connections can have caches
+                cache = cache_by_id(session, input.cluster_id, item.cache_id) if item.cache_id else None
+                if cache:
+                    input.cache_type = cache.cache_type
+                    input.cache_name = cache.name
+                else:
+                    input.cache_type = None
+                    input.cache_name = None
 
                 if item.sec_tls_ca_cert_id:
                     self.add_tls_ca_cert(input, item.sec_tls_ca_cert_id)
@@ -585,7 +596,9 @@ class Edit(_CreateEdit):
         input_optional = 'service', 'service_id', AsIs('security_id'), 'method', 'soap_action', 'soap_version', \
             'data_format', 'host', 'ping_method', 'pool_size', Boolean('merge_url_params_req'), 'url_params_pri', \
             'params_pri', 'serialization_type', 'timeout', AsIs('sec_tls_ca_cert_id'), Boolean('has_rbac'), 'content_type', \
-            'cache_id', Integer('cache_expiry'), 'content_encoding', Boolean('match_slash'), 'http_accept', \
+            'cache_id', Integer('cache_expiry'), Boolean('cache_single_flight'), Integer('cache_stale_ttl'), \
+            Boolean('cache_etag'), Boolean('is_streaming'), Integer('stream_buffer_size'), 'content_encoding', \
+            Boolean('match_slash'), 'http_accept', \
             List('service_whitelist'), 'is_rate_limit_active', 'rate_limit_type', 'rate_limit_def', \
             Boolean('rate_limit_check_parent_def'), Boolean('sec_use_rbac'), 'hl7_version', 'json_path', \
             'should_parse_on_input', 'should_validate', 'should_return_errors', 'data_encoding', \
@@ -593,7 +606,10 @@ class Edit(_CreateEdit):
             Integer('max_len_messages_sent'), Integer('max_len_messages_received'), \
             Integer('max_bytes_per_message_sent'), Integer('max_bytes_per_message_received'), \
             'cluster_id', 'is_active', 'transport', 'tls_verify', \
-            'is_wrapper', 'wrapper_type', 'username', 'password', AsIs('security_groups')
+            'is_wrapper', 'wrapper_type', 'username', 'password', AsIs('security_groups'), Integer('max_in_flight'), \
+            Integer('retry_max'), Integer('retry_budget'), Integer('breaker_error_rate'), Integer('breaker_slow_call_rate'), \
+            Integer('breaker_slow_call_time'), Integer('breaker_min_calls'), Integer('breaker_window'), \
+            Integer('breaker_open_time'), Integer('breaker_half_open_calls')
         output_optional = 'id', 'name'
 
     def handle(self):
@@ -747,18 +763,19 @@ class Edit(_CreateEdit):
                     input.url_params_pri = item.url_params_pri
                     input.params_pri = item.params_pri
 
-                    cache = cache_by_id(session, input.cluster_id, item.cache_id) if item.cache_id else None
-                    if cache:
-                        input.cache_type = cache.cache_type
-                        input.cache_name = cache.name
-                    else:
-                        input.cache_type = None
-                        input.cache_name = None
-
                 else:
                     input.ping_method = item.ping_method
                     input.pool_size = item.pool_size
 
+                # Both channels and outgoing connections can have caches
+                cache = cache_by_id(session, input.cluster_id, item.cache_id) if item.cache_id else None
+                if cache:
+                    input.cache_type = cache.cache_type
+                    input.cache_name = cache.name
+                else:
+                    input.cache_type = None
+                    input.cache_name = None
+
                 input.is_internal = item.is_internal
                 input.old_name = old_name
                 input.old_url_path = old_url_path
@@ -898,6 +915,28 @@ class Ping(AdminService):
 
 # ################################################################################################################################
 
+class GetStats(AdminService):
+    """ Returns statistics of an outgoing HTTP/SOAP connection, such as its latency histogram or the state
+    of its circuit breaker. Each worker process keeps statistics of its own and these are the ones of the worker
+    that the request was processed by.
+    """
+    class SimpleIO(AdminSIO):
+        request_elem = 'zato_http_soap_get_stats_request'
+        response_elem = 'zato_http_soap_get_stats_response'
+        input_required = 'id'
+        output_required = 'id', AsIs('stats')
+
+    def handle(self):
+        with closing(self.odb.session()) as session:
+            item = session.query(HTTPSOAP).filter_by(id=self.request.input.id).one()
+
+        config_dict = getattr(self.outgoing, item.transport)
+
+        self.response.payload.id = self.request.input.id
+        self.response.payload.stats = config_dict.get(item.name).conn.get_stats()
+
+# ################################################################################################################################
+
 class ReloadWSDL(AdminService, _HTTPSOAPService):
     """ Reloads WSDL by recreating the whole underlying queue of SOAP clients.
     """
@@ -15,7 +15,7 @@ from zato.common.api import CHANNEL, ContentType, CONTENT_TYPE, PUBSUB, ZATO_NON
 from zato.common.exception import BadRequest, Forbidden, PubSubSubscriptionExists
 from zato.common.typing_ import cast_
 from zato.common.util.auth import parse_basic_auth
-from zato.server.service import AsIs, Int, Service
+from zato.server.service import AsIs, Int, List, Service
 from zato.server.service.internal.pubsub.subscription import CreateWSXSubscription
 
 # ################################################################################################################################
@@ -207,6 +207,57 @@ class TopicService(_PubSubService):
 
 # ################################################################################################################################
 
+class BulkTopicSIO:
+    input_required = List('request_list'),
+    output_optional = List('result_list'),
+    response_elem = None
+    skip_empty_keys = True
+    default_value = None
+
+# ################################################################################################################################
+
+class BulkTopicService(_PubSubService):
+    """ Publishes messages to many topics at once.
+    POST /zato/pubsub/topics {"request_list": [{"topic_name":"/my/topic", "data":"my data", ...}, ...]}
+    """
+    SimpleIO = BulkTopicSIO
+
+    def handle_POST(self):
+
+        # Checks credentials and returns endpoint_id if valid
+        endpoint_id = self._pubsub_check_credentials()
+
+        # Ignore the header set by curl and similar tools
+        mime_type = self.wsgi_environ.get('CONTENT_TYPE')
+        if (not mime_type) or (mime_type == ContentType.FormURLEncoded):
+            mime_type = CONTENT_TYPE.JSON
+
+        request_list = [] # type: anylist
+
+        for item in self.request.input.request_list:
+
+            # We always require a topic and some data on input
+            if not (item.get('topic_name') and item.get('data')):
+                raise BadRequest(self.cid, 'Each request requires topic_name and data')
+
+            request_list.append({
+                'topic_name': item['topic_name'],
+                'mime_type': mime_type,
+                'data': item['data'],
+                'msg_id': item.get('msg_id'),
+                'priority': item.get('priority'),
+                'expiration': item.get('expiration'),
+                'correl_id': item.get('correl_id') or self.cid,
+                'in_reply_to': item.get('in_reply_to'),
+                'ext_client_id': item.get('ext_client_id'),
+                'ext_pub_time': item.get('ext_pub_time'),
+                'has_gd': item.get('has_gd', ZATO_NONE),
+            })
+
+        self.response.payload.result_list = self.pubsub.publish_bulk(request_list, service=self, endpoint_id=endpoint_id)
+
+# ################################################################################################################################
+
 class SubscribeService(_PubSubService):
     """ Service through which REST clients subscribe to or unsubscribe from topics.
     """
@@ -48,3 +48,20 @@ class Publish(AdminService):
                 self.response.payload.msg_id_list = response
 
 # ################################################################################################################################
+# ################################################################################################################################
+
+class PublishBulk(AdminService):
+    """ Publishes messages to many topics at once, storing all the GD ones in a single SQL transaction.
+    Each element of request_list has the same keys that the input to zato.pubsub.publish.publish has.
+    """
+    call_hooks = False
+
+    class SimpleIO:
+        input_required = (List('request_list'),)
+        output_optional = (List('result_list'),) # type: anytuple
+
+    def handle(self):
+        self.response.payload.result_list = self.pubsub.impl_publisher.run_bulk_from_dict(
+            self.cid, self.request.input.request_list)
+
+# ################################################################################################################################
@@ -22,6 +22,7 @@ from zato.common.api import PUBSUB
 from zato.common.broker_message import PUBSUB as BROKER_MSG_PUBSUB
 from zato.common.exception import BadRequest, NotFound, Forbidden, PubSubSubscriptionExists
 from zato.common.odb.model import PubSubSubscription
+from zato.common.odb.query.pubsub.cursor import add_cursor
 from zato.common.odb.query.pubsub.queue import get_queue_depth_by_sub_key
 from zato.common.odb.query.pubsub.subscribe import add_subscription, add_wsx_subscription, has_subscription, \
      move_messages_to_sub_queue
@@ -388,8 +389,14 @@ class SubscribeServiceImpl(_Subscribe):
                     # * If there are no subscribers and no messages in the topic then this is a no-op
                     #
 
-                    move_messages_to_sub_queue(session, ctx.cluster_id, ctx.topic.id, ctx.endpoint_id,
-                        ctx.sub_pattern_matched, sub_key, now)
+                    # Subscriptions to topics with logs of messages do not have queues and keep cursors instead ..
+                    if ctx.topic.gd_storage == PUBSUB.GD_STORAGE.TOPIC_LOG.id:
+                        _ = add_cursor(session, ctx.cluster_id, ctx.topic.id, sub_key, now)
+
+                    # .. whereas all the other ones have their own queues.
+                    else:
+                        move_messages_to_sub_queue(session, ctx.cluster_id, ctx.topic.id, ctx.endpoint_id,
+                            ctx.sub_pattern_matched, sub_key, now)
 
                     # Subscription's ID is available only now, after the session was flushed
                     sub_config.id = ps_sub.id
@@ -11,8 +11,9 @@ from operator import itemgetter
 
 # Zato
 from zato.common.util.time_ import datetime_from_ms
-from zato.server.service import AsIs, Int
-from zato.server.service.internal import AdminService, GetListAdminSIO
+from zato.server.pubsub.delivery.task import wakeup_counter
+from zato.server.service import AsIs, Float, Int
+from zato.server.service.internal import AdminService, AdminSIO, GetListAdminSIO
 
 # ################################################################################################################################
 
@@ -29,7 +30,7 @@ class GetTaskSIO:
     output_required = ('server_name', 'server_pid', 'sub_key', 'topic_id', 'topic_name', 'is_active',
         'endpoint_id', 'endpoint_name', 'py_object', AsIs('python_id'), Int('len_messages'), Int('len_history'), Int('len_batches'),
         Int('len_delivered')) # type: anytuple
-    output_optional = 'last_sync', 'last_sync_sk', 'last_iter_run', AsIs('ext_client_id') # type: anytuple
+    output_optional = 'last_sync', 'last_sync_sk', 'last_iter_run', AsIs('ext_client_id'), Int('len_wakeups') # type: anytuple
     output_elem = None
     response_elem = None
 
@@ -75,6 +76,7 @@ class GetServerDeliveryTaskList(AdminService):
                             'last_iter_run': datetime_from_ms(task.last_iter_run * 1000),
                             'len_batches': task.len_batches,
                             'len_delivered': task.len_delivered,
+                            'len_wakeups': task.len_wakeups,
                         })
 
         # Return the list of tasks sorted by sub_keys and their Python names
@@ -86,6 +88,33 @@ class GetServerDeliveryTaskList(AdminService):
 # ################################################################################################################################
 # ################################################################################################################################
 
+class GetServerDeliveryTaskWakeups(AdminService):
+    """ Returns how many times delivery tasks of a particular server process woke up, in total and per second
+    since the previous invocation (must be invoked on the required one).
+    """
+    class SimpleIO(AdminSIO):
+        output_required = 'server_name', 'server_pid', Int('len_tasks'), Int('total'), Int('total_idle'), Float('per_second')
+
+    def handle(self):
+
+        len_tasks = 0
+
+        for ps_tool in self.pubsub.pubsub_tools: # type: PubSubTool
+            with ps_tool.lock:
+                len_tasks += len(ps_tool.delivery_tasks)
+
+        self.response.payload = {
+            'server_name': self.server.name,
+            'server_pid': self.server.pid,
+            'len_tasks': len_tasks,
+            'total': wakeup_counter.total,
+            'total_idle': wakeup_counter.total_idle,
+            'per_second': wakeup_counter.get_per_second(),
+        }
+
+# ################################################################################################################################
+# ################################################################################################################################
+
 class GetDeliveryTaskList(AdminService):
     """ Returns all delivery tasks for a particular server process (possibly a remote one).
     """
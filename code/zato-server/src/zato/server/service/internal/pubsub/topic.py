@@ -53,11 +53,12 @@ broker_message_prefix = 'TOPIC_'
 list_func:'any_' = pubsub_topic_list
 skip_input_params = ['cluster_id', 'is_internal', 'current_depth_gd', 'last_pub_time', 'last_pub_msg_id', 'last_endpoint_id',
     'last_endpoint_name']
-input_optional_extra = ['needs_details', 'on_no_subs_pub', 'hook_service_name', 'target_service_name'] + topic_limit_fields
+input_optional_extra = ['needs_details', 'on_no_subs_pub', 'hook_service_name', 'target_service_name', 'gd_storage'] + \
+    topic_limit_fields
 output_optional_extra:'anylist' = ['is_internal', Int('current_depth_gd'), Int('current_depth_non_gd'), 'last_pub_time',
     'hook_service_name', 'last_pub_time', AsIs('last_pub_msg_id'), 'last_endpoint_id', 'last_endpoint_name',
     Bool('last_pub_has_gd'), Opaque('last_pub_server_pid'), 'last_pub_server_name', 'on_no_subs_pub',
-    Int('sub_count'),] + topic_limit_fields
+    Int('sub_count'), 'gd_storage'] + topic_limit_fields
 
 # ################################################################################################################################
 
@@ -100,6 +101,7 @@ def _add_limits(item:'any_') -> 'None':
     item.limit_retention      = item.get('limit_retention')      or PUBSUB.DEFAULT.LimitTopicRetention
     item.limit_sub_inactivity = item.get('limit_sub_inactivity') or PUBSUB.DEFAULT.LimitMessageExpiry
     item.limit_message_expiry = item.get('limit_message_expiry') or PUBSUB.DEFAULT.LimitSubInactivity
+    item.gd_storage           = item.get('gd_storage')           or PUBSUB.DEFAULT.GD_STORAGE
 
 # ################################################################################################################################
 
@@ -246,7 +248,7 @@ class Get(AdminService):
         input_optional:'anytuple' = 'cluster_id', AsIs('id'), 'name'
         output_optional:'anytuple' = 'id', 'name', 'is_active', 'is_internal', 'has_gd', 'max_depth_gd', 'max_depth_non_gd', \
             'current_depth_gd', Int('limit_retention'), Int('limit_message_expiry'), Int('limit_sub_inactivity'), \
-                'last_pub_time', 'on_no_subs_pub', 'target_service_name'
+                'last_pub_time', 'on_no_subs_pub', 'target_service_name', 'gd_storage'
 
     def handle(self) -> 'None':
 
@@ -515,6 +517,20 @@ class GetNonGDDepth(AdminService):
 # ################################################################################################################################
 # ################################################################################################################################
 
+class GetServerNonGDBacklogStats(AdminService):
+    """ Returns the number of non-GD messages kept in RAM by current server process and how many bytes they take up,
+    in total and for each topic.
+    """
+    class SimpleIO:
+        output_optional:'anytuple' = (Int('messages'), Int('bytes'), Int('max_bytes'), 'on_max_bytes', Opaque('topics'))
+        response_elem = None
+
+    def handle(self) -> 'None':
+        self.response.payload = self.pubsub.sync_backlog.get_stats()
+
+# ################################################################################################################################
+# ################################################################################################################################
+
 class CollectNonGDDepth(AdminService):
     """ Checks depth of non-GD messages for the input topic on all servers and returns a combined tally.
     """
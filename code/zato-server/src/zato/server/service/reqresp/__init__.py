@@ -48,6 +48,7 @@ if 0:
     # Zato
     from zato.common.kvdb.api import KVDB as KVDBAPI
     from zato.common.odb.api import PoolStore
+    from zato.common.util.http_ import RequestStream
     from zato.common.typing_ import any_, callable_, stranydict, strnone
     from zato.hl7.mllp.server import ConnCtx as HL7ConnCtx
     from zato.server.config import ConfigDict, ConfigStore
@@ -76,6 +77,7 @@ if 0:
     KVDBAPI = KVDBAPI
     Logger = Logger
     PoolStore = PoolStore
+    RequestStream = RequestStream
     SearchAPI = SearchAPI
     Service = Service
     SMSAPI = SMSAPI
@@ -104,7 +106,7 @@ direct_payload = simple_types + (EtreeElement, ObjectifiedElement)
 class HTTPRequestData:
     """ Data regarding an HTTP request.
     """
-    __slots__ = 'method', 'GET', 'POST', 'path', 'params', 'user_agent', '_wsgi_environ'
+    __slots__ = 'method', 'GET', 'POST', 'path', 'params', 'user_agent', 'stream', '_wsgi_environ'
 
     def __init__(self, _Bunch=Bunch):
         self.method = None # type: str
@@ -113,6 +115,7 @@ class HTTPRequestData:
         self.path = None # type: str
         self.params = _Bunch()
         self.user_agent = ''
+        self.stream = None # type: RequestStream | None
         self._wsgi_environ = None # type: dict
 
     def init(self, wsgi_environ=None):
@@ -123,6 +126,7 @@ class HTTPRequestData:
         self.path = wsgi_environ.get('PATH_INFO') # type: str
         self.params.update(wsgi_environ.get('zato.http.path_params', {}))
         self.user_agent = wsgi_environ.get('HTTP_USER_AGENT')
+        self.stream = wsgi_environ.get('zato.http.request.stream')
 
     def get_form_data(self) -> 'stranydict':
         return util_get_form_data(self._wsgi_environ)
@@ -255,6 +259,17 @@ class Request:
     def raw_request(self) -> 'any_':
         return self.text
 
+# ################################################################################################################################
+
+    def __iter__(self) -> 'any_':
+        """ Iterates over chunks of the request's body. In streaming REST channels, these are read from the client
+        as they are consumed. Otherwise, the whole body, which has already been read, is the only chunk.
+        """
+        if self.http.stream is not None:
+            return iter(self.http.stream)
+        else:
+            return iter([self.raw_request] if self.raw_request else [])
+
 # ################################################################################################################################
 
     @raw_request.setter
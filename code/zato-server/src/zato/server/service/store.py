@@ -44,7 +44,6 @@ except ImportError:
 
 # Zato
 from zato.common.api import CHANNEL, DONT_DEPLOY_ATTR_NAME, RATE_LIMIT, SourceCodeInfo, TRACE1
-from zato.common.facade import SecurityFacade
 from zato.common.json_internal import dumps
 from zato.common.json_schema import get_service_config, ValidationConfig as JSONSchemaValidationConfig, \
      Validator as JSONSchemaValidator
@@ -54,6 +53,7 @@ from zato.common.marshal_.simpleio import DataClassSimpleIO
 from zato.common.odb.model.base import Base as ModelBase
 from zato.common.typing_ import cast_, list_
 from zato.common.util.api import deployment_info, import_module_from_path, is_func_overridden, is_python_file, visit_py_source
+from zato.common.util.http_ import is_stream_payload
 from zato.common.util.platform_ import is_non_windows
 from zato.common.util.python_ import get_module_name_by_path
 from zato.server.config import ConfigDict
@@ -117,7 +117,7 @@ data_class_model_class_name = 'zato.server.service.Model'
 # ################################################################################################################################
 # ################################################################################################################################
 
-hook_methods = ('accept', 'get_request_hash') + before_handle_hooks + after_handle_hooks + before_job_hooks + after_job_hooks
+hook_methods = ('accept', 'get_request_hash', 'before_reuse') + before_handle_hooks + after_handle_hooks + before_job_hooks + after_job_hooks
 
 # ################################################################################################################################
 # ################################################################################################################################
@@ -302,6 +302,7 @@ class ServiceStore:
         self.impl_name_to_id = {}   # type: strintdict
         self.name_to_impl_name = {} # type: stranydict
         self.deployment_info = {}   # type: stranydict
+        self.instance_pools = {}    # type: stranydict
         self.update_lock = RLock()
         self.patterns_matcher = Matcher()
         self.needs_post_deploy_attr = 'needs_post_deploy'
@@ -839,19 +840,57 @@ class ServiceStore:
         service_class = _info['service_class']
         is_active = _info['is_active']
 
-        # .. do create a new instance ..
-        service:'Service' = service_class(*args, **kwargs)
+        # .. reuse an instance that was released to the pool, if the service has one ..
+        if service_class.instance_pool_size and (pool := self.instance_pools.get(impl_name)):
+            service = pool.pop()
+
+            # .. unless it was created before the service was redeployed ..
+            if service.__class__ is not service_class:
+                service = service_class(*args, **kwargs)
+
+        # .. otherwise, do create a new instance ..
+        else:
+            service = service_class(*args, **kwargs)
 
         # .. populate its basic attributes ..
         service.server = self.server
         service.config = self.server.user_config
         service.user_config = self.server.user_config
         service.time = self.server.time_util
-        service.security = SecurityFacade(service.server)
 
         # .. and return everything to our caller.
         return service, is_active
 
+# ################################################################################################################################
+
+    def release_instance(self, service:'Service') -> 'None':
+        """ Returns to the pool an instance of a service that has instance_pool_size set, assuming the pool is not full yet.
+        Must be called only after the service's response has been obtained.
+        """
+        pool = self.instance_pools.setdefault(service.impl_name, [])
+
+        # There are enough instances in the pool already
+        if len(pool) >= service.instance_pool_size:
+            return
+
+        # A response that is a generator or a file-like object is read only after the service has returned
+        # and it may still need the instance, which is why the latter cannot be reused.
+        if is_stream_payload(service.response.payload):
+            return
+
+        # Data of the request that the instance was used for is not kept ..
+        service._reset()
+
+        # .. and the service itself can reset whatever else it needs to.
+        if service.before_reuse:
+            try:
+                service.before_reuse()
+            except Exception:
+                logger.warning('Instance of `%s` not reused, e:`%s`', service.name, format_exc())
+                return
+
+        pool.append(service)
+
 # ################################################################################################################################
 
     def new_instance_by_id(self, service_id:'int', *args:'any_', **kwargs:'any_') -> 'tuple_[Service, bool]':
@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2023, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+import os
+from time import sleep
+from unittest import main, TestCase
+from uuid import uuid4
+
+# Bunch
+from bunch import Bunch
+
+# gevent
+from gevent import sleep as gevent_sleep, spawn
+
+# posix_ipc
+import posix_ipc as ipc
+
+# Zato
+from zato.cache import KeyExpiredError
+from zato.server.connection import cache_shmem
+from zato.server.connection.cache_shmem import _lock_owner, _magic, _reclaim_owner_offset, _region_header, _version, \
+     SharedMemoryCache
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import any_
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class CacheSharedMemoryTestCase(TestCase):
+
+    def setUp(self) -> 'None':
+        self.deployment_key = uuid4().hex
+        self.caches = []
+
+    def tearDown(self) -> 'None':
+        for cache in self.caches:
+            cache.unlink()
+            cache.close()
+
+# ################################################################################################################################
+
+    def _get_cache(self, **kwargs) -> 'SharedMemoryCache':
+
+        config = Bunch()
+        config.name = 'test.cache'
+        config.max_size = 100
+        config.max_item_size = 1000
+        config.extend_expiry_on_get = True
+        config.extend_expiry_on_set = True
+        config.update(kwargs)
+
+        cache = SharedMemoryCache(config, 'test.server', self.deployment_key)
+        self.caches.append(cache)
+
+        return cache
+
+# ################################################################################################################################
+
+    def test_set_get(self) -> 'None':
+
+        cache = self._get_cache()
+
+        self.assertIsNone(cache.set('key1', 'value1'))
+        self.assertEqual(cache.set('key1', 'value2'), 'value1')
+
+        cache.set(b'key2', b'value2')
+        cache.set(3, {'a': [1, 2]})
+
+        self.assertEqual(cache.get('key1'), 'value2')
+        self.assertEqual(cache.get(b'key2'), b'value2')
+        self.assertEqual(cache.get(3), {'a': [1, 2]})
+        self.assertIsNone(cache.get('key4'))
+        self.assertEqual(cache.get('key4', 'default'), 'default')
+
+        entry = cache.get('key1', details=True)
+        self.assertEqual(entry.value, 'value2')
+        self.assertEqual(entry.hits, 2)
+        self.assertEqual(entry.position, -1)
+
+        self.assertIn('key1', cache)
+        self.assertEqual(len(cache), 3)
+
+        self.assertEqual(cache.delete('key1'), 'value2')
+        self.assertNotIn('key1', cache)
+        self.assertRaises(KeyError, cache.delete, 'key1')
+
+# ################################################################################################################################
+
+    def test_shared_by_instances(self) -> 'None':
+
+        # Each of these stands for the same cache in a different worker process
+        cache1 = self._get_cache()
+        cache2 = self._get_cache()
+
+        cache1.set('key1', 'value1')
+        self.assertEqual(cache2.get('key1'), 'value1')
+
+        cache2.delete('key1')
+        self.assertNotIn('key1', cache1)
+
+        cache1.set('key2', 'value2')
+        cache2.clear()
+        self.assertEqual(len(cache1), 0)
+
+# ################################################################################################################################
+
+    def test_expiry(self) -> 'None':
+
+        cache = self._get_cache()
+
+        cache.set('key1', 'value1', 0.01)
+        cache.set('key2', 'value2')
+        cache.set('key3', 'value3', 0.01)
+        self.assertTrue(cache.expire('key2', 0.01))
+        self.assertFalse(cache.expire('key4', 0.01))
+
+        sleep(0.02)
+
+        self.assertRaises(KeyExpiredError, cache.get, 'key1')
+        self.assertListEqual(sorted(cache.delete_expired()), ['key2', 'key3'])
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.get_stats()['expired_total'], 3)
+
+# ################################################################################################################################
+
+    def test_max_size(self) -> 'None':
+
+        cache = self._get_cache(max_size=20)
+
+        for idx in range(100):
+            cache.set('key.{}'.format(idx), idx)
+
+        self.assertLessEqual(len(cache), 20)
+        self.assertEqual(cache.get('key.99'), 99)
+
+        self.assertRaises(ValueError, cache.set, 'key', 'x' * 1001)
+
+# ################################################################################################################################
+
+    def test_pattern_ops(self) -> 'None':
+
+        cache = self._get_cache()
+
+        cache.set('abc.1', 'value1')
+        cache.set('abc.2', 'value2')
+        cache.set('xyz.1', 'value3')
+        cache.set(123, 'value4')
+
+        self.assertDictEqual(cache.get_by_prefix('abc.'), {'abc.1':'value1', 'abc.2':'value2'})
+        self.assertDictEqual(cache.get_by_suffix('.1'), {'abc.1':'value1', 'xyz.1':'value3'})
+        self.assertDictEqual(cache.get_by_regex('x.z'), {'xyz.1':'value3'})
+        self.assertDictEqual(cache.get_contains_all(['a', '2']), {'abc.2':'value2'})
+        self.assertEqual(len(cache.get_not_contains('abc', limit=1)), 1)
+
+        self.assertDictEqual(cache.set_by_prefix('abc.', 'new', return_found=True), {'abc.1':'value1', 'abc.2':'value2'})
+        self.assertEqual(cache.get('abc.1'), 'new')
+
+        self.assertTrue(cache.expire_contains('xyz', 100))
+        self.assertEqual(cache.get('xyz.1', details=True).expiry, 100)
+
+        self.assertDictEqual(cache.delete_contains_any(['1', 'q'], return_found=True), {'abc.1':'new', 'xyz.1':'value3'})
+        self.assertListEqual(sorted(cache.keys(), key=str), [123, 'abc.2'])
+
+# ################################################################################################################################
+
+    def test_stats(self) -> 'None':
+
+        cache = self._get_cache()
+
+        cache.set('key1', 'value1')
+        cache.get('key1')
+        cache.get('key2')
+
+        stats = cache.get_stats()
+
+        self.assertEqual(stats['size'], 1)
+        self.assertEqual(stats['max_size'], 100)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['get_ops'], 1)
+        self.assertEqual(stats['set_ops'], 1)
+
+# ################################################################################################################################
+
+    def test_lock_owner_alive(self) -> 'None':
+
+        cache = self._get_cache(shmem_stripes=1, shmem_lock_timeout=0.05)
+        lock, = cache._locks
+
+        # We hold the lock now ..
+        lock.__enter__()
+
+        greenlet = spawn(cache.set, 'key1', 'value1')
+        gevent_sleep(0.2)
+
+        # .. so the other greenlet keeps waiting for it, even after the timeout, because we are still running ..
+        self.assertFalse(greenlet.ready())
+
+        # .. until we release it.
+        lock.__exit__()
+        greenlet.join(1)
+
+        self.assertTrue(greenlet.successful())
+        self.assertEqual(cache.get('key1'), 'value1')
+        self.assertEqual(lock.sem.value, 1)
+
+# ################################################################################################################################
+
+    def test_lock_owner_gone(self) -> 'None':
+
+        cache = self._get_cache(shmem_stripes=1, shmem_lock_timeout=0.05)
+        lock, = cache._locks
+
+        # A process that is no longer running, and PIDs never go this high on Linux ..
+        pid = 2 ** 22 + 1
+
+        # .. held the lock when it died ..
+        lock.sem.acquire()
+        _lock_owner.pack_into(cache._mmap, lock.owner_offset, pid)
+
+        # .. so we take it over once it has not been released in time ..
+        cache.set('key1', 'value1')
+        self.assertEqual(cache.get('key1'), 'value1')
+
+        # .. and it is released normally afterwards, without having been released on behalf of the other process.
+        self.assertEqual(lock.sem.value, 1)
+        self.assertEqual(_lock_owner.unpack_from(cache._mmap, lock.owner_offset)[0], 0)
+
+# ################################################################################################################################
+
+    def test_lock_owner_unknown(self) -> 'None':
+
+        cache = self._get_cache(shmem_stripes=1, shmem_lock_timeout=0.05)
+        lock, = cache._locks
+
+        # A process died right after acquiring the lock, before it could store its PID ..
+        lock.sem.acquire()
+
+        # .. so we take the lock over once it has had no owner for too long.
+        cache.set('key1', 'value1')
+        self.assertEqual(cache.get('key1'), 'value1')
+
+        self.assertEqual(lock.sem.value, 1)
+        self.assertEqual(_lock_owner.unpack_from(cache._mmap, lock.owner_offset)[0], 0)
+
+# ################################################################################################################################
+
+    def test_reclaim_owner_gone(self) -> 'None':
+
+        cache = self._get_cache(shmem_stripes=1, shmem_lock_timeout=0.05)
+        lock, = cache._locks
+
+        pid = 2 ** 22 + 1
+
+        # A process held the lock when it died ..
+        lock.sem.acquire()
+        _lock_owner.pack_into(cache._mmap, lock.owner_offset, pid)
+
+        # .. and so did another one, while it was taking the lock over ..
+        cache._reclaim_sem.acquire()
+        _lock_owner.pack_into(cache._mmap, _reclaim_owner_offset, pid + 1)
+
+        # .. yet we can still take the lock over ..
+        cache.set('key1', 'value1')
+        self.assertEqual(cache.get('key1'), 'value1')
+
+        # .. and both semaphores are released afterwards.
+        self.assertEqual(lock.sem.value, 1)
+        self.assertEqual(cache._reclaim_sem.value, 1)
+        self.assertEqual(_lock_owner.unpack_from(cache._mmap, _reclaim_owner_offset)[0], 0)
+
+# ################################################################################################################################
+
+    def test_reclaim_owner_unknown(self) -> 'None':
+
+        cache = self._get_cache(shmem_stripes=1, shmem_lock_timeout=0.05)
+        lock, = cache._locks
+
+        # Neither process stored its PID before dying ..
+        lock.sem.acquire()
+        cache._reclaim_sem.acquire()
+
+        # .. which means that we take both over once they have had no owners for too long.
+        cache.set('key1', 'value1')
+        self.assertEqual(cache.get('key1'), 'value1')
+
+        self.assertEqual(lock.sem.value, 1)
+        self.assertEqual(cache._reclaim_sem.value, 1)
+
+# ################################################################################################################################
+
+    def _create_region(self) -> 'any_':
+        """ Creates a region the way the first worker process does, but without sizing or initialising it yet.
+        """
+        cache = self._get_cache()
+        cache.unlink()
+        cache.close()
+        self.caches.remove(cache)
+
+        return cache, ipc.SharedMemory(cache.shmem_name, ipc.O_CREX)
+
+# ################################################################################################################################
+
+    def test_attach_before_initialised(self) -> 'None':
+
+        creator, mem = self._create_region()
+
+        def initialise() -> 'None':
+
+            # The region is sized first ..
+            gevent_sleep(0.05)
+            os.ftruncate(mem.fd, creator.size)
+
+            # .. and its header is written to later on.
+            gevent_sleep(0.05)
+            with open(mem.fd, 'r+b', closefd=False) as f:
+                f.write(_region_header.pack(_magic, _version, creator.stripes, creator.slots_per_stripe, creator.slot_size,
+                    creator.max_key_size))
+
+        greenlet = spawn(initialise)
+
+        # We attach in the meantime and wait for the creator before using the region ..
+        cache = self._get_cache()
+        greenlet.join(1)
+        mem.close_fd()
+
+        # .. which means that we can use it right away.
+        cache.set('key1', 'value1')
+        self.assertEqual(cache.get('key1'), 'value1')
+
+# ################################################################################################################################
+
+    def test_attach_timeout(self) -> 'None':
+
+        _, mem = self._create_region()
+        mem.close_fd()
+
+        attach_timeout = cache_shmem._attach_timeout
+        cache_shmem._attach_timeout = 0.05
+
+        # The creator never sized the region
+        try:
+            with self.assertRaises(Exception) as ctx:
+                _ = self._get_cache()
+        finally:
+            cache_shmem._attach_timeout = attach_timeout
+            ipc.unlink_shared_memory(mem.name)
+
+        self.assertIn('was not sized', ctx.exception.args[0])
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    _ = main()
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2023, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+from unittest import main, TestCase
+
+# Bunch
+from bunch import Bunch
+
+# gevent
+from gevent import sleep
+
+# Zato
+from zato.common.api import CACHE
+from zato.server.connection.cache import Cache
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class CacheSyncBatchTestCase(TestCase):
+
+    def setUp(self) -> 'None':
+        self.single = []
+        self.batches = []
+
+# ################################################################################################################################
+
+    def _get_cache(self, sync_method:'str'=CACHE.SYNC_METHOD.BATCHED.id, **kwargs) -> 'Cache':
+
+        config = Bunch()
+        config.name = 'test.cache'
+        config.max_size = 100
+        config.max_item_size = 1000
+        config.extend_expiry_on_get = True
+        config.extend_expiry_on_set = True
+        config.sync_method = sync_method
+        config.after_state_changed_callback = lambda op, name, data: self.single.append((op, data))
+        config.after_state_changed_batch_callback = lambda name, items: self.batches.append(items)
+        config.update(kwargs)
+
+        return Cache(config)
+
+# ################################################################################################################################
+
+    def test_changes_are_batched_and_coalesced(self) -> 'None':
+
+        cache = self._get_cache(sync_batch_window=10)
+
+        cache.set('key1', 'value1')
+        cache.set('key2', 'value2')
+        cache.set('key1', 'value1-new')
+        cache.expire('key2', 10)
+        cache.delete('key2')
+
+        # Nothing is sent before the window elapses ..
+        self.assertListEqual(self.batches, [])
+
+        sleep(0.05)
+
+        # .. and then all the changes are sent in one batch, only the latest one for each key.
+        self.assertEqual(len(self.batches), 1)
+        self.assertListEqual(self.single, [])
+
+        batch = self.batches[0]
+        self.assertEqual(len(batch), 2)
+
+        op1, data1 = batch[0]
+        op2, data2 = batch[1]
+
+        self.assertEqual(op1, CACHE.STATE_CHANGED.SET)
+        self.assertEqual(data1['key'], 'key1')
+        self.assertEqual(data1['value'], 'value1-new')
+
+        self.assertEqual(op2, CACHE.STATE_CHANGED.DELETE)
+        self.assertEqual(data2['key'], 'key2')
+
+# ################################################################################################################################
+
+    def test_batch_flushed_on_max_ops(self) -> 'None':
+
+        cache = self._get_cache(sync_batch_window=10_000, sync_batch_max_ops=3)
+
+        cache.set('key1', 'value1')
+        cache.set('key2', 'value2')
+        cache.set('key3', 'value3')
+
+        sleep(0.01)
+
+        self.assertEqual(len(self.batches), 1)
+        self.assertEqual(len(self.batches[0]), 3)
+
+# ################################################################################################################################
+
+    def test_clear_drops_pending_changes(self) -> 'None':
+
+        cache = self._get_cache(sync_batch_window=10)
+
+        cache.set('key1', 'value1')
+        cache.set('key2', 'value2')
+        cache.clear()
+        cache.set('key3', 'value3')
+
+        sleep(0.05)
+
+        batch = self.batches[0]
+        self.assertListEqual([op for op, _ in batch], [CACHE.STATE_CHANGED.CLEAR, CACHE.STATE_CHANGED.SET])
+
+# ################################################################################################################################
+
+    def test_sync_after_batch(self) -> 'None':
+
+        source = self._get_cache(sync_batch_window=10)
+        target = self._get_cache(CACHE.SYNC_METHOD.NO_SYNC.id)
+        target.set('key2', 'value2')
+
+        source.set('key1', 'value1', 100)
+        source.delete('key2')
+        source.set('key3', 'value3')
+
+        sleep(0.05)
+
+        items = []
+        for op, data in self.batches[0]:
+            data['op'] = op
+            items.append(data)
+
+        target.sync_after_batch(Bunch(cache_name='test.cache', items=items))
+
+        self.assertEqual(target.get('key1'), 'value1')
+        self.assertNotIn('key2', target)
+        self.assertEqual(target.get('key3'), 'value3')
+
+        # The original timestamp of the change is preserved
+        entry = target.get('key1', details=True)
+        self.assertEqual(entry.last_write, source.get('key1', details=True).last_write)
+
+# ################################################################################################################################
+
+    def test_no_batching_if_not_configured(self) -> 'None':
+
+        cache = self._get_cache(CACHE.SYNC_METHOD.IN_BACKGROUND.id)
+        cache.set('key1', 'value1')
+
+        sleep(0.01)
+
+        self.assertListEqual(self.batches, [])
+        self.assertEqual(len(self.single), 1)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    _ = main()
+
+# ################################################################################################################################
+# ################################################################################################################################
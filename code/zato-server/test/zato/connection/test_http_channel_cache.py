@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+from http.client import NOT_MODIFIED, OK
+from json import dumps, loads
+from unittest import main, TestCase
+
+# Bunch
+from bunch import Bunch
+
+# gevent
+from gevent import joinall, sleep, spawn
+
+# Zato
+from zato.common.typing_ import cast_
+from zato.server.connection.http_soap.channel import ModuleCtx, RequestHandler
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import any_, anydict, anylist
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class _Response:
+    def __init__(self, payload:'str') -> 'None':
+        self.payload = payload
+        self.content_type = 'application/json'
+        self.headers = {}
+        self.status_code = OK
+
+# ################################################################################################################################
+
+class _Service:
+    get_request_hash = None
+    instance_pool_size = 0
+
+    def get_name(self) -> 'str':
+        return 'test.service'
+
+# ################################################################################################################################
+
+class _ServiceStore:
+    def __init__(self) -> 'None':
+        self.is_active = True
+
+    def new_instance(self, impl_name:'str') -> 'any_':
+        return _Service(), self.is_active
+
+# ################################################################################################################################
+
+class _Server:
+    """ Keeps cached values in a dict, along with the expiry that each was stored with.
+    """
+    def __init__(self) -> 'None':
+        self.service_store = _ServiceStore()
+        self.cache = {} # type: anydict
+        self.expiry = {} # type: anydict
+
+    def get_from_cache(self, cache_type:'str', cache_name:'str', key:'str') -> 'any_':
+        return self.cache.get(key)
+
+    def set_in_cache(self, cache_type:'str', cache_name:'str', key:'str', value:'any_', expiry:'float'=0.0) -> 'None':
+        self.cache[key] = value
+        self.expiry[key] = expiry
+
+# ################################################################################################################################
+
+class _RequestHandler(RequestHandler):
+    """ Produces responses without invoking any actual services, after a configurable delay.
+    """
+    def __init__(self, *args:'any_', **kwargs:'any_') -> 'None':
+        super().__init__(*args, **kwargs)
+        self.delay = 0.0
+        self.is_stream = False
+        self.invocations = [] # type: anylist
+
+    def _invoke_service(self, service:'any_', cid:'str', *args:'any_', **kwargs:'any_') -> 'any_':
+        self.invocations.append(cid)
+        sleep(self.delay)
+
+        payload = '{"invocation":%d}' % len(self.invocations)
+
+        # Services may return generators that produce their responses piece by piece
+        if self.is_stream:
+            payload = (elem for elem in (payload[:5], payload[5:].encode('utf8')))
+
+        return _Response(payload) # type: ignore
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class HTTPChannelCacheTestCase(TestCase):
+
+    def get_channel_item(self, **kwargs:'any_') -> 'Bunch':
+        channel_item = Bunch({
+            'id': 123,
+            'name': 'test.channel',
+            'service_impl_name': 'test.service',
+            'cache_type': 'builtin',
+            'cache_name': 'default',
+            'cache_expiry': 0,
+            'cache_single_flight': False,
+            'cache_stale_ttl': 0,
+            'cache_etag': False,
+        })
+        channel_item.update(kwargs)
+        return channel_item
+
+# ################################################################################################################################
+
+    def handle(
+        self,
+        handler:'_RequestHandler',
+        channel_item:'Bunch',
+        cid:'str',
+        if_none_match:'str'='',
+        method:'str'='GET',
+    ) -> 'any_':
+
+        wsgi_environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': '/test',
+        }
+
+        if if_none_match:
+            wsgi_environ['HTTP_IF_NONE_MATCH'] = if_none_match
+
+        return handler.handle(cid, {}, channel_item, wsgi_environ, '', cast_('any_', None), {}, None, '/test', {}, {})
+
+# ################################################################################################################################
+
+    def test_no_single_flight(self) -> 'None':
+
+        handler = _RequestHandler(cast_('any_', _Server()))
+        handler.delay = 0.05
+        channel_item = self.get_channel_item()
+
+        greenlets = [spawn(self.handle, handler, channel_item, str(idx)) for idx in range(5)]
+        _ = joinall(greenlets, raise_error=True)
+
+        # Each concurrent request invoked the service on its own
+        self.assertEqual(len(handler.invocations), 5)
+
+# ################################################################################################################################
+
+    def test_single_flight(self) -> 'None':
+
+        handler = _RequestHandler(cast_('any_', _Server()))
+        handler.delay = 0.05
+        channel_item = self.get_channel_item(cache_single_flight=True)
+
+        greenlets = [spawn(self.handle, handler, channel_item, str(idx)) for idx in range(5)]
+        _ = joinall(greenlets, raise_error=True)
+
+        # Only one request invoked the service and all the others received its response
+        self.assertEqual(len(handler.invocations), 1)
+        self.assertDictEqual(handler._cache_in_flight, {})
+
+        for greenlet in greenlets:
+            self.assertEqual(greenlet.value.payload, '{"invocation":1}')
+
+# ################################################################################################################################
+
+    def test_single_flight_timeout(self) -> 'None':
+
+        handler = _RequestHandler(cast_('any_', _Server()))
+        handler.delay = 0.1
+        channel_item = self.get_channel_item(cache_single_flight=True)
+
+        timeout = ModuleCtx.Cache_Single_Flight_Timeout
+        ModuleCtx.Cache_Single_Flight_Timeout = 0.01
+
+        try:
+            greenlets = [spawn(self.handle, handler, channel_item, str(idx)) for idx in range(3)]
+            _ = joinall(greenlets, raise_error=True)
+        finally:
+            ModuleCtx.Cache_Single_Flight_Timeout = timeout
+
+        # The first request took too long so the others invoked the service on their own
+        self.assertEqual(len(handler.invocations), 3)
+
+# ################################################################################################################################
+
+    def test_stale_while_revalidate(self) -> 'None':
+
+        server = _Server()
+        handler = _RequestHandler(cast_('any_', server))
+        channel_item = self.get_channel_item(cache_expiry=1, cache_stale_ttl=10)
+
+        response = self.handle(handler, channel_item, 'cid1')
+        self.assertEqual(response.payload, '{"invocation":1}')
+
+        # The response is kept in the cache for longer than it is fresh ..
+        cache_key, = server.cache
+        self.assertEqual(server.expiry[cache_key], 11)
+
+        # .. it is served from the cache while it is fresh ..
+        response = self.handle(handler, channel_item, 'cid2')
+        self.assertEqual(response.payload, '{"invocation":1}')
+        self.assertEqual(len(handler.invocations), 1)
+
+        # .. make it stale ..
+        cached = loads(server.cache[cache_key])
+        cached['fresh_until'] = 1.0
+        server.cache[cache_key] = dumps(cached)
+
+        # .. it is still served once stale ..
+        response = self.handle(handler, channel_item, 'cid3')
+        self.assertEqual(response.payload, '{"invocation":1}')
+
+        # .. and, in background, a new one is obtained.
+        sleep(0.05)
+        self.assertEqual(len(handler.invocations), 2)
+
+        response = self.handle(handler, channel_item, 'cid4')
+        self.assertEqual(response.payload, '{"invocation":2}')
+
+# ################################################################################################################################
+
+    def test_stale_inactive_service(self) -> 'None':
+
+        server = _Server()
+        handler = _RequestHandler(cast_('any_', server))
+        channel_item = self.get_channel_item(cache_expiry=1, cache_stale_ttl=10)
+
+        _ = self.handle(handler, channel_item, 'cid1')
+
+        # Make the response stale ..
+        cache_key, = server.cache
+        cached = loads(server.cache[cache_key])
+        cached['fresh_until'] = 1.0
+        server.cache[cache_key] = dumps(cached)
+
+        # .. it is served from the cache ..
+        response = self.handle(handler, channel_item, 'cid2')
+        self.assertEqual(response.payload, '{"invocation":1}')
+
+        # .. but the service is deactivated before it can be refreshed in background ..
+        server.service_store.is_active = False
+        sleep(0.05)
+
+        # .. so it is not invoked.
+        self.assertEqual(len(handler.invocations), 1)
+
+# ################################################################################################################################
+
+    def test_etag(self) -> 'None':
+
+        handler = _RequestHandler(cast_('any_', _Server()))
+        channel_item = self.get_channel_item(cache_etag=True)
+
+        response = self.handle(handler, channel_item, 'cid1')
+        etag = response.headers['ETag']
+
+        self.assertEqual(response.status_code, OK)
+        self.assertTrue(etag.startswith('"'))
+
+        # A matching ETag means there is no body to return ..
+        response = self.handle(handler, channel_item, 'cid2', if_none_match='"abc", W/{}'.format(etag))
+        self.assertEqual(response.status_code, NOT_MODIFIED)
+        self.assertEqual(response.payload, '')
+        self.assertEqual(response.headers['ETag'], etag)
+
+        # .. unlike one that does not match.
+        response = self.handle(handler, channel_item, 'cid3', if_none_match='"abc"')
+        self.assertEqual(response.status_code, OK)
+        self.assertEqual(response.payload, '{"invocation":1}')
+        self.assertEqual(len(handler.invocations), 1)
+
+        # Only GET and HEAD requests can receive a 304 response
+        response = self.handle(handler, channel_item, 'cid4', if_none_match='*', method='HEAD')
+        self.assertEqual(response.status_code, NOT_MODIFIED)
+
+        response = self.handle(handler, channel_item, 'cid5', if_none_match='*', method='POST')
+        self.assertEqual(response.status_code, OK)
+
+# ################################################################################################################################
+
+    def test_stream_payload(self) -> 'None':
+
+        server = _Server()
+        handler = _RequestHandler(cast_('any_', server))
+        handler.is_stream = True
+        channel_item = self.get_channel_item(cache_etag=True, cache_single_flight=True)
+
+        # The generator is read in full ..
+        response1 = self.handle(handler, channel_item, 'cid1')
+        self.assertEqual(response1.payload, b'{"invocation":1}')
+
+        # .. and what it produced is cached ..
+        response2 = self.handle(handler, channel_item, 'cid2')
+        self.assertEqual(response2.payload, '{"invocation":1}')
+        self.assertEqual(response2.headers['ETag'], response1.headers['ETag'])
+        self.assertEqual(len(handler.invocations), 1)
+
+        # .. unless it is not text.
+        handler._invoke_service = lambda *args, **kwargs: _Response(iter([b'\xff'])) # type: ignore
+        channel_item = self.get_channel_item(id=456)
+
+        response = self.handle(handler, channel_item, 'cid3')
+        self.assertEqual(response.payload, b'\xff')
+        self.assertEqual(len(server.cache), 1)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    _ = main()
+
+# ################################################################################################################################
+# ################################################################################################################################
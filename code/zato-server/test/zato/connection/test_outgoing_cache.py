@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+from email.utils import formatdate
+from json import dumps
+from time import time
+from unittest import main, TestCase
+
+# requests
+from requests import Response
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.structures import CaseInsensitiveDict
+
+# Zato
+from zato.common.api import CACHE, DATA_FORMAT, URL_TYPE
+from zato.server.connection.http_soap.outgoing import HTTPSOAPWrapper
+from zato.server.connection.http_soap.outgoing_cache import get_freshness_lifetime, parse_cache_control
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import any_, anydict, anylist
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class _Server:
+    """ Keeps cached values in a dict, along with the expiry that each was stored with.
+    """
+    def __init__(self) -> 'None':
+        self.cache = {} # type: anydict
+        self.expiry = {} # type: anydict
+
+    def get_from_cache(self, cache_type:'str', cache_name:'str', key:'str') -> 'any_':
+        return self.cache.get(key)
+
+    def set_in_cache(self, cache_type:'str', cache_name:'str', key:'str', value:'any_', expiry:'float'=0.0) -> 'None':
+        self.cache[key] = value
+        self.expiry[key] = expiry
+
+# ################################################################################################################################
+
+class _Session:
+    """ Returns the responses given on input, one by one, and records the headers of each request.
+    """
+    def __init__(self, results:'anylist') -> 'None':
+        self.results = results
+        self.requests = [] # type: anylist
+
+    def request(self, method:'str', address:'str', *args:'any_', **kwargs:'any_') -> 'Response':
+
+        self.requests.append(dict(kwargs['headers']))
+        result = self.results.pop(0)
+
+        if isinstance(result, Exception):
+            raise result
+
+        status_code, headers, data = result
+
+        response = Response()
+        response.status_code = status_code
+        response.headers = CaseInsensitiveDict(headers)
+        response._content = dumps(data).encode('utf8') if data is not None else b''
+        response.encoding = 'utf8'
+
+        return response
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class OutgoingCacheTestCase(TestCase):
+
+    def get_wrapper(self, results:'anylist', **config:'any_') -> 'HTTPSOAPWrapper':
+
+        wrapper_config = {
+            'id': 1,
+            'name': 'my.conn',
+            'is_active': True,
+            'transport': URL_TYPE.PLAIN_HTTP,
+            'data_format': DATA_FORMAT.JSON,
+            'content_type': None,
+            'address_host': 'http://localhost',
+            'address_url_path': '/my/path',
+            'timeout': 10,
+            'pool_size': 10,
+            'sec_type': None,
+            'security_name': None,
+            'password': None,
+            'cache_type': CACHE.TYPE.BUILTIN,
+            'cache_name': 'default',
+            'cache_expiry': 0,
+        }
+        wrapper_config.update(config)
+
+        wrapper = HTTPSOAPWrapper(_Server(), wrapper_config) # type: ignore
+        wrapper.session = _Session(results) # type: ignore
+
+        return wrapper
+
+# ################################################################################################################################
+
+    def test_max_age(self) -> 'None':
+
+        wrapper = self.get_wrapper([
+            (200, {'Cache-Control': 'max-age=60'}, {'abc': 123}),
+        ])
+
+        response1 = wrapper.get('cid.1', {'aaa': 1, 'bbb': 2})
+
+        # The second response is served from cache, regardless of the order of query string parameters,
+        # and it has the same data as the first one, without it having been parsed again.
+        response2 = wrapper.get('cid.2', {'bbb': 2, 'aaa': 1})
+
+        self.assertDictEqual(response2.data, {'abc': 123}) # type: ignore
+        self.assertIs(response2.data, response1.data)
+        self.assertEqual(response2.status_code, 200)
+        self.assertEqual(response2.text, '{"abc": 123}')
+        self.assertEqual(len(wrapper.session.requests), 1) # type: ignore
+
+        stats = wrapper.get_stats()
+
+        self.assertEqual(stats['cache_hits'], 1)
+        self.assertEqual(stats['cache_misses'], 1)
+
+        # Other methods are never cached
+        wrapper.session.results.append((200, {'Cache-Control': 'max-age=60'}, {})) # type: ignore
+        _ = wrapper.post('cid.3', '')
+
+        self.assertEqual(len(wrapper.session.requests), 2) # type: ignore
+
+# ################################################################################################################################
+
+    def test_no_store(self) -> 'None':
+
+        wrapper = self.get_wrapper([
+            (200, {'Cache-Control': 'no-store, max-age=60'}, {'abc': 123}),
+            (200, {'Cache-Control': 'max-age=60'}, {'abc': 456}),
+            (200, {'Cache-Control': 'max-age=60', 'Vary': '*'}, {'abc': 789}),
+        ])
+
+        for _ in range(3):
+            _ = wrapper.get('cid')
+
+        self.assertEqual(len(wrapper.session.requests), 2) # type: ignore
+
+        # A response without any freshness information or validators is not stored at all
+        wrapper = self.get_wrapper([(200, {}, {}), (200, {}, {})])
+
+        for _ in range(2):
+            _ = wrapper.get('cid')
+
+        self.assertDictEqual(wrapper.server.cache, {}) # type: ignore
+        self.assertEqual(len(wrapper.session.requests), 2) # type: ignore
+
+# ################################################################################################################################
+
+    def test_shared(self) -> 'None':
+
+        # The cache is shared by all the callers so private responses are not stored ..
+        wrapper = self.get_wrapper([
+            (200, {'Cache-Control': 'private, max-age=60'}, {'abc': 123}),
+            (200, {'Cache-Control': 'max-age=60'}, {'abc': 456}),
+        ])
+
+        for _ in range(3):
+            _ = wrapper.get('cid')
+
+        self.assertEqual(len(wrapper.session.requests), 2) # type: ignore
+
+        # .. and neither are responses to requests with credentials ..
+        wrapper = self.get_wrapper([
+            (200, {'Cache-Control': 'max-age=60'}, {'abc': 123}),
+            (200, {'Cache-Control': 'max-age=60'}, {'abc': 456}),
+        ])
+
+        response = wrapper.get('cid.1', headers={'authorization': 'Bearer abc'})
+        self.assertDictEqual(response.data, {'abc': 123}) # type: ignore
+        self.assertDictEqual(wrapper.server.cache, {}) # type: ignore
+
+        response = wrapper.get('cid.2')
+        self.assertDictEqual(response.data, {'abc': 456}) # type: ignore
+
+        # .. unless they are explicitly allowed to be shared.
+        for cache_control in 'public, max-age=60', 's-maxage=60', 'must-revalidate, max-age=60':
+
+            wrapper = self.get_wrapper([(200, {'Cache-Control': cache_control}, {'abc': 123})])
+
+            _ = wrapper.get('cid.1', headers={'Authorization': 'Bearer abc'})
+            response = wrapper.get('cid.2')
+
+            self.assertDictEqual(response.data, {'abc': 123}) # type: ignore
+            self.assertEqual(len(wrapper.session.requests), 1) # type: ignore
+
+# ################################################################################################################################
+
+    def test_revalidation(self) -> 'None':
+
+        last_modified = formatdate(time() - 100, usegmt=True)
+
+        wrapper = self.get_wrapper([
+            (200, {'Cache-Control': 'no-cache', 'ETag': '"abc"', 'Last-Modified': last_modified}, {'abc': 123}),
+            (304, {'Cache-Control': 'max-age=60', 'ETag': '"abc"'}, None),
+        ], cache_expiry=120)
+
+        response1 = wrapper.get('cid.1')
+
+        # The response needs to be revalidated each time it is used but it is kept for as long as the connection says
+        key, = wrapper.server.cache # type: ignore
+        self.assertEqual(wrapper.server.expiry[key], 120) # type: ignore
+
+        # The response is revalidated with a conditional request ..
+        response2 = wrapper.get('cid.2')
+
+        headers = wrapper.session.requests[1] # type: ignore
+
+        self.assertEqual(headers['If-None-Match'], '"abc"')
+        self.assertEqual(headers['If-Modified-Since'], last_modified)
+
+        # .. the remote end confirms that it has not changed so we have the stored one ..
+        self.assertEqual(response2.status_code, 200)
+        self.assertIs(response2.data, response1.data)
+
+        # .. and, because its new headers make it fresh, there is no need to revalidate it again.
+        response3 = wrapper.get('cid.3')
+
+        self.assertEqual(response3.headers['Cache-Control'], 'max-age=60')
+        self.assertEqual(len(wrapper.session.requests), 2) # type: ignore
+
+        stats = wrapper.get_stats()
+
+        self.assertEqual(stats['cache_misses'], 1)
+        self.assertEqual(stats['cache_revalidations'], 1)
+        self.assertEqual(stats['cache_hits'], 1)
+
+# ################################################################################################################################
+
+    def test_changed(self) -> 'None':
+
+        wrapper = self.get_wrapper([
+            (200, {'ETag': '"abc"'}, {'abc': 123}),
+            (200, {'ETag': '"def"'}, {'abc': 456}),
+            (304, {}, None),
+        ])
+
+        _ = wrapper.get('cid.1')
+        response = wrapper.get('cid.2')
+
+        # A new response replaces the stored one ..
+        self.assertDictEqual(response.data, {'abc': 456}) # type: ignore
+
+        # .. and it is the one that is revalidated next time.
+        response = wrapper.get('cid.3')
+
+        self.assertEqual(wrapper.session.requests[2]['If-None-Match'], '"def"') # type: ignore
+        self.assertDictEqual(response.data, {'abc': 456}) # type: ignore
+
+# ################################################################################################################################
+
+    def test_stale_if_error(self) -> 'None':
+
+        wrapper = self.get_wrapper([
+            (200, {'Cache-Control': 'max-age=0, stale-if-error=60'}, {'abc': 123}),
+            RequestsConnectionError(),
+            (503, {}, {}),
+        ])
+
+        _ = wrapper.get('cid.1')
+
+        # Both an exception and an error response let the stale response be served
+        response = wrapper.get('cid.2')
+        self.assertDictEqual(response.data, {'abc': 123}) # type: ignore
+
+        response = wrapper.get('cid.3')
+        self.assertDictEqual(response.data, {'abc': 123}) # type: ignore
+
+        self.assertEqual(wrapper.get_stats()['cache_stale_if_error'], 2)
+
+        # But not if the response must be revalidated
+        wrapper = self.get_wrapper([
+            (200, {'Cache-Control': 'max-age=0, stale-if-error=60, must-revalidate', 'ETag': '"abc"'}, {'abc': 123}),
+            RequestsConnectionError(),
+        ])
+
+        _ = wrapper.get('cid.1')
+
+        with self.assertRaises(RequestsConnectionError):
+            _ = wrapper.get('cid.2')
+
+# ################################################################################################################################
+
+    def test_vary(self) -> 'None':
+
+        wrapper = self.get_wrapper([
+            (200, {'Cache-Control': 'max-age=60', 'Vary': 'Accept-Language'}, {'abc': 'en'}),
+            (200, {'Cache-Control': 'max-age=60', 'Vary': 'Accept-Language'}, {'abc': 'de'}),
+        ])
+
+        response = wrapper.get('cid.1', headers={'Accept-Language': 'en'})
+        self.assertDictEqual(response.data, {'abc': 'en'}) # type: ignore
+
+        response = wrapper.get('cid.2', headers={'accept-language': 'en'})
+        self.assertDictEqual(response.data, {'abc': 'en'}) # type: ignore
+
+        response = wrapper.get('cid.3', headers={'Accept-Language': 'de'})
+        self.assertDictEqual(response.data, {'abc': 'de'}) # type: ignore
+
+        self.assertEqual(len(wrapper.session.requests), 2) # type: ignore
+
+# ################################################################################################################################
+
+    def test_freshness_lifetime(self) -> 'None':
+
+        now = time()
+        date = formatdate(now, usegmt=True)
+        expires = formatdate(now + 100, usegmt=True)
+
+        def get_lifetime(headers:'anydict') -> 'float':
+            headers = CaseInsensitiveDict(headers) # type: ignore
+            return get_freshness_lifetime(headers, parse_cache_control(headers.get('Cache-Control') or ''), now)
+
+        # max-age takes precedence over Expires ..
+        self.assertEqual(get_lifetime({'Cache-Control': 'public, Max-Age="30"', 'Expires': expires}), 30)
+
+        # .. which is relative to the Date header ..
+        self.assertEqual(get_lifetime({'Expires': expires, 'Date': date}), 100)
+        self.assertEqual(get_lifetime({'Expires': '0'}), 0)
+
+        # .. and the time spent in other caches is subtracted from either.
+        self.assertEqual(get_lifetime({'Cache-Control': 'max-age=30', 'Age': '10'}), 20)
+        self.assertEqual(get_lifetime({'Cache-Control': 'max-age=30', 'Age': '40'}), 0)
+        self.assertEqual(get_lifetime({'Cache-Control': 'no-cache, max-age=30'}), 0)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    _ = main()
+
+# ################################################################################################################################
+# ################################################################################################################################
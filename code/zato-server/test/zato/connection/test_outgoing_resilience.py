@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+from unittest import main, TestCase
+
+# gevent
+from gevent import joinall, sleep, spawn
+
+# requests
+from requests import Response
+from requests.exceptions import ConnectionError as RequestsConnectionError
+
+# Zato
+from zato.common.api import URL_TYPE
+from zato.common.exception import CircuitOpenException, TimeoutException
+from zato.server.connection.http_soap.outgoing import HTTPSOAPWrapper
+from zato.server.connection.http_soap.resilience import BreakerState, CircuitBreaker, LatencyHistogram, RetryBudget
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import any_, anylist
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class _Session:
+    """ Returns responses with the status codes given on input, or raises exceptions if these are given instead.
+    """
+    def __init__(self, results:'anylist', delay:'float'=0.0) -> 'None':
+        self.results = results
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.methods = [] # type: anylist
+
+    def request(self, method:'str', address:'str', *args:'any_', **kwargs:'any_') -> 'Response':
+
+        self.methods.append(method)
+        self.in_flight += 1
+        self.max_in_flight = max(self.in_flight, self.max_in_flight)
+
+        try:
+            sleep(self.delay)
+            result = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        finally:
+            self.in_flight -= 1
+
+        if isinstance(result, Exception):
+            raise result
+
+        response = Response()
+        response.status_code = result
+        response._content = b'{}'
+        return response
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class OutgoingResilienceTestCase(TestCase):
+
+    def get_wrapper(self, results:'anylist', delay:'float'=0.0, **config:'any_') -> 'HTTPSOAPWrapper':
+
+        wrapper_config = {
+            'id': 1,
+            'name': 'my.conn',
+            'is_active': True,
+            'transport': URL_TYPE.PLAIN_HTTP,
+            'data_format': None,
+            'content_type': None,
+            'address_host': 'http://localhost',
+            'address_url_path': '/my/path',
+            'timeout': 10,
+            'pool_size': 30,
+            'sec_type': None,
+            'security_name': None,
+            'password': None,
+        }
+        wrapper_config.update(config)
+
+        wrapper = HTTPSOAPWrapper(None, wrapper_config) # type: ignore
+        wrapper.session = _Session(results, delay) # type: ignore
+
+        return wrapper
+
+# ################################################################################################################################
+
+    def test_pool_size(self) -> 'None':
+
+        wrapper = self.get_wrapper([200])
+
+        # Both plain HTTP and HTTPS use the pool size configured
+        self.assertEqual(wrapper.http_adapter._pool_maxsize, 30) # type: ignore
+        self.assertEqual(wrapper.https_adapter._pool_maxsize, 30) # type: ignore
+
+# ################################################################################################################################
+
+    def test_max_in_flight(self) -> 'None':
+
+        wrapper = self.get_wrapper([200], delay=0.01, max_in_flight=3)
+        joinall([spawn(wrapper.get, 'abc') for _ in range(10)])
+
+        self.assertEqual(wrapper.session.max_in_flight, 3) # type: ignore
+        self.assertEqual(wrapper.stats.calls, 10)
+
+        # A call that cannot obtain a slot in time is rejected
+        wrapper = self.get_wrapper([200], delay=0.05, max_in_flight=1, timeout=0.01)
+        greenlets = [spawn(wrapper.get, 'abc') for _ in range(2)]
+        joinall(greenlets)
+
+        self.assertIsInstance(greenlets[1].exception, TimeoutException)
+        self.assertEqual(wrapper.stats.in_flight_rejected, 1)
+
+# ################################################################################################################################
+
+    def test_retry(self) -> 'None':
+
+        wrapper = self.get_wrapper([RequestsConnectionError(), 503, 200], retry_max=3)
+
+        response = wrapper.get('abc')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(wrapper.stats.calls, 1)
+        self.assertEqual(wrapper.stats.requests, 3)
+        self.assertEqual(wrapper.stats.retries, 2)
+        self.assertEqual(wrapper.stats.errors, 2)
+
+        # Methods that are not idempotent are never retried
+        wrapper = self.get_wrapper([503, 200], retry_max=3)
+        response = wrapper.post('abc', 'my.data')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(wrapper.stats.retries, 0)
+
+# ################################################################################################################################
+
+    def test_retry_budget(self) -> 'None':
+
+        wrapper = self.get_wrapper([503], retry_max=2, retry_budget=25)
+
+        # No retries are saved up ..
+        wrapper.retry_budget.tokens = 0 # type: ignore
+
+        # .. so a retry is possible only once in four calls.
+        for _ in range(8):
+            _ = wrapper.get('abc')
+
+        self.assertEqual(wrapper.stats.retries, 2)
+        self.assertEqual(wrapper.stats.retries_denied, 8)
+        self.assertEqual(wrapper.stats.requests, 10)
+
+# ################################################################################################################################
+
+    def test_breaker(self) -> 'None':
+
+        wrapper = self.get_wrapper([500, 500, 200, 200], breaker_error_rate=50, breaker_min_calls=4, breaker_open_time=1)
+
+        for _ in range(4):
+            _ = wrapper.get('abc')
+
+        # Half of the calls failed so the breaker is open now ..
+        with self.assertRaises(CircuitOpenException):
+            _ = wrapper.get('abc')
+
+        stats = wrapper.get_stats()
+
+        self.assertEqual(stats['breaker']['state'], BreakerState.Open)
+        self.assertEqual(stats['breaker']['rejected'], 1)
+        self.assertEqual(stats['requests'], 4)
+        self.assertEqual(stats['latency']['count'], 4)
+
+# ################################################################################################################################
+
+    def test_breaker_half_open(self) -> 'None':
+
+        breaker = CircuitBreaker(error_rate=50, slow_call_rate=0, slow_call_time=0, min_calls=2, window=60,
+            open_time=0, half_open_calls=2)
+
+        for _ in range(2):
+            self.assertTrue(breaker.allow_request())
+            breaker.on_result(True, 1.0)
+
+        self.assertEqual(breaker.state, BreakerState.Open)
+
+        # Only as many probes as configured are let through ..
+        self.assertTrue(breaker.allow_request())
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+        self.assertEqual(breaker.state, BreakerState.Half_Open)
+
+        # .. a failed one opens the breaker again ..
+        breaker.on_result(True, 1.0)
+        self.assertEqual(breaker.state, BreakerState.Open)
+        self.assertEqual(breaker.times_opened, 2)
+
+        # .. and successful ones close it.
+        for _ in range(2):
+            self.assertTrue(breaker.allow_request())
+            breaker.on_result(False, 1.0)
+
+        self.assertEqual(breaker.state, BreakerState.Closed)
+        self.assertTrue(breaker.allow_request())
+
+# ################################################################################################################################
+
+    def test_breaker_probe_killed(self) -> 'None':
+
+        wrapper = self.get_wrapper([500, 500, 200], delay=0.05, breaker_error_rate=50, breaker_min_calls=2,
+            breaker_half_open_calls=1)
+
+        # Probes are let through as soon as the breaker opens
+        wrapper.breaker.open_time = 0 # type: ignore
+
+        for _ in range(2):
+            _ = wrapper.get('abc')
+
+        # The breaker is open now so the next call is a probe, which we kill before it completes ..
+        greenlet = spawn(wrapper.get, 'abc')
+        sleep(0.01)
+
+        self.assertEqual(wrapper.breaker.state, BreakerState.Half_Open) # type: ignore
+        greenlet.kill()
+
+        # .. it counts as a failure so the breaker opens again instead of waiting for the probe's result forever ..
+        self.assertEqual(wrapper.breaker.state, BreakerState.Open) # type: ignore
+        self.assertEqual(wrapper.stats.errors, 3)
+
+        # .. which means that new probes can be let through.
+        response = wrapper.get('abc')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(wrapper.breaker.state, BreakerState.Closed) # type: ignore
+
+# ################################################################################################################################
+
+    def test_breaker_slow_calls(self) -> 'None':
+
+        breaker = CircuitBreaker(error_rate=0, slow_call_rate=50, slow_call_time=100, min_calls=4, window=60,
+            open_time=30, half_open_calls=1)
+
+        for time_ms in (10, 200, 10):
+            breaker.on_result(False, time_ms)
+
+        self.assertEqual(breaker.state, BreakerState.Closed)
+
+        breaker.on_result(False, 300)
+        self.assertEqual(breaker.state, BreakerState.Open)
+        self.assertFalse(breaker.allow_request())
+
+# ################################################################################################################################
+
+    def test_retry_budget_tokens(self) -> 'None':
+
+        budget = RetryBudget(50, max_tokens=2)
+
+        self.assertTrue(budget.try_spend())
+        self.assertTrue(budget.try_spend())
+        self.assertFalse(budget.try_spend())
+
+        # Two requests earn one retry ..
+        budget.on_request()
+        budget.on_request()
+        self.assertTrue(budget.try_spend())
+
+        # .. but no more than the maximum can be saved up.
+        for _ in range(10):
+            budget.on_request()
+
+        self.assertEqual(budget.tokens, 2)
+
+# ################################################################################################################################
+
+    def test_latency_histogram(self) -> 'None':
+
+        histogram = LatencyHistogram((10, 100))
+
+        for time_ms in (1, 5, 50, 500):
+            histogram.observe(time_ms)
+
+        data = histogram.to_dict()
+
+        self.assertDictEqual(data['buckets'], {'le_10': 2, 'le_100': 1, 'inf': 1})
+        self.assertEqual(data['count'], 4)
+        self.assertEqual(data['max_ms'], 500)
+        self.assertEqual(data['p50_ms'], 10)
+        self.assertEqual(data['p90_ms'], 500)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    _ = main()
+
+# ################################################################################################################################
+# ################################################################################################################################
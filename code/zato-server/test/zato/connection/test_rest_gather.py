@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+from time import monotonic
+from unittest import main, TestCase
+
+# Bunch
+from bunch import Bunch
+
+# gevent
+from gevent import sleep
+
+# requests
+from requests import Response
+
+# Zato
+from zato.common.api import URL_TYPE
+from zato.server.connection.facade import RESTFacade
+from zato.server.connection.http_soap.outgoing import HTTPSOAPWrapper
+from zato.server.connection.http_soap.resilience import BreakerState
+
+# Zato - Cython
+from zato.cy.reqresp.response import Response as ServiceResponse
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import any_, anylist
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class _BaseException(BaseException):
+    pass
+
+# ################################################################################################################################
+
+class _Conn:
+    """ Returns responses after a delay, keeping track of how many calls are running at a time.
+    """
+    def __init__(self, name:'str', delay:'float', pool_size:'int'=10) -> 'None':
+        self.config = {'name': name}
+        self.delay = delay
+        self.pool_size = pool_size
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = [] # type: anylist
+
+    def _call(self, method:'str', cid:'str', *args:'any_', **kwargs:'any_') -> 'Response':
+
+        self.calls.append((method, cid, args, kwargs))
+        self.in_flight += 1
+        self.max_in_flight = max(self.in_flight, self.max_in_flight)
+
+        try:
+            sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+
+        if kwargs.get('params', {}).get('should_raise'):
+            raise Exception('My exception')
+
+        if kwargs.get('params', {}).get('should_raise_base'):
+            raise _BaseException('My base exception')
+
+        response = Response()
+        response.status_code = 200
+        return response
+
+    def get(self, cid:'str', *args:'any_', **kwargs:'any_') -> 'Response':
+        return self._call('get', cid, *args, **kwargs)
+
+    def post(self, cid:'str', *args:'any_', **kwargs:'any_') -> 'Response':
+        return self._call('post', cid, *args, **kwargs)
+
+# ################################################################################################################################
+
+class _Session:
+    """ Returns responses with a given status code after a delay.
+    """
+    def __init__(self, status_code:'int', delay:'float'=0.0) -> 'None':
+        self.status_code = status_code
+        self.delay = delay
+
+    def request(self, method:'str', address:'str', *args:'any_', **kwargs:'any_') -> 'Response':
+
+        sleep(self.delay)
+
+        response = Response()
+        response.status_code = self.status_code
+        response._content = b'{}'
+        return response
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class RESTGatherTestCase(TestCase):
+
+    def get_facade(self, *conn_list:'_Conn') -> 'RESTFacade':
+
+        out_plain_http = {conn.config['name']: Bunch(conn=conn) for conn in conn_list}
+
+        facade = RESTFacade()
+        facade.init('my.cid', out_plain_http, ServiceResponse()) # type: ignore
+
+        return facade
+
+# ################################################################################################################################
+
+    def test_gather(self) -> 'None':
+
+        conn1 = _Conn('conn1', 0.05)
+        conn2 = _Conn('conn2', 0.05)
+
+        facade = self.get_facade(conn1, conn2)
+
+        start = monotonic()
+
+        results = facade.gather([
+            {'name': 'conn1', 'params': {'abc': 1}},
+            {'name': 'conn2', 'method': 'post', 'data': 'my.data'},
+            {'name': 'conn1', 'params': {'abc': 2}},
+            {'name': 'conn1', 'params': {'should_raise': True}},
+            {'name': 'no.such.conn'},
+            {'name': 'conn1', 'method': 'no_such_method'},
+        ])
+
+        # All the calls were made at the same time ..
+        self.assertLess(monotonic() - start, 0.1)
+        self.assertEqual(conn1.max_in_flight, 3)
+
+        # .. with what was given on input ..
+        self.assertListEqual(sorted(call[3]['params']['abc'] for call in conn1.calls[:2]), [1, 2])
+        self.assertEqual(conn2.calls[0][0], 'post')
+        self.assertEqual(conn2.calls[0][1], 'my.cid')
+        self.assertEqual(conn2.calls[0][3]['data'], 'my.data')
+
+        # .. and their results are in the same order as the calls were.
+        self.assertListEqual([result.name for result in results], ['conn1', 'conn2', 'conn1', 'conn1', 'no.such.conn', 'conn1'])
+        self.assertListEqual([result.is_ok for result in results], [True, True, True, False, False, False])
+
+        self.assertEqual(results[1].response.status_code, 200) # type: ignore
+        self.assertEqual(results[3].exception.args[0], 'My exception') # type: ignore
+        self.assertIsInstance(results[4].exception, KeyError)
+        self.assertIsInstance(results[5].exception, AttributeError)
+        self.assertGreaterEqual(results[0].time_ms, 50)
+
+# ################################################################################################################################
+
+    def test_pool_size(self) -> 'None':
+
+        conn = _Conn('conn1', 0.01, pool_size=2)
+        facade = self.get_facade(conn)
+
+        # By default, each connection is called by as many greenlets as there are connections in its pool ..
+        results = facade.gather([{'name': 'conn1'}] * 6)
+
+        self.assertEqual(conn.max_in_flight, 2)
+        self.assertTrue(all(result.is_ok for result in results))
+
+        # .. unless told otherwise.
+        conn.max_in_flight = 0
+        _ = facade.gather([{'name': 'conn1'}] * 6, pool_size=3)
+
+        self.assertEqual(conn.max_in_flight, 3)
+
+# ################################################################################################################################
+
+    def test_deadline(self) -> 'None':
+
+        fast = _Conn('fast', 0.01)
+        slow = _Conn('slow', 1.0)
+
+        facade = self.get_facade(fast, slow)
+
+        start = monotonic()
+        results = facade.gather([{'name': 'fast'}, {'name': 'slow'}, {'name': 'fast'}], deadline=0.1)
+
+        # We did not wait for the slow call ..
+        self.assertLess(monotonic() - start, 0.5)
+
+        # .. but we have the results of the fast ones.
+        self.assertListEqual([result.is_ok for result in results], [True, False, True])
+        self.assertListEqual([result.is_timeout for result in results], [False, True, False])
+        self.assertIsNone(results[1].response)
+
+        # Timings of each call are in the service's response
+        timings = facade._response.meta['rest_gather'] # type: ignore
+
+        self.assertListEqual([timing['name'] for timing in timings], ['fast', 'slow', 'fast'])
+        self.assertListEqual([timing['status_code'] for timing in timings], [200, None, 200])
+        self.assertTrue(timings[1]['is_timeout'])
+        self.assertGreaterEqual(timings[1]['time_ms'], 100)
+
+        # The slow call is not counted as running anymore
+        sleep(0.01)
+        self.assertEqual(slow.in_flight, 0)
+
+# ################################################################################################################################
+
+    def test_deadline_base_exception(self) -> 'None':
+
+        conn = _Conn('conn1', 0.01)
+        facade = self.get_facade(conn)
+
+        results = facade.gather([{'name': 'conn1', 'params': {'should_raise_base': True}}], deadline=0.5)
+
+        # The call ended before the deadline so it did not time out even if it did not succeed
+        self.assertFalse(results[0].is_ok)
+        self.assertFalse(results[0].is_timeout)
+        self.assertIsInstance(results[0].exception, _BaseException)
+
+# ################################################################################################################################
+
+    def test_deadline_breaker(self) -> 'None':
+
+        conn = HTTPSOAPWrapper(None, { # type: ignore
+            'id': 1,
+            'name': 'conn1',
+            'is_active': True,
+            'transport': URL_TYPE.PLAIN_HTTP,
+            'data_format': None,
+            'content_type': None,
+            'address_host': 'http://localhost',
+            'address_url_path': '/my/path',
+            'timeout': 10,
+            'pool_size': 10,
+            'sec_type': None,
+            'security_name': None,
+            'password': None,
+            'max_in_flight': 5,
+            'breaker_error_rate': 50,
+            'breaker_min_calls': 2,
+            'breaker_half_open_calls': 1,
+        })
+        conn.session = _Session(500) # type: ignore
+
+        breaker = conn.breaker # type: any_
+        breaker.open_time = 0
+
+        facade = self.get_facade(conn) # type: ignore
+
+        # The calls fail so the breaker opens ..
+        _ = facade.gather([{'name': 'conn1'}] * 2)
+        self.assertEqual(breaker.state, BreakerState.Open)
+
+        # .. the next call is a probe which misses the deadline ..
+        conn.session = _Session(200, 1.0) # type: ignore
+        results = facade.gather([{'name': 'conn1'}], deadline=0.05)
+
+        self.assertTrue(results[0].is_timeout)
+
+        # .. by the time we return, it has counted as a failure and its in-flight slot has been released ..
+        self.assertEqual(breaker.state, BreakerState.Open)
+        self.assertEqual(conn.get_stats()['in_flight'], 0)
+
+        # .. and nothing modifies its result anymore ..
+        sleep(0.01)
+        self.assertIsNone(results[0].response)
+
+        # .. which means that the breaker lets new probes through rather than being stuck half-open.
+        conn.session = _Session(200) # type: ignore
+        results = facade.gather([{'name': 'conn1'}])
+
+        self.assertTrue(results[0].is_ok)
+        self.assertEqual(breaker.state, BreakerState.Closed)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    _ = main()
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+from unittest import main, TestCase
+
+# Bunch
+from bunch import Bunch
+
+# gevent
+from gevent import sleep
+from gevent.lock import RLock
+
+# Zato
+from zato.common.api import PUBSUB
+from zato.common.util.time_ import utcnow_as_ms
+from zato.server.pubsub.delivery._sorted_list import SortedList
+from zato.server.pubsub.delivery.message import NonGDMessage
+from zato.server.pubsub.delivery.task import DeliveryTask, WakeupCounter
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import any_, anydict, anylist, strlist
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+sub_key = 'zpsk.test.123'
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class DeliveryTaskWakeupTestCase(TestCase):
+
+    def setUp(self) -> 'None':
+
+        self.delivered = [] # type: anylist
+        self.to_skip = [] # type: strlist
+        self.msg_idx = 0
+
+        self.delivery_list = SortedList()
+
+        self.task = DeliveryTask(
+            pubsub = Bunch(wait_for_topic=lambda topic_name: True),
+            sub_config = {
+                'topic_id': 1,
+                'topic_name': '/test',
+                'endpoint_name': 'test.endpoint',
+                'task_delivery_interval': 200,
+                'delivery_method': PUBSUB.DELIVERY_METHOD.NOTIFY.id,
+                'delivery_batch_size': 10,
+                'wrap_one_msg_in_list': True,
+                'wait_sock_err': 1,
+                'wait_non_sock_err': 1,
+            },
+            sub_key = sub_key,
+            delivery_lock = RLock(),
+            delivery_list = self.delivery_list,
+            deliver_pubsub_msg = self._deliver,
+            confirm_pubsub_msg_delivered_cb = lambda sub_key, msg_id_list: None,
+            enqueue_initial_messages_func = lambda sub_key, topic_name, endpoint_name: None,
+            pubsub_set_to_delete = lambda sub_key, msg_id_list: None,
+            pubsub_get_before_delivery_hook = self._get_hook,
+            pubsub_invoke_before_delivery_hook = self._invoke_hook,
+        )
+
+        # Let the task start and block on its event
+        sleep(0.01)
+
+    def tearDown(self) -> 'None':
+        self.task.stop()
+        sleep(0.01)
+
+# ################################################################################################################################
+
+    def _deliver(self, sub_key:'str', msg_list:'anylist') -> 'None':
+        self.delivered.extend(msg.pub_msg_id for msg in msg_list)
+
+    def _get_hook(self, sub_key:'str') -> 'any_':
+        return self._invoke_hook if self.to_skip else None
+
+    def _invoke_hook(self, hook:'any_', topic_id:'int', sub_key:'str', batch:'anylist', messages:'anydict') -> 'None':
+        for msg in batch:
+            action = PUBSUB.HOOK_ACTION.SKIP if msg.pub_msg_id in self.to_skip else PUBSUB.HOOK_ACTION.DELIVER
+            messages[action].append(msg)
+
+    def add_message(self) -> 'str':
+
+        self.msg_idx += 1
+        now = utcnow_as_ms()
+
+        msg = NonGDMessage(sub_key, 'test.server', 123, {
+            'pub_msg_id': 'zpsm{}'.format(self.msg_idx),
+            'pub_time': now,
+            'data': 'data',
+            'expiration': 60_000,
+            'expiration_time': now + 60,
+            'topic_name': '/test',
+            'size': 4,
+            'published_by_id': 1,
+            'pub_pattern_matched': 'pub=/*',
+            'reply_to_sk': [],
+            'deliver_to_sk': [],
+            'sub_pattern_matched': {sub_key: 'sub=/*'},
+        })
+
+        self.delivery_list.add(msg)
+        self.task.wake_up()
+
+        return msg.pub_msg_id
+
+# ################################################################################################################################
+
+    def test_idle(self) -> 'None':
+
+        len_wakeups = self.task.len_wakeups
+        sleep(0.3)
+
+        # An idle task does not wake up at all
+        self.assertEqual(self.task.len_wakeups, len_wakeups)
+
+# ################################################################################################################################
+
+    def test_wake_up_on_new_messages(self) -> 'None':
+
+        msg_id1 = self.add_message()
+        msg_id2 = self.add_message()
+        sleep(0.02)
+
+        # The messages were delivered without waiting for the delivery interval ..
+        self.assertListEqual(self.delivered, [msg_id1, msg_id2])
+        self.assertEqual(len(self.delivery_list), 0)
+
+        # .. and the same goes for messages added later on.
+        msg_id3 = self.add_message()
+        sleep(0.02)
+
+        self.assertListEqual(self.delivered, [msg_id1, msg_id2, msg_id3])
+
+# ################################################################################################################################
+
+    def test_skipped_messages_wait_for_delivery_interval(self) -> 'None':
+
+        msg_id1 = self.add_message()
+        self.to_skip.append(msg_id1)
+
+        sleep(0.1)
+
+        # The message was skipped and the task waits for its delivery interval instead of retrying immediately ..
+        self.assertListEqual(self.delivered, [])
+        self.assertLessEqual(self.task.delivery_iter, 2)
+
+        # .. which means that the message is delivered once it is not skipped anymore and the interval lapses.
+        self.to_skip.clear()
+        sleep(0.25)
+
+        self.assertListEqual(self.delivered, [msg_id1])
+
+# ################################################################################################################################
+
+    def test_stop(self) -> 'None':
+
+        self.task.stop()
+        sleep(0.01)
+
+        # A stopped task does not deliver messages anymore
+        _ = self.add_message()
+        sleep(0.01)
+
+        self.assertListEqual(self.delivered, [])
+
+# ################################################################################################################################
+
+    def test_wakeup_counter(self) -> 'None':
+
+        now = [0.0]
+        counter = WakeupCounter(lambda: now[0])
+
+        counter.incr(True)
+        counter.incr(False)
+        counter.incr(False)
+        now[0] = 2.0
+
+        self.assertEqual(counter.get_per_second(), 1.5)
+        self.assertEqual(counter.total, 3)
+        self.assertEqual(counter.total_idle, 2)
+
+        # The rate is computed since the previous call
+        now[0] = 3.0
+        self.assertEqual(counter.get_per_second(), 0.0)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    _ = main()
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+from unittest import main, TestCase
+
+# Bunch
+from bunch import Bunch
+
+# Zato
+from zato.common.api import PUBSUB
+from zato.common.util.time_ import utcnow_as_ms
+from zato.server.pubsub.sync import InRAMSync
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import any_, anydict, dictlist
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+now = utcnow_as_ms()
+
+topic_id1 = 1
+topic_id2 = 2
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class InRAMSyncTestCase(TestCase):
+
+    def setUp(self) -> 'None':
+        self.msg_idx = 0
+
+    def get_backlog(self, max_bytes:'int'=0, on_max_bytes:'str'=PUBSUB.DEFAULT.ON_MAX_BACKLOG_BYTES) -> 'InRAMSync':
+
+        pubsub = Bunch(
+            server = Bunch(name='test.server', pid=123),
+            get_endpoint_by_id = lambda endpoint_id: Bunch(name='test.endpoint'),
+        )
+
+        return InRAMSync(pubsub, max_bytes, on_max_bytes) # type: ignore
+
+# ################################################################################################################################
+
+    def get_msg_list(self, topic_id:'int', count:'int', size:'int'=10, expiration:'int'=3600) -> 'dictlist':
+
+        out = [] # type: dictlist
+
+        for _ in range(count):
+
+            self.msg_idx += 1
+
+            out.append({
+                'pub_msg_id': 'zpsm{}'.format(self.msg_idx),
+                'pub_time': now,
+                'data': 'a' * size,
+                'size': size,
+                'expiration': expiration,
+                'expiration_time': now + expiration,
+                'topic_id': topic_id,
+                'topic_name': '/test/{}'.format(topic_id),
+                'published_by_id': 1,
+            })
+
+        return out
+
+# ################################################################################################################################
+
+    def add(self, backlog:'InRAMSync', topic_id:'int', msg_list:'dictlist', sub_keys:'any_'=('sk1',)) -> 'dictlist':
+        return backlog.add_messages('test.cid', topic_id, '/test/{}'.format(topic_id), 1000, list(sub_keys), msg_list)
+
+# ################################################################################################################################
+
+    def get_topic_stats(self, backlog:'InRAMSync', topic_id:'int') -> 'anydict':
+        return backlog.get_stats()['topics'][topic_id]
+
+# ################################################################################################################################
+
+    def test_counters(self) -> 'None':
+
+        backlog = self.get_backlog()
+
+        msg_list1 = self.get_msg_list(topic_id1, 3, size=10)
+        msg_list2 = self.get_msg_list(topic_id2, 2, size=7)
+
+        _ = self.add(backlog, topic_id1, msg_list1)
+        _ = self.add(backlog, topic_id2, msg_list2, ['sk2'])
+
+        stats = backlog.get_stats()
+        self.assertEqual(stats['messages'], 5)
+        self.assertEqual(stats['bytes'], 44)
+        self.assertDictEqual(stats['topics'][topic_id1], {'messages': 3, 'bytes': 30})
+        self.assertDictEqual(stats['topics'][topic_id2], {'messages': 2, 'bytes': 14})
+
+        # Each way of deleting messages updates the counters ..
+        backlog.delete_msg_by_id(msg_list1[0]['pub_msg_id'])
+        self.assertDictEqual(self.get_topic_stats(backlog, topic_id1), {'messages': 2, 'bytes': 20})
+
+        _ = backlog.retrieve_messages_by_sub_keys(topic_id1, ['sk1'])
+        self.assertDictEqual(self.get_topic_stats(backlog, topic_id1), {'messages': 0, 'bytes': 0})
+
+        backlog.unsubscribe(topic_id2, '/test/2', ['sk2'])
+        self.assertDictEqual(self.get_topic_stats(backlog, topic_id2), {'messages': 0, 'bytes': 0})
+
+        # .. including updates of messages.
+        msg_list3 = self.get_msg_list(topic_id1, 1, size=10)
+        _ = self.add(backlog, topic_id1, msg_list3)
+
+        msg = dict(msg_list3[0], msg_id=msg_list3[0]['pub_msg_id'], size=25)
+        for attr in ('priority', 'pub_correl_id', 'in_reply_to', 'mime_type'):
+            msg[attr] = None
+
+        self.assertTrue(backlog.update_msg(msg))
+        self.assertEqual(backlog.get_stats()['bytes'], 25)
+
+# ################################################################################################################################
+
+    def test_delete_expired(self) -> 'None':
+
+        backlog = self.get_backlog()
+
+        msg_list1 = self.get_msg_list(topic_id1, 2, expiration=10)
+        msg_list2 = self.get_msg_list(topic_id1, 2, expiration=20)
+
+        _ = self.add(backlog, topic_id1, msg_list2 + msg_list1)
+
+        # Nothing has expired yet ..
+        self.assertEqual(backlog.delete_expired(now + 5), 0)
+
+        # .. now, the first messages have ..
+        self.assertEqual(backlog.delete_expired(now + 10), 2)
+        self.assertListEqual(sorted(backlog.msg_id_to_msg), [msg['pub_msg_id'] for msg in msg_list2])
+        self.assertEqual(backlog.get_stats()['bytes'], 20)
+
+        # .. and the index contains only the remaining ones.
+        self.assertEqual(len(backlog.expiry_index), 2)
+
+        # Messages deleted before they expire are skipped ..
+        backlog.delete_msg_by_id(msg_list2[0]['pub_msg_id'])
+        self.assertEqual(backlog.delete_expired(now + 20), 1)
+
+        # .. and nothing is left afterwards.
+        self.assertDictEqual(backlog.msg_id_to_msg, {})
+        self.assertDictEqual(backlog.sub_key_to_msg_id, {'sk1': set()})
+        self.assertListEqual(backlog.expiry_index, [])
+
+# ################################################################################################################################
+
+    def test_max_bytes_spill_gd(self) -> 'None':
+
+        backlog = self.get_backlog(max_bytes=25, on_max_bytes=PUBSUB.ON_MAX_BACKLOG_BYTES.SPILL_GD.id)
+
+        msg_list = self.get_msg_list(topic_id1, 3, size=10)
+        to_spill = self.add(backlog, topic_id1, msg_list)
+
+        # Only the message that did not fit is returned, so that it can be stored in SQL ..
+        self.assertListEqual(to_spill, msg_list[2:])
+        self.assertListEqual(sorted(backlog.msg_id_to_msg), ['zpsm1', 'zpsm2'])
+
+        # .. and it is returned in its original form.
+        self.assertNotIn('server_name', to_spill[0])
+
+# ################################################################################################################################
+
+    def test_max_bytes_drop_oldest(self) -> 'None':
+
+        backlog = self.get_backlog(max_bytes=25, on_max_bytes=PUBSUB.ON_MAX_BACKLOG_BYTES.DROP_OLDEST.id)
+
+        _ = self.add(backlog, topic_id1, self.get_msg_list(topic_id1, 2, size=10))
+        to_spill = self.add(backlog, topic_id2, self.get_msg_list(topic_id2, 1, size=10))
+
+        # The oldest message was dropped to make room for the new one ..
+        self.assertListEqual(to_spill, [])
+        self.assertListEqual(sorted(backlog.msg_id_to_msg), ['zpsm2', 'zpsm3'])
+        self.assertDictEqual(self.get_topic_stats(backlog, topic_id1), {'messages': 1, 'bytes': 10})
+        self.assertDictEqual(self.get_topic_stats(backlog, topic_id2), {'messages': 1, 'bytes': 10})
+
+        # .. but messages bigger than the whole backlog cannot be kept at all and nothing is dropped for them.
+        to_spill = self.add(backlog, topic_id1, self.get_msg_list(topic_id1, 1, size=30))
+        self.assertEqual(len(to_spill), 1)
+        self.assertListEqual(sorted(backlog.msg_id_to_msg), ['zpsm2', 'zpsm3'])
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    _ = main()
+
+# ################################################################################################################################
+# ################################################################################################################################
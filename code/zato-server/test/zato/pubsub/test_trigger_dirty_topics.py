@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2023, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+from unittest import main, TestCase
+
+# Bunch
+from bunch import Bunch
+
+# gevent
+from gevent import sleep, spawn
+from gevent.lock import RLock
+
+# Zato
+from zato.server.pubsub.core.trigger import NotifyPubSubTasksTrigger
+from zato.server.pubsub.model import Topic
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import any_, anylist
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+def get_topic(topic_id:'int', task_sync_interval:'int') -> 'Topic':
+    return Topic({
+        'id': topic_id,
+        'name': '/topic/{}'.format(topic_id),
+        'is_active': True,
+        'is_internal': False,
+        'max_depth_gd': 100,
+        'max_depth_non_gd': 100,
+        'has_gd': True,
+        'depth_check_freq': 1,
+        'pub_buffer_size_gd': 1,
+        'task_delivery_interval': 1,
+        'meta_store_frequency': 1,
+        'task_sync_interval': task_sync_interval,
+    }, 'test.server', 123)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class TriggerDirtyTopicsTestCase(TestCase):
+
+    def setUp(self) -> 'None':
+
+        self.lock = RLock()
+        self.invocations = [] # type: anylist
+        self.has_subscribers = True
+        self.sync_backlog_errors = 0
+
+        # Topic 1 has a short interval and topic 2 has a long one
+        self.topics = {
+            1: get_topic(1, 10),
+            2: get_topic(2, 500),
+        }
+
+        # There are many more topics that are never published to
+        for topic_id in range(3, 5000):
+            self.topics[topic_id] = get_topic(topic_id, 10)
+
+        self.trigger = NotifyPubSubTasksTrigger(
+            lock = self.lock,
+            topics = self.topics,
+            sync_max_iters = None,
+            invoke_service_func = self._invoke_service,
+            set_sync_has_msg_func = self._set_sync_has_msg,
+            get_subscriptions_by_topic_func = self._get_subscriptions_by_topic,
+            get_delivery_server_by_sub_key_func = lambda sub_key: 'test.server',
+            sync_backlog_get_delete_messages_by_sub_keys_func = self._sync_backlog_get_delete_messages_by_sub_keys,
+        )
+
+        self.greenlet = spawn(self.trigger.run)
+
+    def tearDown(self) -> 'None':
+        self.trigger.stop()
+        _ = self.greenlet.join(timeout=2)
+
+# ################################################################################################################################
+
+    def _invoke_service(self, service:'str', request:'any_') -> 'None':
+        self.invocations.append(request['topic_id'])
+
+    def _get_subscriptions_by_topic(self, topic_name:'str') -> 'anylist':
+        return [Bunch(sub_key='sk.123')] if self.has_subscribers else []
+
+    def _sync_backlog_get_delete_messages_by_sub_keys(self, topic_id:'int', sub_keys:'anylist') -> 'anylist':
+        if self.sync_backlog_errors:
+            self.sync_backlog_errors -= 1
+            raise Exception('Test exception')
+        return []
+
+    def _set_sync_has_msg(self, topic_id:'int', is_gd:'bool', value:'bool', source:'str', gd_pub_time_max:'float'=0.0) -> 'None':
+        topic = self.topics[topic_id]
+        if is_gd:
+            topic.sync_has_gd_msg = value
+        else:
+            topic.sync_has_non_gd_msg = value
+        if value:
+            self.trigger.mark_topic_dirty(topic_id)
+
+    def publish(self, topic_id:'int') -> 'None':
+        with self.lock:
+            self._set_sync_has_msg(topic_id, False, True, 'test')
+
+# ################################################################################################################################
+
+    def test_idle(self) -> 'None':
+
+        sleep(0.1)
+
+        # Nothing was published so nothing was processed
+        self.assertListEqual(self.invocations, [])
+        self.assertSetEqual(self.trigger.dirty_topics, set())
+        self.assertListEqual(self.trigger.deadlines, [])
+
+# ################################################################################################################################
+
+    def test_publish(self) -> 'None':
+
+        sleep(0.02)
+        self.publish(1)
+        sleep(0.02)
+
+        # The topic was processed and its flags were reset
+        self.assertListEqual(self.invocations, [1])
+        self.assertFalse(self.topics[1].sync_has_non_gd_msg)
+
+# ################################################################################################################################
+
+    def test_task_sync_interval(self) -> 'None':
+
+        # Both topics were just created which means that they were synced just now too ..
+        self.publish(1)
+        self.publish(2)
+        sleep(0.1)
+
+        # .. so only the one with a short interval has been processed by now ..
+        self.assertListEqual(self.invocations, [1])
+        self.assertListEqual([topic_id for _, topic_id in self.trigger.deadlines], [2])
+
+        # .. whereas the other one is processed once its interval elapses.
+        sleep(0.5)
+        self.assertListEqual(self.invocations, [1, 2])
+        self.assertListEqual(self.trigger.deadlines, [])
+
+# ################################################################################################################################
+
+    def test_no_subscribers(self) -> 'None':
+
+        self.has_subscribers = False
+
+        sleep(0.02)
+        self.publish(1)
+        sleep(0.05)
+
+        # There are no subscribers yet so the topic keeps its messages ..
+        self.assertListEqual(self.invocations, [])
+        self.assertTrue(self.topics[1].sync_has_non_gd_msg)
+
+        # .. but once there are some, they receive the messages without another publication.
+        self.has_subscribers = True
+        sleep(0.05)
+
+        self.assertListEqual(self.invocations, [1])
+        self.assertFalse(self.topics[1].sync_has_non_gd_msg)
+
+# ################################################################################################################################
+
+    def test_error_in_sync(self) -> 'None':
+
+        self.sync_backlog_errors = 1
+
+        sleep(0.02)
+        self.publish(1)
+        sleep(0.005)
+
+        # The topic could not be processed so it still has its messages ..
+        self.assertListEqual(self.invocations, [])
+        self.assertTrue(self.topics[1].sync_has_non_gd_msg)
+
+        # .. but it is processed again later on without another publication.
+        sleep(0.05)
+
+        self.assertListEqual(self.invocations, [1])
+        self.assertFalse(self.topics[1].sync_has_non_gd_msg)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    _ = main()
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2023, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+from time import monotonic
+from unittest import main, TestCase
+
+# gevent
+from gevent import sleep
+
+# Zato
+from zato.common.typing_ import cast_
+from zato.server.connection.server.rpc.api import ConfigCtx, ServerRPC
+from zato.server.connection.server.rpc.config import RPCServerInvocationCtx
+from zato.server.connection.server.rpc.invoker import LocalServerInvoker, RemoteServerInvoker
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import any_, anylist
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class TestConfig:
+    cluster_name = 'rpc_test_cluster'
+    current_server_name = 'server1'
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class TestRemoteServerInvoker(RemoteServerInvoker):
+    """ Responds to invocations without any network connections, after a configurable delay.
+    """
+    delay = 0.0
+    ping_history = [] # type: anylist
+
+    def ping(self, ping_timeout:'any_'=None) -> 'None':
+        self.ping_history.append(self.server_name)
+        self.last_ok = monotonic()
+
+    def invoke_all_pids(self, *args:'any_', **kwargs:'any_') -> 'any_':
+        return self._invoke(self._respond, *args, **kwargs)
+
+    def _respond(self, service:'str', request:'any_', *args:'any_', **kwargs:'any_') -> 'any_':
+        sleep(self.delay)
+        if self.server_name == 'error':
+            raise Exception('Test error')
+        return _Response([{'server_name': self.server_name, 'service': service}])
+
+class _Response:
+    def __init__(self, data:'any_') -> 'None':
+        self.data = data
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class _TestConfigSource:
+
+    current_cluster_name = TestConfig.cluster_name
+    current_server_name = TestConfig.current_server_name
+
+    def __init__(self, server_names:'anylist') -> 'None':
+        self.server_names = server_names
+
+    def get_server_ctx_list(self, cluster_name:'str') -> 'anylist':
+
+        out = []
+
+        for idx, server_name in enumerate(self.server_names, 1):
+
+            ctx = RPCServerInvocationCtx()
+            ctx.cluster_name = cluster_name
+            ctx.server_name = server_name
+            ctx.address = '127.0.0.{}'.format(idx)
+            ctx.port = 17010
+            ctx.username = 'test.username'
+            ctx.password = 'test.password'
+
+            out.append(ctx)
+
+        return out
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class ServerRPCInvokeAllTestCase(TestCase):
+
+    def setUp(self) -> 'None':
+        TestRemoteServerInvoker.delay = 0.0
+        TestRemoteServerInvoker.ping_history[:] = []
+
+# ################################################################################################################################
+
+    def get_server_rpc(self, *server_names:'str') -> 'ServerRPC':
+
+        config_source = _TestConfigSource(list(server_names))
+        config_ctx = ConfigCtx(
+            cast_('any_', config_source),
+            cast_('any_', None),
+            local_server_invoker_class = LocalServerInvoker,
+            remote_server_invoker_class = TestRemoteServerInvoker,
+        )
+
+        return ServerRPC(config_ctx)
+
+# ################################################################################################################################
+
+    def test_invoke_all_is_concurrent(self) -> 'None':
+
+        TestRemoteServerInvoker.delay = 0.2
+        server_rpc = self.get_server_rpc('server2', 'server3', 'server4', 'server5')
+
+        result = server_rpc.invoke_all('test.service')
+
+        self.assertTrue(result.is_ok)
+        self.assertListEqual(sorted(item['server_name'] for item in result.data), ['server2', 'server3', 'server4', 'server5'])
+
+        # All the servers were invoked at the same time rather than one after another
+        stats = server_rpc.get_stats()
+        self.assertEqual(len(stats), 4)
+
+        for server_stats in stats.values():
+            self.assertEqual(server_stats['invocations'], 1)
+            self.assertEqual(server_stats['errors'], 0)
+            self.assertGreaterEqual(server_stats['avg_time'], 0.2)
+            self.assertLess(server_stats['avg_time'], 0.4)
+
+# ################################################################################################################################
+
+    def test_invoke_all_deadline(self) -> 'None':
+
+        TestRemoteServerInvoker.delay = 5
+        server_rpc = self.get_server_rpc('server2', 'server3')
+
+        result = server_rpc.invoke_all('test.service', deadline=0.05)
+
+        self.assertFalse(result.is_ok)
+        self.assertListEqual(result.data, [])
+
+# ################################################################################################################################
+
+    def test_invoke_all_error_does_not_stop_other_servers(self) -> 'None':
+
+        server_rpc = self.get_server_rpc('server2', 'error', 'server3')
+
+        result = server_rpc.invoke_all('test.service')
+
+        self.assertFalse(result.is_ok)
+        self.assertListEqual(sorted(item['server_name'] for item in result.data), ['server2', 'server3'])
+
+        stats = server_rpc.get_stats()
+        self.assertEqual(stats['error']['errors'], 1)
+        self.assertEqual(stats['error']['last_error'], 'Exception: Test error')
+
+# ################################################################################################################################
+
+    def test_invokers_are_reused(self) -> 'None':
+
+        server_rpc = self.get_server_rpc('server1', 'server2', 'server3')
+
+        _ = server_rpc.invoke_all('test.service')
+        invokers = dict(server_rpc._invokers)
+
+        self.assertIsInstance(invokers['server1'], LocalServerInvoker)
+        self.assertIsInstance(invokers['server2'], TestRemoteServerInvoker)
+
+        # The same invokers, along with their connections, are used the next time ..
+        server_rpc.populate_invokers()
+        for server_name, invoker in invokers.items():
+            self.assertIs(server_rpc._invokers[server_name], invoker)
+
+        # .. and the ones of servers that no longer exist are dropped.
+        config_source = server_rpc.config_ctx.config_source
+        config_source.server_names = ['server1', 'server2']
+
+        server_rpc.populate_invokers()
+        self.assertListEqual(sorted(server_rpc._invokers), ['server1', 'server2'])
+        self.assertIs(server_rpc._invokers['server2'], invokers['server2'])
+
+# ################################################################################################################################
+
+    def test_ping_is_cached(self) -> 'None':
+
+        server_rpc = self.get_server_rpc('server2', 'error')
+
+        _ = server_rpc.invoke_all('test.service')
+        _ = server_rpc.invoke_all('test.service')
+        _ = server_rpc.invoke_all('test.service')
+
+        # A server that responds is pinged only once within the health TTL,
+        # whereas one that fails is pinged before each invocation.
+        self.assertEqual(TestRemoteServerInvoker.ping_history.count('server2'), 1)
+        self.assertEqual(TestRemoteServerInvoker.ping_history.count('error'), 3)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    _ = main()
+
+# ################################################################################################################################
+# ################################################################################################################################
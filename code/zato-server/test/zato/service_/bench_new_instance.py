@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+
+Micro-benchmarks of creating and invoking instances of an empty service, with and without an instance pool.
+This is not a test module, run it directly:
+
+    $ python bench_new_instance.py
+"""
+
+# stdlib
+from time import perf_counter
+
+# Bunch
+from bunch import Bunch
+
+# gevent
+from gevent.lock import RLock
+
+# Zato
+from zato.common.api import CHANNEL, DATA_FORMAT
+from zato.common.facade import SecurityFacade
+from zato.server.service import Service
+from zato.server.service.store import ServiceStore
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import any_
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+# How many operations to time in each run
+ops_per_run = 100_000
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class _Server:
+    """ Only what services need to be deployed and invoked without connections of any kind.
+    """
+    def __init__(self) -> 'None':
+        self.user_config = Bunch()
+        self.static_config = Bunch()
+        self.time_util = None
+        self.kvdb = Bunch(translate=None)
+        self.json_parser = None
+        self.encrypt = None
+        self.component_enabled = Bunch(stats=False)
+        self.is_sso_enabled = False
+        self.crypto_manager = None
+        self.audit_pii = None
+        self.internal_cache_patterns = {}
+        self.internal_cache_lock_patterns = RLock()
+        self.security_facade = SecurityFacade(self) # type: ignore
+        self.service_store = ServiceStore(services={}, odb=None, server=self, is_testing=True) # type: ignore
+
+# ################################################################################################################################
+
+class EmptyService(Service):
+    name = 'bench.empty'
+
+    def handle(self) -> 'None':
+        pass
+
+class PooledEmptyService(EmptyService):
+    name = 'bench.empty-pooled'
+    instance_pool_size = 10
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+def _report(name:'str', elapsed:'float') -> 'None':
+    print('{:<24} ops/s:{:>12,.0f}  us/op:{:>8.3f}'.format(name, ops_per_run / elapsed, elapsed / ops_per_run * 1_000_000))
+
+# ################################################################################################################################
+
+def _set_response_func(service:'Service', **ignored_kwargs:'any_') -> 'any_':
+    return service.response.payload
+
+# ################################################################################################################################
+
+def bench(name:'str', class_:'type[Service]') -> 'None':
+
+    server = _Server()
+    store = server.service_store
+    worker_store = store._testing_worker_store
+
+    _ = class_.zato_set_module_name(__file__)
+    _ = class_.get_name()
+    impl_name = class_.get_impl_name()
+
+    store.services[impl_name] = {'service_class': class_, 'is_active': True, 'slow_threshold': 99999}
+    store.set_up_class_attributes(class_, store)
+
+    # This is what the invoking side does, e.g. self.invoke or REST channels
+    start = perf_counter()
+    for _ in range(ops_per_run):
+        service, _ = store.new_instance(impl_name)
+        _ = service.update_handle(_set_response_func, service, '', CHANNEL.INVOKE, DATA_FORMAT.DICT, '', server, None,
+            worker_store, 'cid', {})
+
+        if service.instance_pool_size:
+            store.release_instance(service)
+
+    _report(name, perf_counter() - start)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+
+    bench('new instance', EmptyService)
+    bench('pooled instance', PooledEmptyService)
+
+# ################################################################################################################################
+# ################################################################################################################################
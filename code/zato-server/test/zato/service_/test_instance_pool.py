@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2024, Zato Source s.r.o. https://zato.io
+
+Licensed under AGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# stdlib
+from unittest import main, TestCase
+
+# Bunch
+from bunch import Bunch
+
+# gevent
+from gevent.lock import RLock
+
+# Zato
+from zato.common.api import CHANNEL, DATA_FORMAT
+from zato.common.facade import SecurityFacade
+from zato.common.typing_ import cast_
+from zato.server.connection.http_soap.channel import RequestHandler
+from zato.server.service import Service
+from zato.server.service.store import ServiceStore
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if 0:
+    from zato.common.typing_ import any_, anydict, anylist
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class _Server:
+    """ Only what services need to be deployed and invoked without connections of any kind.
+    """
+    def __init__(self) -> 'None':
+        self.user_config = Bunch()
+        self.static_config = Bunch()
+        self.time_util = None
+        self.kvdb = Bunch(translate=None)
+        self.json_parser = None
+        self.encrypt = None
+        self.component_enabled = Bunch(stats=False)
+        self.is_sso_enabled = False
+        self.crypto_manager = None
+        self.audit_pii = None
+        self.internal_cache_patterns = {}
+        self.internal_cache_lock_patterns = RLock()
+        self.security_facade = SecurityFacade(self) # type: ignore
+        self.service_store = ServiceStore(services={}, odb=None, server=self, is_testing=True) # type: ignore
+        self.cache = {} # type: anydict
+
+    def get_from_cache(self, cache_type:'str', cache_name:'str', key:'str') -> 'any_':
+        return self.cache.get(key)
+
+    def set_in_cache(self, cache_type:'str', cache_name:'str', key:'str', value:'any_', expiry:'float'=0.0) -> 'None':
+        self.cache[key] = value
+
+# ################################################################################################################################
+
+class _Response:
+    def __init__(self, payload:'str') -> 'None':
+        self.payload = payload
+        self.content_type = 'application/json'
+        self.headers = {}
+        self.status_code = 200
+
+# ################################################################################################################################
+
+class _RequestHandler(RequestHandler):
+    """ Invokes services without any actual HTTP requests and keeps track of which instances were invoked.
+    """
+    def __init__(self, *args:'any_', **kwargs:'any_') -> 'None':
+        super().__init__(*args, **kwargs)
+        self.invoked = [] # type: anylist
+
+    def _invoke_service(self, service:'Service', cid:'str', *args:'any_', **kwargs:'any_') -> 'any_':
+
+        def set_response_func(service:'Service', **ignored_kwargs:'any_') -> 'any_':
+            return _Response(str(service.response.payload))
+
+        self.invoked.append(service)
+
+        return service.update_handle(set_response_func, service, '', CHANNEL.HTTP_SOAP, DATA_FORMAT.JSON, '', self.server,
+            None, self.server.service_store._testing_worker_store, cid, {})
+
+# ################################################################################################################################
+
+class MyService(Service):
+    name = 'test.my-service'
+
+    def handle(self) -> 'None':
+        self.response.payload = {'cid': self.cid}
+
+# ################################################################################################################################
+
+class MyPooledService(MyService):
+    name = 'test.my-pooled-service'
+    instance_pool_size = 2
+
+    def handle(self) -> 'None':
+        self.my_attr = self.cid
+        super().handle()
+
+    def before_reuse(self) -> 'None':
+        self.my_attr = None
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+class InstancePoolTestCase(TestCase):
+
+    def setUp(self) -> 'None':
+        self.server = _Server()
+        self.store = self.server.service_store
+
+        for class_ in MyService, MyPooledService:
+            _ = class_.zato_set_module_name(__file__)
+            _ = class_.get_name()
+            impl_name = class_.get_impl_name()
+
+            self.store.services[impl_name] = {'service_class': class_, 'is_active': True, 'slow_threshold': 99999}
+            self.store.set_up_class_attributes(class_, self.store)
+
+            # No outgoing connections are configured in tests
+            class_.kvdb = None # type: ignore
+            class_._out_ftp = None # type: ignore
+            class_._out_plain_http = {} # type: ignore
+            class_.component_enabled_hl7 = False
+
+# ################################################################################################################################
+
+    def invoke(self, class_:'any_', cid:'str') -> 'tuple[Service, any_]':
+
+        def set_response_func(service:'Service', **ignored_kwargs:'any_') -> 'any_':
+            return service.response.payload
+
+        service, _ = self.store.new_instance(class_.get_impl_name())
+        response = service.update_handle(set_response_func, service, '', CHANNEL.INVOKE, DATA_FORMAT.DICT, '', self.server,
+            None, self.store._testing_worker_store, cid, {})
+
+        if service.instance_pool_size:
+            self.store.release_instance(service)
+
+        return service, response
+
+# ################################################################################################################################
+
+    def test_facades_are_lazy(self) -> 'None':
+
+        service, _ = self.store.new_instance(MyService.get_impl_name())
+
+        # Nothing has been built yet ..
+        for name in 'out', 'outgoing', 'rest', 'keysight', 'security', 'patterns', 'environ':
+            self.assertNotIn(name, service.__dict__)
+
+        # .. these are built on first access and then they are reused ..
+        self.assertIs(service.rest, service.rest)
+        self.assertIs(service.outgoing, service.out)
+
+        # .. while this one is shared by all the services.
+        self.assertIs(service.security, self.server.security_facade)
+
+        # Assigning to lazily-built attributes works as usual
+        service.environ = {'abc': 123}
+        self.assertDictEqual(service.environ, {'abc': 123})
+
+# ################################################################################################################################
+
+    def test_pool_reuses_instances(self) -> 'None':
+
+        service1, response1 = self.invoke(MyPooledService, 'cid1')
+        service2, response2 = self.invoke(MyPooledService, 'cid2')
+
+        # The same instance served both requests ..
+        self.assertIs(service1, service2)
+        self.assertDictEqual(response1, {'cid': 'cid1'})
+        self.assertDictEqual(response2, {'cid': 'cid2'})
+
+        # .. and it was reset each time it was released.
+        self.assertIsNone(service2.my_attr)
+        self.assertEqual(service2.cid, '')
+        self.assertEqual(service2.response.payload, '')
+
+# ################################################################################################################################
+
+    def test_pool_is_opt_in_and_bounded(self) -> 'None':
+
+        service1, _ = self.invoke(MyService, 'cid1')
+        service2, _ = self.invoke(MyService, 'cid2')
+
+        self.assertIsNot(service1, service2)
+        self.assertNotIn(MyService.get_impl_name(), self.store.instance_pools)
+
+        # Three instances exist at the same time but only two of them can be kept for later
+        impl_name = MyPooledService.get_impl_name()
+        instances = [self.store.new_instance(impl_name)[0] for _ in range(3)]
+
+        for instance in instances:
+            self.store.release_instance(instance)
+
+        self.assertEqual(len(self.store.instance_pools[impl_name]), 2)
+
+# ################################################################################################################################
+
+    def test_stream_payload_is_not_pooled(self) -> 'None':
+
+        impl_name = MyPooledService.get_impl_name()
+
+        service, _ = self.store.new_instance(impl_name)
+        service.response.payload = iter(['abc'])
+
+        self.store.release_instance(service)
+        self.assertListEqual(self.store.instance_pools[impl_name], [])
+
+# ################################################################################################################################
+
+    def test_pool_with_cached_channel(self) -> 'None':
+
+        impl_name = MyPooledService.get_impl_name()
+        handler = _RequestHandler(cast_('any_', self.server))
+
+        channel_item = Bunch({
+            'id': 123,
+            'name': 'test.channel',
+            'service_impl_name': impl_name,
+            'cache_type': 'builtin',
+            'cache_name': 'default',
+            'cache_single_flight': True,
+        })
+
+        def handle(cid:'str') -> 'any_':
+            wsgi_environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/test'}
+            return handler.handle(cid, {}, channel_item, wsgi_environ, '', cast_('any_', None), {}, None, '/test', {}, {})
+
+        # Nothing is cached yet so the service is invoked and its instance is released once the response is cached ..
+        response1 = handle('cid1')
+
+        self.assertEqual(len(handler.invoked), 1)
+        self.assertListEqual(self.store.instance_pools[impl_name], handler.invoked)
+        self.assertIsNone(handler.invoked[0].my_attr)
+
+        # .. this time, the response is returned from the cache, which means that the instance is reused
+        # .. without invoking the service and it is released again afterwards.
+        response2 = handle('cid2')
+
+        self.assertEqual(len(handler.invoked), 1)
+        self.assertListEqual(self.store.instance_pools[impl_name], handler.invoked)
+        self.assertEqual(response2.payload, response1.payload)
+
+# ################################################################################################################################
+# ################################################################################################################################
+
+if __name__ == '__main__':
+    _ = main()
+
+# ################################################################################################################################
+# ################################################################################################################################
@@ -15,9 +15,6 @@ from uuid import uuid4
 # Base32 Crockford
 from base32_crockford import encode as crockford_encode
 
-# ipaddress
-from ipaddress import ip_network
-
 # SQLAlchemy
 from sqlalchemy import update
 
@@ -27,6 +24,7 @@ from zxcvbn import zxcvbn
 # Zato
 from zato.common.crypto.api import CryptoManager
 from zato.common.odb.model import SSOUser as UserModel
+from zato.common.util.network import NetworkMatcher
 from zato.sso import const, status_code, ValidationError
 from zato.sso.common import LoginCtx
 
@@ -253,17 +251,18 @@ def normalize_sso_config(sso_conf:'Bunch') -> 'None':
     usr_valid_srv = usr_valid_srv if isinstance(usr_valid_srv, list) else [usr_valid_srv]
     sso_conf.user_validation.service = usr_valid_srv
 
-    # Convert all white/black-listed IP addresses to sets of network objects
-    # which will let serviced in run-time efficiently check for membership of an address in that network.
+    # Convert all white/black-listed IP addresses to network matchers
+    # which will let serviced in run-time efficiently check for membership of an address in any of the networks.
 
     user_address_list = sso_conf.user_address_list
     for username, ip_allowed in user_address_list.items():
+        matcher = NetworkMatcher()
         if ip_allowed:
-            ip_allowed = user_address_list if isinstance(ip_allowed, list) else [ip_allowed]
-            ip_allowed = [ip_network(elem.decode('utf8')) for elem in ip_allowed if elem != '*']
-        else:
-            ip_allowed = []
-        user_address_list[username] = ip_allowed
+            ip_allowed = ip_allowed if isinstance(ip_allowed, list) else [ip_allowed]
+            for elem in ip_allowed:
+                if elem != '*':
+                    matcher.add(elem if isinstance(elem, str) else elem.decode('utf8'))
+        user_address_list[username] = matcher
 
     # Make sure signup service list is a list
     callback_service_list = sso_conf.signup.callback_service_list or []
@@ -351,9 +350,8 @@ class UserChecker:
                     return False
                 else:
                     for _remote_addr in ctx.remote_addr:
-                        for _ip_allowed in ip_allowed:
-                            if _remote_addr in _ip_allowed:
-                                return True # OK, there was at least that one match so we report success
+                        if _remote_addr in ip_allowed:
+                            return True # OK, there was at least that one match so we report success
 
                     # If we get here, it means that none of remote addresses from input matched
                     # so we can return False to be explicit.